@@ -0,0 +1,137 @@
+# benchmarks/archive.py
+# Candle archive (bot/archive.py): appends, range reads, and reading the same history from JSON.
+#
+#   python -m benchmarks.archive --years 3
+#
+# Builds --years of synthetic 5m bars and archives them in a temporary
+# directory: the history in one append, then the last --live bars one closed
+# bar at a time like the live loop (with and without fsync). Then times
+#   - range reads of --window bars at random offsets (views, from a fresh
+#     CandleArchive like another process would open it),
+#   - the same history from a tools/okx_recorder.py style JSON recording
+#     (json.load + okx_rows_to_frame: what a replay has to do today).
+# Checks (exit code 1 on any mismatch): every read equals the source bars; a
+# crash between writing an append's columns and committing it leaves the
+# previous rows readable and the next append overwrites the torn rows; bars
+# filling a gap in the archive are merged in order.
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+import numpy as np
+
+from .synthetic import make_5m
+
+COLUMNS = ["time", "open", "high", "low", "close", "volume"]
+
+
+def same(cols, df, lo, hi) -> bool:
+    return all(np.array_equal(np.asarray(cols[c]), df[c].to_numpy()[lo:hi]) for c in COLUMNS)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="memory-mapped candle archive")
+    ap.add_argument("--years", type=float, default=3.0, help="years of 5m bars")
+    ap.add_argument("--live", type=int, default=500, help="bars appended one at a time")
+    ap.add_argument("--window", type=int, default=300, help="bars per range read")
+    ap.add_argument("--reads", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+    logging.disable(logging.ERROR)   # the simulated crash is logged as an append error
+
+    from bot.archive import CandleArchive
+    from bot.data import okx_rows_to_frame
+
+    n = int(args.years * 365 * 288)
+    df = make_5m(n, seed=args.seed)[COLUMNS]
+    df["time"] = df["time"].astype(np.int64)
+    rng = np.random.default_rng(args.seed)
+    now = int(df["time"].iat[-1]) + 600   # every bar closed
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        # --- writes ---
+        wall = {}
+        for fsync in (False, True):
+            root = os.path.join(tmp, f"fsync{int(fsync)}")
+            arch = CandleArchive(root, fsync=fsync)
+            t0 = time.perf_counter()
+            arch.append("BENCH", "5m", df.iloc[:n - args.live], now)
+            wall[("bulk", fsync)] = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for i in range(n - args.live, n):
+                # the store's window as the live loop hands it over: only its last bar is new
+                arch.append("BENCH", "5m", df.iloc[max(0, i - 299):i + 1], now)
+            wall[("live", fsync)] = (time.perf_counter() - t0) / args.live
+        size = sum(os.path.getsize(os.path.join(root, "BENCH", "5m", f)) for f in os.listdir(os.path.join(root, "BENCH", "5m")))
+
+        # --- reads, as another process: a fresh archive object over the same files ---
+        reader = CandleArchive(root).series("BENCH", "5m")
+        t0 = time.perf_counter()
+        cols = reader.read(last=args.window)
+        first_read = time.perf_counter() - t0
+        mismatches += not same(cols, df, n - args.window, n)
+        times = df["time"].to_numpy()
+        starts = rng.integers(0, n - args.window, args.reads)
+        t0 = time.perf_counter()
+        for s in starts:
+            cols = reader.read(int(times[s]), int(times[s + args.window]))
+        read_wall = (time.perf_counter() - t0) / args.reads
+        for s in starts[:50]:
+            mismatches += not same(reader.read(int(times[s]), int(times[s + args.window])), df, s, s + args.window)
+        whole = reader.read()
+        mismatches += not same(whole, df, 0, n)
+
+        # --- the same history from a JSON recording ---
+        rec = os.path.join(tmp, "BENCH__5m.json")
+        rows = [[str(int(r.time) * 1000), repr(r.open), repr(r.high), repr(r.low), repr(r.close), repr(r.volume),
+                 "0", "0", "1"] for r in df.itertuples()]
+        with open(rec, "w", encoding="utf-8") as f:
+            json.dump({"inst": "BENCH", "bar": "5m", "rows": rows}, f)
+        t0 = time.perf_counter()
+        with open(rec, "r", encoding="utf-8") as f:
+            loaded = json.load(f)["rows"]
+        parsed = okx_rows_to_frame(loaded[::-1])
+        json_wall = time.perf_counter() - t0
+        json_size = os.path.getsize(rec)
+        mismatches += len(parsed) != n
+
+        # --- crash between the column writes and the commit ---
+        crash = CandleArchive(os.path.join(tmp, "crash"))
+        crash.append("BENCH", "5m", df.iloc[:1000], now)
+        s = crash.series("BENCH", "5m")
+        def killed(meta):
+            raise OSError("killed before the commit")
+        commit, s._commit = s._commit, killed
+        crash.append("BENCH", "5m", df.iloc[1000:1010].assign(close=-1.0), now)   # torn: never committed
+        s._commit = commit
+        after = CandleArchive(os.path.join(tmp, "crash")).series("BENCH", "5m")
+        mismatches += after.rows != 1000 or not same(after.read(), df, 0, 1000)
+        crash.append("BENCH", "5m", df.iloc[1000:1010], now)
+        after = CandleArchive(os.path.join(tmp, "crash")).series("BENCH", "5m")
+        mismatches += after.rows != 1010 or not same(after.read(), df, 0, 1010)
+
+        # --- a gap filled later: merged into a new generation ---
+        gap = CandleArchive(os.path.join(tmp, "gap"))
+        gap.append("BENCH", "5m", df.iloc[:500], now)
+        gap.append("BENCH", "5m", df.iloc[600:1000], now)
+        added = gap.append("BENCH", "5m", df.iloc[450:650], now)
+        g = CandleArchive(os.path.join(tmp, "gap")).series("BENCH", "5m")
+        mismatches += added != 100 or g.meta()["gen"] != 1 or not same(g.read(), df, 0, 1000)
+
+    print(f"years={args.years} bars={n:,} archive={size / 1e6:.1f} MB (json {json_size / 1e6:.1f} MB)")
+    print(f"  bulk append        {wall[('bulk', False)] * 1000:9.1f} ms (fsync {wall[('bulk', True)] * 1000:.1f} ms)")
+    print(f"  live append        {wall[('live', False)] * 1000:9.3f} ms/bar (fsync {wall[('live', True)] * 1000:.3f} ms/bar)")
+    print(f"  first read (new)   {first_read * 1000:9.3f} ms  last {args.window} bars, fresh reader")
+    print(f"  range read         {read_wall * 1e6:9.1f} us  {args.window} bars at a random time, {args.reads} reads")
+    print(f"  json + frame       {json_wall * 1000:9.1f} ms  whole history, before any slicing")
+    print(f"  mismatches={mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
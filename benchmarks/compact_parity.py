@@ -0,0 +1,89 @@
+# benchmarks/compact_parity.py
+# Signal parity of COMPACT_MODE frames vs full float64 frames.
+#
+#   python -m benchmarks.compact_parity --steps 2000
+#
+# Walks a synthetic market bar by bar (as the live loop would see it: the last
+# MAX_BARS_PER_TF bars of each TF), runs run_checks on the float64 frames and on
+# their compact copies with separate cond_1 state files, and compares ok /
+# summary / direction / start_index / flags of the conditions both evaluated. Also prints the
+# resident size of both representations. Exit code 1 on any mismatch.
+# Few steps reach past cond_1 here; the per-condition parity at starts that reach
+# conditions 2..11 is tests/test_compact.py (python -m pytest tests).
+
+import os
+import sys
+import logging
+import argparse
+import tempfile
+
+import numpy as np
+
+from .synthetic import make_market
+
+
+def _same(a, b) -> bool:
+    """Same outcome, and the conditions both runs evaluated agree (their cost order may differ)."""
+    from bot.checker import evaluated
+    (ok_a, ra), (ok_b, rb) = a, b
+    fa, fb = evaluated(ra), evaluated(rb)
+    return ((ok_a, ra["summary"], ra["direction"], ra["start_index"])
+            == (ok_b, rb["summary"], rb["direction"], rb["start_index"])
+            and all(fa[c] == fb[c] for c in fa.keys() & fb.keys()))
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="compact vs float64 signal parity")
+    ap.add_argument("--steps", type=int, default=2000, help="5m bars to walk")
+    ap.add_argument("--bars", type=int, default=300, help="bars per TF visible at each step")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+    logging.disable(logging.INFO)
+
+    from bot.indicators import add_all_indicators
+    from bot.checker import run_checks, evaluated
+    from bot.compact import compact_all, frames_nbytes
+    from bot.conditions import cond_1
+
+    warm = args.bars * 24   # enough 5m history for `bars` 2H bars
+    raw = make_market(warm + args.steps, seed=args.seed)
+    # indicators are causal, so computing once and slicing equals recomputing per step
+    full = {tf: add_all_indicators(df) for tf, df in raw.items()}
+    times = {tf: df["time"].to_numpy() for tf, df in full.items()}
+
+    mismatches, signals = [], 0
+    sizes = None
+    with tempfile.TemporaryDirectory() as tmp:
+        state_f64 = os.path.join(tmp, "f64.json")
+        state_c = os.path.join(tmp, "compact.json")
+        for step in range(args.steps):
+            i5 = warm + step
+            t = times["5m"][i5]
+            view = {}
+            for tf, df in full.items():
+                end = int(np.searchsorted(times[tf], t, side="right"))
+                view[tf] = df.iloc[max(0, end - args.bars):end].reset_index(drop=True)
+            compact = compact_all(view, args.bars)
+            if sizes is None:
+                sizes = (sum(frames_nbytes(view).values()), sum(frames_nbytes(compact).values()))
+
+            cond_1.STATE_FILE = state_f64
+            ok_a, res_a = run_checks(view)
+            cond_1.STATE_FILE = state_c
+            ok_b, res_b = run_checks(compact)
+
+            signals += ok_a
+            if not _same((ok_a, res_a), (ok_b, res_b)):
+                key_a = (ok_a, res_a["summary"], res_a["direction"], res_a["start_index"], evaluated(res_a))
+                key_b = (ok_b, res_b["summary"], res_b["direction"], res_b["start_index"], evaluated(res_b))
+                mismatches.append((step, key_a, key_b))
+
+    print(f"steps={args.steps} signals={signals} mismatches={len(mismatches)}")
+    print(f"frame bytes per instrument: float64={sizes[0]:,}  compact={sizes[1]:,}  "
+          f"ratio={sizes[1] / sizes[0]:.2f}")
+    for step, a, b in mismatches[:20]:
+        print(f"  step {step}: f64={a}\n           compact={b}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
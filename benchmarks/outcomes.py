@@ -0,0 +1,110 @@
+# benchmarks/outcomes.py
+# Streaming signal outcomes (bot/outcomes.py) vs a batch pass over the whole history.
+#
+#   python -m benchmarks.outcomes --steps 5000 --every 20
+#
+# Walks a synthetic 5m market bar by bar (the frame grows from a fixed first bar,
+# forming bar included, like the live loop) and opens a signal every --every
+# bars with a random direction and branch (ok_30m_branch / ok_1h2h_branch), as
+# profile_reports would. Times OUTCOMES.feed per step, then recomputes every
+# closed signal's outcome from the full history the way a nightly batch job
+# would (numpy over each signal's window) and checks that both give the same
+# report() (exit code 1 if not). Prints the aggregate per branch.
+
+import sys
+import time
+import logging
+import argparse
+
+import numpy as np
+
+from .synthetic import make_market
+
+
+def batch(tracker, positions, t, high, low, close):
+    """Outcome of each position from the full series (independent of the streaming code)."""
+    from bot.outcomes import OutcomeTracker, BAR_SEC
+    out = OutcomeTracker(tracker.target_atr, tracker.stop_atr, tracker.horizons)
+    for pos in positions:
+        i0 = int(np.searchsorted(t, pos["from_ts"]))
+        bars = (t[i0:] - pos["from_ts"]) // BAR_SEC + 1
+        n = int(np.searchsorted(bars, tracker.max_bars, side="right"))
+        if n == 0 or bars[n - 1] < tracker.max_bars:
+            continue   # still open at the end of the history
+        sl = slice(i0, i0 + n)
+        h, l, c, e = high[sl], low[sl], close[sl], pos["entry"]
+        if pos["direction"] == "long":
+            fav, adv, ret = h - e, e - l, c - e
+            hit_t, hit_s = h >= pos["target"], l <= pos["stop"]
+        else:
+            fav, adv, ret = e - l, h - e, e - c
+            hit_t, hit_s = l <= pos["target"], h >= pos["stop"]
+        p = dict(pos, bars=int(bars[n - 1]), mfe=max(0.0, float(fav.max())), mae=max(0.0, float(adv.max())),
+                 target_bar=int(bars[hit_t.argmax()]) if hit_t.any() else None,
+                 stop_bar=int(bars[hit_s.argmax()]) if hit_s.any() else None,
+                 ret={str(hz): float(ret[int(np.searchsorted(bars[:n], hz))]) / e * 100.0
+                      for hz in tracker.horizons})
+        out._close(p)
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="streaming signal outcomes vs batch")
+    ap.add_argument("--steps", type=int, default=5000, help="5m bars to walk")
+    ap.add_argument("--bars", type=int, default=300, help="5m bars visible at the first step")
+    ap.add_argument("--every", type=int, default=20, help="a signal every N bars")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+    logging.disable(logging.INFO)
+
+    from bot.indicators import add_all_indicators
+    from bot.outcomes import OutcomeTracker, report
+
+    raw = make_market(args.bars + args.steps + 1, seed=args.seed)
+    df = add_all_indicators(raw["5m"])
+    t = df["time"].to_numpy()
+    high, low, close = (df[c].to_numpy() for c in ("high", "low", "close"))
+    rng = np.random.default_rng(args.seed)
+
+    tracker = OutcomeTracker()
+    opened, wall, max_open = [], 0.0, 0
+    for step in range(args.steps):
+        end = args.bars + step + 1          # the forming bar is the last row
+        now = int(t[end - 1]) + 60          # a minute into the forming bar
+        view = df.iloc[:end]
+        t0 = time.perf_counter()
+        tracker.feed("BENCH", view, now)
+        wall += time.perf_counter() - t0
+        if step % args.every == 0:
+            pos = tracker.open("BENCH", "default", str(rng.choice(["ok_30m_branch", "ok_1h2h_branch"])),
+                               str(rng.choice(["long", "short"])), int(t[end - 2]), float(close[end - 1]), view, now)
+            opened.append(dict(pos, ret={}))
+        max_open = max(max_open, len(tracker._open.get("BENCH", [])))
+
+    t0 = time.perf_counter()
+    ref = batch(tracker, opened, t[:args.bars + args.steps], high, low, close)
+    wall_batch = time.perf_counter() - t0
+
+    live, full = report(tracker.export()), report(ref.export())
+    mismatches = 0
+    for profile, branches in full["branches"].items():
+        for branch, agg in branches.items():
+            if live["branches"].get(profile, {}).get(branch) != agg:
+                mismatches += 1
+                print(f"  mismatch {profile}/{branch}:\n    live  {live['branches'].get(profile, {}).get(branch)}\n"
+                      f"    batch {agg}")
+    closed = sum(a["signals"] for b in live["branches"].values() for a in b.values())
+    print(f"steps={args.steps} signals={len(opened)} closed={closed} open at the end={len(live['open'])} "
+          f"(max {max_open} at once)")
+    print(f"  streaming {wall / args.steps * 1000:8.3f} ms/bar   ({wall * 1000:.1f} ms total)")
+    print(f"  batch     {wall_batch * 1000:8.1f} ms for the whole history")
+    for branch, a in live["branches"].get("default", {}).items():
+        rets = " ".join(f"{h}b {r['mean']:+.3f}%" for h, r in a["returns_pct"].items())
+        print(f"  {branch:15s} n={a['signals']:3d} target first {a['target_first_rate']:.2f} "
+              f"stop first {a['stop_first_rate']:.2f} MFE {a['mfe_atr']:.2f} ATR MAE {a['mae_atr']:.2f} ATR | {rets}")
+    print(f"  mismatches={mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+# benchmarks/run.py
+# Micro/macro benchmarks for the hot paths on synthetic data.
+#
+#   python -m benchmarks.run                              # 300, 10k, 1M bars
+#   python -m benchmarks.run --sizes 300,10000 --save-baseline benchmarks/results/baseline.json
+#   python -m benchmarks.run --baseline benchmarks/results/baseline.json --threshold 0.25
+#
+# Exit code 1 when any case is slower than baseline median * (1 + threshold).
+#
+# Conditions 2..11 are timed at a cond_1 start that reaches them in run_checks
+# (bot/analytics candidates: 2..9 after all of 2..7 pass, 10/11 after the 8&9
+# branch failed), on the last n bars up to that start. The synthetic history is
+# at least COVERAGE_BARS long so such starts exist; exit code 1 as well when it
+# produces no ok_30m_branch or no ok_1h2h_branch signal.
+#
+# run_profiles times the PROFILE_SPECS profiles plus the default in one pass
+# against one run_checks per profile (the parity of the two is tests/test_profiles.py).
+# cycle_eager / cycle_lazy time indicators + run_checks the way main.compute_dfs
+# builds the frames: all five TFs, or 5m and the rest on first read (bot/lazy.py);
+# both give the same outcomes (tests/test_lazy_frames.py).
+# integrity_inspect / integrity_repair time bot/integrity.py on the 5m series,
+# clean and with a gap, a duplicate, two swapped bars and a stale tail to fetch
+# (CandleStore under faulty responses: tests/test_integrity.py).
+# levels_incremental feeds a copy of every TF's PivotBook the bars of the last
+# LEVELS_STEPS 5m bars, levels_rebuild a fresh book the whole frame (the two
+# give the same levels: tests/test_levels.py); swing_levels is the old 5m swing(20).
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import copy
+import platform
+import statistics
+import tempfile
+from typing import Callable, Dict
+
+import numpy as np
+
+from .synthetic import make_market, okx_rows
+
+DEFAULT_SIZES = [300, 10_000, 1_000_000]
+COVERAGE_BARS = 20_000   # 5m bars: every condition reached, both branches signalled
+DEFAULT_OUT = os.path.join("benchmarks", "results", "latest.json")
+LEVELS_STEPS = 100       # 5m bars levels_incremental catches up on
+
+# profiles next to the default one: looser thresholds, and strict mode
+PROFILE_SPECS = {
+    "aggressive": {"params": {"c2.max_cross_age": 15, "c2.max_gap": 100.0, "c4.kdj_gap": 3.0,
+                              "c6.dea_max": 250.0, "c8.dj_min": 15.0, "c8.drsi_min": 7.5}},
+    "conservative": {"strict": True, "params": {"c3.tol": 2.5}},
+}
+
+
+def timeit(fn: Callable, min_time: float = 0.2, min_reps: int = 3, max_reps: int = 50,
+           budget: float = 5.0) -> Dict:
+    times = []
+    total = 0.0
+    while len(times) < max_reps and (total < min_time or len(times) < min_reps):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        times.append(dt)
+        total += dt
+        if total > budget:
+            break
+    return {"min": min(times), "median": statistics.median(times), "reps": len(times)}
+
+
+def build_frames(n: int, seed: int):
+    """
+    n bars per TF (higher TFs may have fewer for huge n), indicators applied, and
+    the analytics.History of the whole synthetic market they are the tail of.
+    """
+    from bot.indicators import add_all_indicators
+    from bot.analytics import History
+    full = make_market(max(n, COVERAGE_BARS), seed=seed)
+    hist = History({tf: add_all_indicators(df) for tf, df in full.items()})
+    raw = {tf: df.tail(n).reset_index(drop=True) for tf, df in full.items()}
+    return raw, {tf: df.tail(n).reset_index(drop=True) for tf, df in hist.frames.items()}, hist
+
+
+def reaching_starts(hist) -> Dict:
+    """
+    cond -> (direction, 5m bar, start index) of a cond_1 start where run_checks
+    evaluates the condition to the end, preferring one where it passes. Also
+    returns the branch counts ("branch_30m" / "branch_1h2h": signals of each).
+    """
+    from bot.analytics import all_candidates, evaluate, outcome
+    found, branches = {}, {"branch_30m": 0, "branch_1h2h": 0}
+    for direction, (t, s) in all_candidates(hist, 300).items():
+        ok = evaluate(hist, direction, t, s)
+        out = outcome(ok)
+        m, b30 = out["mandatory"], out["branch_30m"]
+        branches["branch_30m"] += int((m & b30).sum())
+        branches["branch_1h2h"] += int((m & ~b30 & out["branch_1h2h"]).sum())
+        reach = {c: m for c in range(2, 8)}
+        reach.update({8: m, 9: m & ok[8], 10: m & ~b30, 11: m & ~b30 & ok[10]})
+        for c, r in reach.items():
+            for i in np.flatnonzero(r):
+                # passing first, then the latest start (the most history before it)
+                key = (bool(ok[c][i]), int(t[i]))
+                if c not in found or key > found[c][0]:
+                    found[c] = (key, direction, int(t[i]), int(s[i]))
+    return {c: v[1:] for c, v in found.items()}, branches
+
+
+def window_at(hist, t: int, s: int, n: int):
+    """The last n bars of every TF at 5m bar t, and start index s inside that window."""
+    from bot.analytics import cut_frames
+    cut = cut_frames(hist, t)
+    frames = {tf: df.tail(n).reset_index(drop=True) for tf, df in cut.items()}
+    return frames, s - (len(cut["5m"]) - len(frames["5m"]))
+
+
+def bench_size(n: int, seed: int) -> Dict[str, Dict]:
+    from bot.indicators import add_all_indicators
+    from bot.utils import last_cross_index, map_index_by_time
+    from bot.data import okx_rows_to_frame
+    from bot.checker import run_checks, run_profiles
+    from bot.config import TIMEFRAMES
+    from bot.lazy import LazyFrames
+    from bot.integrity import inspect, repair
+    from bot.levels import PivotBook
+    from bot.utils import swing_levels
+    from bot.profiles import PROFILES, make_profile, profile_path
+    from bot.conditions import cond_1
+    from bot.conditions.cond_1 import check_cond_1
+    from bot.conditions.cond_2 import check_cond_2
+    from bot.conditions.cond_3 import check_cond_3
+    from bot.conditions.cond_4 import check_cond_4
+    from bot.conditions.cond_5 import check_cond_5
+    from bot.conditions.cond_6 import check_cond_6
+    from bot.conditions.cond_7 import check_cond_7
+    from bot.conditions.cond_8 import check_cond_8
+    from bot.conditions.cond_9 import check_cond_9
+    from bot.conditions.cond_10 import check_cond_10
+    from bot.conditions.cond_11 import check_cond_11
+
+    raw, dfs, hist = build_frames(n, seed)
+    df5 = dfs["5m"]
+    start = len(df5) - 3
+    rows = okx_rows(raw["5m"])
+    res = {}
+    starts, branches = reaching_starts(hist)
+    missing = [c for c in range(2, 12) if c not in starts] + [b for b, k in branches.items() if not k]
+    if missing:
+        raise SystemExit(f"synthetic market (seed {seed}) does not reach {missing}: raise COVERAGE_BARS or change the seed")
+    checks = {2: lambda f, d, s: check_cond_2(f, d), 3: check_cond_3, 4: check_cond_4, 5: check_cond_5,
+              6: check_cond_6, 7: lambda f, d, s: check_cond_7(f, d), 8: check_cond_8, 9: check_cond_9,
+              10: check_cond_10, 11: check_cond_11}
+
+    def case(name, fn):
+        res[f"{name}@{n}"] = timeit(fn)
+
+    case("decode_candles", lambda: okx_rows_to_frame(rows))
+    case("add_all_indicators", lambda: add_all_indicators(raw["5m"]))
+    case("last_cross_index", lambda: last_cross_index(df5["ema5"], df5["ema21"], "up", lookback=200))
+    case("last_cross_index_full", lambda: last_cross_index(df5["ema5"], df5["ema21"], "up", lookback=len(df5)))
+    case("map_index_by_time", lambda: map_index_by_time(df5, dfs["15m"], start))
+
+    raw5 = raw["5m"]
+    now = int(raw5["time"].iat[-1]) + 300    # the last bar just closed
+    k = len(raw5) // 2
+    order = np.r_[np.arange(k), k + 1, k, np.arange(k + 2, len(raw5) - 2), k - 10]
+    faulty = raw5.iloc[np.delete(order, k // 2)].reset_index(drop=True)
+    fetch_before = lambda tf, ts, limit: raw5[raw5["time"] < ts].tail(limit).reset_index(drop=True)
+    case("integrity_inspect", lambda: inspect(raw5, "5m", now))
+    case("integrity_repair", lambda: repair(faulty, "5m", fetch_before, now, set()))
+
+    books = {tf: PivotBook(tf) for tf in dfs}
+    for tf, book in books.items():
+        book.feed(dfs[tf], now - LEVELS_STEPS * 300)
+
+    def levels(fed):
+        for tf, df in dfs.items():
+            (copy.deepcopy(books[tf]) if fed else PivotBook(tf)).feed(df, now)
+
+    case("levels_incremental", lambda: levels(True))
+    case("levels_rebuild", lambda: levels(False))
+    case("swing_levels", lambda: swing_levels(df5, 20))
+
+    # cond_1 persists its waiting state; keep it out of the working directory
+    with tempfile.TemporaryDirectory() as tmp:
+        cond_1.STATE_FILE = os.path.join(tmp, "cond1_state.json")
+        for d in ("long", "short"):
+            case(f"check_cond_1[{d}]", lambda d=d: check_cond_1(dfs, d))
+        reached = []
+        for c, check in checks.items():
+            d, t, s = starts[c]
+            frames, s = window_at(hist, t, s, n)
+            reached.append(f"{c}{d[0]}{'+' if check(frames, d, s)[0] else '-'}")
+            case(f"check_cond_{c}", lambda check=check, frames=frames, d=d, s=s: check(frames, d, s))
+        case("run_checks", lambda: run_checks(dfs))
+
+        profiles = [PROFILES[0]] + [make_profile(name, spec) for name, spec in PROFILE_SPECS.items()]
+
+        def per_profile():
+            for p in profiles:
+                with cond_1.state_file(profile_path(os.path.join(tmp, "alone.json"), p["name"])):
+                    run_checks(dfs, p)
+
+        case("run_profiles", lambda: run_profiles(dfs, profiles, os.path.join(tmp, "shared.json")))
+        case("run_checks_per_profile", per_profile)
+
+        def cycle(eager):
+            load = lambda tf: add_all_indicators(raw[tf])
+            run_checks(LazyFrames(TIMEFRAMES, load, {tf: load(tf) for tf in eager}))
+
+        case("cycle_eager", lambda: cycle(TIMEFRAMES))
+        case("cycle_lazy", lambda: cycle(["5m"]))
+    print(f"size {n}: conditions timed at {' '.join(reached)} (l/s direction, +/- result); "
+          f"signals {branches}", file=sys.stderr)
+    return res
+
+
+def compare(current: Dict, baseline: Dict, threshold: float):
+    """Returns (rows, regressions) comparing medians of cases present in both."""
+    rows, regressions = [], []
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        ratio = cur["median"] / base["median"] if base["median"] > 0 else float("inf")
+        rows.append((name, base["median"], cur["median"], ratio))
+        if ratio > 1.0 + threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="EMA bot benchmarks on synthetic data")
+    ap.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                    help="comma-separated bar counts per TF")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default=DEFAULT_OUT)
+    ap.add_argument("--baseline", help="compare against this results JSON")
+    ap.add_argument("--threshold", type=float, default=0.25,
+                    help="allowed median slowdown vs baseline (0.25 = +25%%)")
+    ap.add_argument("--save-baseline", help="also write results to this path")
+    args = ap.parse_args(argv)
+
+    # conditions log every evaluation at INFO
+    logging.disable(logging.INFO)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = {}
+    for n in sizes:
+        t0 = time.perf_counter()
+        results.update(bench_size(n, args.seed))
+        print(f"size {n}: {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "ts": int(time.time()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "node": platform.node(),
+            "sizes": sizes,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    for path in filter(None, (args.out, args.save_baseline)):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+
+    for name, r in results.items():
+        print(f"{name:40s} median {r['median'] * 1e3:10.3f} ms  min {r['min'] * 1e3:10.3f} ms  x{r['reps']}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows, regressions = compare(report, baseline, args.threshold)
+        print("\ncase                                     baseline ms   current ms   ratio")
+        for name, b, c, ratio in rows:
+            flag = "  REGRESSION" if name in regressions else ""
+            print(f"{name:40s} {b * 1e3:11.3f} {c * 1e3:12.3f} {ratio:7.2f}{flag}")
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above +{args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
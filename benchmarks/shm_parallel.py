@@ -0,0 +1,126 @@
+# benchmarks/shm_parallel.py
+# run_checks in worker processes: shared-memory frames vs pickled DataFrames.
+#
+#   python -m benchmarks.shm_parallel --instruments 8 --steps 50 --workers 4
+#
+# Walks a synthetic market bar by bar for N instruments (different seeds) and
+# evaluates every instrument each step three ways: in the calling thread, in a
+# process pool with the frames pickled per call, and through bot.shm
+# (ParallelChecks: descriptors only, parent writes changed rows). Prints the
+# wall time per step of each mode, the bytes shipped per call, the share of rows
+# the parent rewrote, and checks that the three modes agree (exit code 1 if not).
+
+import os
+import sys
+import time
+import pickle
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from .synthetic import make_market
+
+
+def _check_pickled(dfs, cond1_path):
+    from bot.checker import run_checks
+    from bot.conditions import cond_1
+    with cond_1.state_file(cond1_path):
+        return run_checks(dfs)
+
+
+def _same(a, b) -> bool:
+    """Same outcome, and the conditions both runs evaluated agree (their cost order may differ)."""
+    from bot.checker import evaluated
+    (ok_a, ra), (ok_b, rb) = a, b
+    fa, fb = evaluated(ra), evaluated(rb)
+    return ((ok_a, ra["summary"], ra["direction"], ra["start_index"])
+            == (ok_b, rb["summary"], rb["direction"], rb["start_index"])
+            and all(fa[c] == fb[c] for c in fa.keys() & fb.keys()))
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="shared-memory vs pickled process-parallel run_checks")
+    ap.add_argument("--instruments", type=int, default=8)
+    ap.add_argument("--steps", type=int, default=50, help="5m bars to walk")
+    ap.add_argument("--bars", type=int, default=300, help="bars per TF visible at each step")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args(argv)
+    logging.disable(logging.INFO)
+
+    from bot.indicators import add_all_indicators
+    from bot.checker import run_checks
+    from bot.conditions import cond_1
+    from bot.shm import ParallelChecks, check_shared, _ping
+
+    warm = args.bars * 24
+    markets = []
+    for n in range(args.instruments):
+        raw = make_market(warm + args.steps, seed=100 + n)
+        full = {tf: add_all_indicators(df) for tf, df in raw.items()}
+        markets.append((full, {tf: df["time"].to_numpy() for tf, df in full.items()}))
+
+    par = ParallelChecks(args.workers, log_level=logging.WARNING)
+    par.warm_up()
+    pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context("spawn"))
+    [f.result() for f in [pool.submit(_ping) for _ in range(args.workers)]]
+
+    wall = {"thread": 0.0, "pickled": 0.0, "shared": 0.0}
+    shipped = {"pickled": 0, "shared": 0}
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = lambda mode, n: os.path.join(tmp, f"{mode}.{n}.json")
+        for step in range(args.steps):
+            views = []
+            for full, times in markets:
+                t = times["5m"][warm + step]
+                view = {}
+                for tf, df in full.items():
+                    end = int(np.searchsorted(times[tf], t, side="right"))
+                    view[tf] = df.iloc[max(0, end - args.bars):end].reset_index(drop=True)
+                views.append(view)
+
+            t0 = time.perf_counter()
+            res_t = []
+            for n, view in enumerate(views):
+                with cond_1.state_file(path("thread", n)):
+                    res_t.append(run_checks(view))
+            wall["thread"] += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            futs = [pool.submit(_check_pickled, view, path("pickled", n)) for n, view in enumerate(views)]
+            res_p = [f.result() for f in futs]
+            wall["pickled"] += time.perf_counter() - t0
+            shipped["pickled"] += sum(len(pickle.dumps(v)) for v in views)
+
+            t0 = time.perf_counter()
+            descs = [par.frames.publish(f"I{n}", view) for n, view in enumerate(views)]
+            futs = [par.pool.submit(check_shared, d, path("shared", n)) for n, d in enumerate(descs)]
+            res_s = [f.result() for f in futs]
+            wall["shared"] += time.perf_counter() - t0
+            shipped["shared"] += sum(len(pickle.dumps(d)) for d in descs)
+
+            for a, b, c in zip(res_t, res_p, res_s):
+                if not (_same(a, b) and _same(a, c)):
+                    mismatches += 1
+
+    frames = par.frames.status()
+    pool.shutdown()
+    par.close()
+    calls = args.steps * args.instruments
+    print(f"instruments={args.instruments} steps={args.steps} workers={args.workers} cpus={os.cpu_count()}")
+    for mode, sec in wall.items():
+        print(f"  {mode:8s} {sec / args.steps * 1000:8.1f} ms/step")
+    for mode, b in shipped.items():
+        print(f"  {mode:8s} {b / calls / 1024:8.1f} KiB shipped per call")
+    print(f"  shared rows rewritten: {frames['rows_written']:,} of {frames['rows_total']:,} "
+          f"({frames['rows_written'] / max(1, frames['rows_total']):.0%}), shm {frames['mb']} MB")
+    print(f"  mismatches={mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# benchmarks/synthetic.py
+# Seeded synthetic OHLCV for benchmarks: one 5m random walk built from regime
+# segments, aggregated into 15m/30m/1H/2H so every TF is consistent with 5m
+# (same bar-open times, high/low/volume of the underlying 5m bars).
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+TF_SECONDS = {"5m": 300, "15m": 900, "30m": 1800, "1H": 3600, "2H": 7200}
+
+# fixed, 2H-aligned epoch so runs are reproducible
+BASE_TS = 1_699_999_200
+
+# (name, drift per 5m bar in %, volatility per bar in %)
+# - trend_up / trend_down : steady EMA/MACD alignment (cond 2..7 on the trend side)
+# - range                 : EMA5/21 chop, mostly `no_start`
+# - reversal_up / _down   : sharp turn after the opposite trend; fresh EMA, KDJ J/D,
+#                           RSI6/21 and StochRSI crosses on 5m..2H (cond 1, 8..11)
+REGIMES: Dict[str, Tuple[float, float]] = {
+    "trend_up": (0.03, 0.12),
+    "trend_down": (-0.03, 0.12),
+    "range": (0.0, 0.08),
+    "reversal_up": (0.12, 0.18),
+    "reversal_down": (-0.12, 0.18),
+}
+
+DEFAULT_SCHEDULE = ["range", "trend_down", "reversal_up", "trend_up", "range",
+                    "trend_up", "reversal_down", "trend_down"]
+
+
+def make_5m(n: int, seed: int = 42, schedule: Optional[List[str]] = None,
+            segment: int = 288, price: float = 60000.0) -> pd.DataFrame:
+    """n 5m bars; regimes from `schedule` repeat every `segment` bars (288 = 1 day)."""
+    rng = np.random.default_rng(seed)
+    schedule = schedule or DEFAULT_SCHEDULE
+    reg_idx = (np.arange(n) // segment) % len(schedule)
+    drift = np.array([REGIMES[schedule[i]][0] for i in range(len(schedule))])[reg_idx] / 100
+    vol = np.array([REGIMES[schedule[i]][1] for i in range(len(schedule))])[reg_idx] / 100
+
+    ret = drift + vol * rng.standard_normal(n)
+    close = price * np.exp(np.cumsum(ret))
+    open_ = np.empty(n)
+    open_[0] = price
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.standard_normal((2, n))) * vol * close * 0.5
+    high = np.maximum(open_, close) + wick[0]
+    low = np.minimum(open_, close) - wick[1]
+    volume = rng.gamma(2.0, 50.0, n) * (1 + 20 * np.abs(ret))
+    time_ = BASE_TS + 300 * np.arange(n, dtype=np.int64)
+    return pd.DataFrame({"time": time_, "open": open_, "high": high, "low": low,
+                         "close": close, "volume": volume})
+
+
+def resample(df5: pd.DataFrame, tf: str) -> pd.DataFrame:
+    """Aggregate 5m bars into `tf` bars keyed by bar-open time (vectorized)."""
+    sec = TF_SECONDS[tf]
+    t = df5["time"].to_numpy()
+    bucket = t // sec * sec
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(t)] - 1
+    return pd.DataFrame({
+        "time": bucket[starts],
+        "open": df5["open"].to_numpy()[starts],
+        "high": np.maximum.reduceat(df5["high"].to_numpy(), starts),
+        "low": np.minimum.reduceat(df5["low"].to_numpy(), starts),
+        "close": df5["close"].to_numpy()[ends],
+        "volume": np.add.reduceat(df5["volume"].to_numpy(), starts),
+    })
+
+
+def make_market(n_5m: int, seed: int = 42, schedule: Optional[List[str]] = None,
+                segment: int = 288) -> Dict[str, pd.DataFrame]:
+    """tf -> OHLCV DataFrame for all TFs; higher TFs have n_5m * 300 / tf_seconds bars."""
+    df5 = make_5m(n_5m, seed=seed, schedule=schedule, segment=segment)
+    out = {"5m": df5}
+    for tf in ("15m", "30m", "1H", "2H"):
+        out[tf] = resample(df5, tf)
+    return out
+
+
+def walk(frames: Dict[str, pd.DataFrame], warm: int, steps: int, bars: int, ahead: int = 0):
+    """
+    Yields (5m bar time, tf -> frame) for 5m bars warm .. warm+steps-1, bar by bar
+    like the live loop: each frame holds the bars opened by that time + `ahead`
+    seconds and starts `bars` bars before the first step, so frames grow instead
+    of sliding (cond_1 keeps bar positions in its state).
+    """
+    times = {tf: df["time"].to_numpy() for tf, df in frames.items()}
+    first = {tf: max(0, int(np.searchsorted(times[tf], times["5m"][warm], side="right")) - bars)
+             for tf in frames}
+    for step in range(steps):
+        t = int(times["5m"][warm + step])
+        yield t, {tf: df.iloc[first[tf]:int(np.searchsorted(times[tf], t + ahead, side="right"))]
+                  .reset_index(drop=True) for tf, df in frames.items()}
+
+
+def okx_rows(df: pd.DataFrame) -> List[List[str]]:
+    """The frame as OKX /market/candles rows (strings, ms timestamps, newest first)."""
+    rows = [[str(int(t) * 1000), f"{o:.1f}", f"{h:.1f}", f"{l:.1f}", f"{c:.1f}", f"{v:.4f}",
+             "0", "0", "1"]
+            for t, o, h, l, c, v in zip(df["time"], df["open"], df["high"], df["low"],
+                                         df["close"], df["volume"])]
+    rows.reverse()
+    return rows
@@ -0,0 +1,815 @@
+# bot/analytics.py
+# Condition funnel over history (tools/funnel.py is the command line job).
+#
+# run_checks answers "signal or not" for the latest bar and stops after the
+# first failing group, so it never tells how often each condition passes on
+# its own. Here every condition is evaluated independently at every candidate
+# start of a history window:
+#   - candidates = bars where cond_1 fires. Its state machine (EMA5/21 cross
+#     starts a wait, EMA10/21 cross within 4 bars confirms) is replayed bar by
+#     bar over precomputed cross arrays, with absolute bar positions and every
+#     closed bar evaluated once;
+#   - conditions 2..11 are numpy expressions over all candidates at once, the
+#     same comparisons as bot/conditions/cond_N.py with the same thresholds
+#     (PARAMS = profiles.DEFAULT_PARAMS), which can be swept.
+# Frames are full-history indicator frames; at a candidate confirmed on 5m bar t
+# every TF is cut at the bar containing t. That higher-TF bar was still forming
+# when t closed: with rebuild_forming (tools/funnel.py) its OHLCV is rebuilt from
+# the 5m bars up to t and its indicators stepped from the previous closed bar as
+# bot/intrabar.py does, instead of reading its final values (which would look
+# into the rest of the bar). verify() re-runs the scalar check_cond_N on those
+# cut frames and reports any disagreement.
+
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .profiles import DEFAULT_PARAMS
+
+logger = logging.getLogger(__name__)
+
+CONDS = list(range(2, 12))
+MANDATORY = [2, 3, 4, 5, 6, 7]
+
+# thresholds of the vectorized conditions: the same keys and defaults as the
+# scalar cond_N.py (bot/profiles.py), so they can be swept
+PARAMS = DEFAULT_PARAMS
+
+SWEEPS = {
+    "c2.max_cross_age": [5, 8, 11, 15, 20],
+    "c2.max_gap": [30, 50, 70, 100, 150],
+    "c3.tol": [0, 2.5, 5, 7.5, 10],
+    "c4.kdj_gap": [0, 3, 6, 9, 12],
+    "c4.rsi_tol": [0, 2.5, 5, 7.5, 10],
+    "c5.rsi_edge": [60, 65, 70, 75, 80],
+    "c5.spread": [0, 2, 4, 6, 8],
+    "c6.rsi_tol": [2, 4.5, 6.5, 9, 12],
+    "c6.kdj_tol": [0, 2.5, 5, 7.5, 10],
+    "c6.dea_max": [50, 100, 150, 200, 300],
+    "c7.rsi_edge": [60, 65, 70, 75, 80],
+    "c8.dj_min": [10, 15, 20, 25, 30],
+    "c8.drsi_min": [5, 7.5, 10, 12.5, 15],
+    "c8.sync": [0, 1, 2, 3, 4],
+    "c8.macd_bars": [2, 3, 4, 5, 6],
+    "c9.sync": [0, 1, 2, 3, 4],
+}
+
+
+class _Times(dict):
+    """tf -> int64 bar times, converted on first use (lazy frames load a TF only when it is read)."""
+
+    def __init__(self, frames):
+        super().__init__()
+        self.frames = frames
+
+    def __missing__(self, tf: str) -> np.ndarray:
+        t = self[tf] = self.frames[tf]["time"].to_numpy(dtype=np.int64)
+        return t
+
+
+class History:
+    """
+    Indicator frames (absolute time, oldest first) as float arrays, plus cached
+    cross positions. rebuild_forming: the higher-TF bar containing a candidate's
+    5m bar t is read as it stood when t closed (see forming()); live frames
+    (bot/priority.py) already end at their forming bars and leave it off.
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame], rebuild_forming: bool = False):
+        self.frames = frames
+        self.time = _Times(frames)
+        self.rebuild_forming = rebuild_forming
+        self._cols: Dict[str, Dict[str, np.ndarray]] = {}
+        self._cross: Dict[Tuple, np.ndarray] = {}
+        self._carries: Dict[str, object] = {}
+        self._partial: Dict[str, Tuple[np.ndarray, ...]] = {}
+        self._forming: Dict[Tuple[str, bytes], Dict[str, np.ndarray]] = {}
+        self.n = len(frames["5m"])
+
+    def col(self, tf: str, name: str) -> np.ndarray:
+        cols = self._cols.setdefault(tf, {})
+        c = cols.get(name)
+        if c is None:
+            c = cols[name] = self.frames[tf][name].to_numpy(dtype=np.float64)
+        return c
+
+    def map_index(self, tf: str, idx5: np.ndarray) -> np.ndarray:
+        """utils.map_index_by_time for 5m positions: the `tf` bar containing each 5m bar."""
+        pos = np.searchsorted(self.time[tf], self.time["5m"][idx5], side="right") - 1
+        return np.maximum(pos, 0)
+
+    def _partial_bars(self, tf: str) -> Tuple[np.ndarray, ...]:
+        """Per 5m bar: (high, low, volume) of its `tf` bar so far, and whether that bar is complete."""
+        out = self._partial.get(tf)
+        if out is None:
+            t5 = self.time["5m"]
+            pos = self.map_index(tf, np.arange(self.n))
+            df5 = self.frames["5m"]
+            g = pd.DataFrame({"pos": pos, "high": df5["high"].to_numpy(dtype=np.float64),
+                              "low": df5["low"].to_numpy(dtype=np.float64),
+                              "volume": df5["volume"].to_numpy(dtype=np.float64)}).groupby("pos")
+            from .store import TF_SECONDS
+            bar_end = self.time[tf][pos] + TF_SECONDS.get(tf, 300)
+            out = self._partial[tf] = (g["high"].cummax().to_numpy(), g["low"].cummin().to_numpy(),
+                                       g["volume"].cumsum().to_numpy(), t5 + 300 >= bar_end)
+        return out
+
+    def forming(self, tf: str, t: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Column -> value per candidate of the `tf` bar containing 5m bar t as it
+        stood when t closed: OHLCV from the 5m bars up to t, indicators stepped
+        from the previous closed bar (bot/intrabar.step). A bar t completes keeps
+        its final values.
+        """
+        key = (tf, t.tobytes())
+        out = self._forming.get(key)
+        if out is not None:
+            return out
+        from .intrabar import carries, step
+        at = self._carries.get(tf)
+        if at is None:
+            at = self._carries[tf] = carries(self.frames[tf])
+        high, low, vol, complete = self._partial_bars(tf)
+        e = self.map_index(tf, t)
+        cols = [c for c in self.frames[tf].columns if c != "time"]
+        out = {c: self.col(tf, c)[e].copy() for c in cols}
+        opens, close5 = self.col(tf, "open"), self.col("5m", "close")
+        for n, (ti, ei) in enumerate(zip(t.tolist(), e.tolist())):
+            if complete[ti] or ei < 1:
+                continue
+            vals = step(at(ei - 1), float(opens[ei]), float(high[ti]), float(low[ti]), float(close5[ti]), float(vol[ti]))
+            for c, v in vals.items():
+                if c in out:
+                    out[c][n] = v
+        self._forming[key] = out
+        return out
+
+    def at(self, tf: str, name: str, idx: np.ndarray, t: np.ndarray) -> np.ndarray:
+        """col(tf, name)[idx], where idx is the bar containing 5m bar t: as it stood then (rebuild_forming)."""
+        v = self.col(tf, name)[idx]
+        if not self.rebuild_forming or tf == "5m":
+            return v
+        return np.where(idx == self.map_index(tf, t), self.forming(tf, t)[name], v)
+
+    def last_cross(self, tf: str, a: str, b: str, dir_: str) -> np.ndarray:
+        """Position of the last utils-style (strict) cross at or before each bar, -1 if none."""
+        key = (tf, a, b, dir_)
+        out = self._cross.get(key)
+        if out is None:
+            x, y = self.col(tf, a), self.col(tf, b)
+            flags = np.zeros(len(x), dtype=bool)
+            if dir_ == "up":
+                flags[1:] = (x[:-1] < y[:-1]) & (x[1:] > y[1:])
+            else:
+                flags[1:] = (x[:-1] > y[:-1]) & (x[1:] < y[1:])
+            out = self._cross[key] = np.maximum.accumulate(np.where(flags, np.arange(len(x)), -1))
+        return out
+
+    def cross_ago(self, tf: str, a: str, b: str, dir_: str, end: np.ndarray, lookback: int,
+                  t: Optional[np.ndarray] = None):
+        """
+        utils.last_cross_index on frames ending at `end`: (bars ago, found). With
+        `t` (end = the bar containing 5m bar t) the cross into bar `end` is taken
+        from its values when t closed (rebuild_forming).
+        """
+        last = self.last_cross(tf, a, b, dir_)
+        if t is None or not self.rebuild_forming or tf == "5m":
+            lp = last[end]
+        else:
+            f, prev = self.forming(tf, t), np.maximum(end - 1, 0)
+            x0, y0, x1, y1 = self.col(tf, a)[prev], self.col(tf, b)[prev], f[a], f[b]
+            cross = ((x0 < y0) & (x1 > y1)) if dir_ == "up" else ((x0 > y0) & (x1 < y1))
+            lp = np.where((end >= 1) & cross, end, last[prev])
+        ago = end - lp
+        return ago, (lp >= 1) & (ago <= lookback)
+
+
+# --- cond 1: candidate starts ---
+def _real_crosses(a: np.ndarray, b: np.ndarray, dir_: str) -> Tuple[np.ndarray, np.ndarray]:
+    """cond_1._is_real_cross between bars p-1 and p (eps hysteresis), and cond_1._is_touch at p."""
+    from .conditions.cond_1 import EPS_ABS, EPS_REL
+    d = a - b
+    eps = np.maximum(EPS_ABS, EPS_REL * np.maximum(np.maximum(np.abs(a), np.abs(b)), 1.0))
+    touch = np.abs(d) <= eps
+    real = np.zeros(len(a), dtype=bool)
+    sign = (d[1:] > 0) if dir_ == "up" else (d[1:] < 0)
+    real[1:] = ~touch[1:] & ~touch[:-1] & (d[:-1] * d[1:] < 0) & sign
+    return real, touch
+
+
+def candidates(h: History, direction: str, warmup: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (t, start) of every bar where check_cond_1 passes when called once per closed
+    bar from `warmup` on: t = confirming bar (EMA10/21), start = start_index.
+    """
+    dir_ = "up" if direction == "long" else "down"
+    ema5, ema10, ema21 = h.col("5m", "ema5"), h.col("5m", "ema10"), h.col("5m", "ema21")
+    real5, _t5 = _real_crosses(ema5, ema21, dir_)
+    real10, touch10 = _real_crosses(ema10, ema21, dir_)
+    last5 = np.maximum.accumulate(np.where(real5, np.arange(h.n), -1))
+
+    ts, starts = [], []
+    waiting, start = False, None
+    for t in range(max(1, warmup), h.n):
+        # locals are read before the update, exactly as check_cond_1 does
+        old_waiting, old_start = waiting, start
+        c5 = int(last5[t])
+        if c5 >= max(1, t - 199) and t - c5 <= 4:
+            if (not waiting) or (start is None) or c5 > start:
+                waiting, start = True, c5
+        if not (old_waiting and old_start is not None) or old_start >= t:
+            continue
+        if t - old_start >= 5:
+            waiting, start = False, None
+            continue
+        if touch10[t]:
+            continue
+        if real10[t]:
+            waiting, start = False, None
+            ts.append(t)
+            starts.append(old_start)
+    return np.asarray(ts, dtype=np.int64), np.asarray(starts, dtype=np.int64)
+
+
+# --- conds 2..11 (vectorized over candidates) ---
+def _free_space(r6, r9, r21, long: bool, edge: float, spread: float):
+    if long:
+        return ((r6 < edge) | ((r6 >= edge) & ((r6 - r9) >= spread))) & (r21 < edge)
+    lo = 100.0 - edge
+    return ((r6 > lo) | ((r6 <= lo) & ((r9 - r6) >= spread))) & (r21 > lo)
+
+
+def _cond_2(h, t, s, long, p):
+    ago, found = h.cross_ago("5m", "macd_dif", "macd_dea", "up" if long else "down", t, 50)
+    ok = found & (ago <= p["c2.max_cross_age"])
+    i = np.clip(t - ago, 0, h.n - 1)
+    gap = np.abs(h.col("5m", "macd_dif")[i] - h.col("5m", "macd_dea")[i])
+    return ok & ~(gap > p["c2.max_gap"])
+
+
+def _cond_3(h, t, s, long, p):
+    i0 = np.maximum(0, s - 2)
+    ok = np.ones(len(s), dtype=bool)
+    for col in ["macd_dif", "macd_dea", "rsi6", "rsi9", "rsi21", "kdj_j", "kdj_k", "kdj_d", "srsi_k", "srsi_d"]:
+        v = h.col("5m", col)
+        d = v[s] - v[i0]
+        ok &= (d >= -p["c3.tol"]) if long else (d <= p["c3.tol"])
+    return ok
+
+
+def _cond_4(h, t, s, long, p):
+    j, k, d = h.col("5m", "kdj_j")[s], h.col("5m", "kdj_k")[s], h.col("5m", "kdj_d")[s]
+    r6 = h.col("5m", "rsi6")
+    r0, r1 = r6[np.maximum(0, s - 3)], r6[s]
+    if long:
+        return (j > k) & (k > d) & ((j - d) >= p["c4.kdj_gap"]) & (r1 >= r0 - p["c4.rsi_tol"])
+    return (j < k) & (k < d) & ((d - j) >= p["c4.kdj_gap"]) & (r1 <= r0 + p["c4.rsi_tol"])
+
+
+def _cond_5(h, t, s, long, p):
+    return _free_space(h.col("5m", "rsi6")[s], h.col("5m", "rsi9")[s], h.col("5m", "rsi21")[s],
+                       long, p["c5.rsi_edge"], p["c5.spread"])
+
+
+def _cond_6(h, t, s, long, p):
+    i = h.map_index("15m", s)
+    b = np.maximum(i - 2, 0)
+    c = lambda name: h.col("15m", name)[b]
+    a = lambda name: h.at("15m", name, i, t)
+    sK, sD = a("srsi_k"), a("srsi_d")
+    r6, r9, r21 = a("rsi6"), a("rsi9"), a("rsi21")
+    j, k, d = a("kdj_j"), a("kdj_k"), a("kdj_d")
+    dea = a("macd_dea")
+    rt, kt = p["c6.rsi_tol"], p["c6.kdj_tol"]
+    if long:
+        ok = (sK >= sD - 3) & (sD <= 82)
+        ok &= (r6 >= c("rsi6") - rt) & (r6 > r9) & (r9 > r21)
+        ok &= (j >= c("kdj_j") - kt) & (k >= c("kdj_k") - kt) & (d >= c("kdj_d") - kt)
+        ok &= (j > k) & (k > d) & ((d < 60) | ((j - d) >= 20)) & (j < 100)
+        ok &= dea < p["c6.dea_max"]
+    else:
+        ok = (sK <= sD + 2) & (sD >= 19)
+        ok &= (r6 <= c("rsi6") + rt) & (r6 < r9) & (r9 < r21)
+        ok &= (j <= c("kdj_j") + kt) & (k <= c("kdj_k") + kt) & (d <= c("kdj_d") + kt)
+        ok &= (j < k) & (k < d) & ((d > 40) | ((d - j) >= 20)) & (j > 0)
+        ok &= dea > -p["c6.dea_max"]
+    return (i >= 2) & ok
+
+
+def _cond_7(h, t, s, long, p):
+    e = h.map_index("15m", t)
+    return _free_space(h.at("15m", "rsi6", e, t), h.at("15m", "rsi9", e, t), h.at("15m", "rsi21", e, t),
+                       long, p["c7.rsi_edge"], p["c5.spread"])
+
+
+def _macd_trend_run(h, tf, e, long, t=None):
+    """Bars of the previous MACD trend before the last cross (utils.macd_prev_trend_ok), and whether it is defined."""
+    dir_ = "up" if long else "down"
+    ago, found = h.cross_ago(tf, "macd_dif", "macd_dea", dir_, e, 100, t)
+    hist, vol, vma = h.col(tf, "macd_hist"), h.col(tf, "volume"), h.col(tf, "vol_ma10")
+    green = h.col(tf, "close") >= h.col(tf, "open")
+    good = (hist * (-1 if long else 1)) > 0
+    tolerated = ~good & (vol < vma) & (green if long else ~green)   # NaN vol_ma10 -> not low volume
+    stop = ~good & ~tolerated
+    n = len(hist)
+    cum_good = np.concatenate([[0], np.cumsum(good)])                       # cum_good[q + 1] = good[0..q]
+    last_stop = np.maximum.accumulate(np.where(stop, np.arange(n), -1))
+    q = np.clip(e - ago - 1, -1, n - 1)      # bar before the MACD cross, walked backwards
+    run = cum_good[q + 1] - cum_good[np.where(q >= 0, last_stop[np.maximum(q, 0)], -1) + 1]
+    return run, found & (q >= 0)
+
+
+def _macd_trend_ok(h, tf, e, long, min_bars, t=None):
+    """utils.macd_prev_trend_ok on `tf` frames ending at `e`."""
+    run, valid = _macd_trend_run(h, tf, e, long, t)
+    return valid & (run >= min_bars)
+
+
+def _cond_8(h, t, s, long, p, tf="30m"):
+    i = h.map_index(tf, s)
+    e = h.map_index(tf, t)
+    i2 = np.maximum(i - 2, 0)
+    a = lambda name: h.at(tf, name, i, t)
+    j, k, d, j2 = a("kdj_j"), a("kdj_k"), a("kdj_d"), h.col(tf, "kdj_j")[i2]
+    r6, r9, r21, r62 = a("rsi6"), a("rsi9"), a("rsi21"), h.col(tf, "rsi6")[i2]
+    dir_ = "up" if long else "down"
+    ago_kdj, f_kdj = h.cross_ago(tf, "kdj_j", "kdj_d", dir_, e, 2, t)
+    ago_rsi, f_rsi = h.cross_ago(tf, "rsi6", "rsi21", dir_, e, 2, t)
+    if long:
+        ok = (j > k) & (k > d) & ((j - j2) > p["c8.dj_min"])
+        ok &= (r6 > r9) & (r9 >= r21 - 1) & ((r6 - r62) > p["c8.drsi_min"])
+    else:
+        ok = (j < k) & (k < d) & ((j2 - j) > p["c8.dj_min"])
+        ok &= (r6 < r9) & (r9 <= r21 + 1) & ((r62 - r6) > p["c8.drsi_min"])
+    ok &= f_kdj & f_rsi & ~(np.abs(ago_kdj - ago_rsi) > p["c8.sync"])
+    return (i >= 3) & ok & _macd_trend_ok(h, tf, e, long, p["c8.macd_bars"], t)
+
+
+def _cond_9(h, t, s, long, p, tf="1H"):
+    i = h.map_index(tf, s)
+    e = h.map_index(tf, t)
+    c = lambda name: h.at(tf, name, i, t)
+    dir_ = "up" if long else "down"
+    agos, ok = [], i >= 3
+    for a, b in (("kdj_j", "kdj_d"), ("rsi6", "rsi21"), ("srsi_k", "srsi_d")):
+        ago, found = h.cross_ago(tf, a, b, dir_, e, 3, t)
+        agos.append(ago)
+        ok &= found
+    if long:
+        ok &= (c("kdj_j") > c("kdj_k")) & (c("kdj_k") > c("kdj_d"))
+        ok &= (c("rsi6") > c("rsi9")) & (c("rsi9") > c("rsi21"))
+        ok &= (c("srsi_k") >= c("srsi_d") - 3) & (c("srsi_d") <= 82)
+    else:
+        ok &= (c("kdj_j") < c("kdj_k")) & (c("kdj_k") < c("kdj_d"))
+        ok &= (c("rsi6") < c("rsi9")) & (c("rsi9") < c("rsi21"))
+        ok &= (c("srsi_k") <= c("srsi_d") + 2) & (c("srsi_d") >= 19)
+    spread = np.max(agos, axis=0) - np.min(agos, axis=0)
+    return ok & ~(spread > p["c9.sync"])
+
+
+def _cond_10(h, t, s, long, p):
+    if "2H" not in h.frames:
+        return np.zeros(len(s), dtype=bool)
+    return _cond_8(h, t, s, long, p, tf="1H") & _cond_9(h, t, s, long, p, tf="2H")
+
+
+def _window_any(flags: np.ndarray, i: np.ndarray, width: int) -> np.ndarray:
+    """flags[max(0, i - width):i].any() for every i."""
+    cs = np.concatenate([[0], np.cumsum(flags)])
+    return (cs[i] - cs[np.maximum(0, i - width)]) > 0
+
+
+def _cond_11(h, t, s, long, p):
+    i = h.map_index("30m", s)
+    c = lambda name: h.col("30m", name)     # windows before bar i: closed bars
+    a = lambda name: h.at("30m", name, i, t)
+    r6, r9, r21 = a("rsi6"), a("rsi9"), a("rsi21")
+    j, k, d = a("kdj_j"), a("kdj_k"), a("kdj_d")
+    sK, sD = a("srsi_k"), a("srsi_d")
+    if long:
+        ok = ((r21 < 63) & (r6 > r9) & (r9 > r21)) | ((r21 < 58) & (r6 > r9) & (r9 >= r21 - 5))
+        ok &= _window_any((c("rsi6") <= c("rsi9") + 2) & (c("rsi9") <= c("rsi21") + 2.5), i, 5)
+        ok &= ((d < 82) & (j > k) & (k > d)) | ((d < 82) & (np.abs(j - k) <= 10) & (np.abs(k - d) <= 4))
+        ok &= _window_any((c("kdj_j") < c("kdj_k")) & (c("kdj_k") < c("kdj_d")), i, 12)
+        ok &= (sD < 89.5) & (sK >= sD - 7)
+    else:
+        ok = (((r21 > 37) & (r6 < r9) & (r9 < r21)) | ((r21 > 37) & (r6 <= r9) & (r9 < r21))
+              | ((r21 > 48) & (r6 < r9) & (r9 <= r21 + 6)))
+        ok &= _window_any((c("rsi6") >= c("rsi9") - 1) & (c("rsi9") >= c("rsi21") - 1), i, 5)
+        ok &= ((d > 30) & (j < k) & (k < d)) | ((d > 30) & (np.abs(j - k) <= 8) & (np.abs(k - d) <= 5))
+        ok &= _window_any((c("kdj_j") > c("kdj_k")) & (c("kdj_k") > c("kdj_d")), i, 11)
+        ok &= (sD > 23) & (sK <= sD + 8)
+    return (i >= 6) & ok
+
+
+VECTORIZED = {2: _cond_2, 3: _cond_3, 4: _cond_4, 5: _cond_5, 6: _cond_6,
+              7: _cond_7, 8: _cond_8, 9: _cond_9, 10: _cond_10, 11: _cond_11}
+
+
+def evaluate(h: History, direction: str, t: np.ndarray, s: np.ndarray,
+             params: Optional[Dict] = None, conds=None) -> Dict[int, np.ndarray]:
+    """cond id -> pass flags (one per candidate) for conditions 2..11 (or `conds`)."""
+    p = dict(PARAMS, **(params or {}))
+    long = direction == "long"
+    return {cid: np.asarray(VECTORIZED[cid](h, t, s, long, p), dtype=bool) for cid in (CONDS if conds is None else conds)}
+
+
+def outcome(ok: Dict[int, np.ndarray]) -> Dict[str, np.ndarray]:
+    """run_checks' decision from independent flags: mandatory, branches, signal."""
+    mandatory = np.logical_and.reduce([ok[c] for c in MANDATORY])
+    b30 = ok[8] & ok[9]
+    b1h = ok[10] & ok[11]
+    return {"mandatory": mandatory, "branch_30m": b30, "branch_1h2h": b1h,
+            "signal": mandatory & (b30 | b1h)}
+
+
+# --- signed margins (how far each threshold is from flipping) ---
+# One value per candidate and threshold, in the indicator's own units (RSI/KDJ
+# points, MACD units, bars): > 0 passes with that much room, < 0 fails by that
+# much, NaN = undefined (no cross in the lookback, not enough bars). AND-ed
+# comparisons take the min of their margins, OR-ed ones the max; 0 is the
+# boundary itself (strict and non-strict comparisons are not told apart).
+def _window_max(values: np.ndarray, i: np.ndarray, width: int) -> np.ndarray:
+    """max(values[max(0, i - width):i]) for every i (NaN rows ignored), NaN for an empty window."""
+    idx = i[:, None] - np.arange(width, 0, -1)[None, :]
+    v = values[np.clip(idx, 0, None)]
+    v = np.where((idx >= 0) & ~np.isnan(v), v, -np.inf)
+    out = v.max(axis=1) if width else np.full(len(i), -np.inf)
+    return np.where(np.isfinite(out), out, np.nan)
+
+
+def _mask(m: Dict[str, np.ndarray], valid: np.ndarray) -> Dict[str, np.ndarray]:
+    return {k: np.where(valid, v, np.nan) for k, v in m.items()}
+
+
+def _free_margins(r6, r9, r21, long, edge, spread, pre):
+    if long:
+        return {f"{pre}.rsi6": np.maximum(edge - r6, (r6 - r9) - spread), f"{pre}.rsi21": edge - r21}
+    lo = 100.0 - edge
+    return {f"{pre}.rsi6": np.maximum(r6 - lo, (r9 - r6) - spread), f"{pre}.rsi21": r21 - lo}
+
+
+def _margins_2(h, t, s, long, p):
+    ago, found = h.cross_ago("5m", "macd_dif", "macd_dea", "up" if long else "down", t, 50)
+    i = np.clip(t - ago, 0, h.n - 1)
+    gap = np.abs(h.col("5m", "macd_dif")[i] - h.col("5m", "macd_dea")[i])
+    return _mask({"c2.max_cross_age": p["c2.max_cross_age"] - ago.astype(np.float64),
+                  "c2.max_gap": p["c2.max_gap"] - gap}, found)
+
+
+def _margins_3(h, t, s, long, p):
+    i0 = np.maximum(0, s - 2)
+    m = []
+    for col in ["macd_dif", "macd_dea", "rsi6", "rsi9", "rsi21", "kdj_j", "kdj_k", "kdj_d", "srsi_k", "srsi_d"]:
+        v = h.col("5m", col)
+        d = v[s] - v[i0]
+        m.append(d + p["c3.tol"] if long else p["c3.tol"] - d)
+    return {"c3.tol": np.min(m, axis=0)}
+
+
+def _margins_4(h, t, s, long, p):
+    j, k, d = h.col("5m", "kdj_j")[s], h.col("5m", "kdj_k")[s], h.col("5m", "kdj_d")[s]
+    r6 = h.col("5m", "rsi6")
+    r0, r1 = r6[np.maximum(0, s - 3)], r6[s]
+    sg = 1.0 if long else -1.0
+    return {"c4.kdj_order": np.minimum(sg * (j - k), sg * (k - d)),
+            "c4.kdj_gap": sg * (j - d) - p["c4.kdj_gap"],
+            "c4.rsi_tol": sg * (r1 - r0) + p["c4.rsi_tol"]}
+
+
+def _margins_5(h, t, s, long, p):
+    return _free_margins(h.col("5m", "rsi6")[s], h.col("5m", "rsi9")[s], h.col("5m", "rsi21")[s],
+                         long, p["c5.rsi_edge"], p["c5.spread"], "c5")
+
+
+def _margins_6(h, t, s, long, p):
+    i = h.map_index("15m", s)
+    b = np.maximum(i - 2, 0)
+    c = lambda name: h.col("15m", name)[b]
+    a = lambda name: h.at("15m", name, i, t)
+    sK, sD = a("srsi_k"), a("srsi_d")
+    r6, r9, r21 = a("rsi6"), a("rsi9"), a("rsi21")
+    j, k, d = a("kdj_j"), a("kdj_k"), a("kdj_d")
+    rt, kt = p["c6.rsi_tol"], p["c6.kdj_tol"]
+    sg = 1.0 if long else -1.0
+    m = {
+        "c6.rsi_dyn": sg * (r6 - c("rsi6")) + rt,
+        "c6.rsi_order": np.minimum(sg * (r6 - r9), sg * (r9 - r21)),
+        "c6.kdj_dyn": np.min([sg * (x - c(name)) + kt for x, name in ((j, "kdj_j"), (k, "kdj_k"), (d, "kdj_d"))],
+                             axis=0),
+        "c6.dea_max": p["c6.dea_max"] - sg * a("macd_dea"),
+    }
+    if long:
+        m["c6.srsi"] = np.minimum(sK - sD + 3, 82 - sD)
+        m["c6.kdj_order"] = np.min([j - k, k - d, np.maximum(60 - d, (j - d) - 20), 100 - j], axis=0)
+    else:
+        m["c6.srsi"] = np.minimum(sD + 2 - sK, sD - 19)
+        m["c6.kdj_order"] = np.min([k - j, d - k, np.maximum(d - 40, (d - j) - 20), j], axis=0)
+    return _mask(m, i >= 2)
+
+
+def _margins_7(h, t, s, long, p):
+    e = h.map_index("15m", t)
+    return _free_margins(h.at("15m", "rsi6", e, t), h.at("15m", "rsi9", e, t), h.at("15m", "rsi21", e, t),
+                         long, p["c7.rsi_edge"], p["c5.spread"], "c7")
+
+
+def _margins_8(h, t, s, long, p, tf="30m", pre="c8"):
+    i = h.map_index(tf, s)
+    e = h.map_index(tf, t)
+    i2 = np.maximum(i - 2, 0)
+    a = lambda name: h.at(tf, name, i, t)
+    j, k, d, j2 = a("kdj_j"), a("kdj_k"), a("kdj_d"), h.col(tf, "kdj_j")[i2]
+    r6, r9, r21, r62 = a("rsi6"), a("rsi9"), a("rsi21"), h.col(tf, "rsi6")[i2]
+    dir_ = "up" if long else "down"
+    ago_kdj, f_kdj = h.cross_ago(tf, "kdj_j", "kdj_d", dir_, e, 2, t)
+    ago_rsi, f_rsi = h.cross_ago(tf, "rsi6", "rsi21", dir_, e, 2, t)
+    run, trend_valid = _macd_trend_run(h, tf, e, long, t)
+    sg = 1.0 if long else -1.0
+    m = {
+        f"{pre}.kdj_order": np.minimum(sg * (j - k), sg * (k - d)),
+        f"{pre}.dj_min": sg * (j - j2) - p["c8.dj_min"],
+        f"{pre}.rsi_order": np.minimum(sg * (r6 - r9), sg * (r9 - r21) + 1),
+        f"{pre}.drsi_min": sg * (r6 - r62) - p["c8.drsi_min"],
+        f"{pre}.kdj_cross": np.where(f_kdj, 2.0 - ago_kdj, np.nan),
+        f"{pre}.rsi_cross": np.where(f_rsi, 2.0 - ago_rsi, np.nan),
+        f"{pre}.sync": np.where(f_kdj & f_rsi, p["c8.sync"] - np.abs(ago_kdj - ago_rsi).astype(np.float64), np.nan),
+        f"{pre}.macd_bars": np.where(trend_valid, run - float(p["c8.macd_bars"]), np.nan),
+    }
+    return _mask(m, i >= 3)
+
+
+def _margins_9(h, t, s, long, p, tf="1H", pre="c9"):
+    i = h.map_index(tf, s)
+    e = h.map_index(tf, t)
+    c = lambda name: h.at(tf, name, i, t)
+    dir_ = "up" if long else "down"
+    m, agos, all_found = {}, [], np.ones(len(s), dtype=bool)
+    for name, (a, b) in (("kdj", ("kdj_j", "kdj_d")), ("rsi", ("rsi6", "rsi21")), ("srsi", ("srsi_k", "srsi_d"))):
+        ago, found = h.cross_ago(tf, a, b, dir_, e, 3, t)
+        m[f"{pre}.{name}_cross"] = np.where(found, 3.0 - ago, np.nan)
+        agos.append(ago)
+        all_found &= found
+    sg = 1.0 if long else -1.0
+    m[f"{pre}.kdj_order"] = np.minimum(sg * (c("kdj_j") - c("kdj_k")), sg * (c("kdj_k") - c("kdj_d")))
+    m[f"{pre}.rsi_order"] = np.minimum(sg * (c("rsi6") - c("rsi9")), sg * (c("rsi9") - c("rsi21")))
+    if long:
+        m[f"{pre}.srsi"] = np.minimum(c("srsi_k") - c("srsi_d") + 3, 82 - c("srsi_d"))
+    else:
+        m[f"{pre}.srsi"] = np.minimum(c("srsi_d") + 2 - c("srsi_k"), c("srsi_d") - 19)
+    spread = np.max(agos, axis=0) - np.min(agos, axis=0)
+    m[f"{pre}.sync"] = np.where(all_found, p["c9.sync"] - spread.astype(np.float64), np.nan)
+    return _mask(m, i >= 3)
+
+
+def _margins_10(h, t, s, long, p):
+    if "2H" not in h.frames:
+        return {}
+    return dict(_margins_8(h, t, s, long, p, tf="1H", pre="c10.1H"),
+                **_margins_9(h, t, s, long, p, tf="2H", pre="c10.2H"))
+
+
+def _margins_11(h, t, s, long, p):
+    i = h.map_index("30m", s)
+    c = lambda name: h.col("30m", name)
+    a = lambda name: h.at("30m", name, i, t)
+    r6, r9, r21 = a("rsi6"), a("rsi9"), a("rsi21")
+    j, k, d = a("kdj_j"), a("kdj_k"), a("kdj_d")
+    sK, sD = a("srsi_k"), a("srsi_d")
+    if long:
+        m = {
+            "c11.rsi": np.maximum(np.min([63 - r21, r6 - r9, r9 - r21], axis=0),
+                                  np.min([58 - r21, r6 - r9, r9 - r21 + 5], axis=0)),
+            "c11.rsi_prev": _window_max(np.minimum(c("rsi9") + 2 - c("rsi6"), c("rsi21") + 2.5 - c("rsi9")), i, 5),
+            "c11.kdj": np.minimum(82 - d, np.maximum(np.minimum(j - k, k - d),
+                                                     np.minimum(10 - np.abs(j - k), 4 - np.abs(k - d)))),
+            "c11.kdj_prev": _window_max(np.minimum(c("kdj_k") - c("kdj_j"), c("kdj_d") - c("kdj_k")), i, 12),
+            "c11.srsi": np.minimum(89.5 - sD, sK - sD + 7),
+        }
+    else:
+        m = {
+            "c11.rsi": np.maximum(np.min([r21 - 37, r9 - r6, r21 - r9], axis=0),
+                                  np.min([r21 - 48, r9 - r6, r21 + 6 - r9], axis=0)),
+            "c11.rsi_prev": _window_max(np.minimum(c("rsi6") - c("rsi9") + 1, c("rsi9") - c("rsi21") + 1), i, 5),
+            "c11.kdj": np.minimum(d - 30, np.maximum(np.minimum(k - j, d - k),
+                                                     np.minimum(8 - np.abs(j - k), 5 - np.abs(k - d)))),
+            "c11.kdj_prev": _window_max(np.minimum(c("kdj_j") - c("kdj_k"), c("kdj_k") - c("kdj_d")), i, 11),
+            "c11.srsi": np.minimum(sD - 23, sD + 8 - sK),
+        }
+    return _mask(m, i >= 6)
+
+
+MARGINS = {2: _margins_2, 3: _margins_3, 4: _margins_4, 5: _margins_5, 6: _margins_6,
+           7: _margins_7, 8: _margins_8, 9: _margins_9, 10: _margins_10, 11: _margins_11}
+
+
+def margins(h: History, direction: str, t: np.ndarray, s: np.ndarray, params: Optional[Dict] = None,
+            conds=None) -> Dict[int, Dict[str, np.ndarray]]:
+    """cond id -> threshold name -> signed margin per candidate (see above)."""
+    p = dict(PARAMS, **(params or {}))
+    long = direction == "long"
+    return {cid: {k: np.asarray(v, dtype=np.float64) for k, v in MARGINS[cid](h, t, s, long, p).items()}
+            for cid in (CONDS if conds is None else conds)}
+
+
+def worst(m: Dict[str, np.ndarray]) -> Tuple[Optional[str], np.ndarray]:
+    """Binding threshold (smallest margin, NaN counts as failing) and its margin, per candidate."""
+    if not m:
+        return None, np.array([])
+    names = list(m)
+    vals = np.array([m[k] for k in names])
+    key = np.where(np.isnan(vals), -np.inf, vals)
+    pos = key.argmin(axis=0)
+    return [names[q] for q in pos], vals[pos, np.arange(vals.shape[1])]
+
+
+def check_margins(h: History, cands: Dict) -> Dict[int, int]:
+    """
+    Candidates whose margins contradict the pass flags: passing with a negative
+    margin, or failing with every margin > 0. Should be 0 for every condition.
+    """
+    bad = {c: 0 for c in CONDS}
+    for direction, (t, s) in cands.items():
+        flags = evaluate(h, direction, t, s)
+        for cid, m in margins(h, direction, t, s).items():
+            if not m:
+                continue
+            vals = np.array(list(m.values()))
+            neg = (vals < 0).any(axis=0)
+            clear = (vals > 0).all(axis=0)     # NaN -> not clear
+            bad[cid] += int((flags[cid] & neg).sum() + (~flags[cid] & clear).sum())
+    return bad
+
+
+# --- report ---
+def _rate(x: np.ndarray) -> Optional[float]:
+    return round(float(x.mean()), 4) if len(x) else None
+
+
+def all_candidates(h: History, warmup: int = 0) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    return {d: candidates(h, d, warmup) for d in ("long", "short")}
+
+
+def funnel(h: History, cands: Dict, params: Optional[Dict] = None) -> Dict:
+    """Funnel counts, pass rates, first/sole failures, co-failures and branch split."""
+    t0 = time.perf_counter()
+    per_dir = {d: evaluate(h, d, t, s, params) for d, (t, s) in cands.items()}
+    ok = {c: np.concatenate([per_dir["long"][c], per_dir["short"][c]]) for c in CONDS}
+    marg = {d: margins(h, d, t, s, params, MANDATORY) for d, (t, s) in cands.items()}
+    out = outcome(ok)
+    n = len(ok[2])
+
+    stages, alive = [], np.ones(n, dtype=bool)
+    for c in MANDATORY:
+        alive = alive & ok[c]
+        stages.append({"after": c, "left": int(alive.sum())})
+    stages.append({"after": "8&9 | 10&11", "left": int(out["signal"].sum())})
+
+    fails = np.array([~ok[c] for c in CONDS])              # conds x candidates
+    mand_fail = np.array([~ok[c] for c in MANDATORY])
+    first = {}
+    blocked = mand_fail.any(axis=0)
+    first_idx = np.argmax(mand_fail, axis=0)
+    for pos, c in enumerate(MANDATORY):
+        first[c] = int((blocked & (first_idx == pos)).sum())
+    sole = {c: int((mand_fail[pos] & (mand_fail.sum(axis=0) == 1)).sum()) for pos, c in enumerate(MANDATORY)}
+    # candidates blocked by one mandatory condition only: which threshold, by how much
+    near = {}
+    for pos, c in enumerate(MANDATORY):
+        names, vals = [], []
+        for d in cands:
+            n_, v_ = worst(marg[d][c])
+            names += list(n_ or [])
+            vals.append(v_)
+        names, vals = np.array(names, dtype=object), np.concatenate(vals)
+        only = mand_fail[pos] & (mand_fail.sum(axis=0) == 1)
+        near[c] = {name: {"count": int((only & (names == name)).sum()),
+                          "p50": round(float(np.nanmedian(vals[only & (names == name)])), 3)
+                          if np.isfinite(vals[only & (names == name)]).any() else None}
+                   for name in sorted(set(names[only]))}
+    co = (fails.astype(np.int64) @ fails.T.astype(np.int64)).tolist()
+
+    m = out["mandatory"]
+    b30, b1h = out["branch_30m"], out["branch_1h2h"]
+    return {
+        "candidates": {d: int(len(cands[d][0])) for d in cands},
+        "pass_rate": {c: {"all": _rate(ok[c]), "long": _rate(per_dir["long"][c]),
+                          "short": _rate(per_dir["short"][c])} for c in CONDS},
+        "funnel": stages,
+        "first_fail": first,
+        "sole_fail": sole,
+        "near_miss": near,
+        "co_fail": {"conds": CONDS, "matrix": co},
+        "branch": {   # among candidates that pass 2..7
+            "mandatory_ok": int(m.sum()),
+            "only_30m": int((m & b30 & ~b1h).sum()),
+            "only_1h2h": int((m & ~b30 & b1h).sum()),   # 8&9 lost, 10&11 saved the signal
+            "both": int((m & b30 & b1h).sum()),
+            "neither": int((m & ~b30 & ~b1h).sum()),
+        },
+        "signals": int(out["signal"].sum()),
+        "elapsed_sec": round(time.perf_counter() - t0, 4),
+    }
+
+
+def sweep(h: History, cands: Dict, grid: Optional[Dict[str, List]] = None) -> Dict[str, List[Dict]]:
+    """Pass rate of the owning condition and signal count for each value of each threshold."""
+    grid = grid or SWEEPS
+    out = {}
+    for name, values in grid.items():
+        cid = int(name.split(".")[0][1:])
+        rows = []
+        for v in values:
+            ok, sig = [], []
+            for direction, (t, s) in cands.items():
+                flags = evaluate(h, direction, t, s, {name: v})
+                ok.append(flags[cid])
+                sig.append(outcome(flags)["signal"])
+            ok, sig = np.concatenate(ok), np.concatenate(sig)
+            rows.append({"value": v, "pass_rate": _rate(ok), "signals": int(sig.sum())})
+        out[name] = rows
+    return out
+
+
+def cut_frames(h: History, t: int) -> Dict[str, pd.DataFrame]:
+    """
+    Frames as the live loop sees them at 5m bar t: every TF up to the bar
+    containing t, that bar as it stood when t closed with rebuild_forming.
+    """
+    out = {}
+    for tf, df in h.frames.items():
+        end = int(np.searchsorted(h.time[tf], h.time["5m"][t], side="right"))
+        out[tf] = df.iloc[:end]
+        if h.rebuild_forming and tf != "5m" and end:
+            last = df.iloc[end - 1:end].copy()
+            for col, v in h.forming(tf, np.array([t])).items():
+                last[col] = v.astype(last[col].dtype, copy=False)
+            out[tf] = pd.concat([df.iloc[:end - 1], last])
+    return out
+
+
+def verify(h: History, cands: Dict, limit: Optional[int] = None) -> Dict:
+    """
+    Scalar check_cond_N on cut frames vs the vectorized flags for up to `limit`
+    candidates per direction. Also returns the scalar cost per condition (ms/call).
+    """
+    from .conditions.cond_2 import check_cond_2
+    from .conditions.cond_3 import check_cond_3
+    from .conditions.cond_4 import check_cond_4
+    from .conditions.cond_5 import check_cond_5
+    from .conditions.cond_6 import check_cond_6
+    from .conditions.cond_7 import check_cond_7
+    from .conditions.cond_8 import check_cond_8
+    from .conditions.cond_9 import check_cond_9
+    from .conditions.cond_10 import check_cond_10
+    from .conditions.cond_11 import check_cond_11
+    scalar = {
+        2: lambda f, d, s: check_cond_2(f, d), 3: check_cond_3, 4: check_cond_4, 5: check_cond_5,
+        6: check_cond_6, 7: lambda f, d, s: check_cond_7(f, d), 8: check_cond_8, 9: check_cond_9,
+        10: check_cond_10, 11: check_cond_11,
+    }
+    mismatches = {c: [] for c in CONDS}
+    cost = {c: 0.0 for c in CONDS}
+    calls = 0
+    for direction, (t, s) in cands.items():
+        t, s = t[:limit], s[:limit]
+        flags = evaluate(h, direction, t, s)
+        for n, (ti, si) in enumerate(zip(t, s)):
+            frames = cut_frames(h, int(ti))
+            calls += 1
+            for c in CONDS:
+                t0 = time.perf_counter()
+                ok, _info = scalar[c](frames, direction, int(si))
+                cost[c] += time.perf_counter() - t0
+                if bool(ok) != bool(flags[c][n]):
+                    mismatches[c].append((direction, int(ti), int(si)))
+    return {"checked": calls, "mismatches": {c: len(v) for c, v in mismatches.items()},
+            "examples": {c: v[:5] for c, v in mismatches.items() if v},
+            "scalar_ms": {c: round(cost[c] / max(1, calls) * 1000, 3) for c in CONDS}}
+
+
+def verify_candidates(h: History, warmup: int, cands: Dict) -> Dict:
+    """
+    Replay check_cond_1 bar by bar on cut frames vs candidates(). dry_run: every
+    bar counts as closed (recordings may end in the future) and state stays in memory.
+    """
+    import os
+    import tempfile
+    from .conditions import cond_1
+    out = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for direction, (t, s) in cands.items():
+            found = []
+            with cond_1.state_file(os.path.join(tmp, f"{direction}.json")), cond_1.dry_run():
+                for i in range(max(1, warmup), h.n):
+                    ok, info = cond_1.check_cond_1({"5m": h.frames["5m"].iloc[:i + 1]}, direction)
+                    if ok:
+                        found.append((i, info["start_index"]))
+            vec = list(zip(t.tolist(), s.tolist()))
+            out[direction] = {"scalar": len(found), "vectorized": len(vec), "equal": found == vec,
+                              "only_scalar": sorted(set(found) - set(vec))[:5],
+                              "only_vectorized": sorted(set(vec) - set(found))[:5]}
+    return out
@@ -0,0 +1,301 @@
+# bot/archive.py
+# Local append-only candle history: one directory per instrument and TF under
+# ARCHIVE_DIR with a raw little-endian file per column (time int64 seconds,
+# open/high/low/close/volume float64) and meta.json holding the committed row
+# count.
+#
+# An append writes the new closed bars past the committed rows (files grow by
+# ARCHIVE_GROW_ROWS at a time), fsyncs them and then replaces meta.json
+# (write-then-rename): a crash before the rename leaves the previous row count,
+# so half-written rows are never read and are overwritten by the next append.
+# Bars older than the last archived one (a gap the integrity check filled, a
+# backfill from tools/okx_recorder.py) are merged by rewriting the series into a
+# new generation of files, switched to by the same meta.json rename.
+#
+# Readers (the store at a cold start, integrity repairs, tools/standin.py, any
+# analysis script, other processes) memory-map the column files and get NumPy
+# views of the requested range: nothing is parsed or copied. Bar times are
+# sorted, so a range is found by binary search over a small in-memory index
+# (every ARCHIVE_INDEX_STRIDE-th time) and then within one stride of the file.
+# One writer per series (the scanner of the node owning the instrument).
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import ARCHIVE_DIR, ARCHIVE_FSYNC, ARCHIVE_GROW_ROWS, ARCHIVE_INDEX_STRIDE
+from .store import TF_SECONDS, RAW_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_VERSION = 1
+DTYPES = {"time": np.dtype("<i8"), "open": np.dtype("<f8"), "high": np.dtype("<f8"), "low": np.dtype("<f8"),
+          "close": np.dtype("<f8"), "volume": np.dtype("<f8")}
+
+
+def _columns(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Raw columns of `df` in archive dtypes, absolute time, sorted, one row per bar (the later row wins)."""
+    cols = {c: df[c].to_numpy().astype(DTYPES[c], copy=False) for c in RAW_COLUMNS}
+    cols["time"] = cols["time"] + int(df.attrs.get("time_base", 0))
+    return _dedup(cols)
+
+
+def _dedup(cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    t = cols["time"]
+    if len(t) < 2 or (np.diff(t) > 0).all():
+        return cols
+    order = np.argsort(t, kind="stable")
+    t = t[order]
+    keep = np.append(t[1:] != t[:-1], True)   # last of equal times
+    return {c: a[order][keep] for c, a in cols.items()}
+
+
+class Series:
+    """The archive of one instrument + TF (a directory)."""
+
+    def __init__(self, path: str, tf: str, fsync: bool = ARCHIVE_FSYNC):
+        self.path = path
+        self.tf = tf
+        self.sec = TF_SECONDS.get(tf, 300)
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._meta: Optional[Dict] = None
+        self._meta_stamp = None
+        self._maps: Dict[str, tuple] = {}            # column -> (gen, rows mapped, memmap)
+        self._index = np.empty(0, dtype=np.int64)   # time of every ARCHIVE_INDEX_STRIDE-th row
+        self._index_gen = None
+
+    # --- meta ---
+    def _file(self, col: str, gen: int) -> str:
+        return os.path.join(self.path, f"{col}.{gen}")
+
+    def meta(self) -> Dict:
+        """Committed state (re-read when another process replaced meta.json)."""
+        path = os.path.join(self.path, "meta.json")
+        try:
+            st = os.stat(path)
+        except OSError:
+            return {"version": ARCHIVE_VERSION, "tf": self.tf, "rows": 0, "gen": 0, "capacity": 0,
+                    "first": None, "last": None}
+        stamp = (st.st_mtime_ns, st.st_ino, st.st_size)
+        if stamp != self._meta_stamp:
+            with open(path, "r", encoding="utf-8") as f:
+                self._meta = json.load(f)
+            self._meta_stamp = stamp
+        return self._meta
+
+    def _commit(self, meta: Dict):
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(self.path, "meta.json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+        self._meta, self._meta_stamp = meta, None
+
+    @property
+    def rows(self) -> int:
+        return self.meta()["rows"]
+
+    # --- writes ---
+    def append(self, cols: Dict[str, np.ndarray]) -> int:
+        """Bars strictly newer than the last archived one go to the end; older ones are merged (rewrite)."""
+        cols = _dedup(cols)
+        t = cols["time"]
+        if not len(t):
+            return 0
+        with self._lock:
+            meta = self.meta()
+            last = meta["last"]
+            if last is not None and int(t[0]) <= last:
+                old = self.read(int(t[0]), last + 1)["time"]
+                missing = np.setdiff1d(t[t <= last], old, assume_unique=True)
+                if len(missing):
+                    return self._rewrite(cols, len(missing))
+                cols = {c: a[t > last] for c, a in cols.items()}
+                t = cols["time"]
+                if not len(t):
+                    return 0
+            return self._append(meta, cols)
+
+    def _append(self, meta: Dict, cols: Dict[str, np.ndarray]) -> int:
+        rows, gen, n = meta["rows"], meta["gen"], len(cols["time"])
+        capacity = meta["capacity"]
+        if rows + n > capacity:
+            capacity = -(-(rows + n) // ARCHIVE_GROW_ROWS) * ARCHIVE_GROW_ROWS
+        os.makedirs(self.path, exist_ok=True)
+        for col in RAW_COLUMNS:
+            dt = DTYPES[col]
+            fd = os.open(self._file(col, gen), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if capacity != meta["capacity"]:
+                    os.ftruncate(fd, capacity * dt.itemsize)
+                os.pwrite(fd, np.ascontiguousarray(cols[col], dtype=dt).tobytes(), rows * dt.itemsize)
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+        t = cols["time"]
+        self._commit(dict(meta, rows=rows + n, capacity=capacity,
+                          first=meta["first"] if rows else int(t[0]), last=int(t[-1])))
+        return n
+
+    def _rewrite(self, cols: Dict[str, np.ndarray], added: int) -> int:
+        """Merge `cols` (`added` of them older than the last bar) into a new generation of files; returns the bars added."""
+        meta = self.meta()
+        old = self.read()
+        merged = _dedup({c: np.concatenate([old[c], cols[c]]) for c in RAW_COLUMNS})
+        gen = meta["gen"] + 1
+        rows = len(merged["time"])
+        capacity = -(-rows // ARCHIVE_GROW_ROWS) * ARCHIVE_GROW_ROWS
+        os.makedirs(self.path, exist_ok=True)
+        for col in RAW_COLUMNS:
+            dt = DTYPES[col]
+            with open(self._file(col, gen), "wb") as f:
+                f.write(merged[col].astype(dt, copy=False).tobytes())
+                f.truncate(capacity * dt.itemsize)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        self._commit(dict(meta, gen=gen, rows=rows, capacity=capacity,
+                          first=int(merged["time"][0]), last=int(merged["time"][-1])))
+        for col in RAW_COLUMNS:
+            try:
+                os.remove(self._file(col, meta["gen"]))
+            except OSError:
+                pass
+        logger.info("Archive %s: merged %s older bar(s), %s rows (generation %s)", self.path, added, rows, gen)
+        return rows - meta["rows"]
+
+    # --- reads ---
+    def _column(self, col: str, meta: Dict) -> np.ndarray:
+        gen, rows = meta["gen"], meta["rows"]
+        cached = self._maps.get(col)
+        if cached is None or cached[0] != gen or cached[1] < rows:
+            # map the whole file: later appends within its size need no new map
+            size = os.path.getsize(self._file(col, gen)) // DTYPES[col].itemsize
+            cached = (gen, size, np.memmap(self._file(col, gen), dtype=DTYPES[col], mode="r", shape=(size,)))
+            self._maps[col] = cached
+        return cached[2][:rows]
+
+    def _search(self, t: np.ndarray, ts: int, meta: Dict) -> int:
+        """First row with time >= ts: the index narrows it to one stride of the file."""
+        stride = ARCHIVE_INDEX_STRIDE
+        if self._index_gen != meta["gen"]:
+            self._index, self._index_gen = np.empty(0, dtype=np.int64), meta["gen"]
+        have = len(self._index)
+        want = -(-len(t) // stride)
+        if want > have:
+            self._index = np.concatenate([self._index, np.array(t[have * stride::stride])])
+        j = int(np.searchsorted(self._index, ts, side="left"))
+        if j == 0:
+            return 0
+        lo, hi = (j - 1) * stride, min(len(t), j * stride)
+        return lo + int(np.searchsorted(t[lo:hi], ts, side="left"))
+
+    def read(self, start: Optional[int] = None, end: Optional[int] = None,
+             last: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Read-only views of the bars with start <= time < end (or the `last` N of them)."""
+        with self._lock:
+            meta = self.meta()
+            if not meta["rows"]:
+                return {c: np.empty(0, dtype=DTYPES[c]) for c in RAW_COLUMNS}
+            t = self._column("time", meta)
+            lo = 0 if start is None else self._search(t, int(start), meta)
+            hi = len(t) if end is None else self._search(t, int(end), meta)
+            if last is not None:
+                lo = max(lo, hi - last)
+            return {c: self._column(c, meta)[lo:hi] for c in RAW_COLUMNS}
+
+    def frame(self, start: Optional[int] = None, end: Optional[int] = None,
+              last: Optional[int] = None) -> pd.DataFrame:
+        """read() as the store's raw frame (time/open/high/low/close/volume; a copy)."""
+        return pd.DataFrame({c: np.array(a) for c, a in self.read(start, end, last).items()})
+
+    def close(self):
+        with self._lock:
+            self._maps.clear()
+
+
+class CandleArchive:
+    """<root>/<inst>/<tf>/ series, opened on first use."""
+
+    def __init__(self, root: str = ARCHIVE_DIR, fsync: bool = ARCHIVE_FSYNC):
+        self.root = root
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._series: Dict[tuple, Series] = {}
+        self.stats = {"appended": 0, "merged": 0, "read_bars": 0, "errors": 0, "last_error": None}
+
+    def series(self, inst: str, tf: str) -> Series:
+        key = (inst, tf)
+        s = self._series.get(key)
+        if s is None:
+            with self._lock:
+                s = self._series.get(key)
+                if s is None:
+                    s = self._series[key] = Series(os.path.join(self.root, inst, tf), tf, self.fsync)
+        return s
+
+    def instruments(self) -> List[str]:
+        try:
+            return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+        except OSError:
+            return []
+
+    def timeframes(self, inst: str) -> List[str]:
+        try:
+            return sorted(d for d in os.listdir(os.path.join(self.root, inst))
+                          if os.path.exists(os.path.join(self.root, inst, d, "meta.json")))
+        except OSError:
+            return []
+
+    def append(self, inst: str, tf: str, df: pd.DataFrame, now: Optional[float] = None) -> int:
+        """Archive the closed bars of a raw frame that are not archived yet; returns how many."""
+        if df is None or not len(df):
+            return 0
+        now = time.time() if now is None else now
+        cols = _columns(df)
+        closed = cols["time"] + TF_SECONDS.get(tf, 300) <= now
+        s = self.series(inst, tf)
+        try:
+            gen = s.meta()["gen"]
+            n = s.append({c: a[closed] for c, a in cols.items()})
+            self.stats["merged" if s.meta()["gen"] != gen else "appended"] += n
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.stats["last_error"] = f"{inst} {tf}: {type(e).__name__}: {e}"
+            logger.exception("Archive: append to %s %s failed", inst, tf)
+            return 0
+        return n
+
+    def frame(self, inst: str, tf: str, start: Optional[int] = None, end: Optional[int] = None,
+              last: Optional[int] = None) -> pd.DataFrame:
+        df = self.series(inst, tf).frame(start, end, last)
+        self.stats["read_bars"] += len(df)
+        return df
+
+    def before(self, inst: str, tf: str, ts: int, limit: int) -> pd.DataFrame:
+        """Up to `limit` archived bars older than `ts`, oldest first (the integrity repair's fetch_before)."""
+        return self.frame(inst, tf, end=ts, last=limit)
+
+    def status(self) -> Dict:
+        series = {}
+        for (inst, tf), s in list(self._series.items()):
+            meta = s.meta()
+            if meta["rows"]:
+                series.setdefault(inst, {})[tf] = {"rows": meta["rows"], "first": meta["first"],
+                                                   "last": meta["last"], "generation": meta["gen"]}
+        return dict(self.stats, dir=self.root, series=series)
+
+
+ARCHIVE = CandleArchive()
@@ -1,7 +1,13 @@
 # bot/checker.py (updated)
-from typing import Dict, Tuple
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 import pandas as pd
-from .config import ENABLED_CONDITIONS, STRICT_MODE
+from .config import COND_COST_ORDER
+from .lazy import COND_TFS, FrameLoadError, LazyFrames, pending_cost
+from .profiles import PROFILES, COND_PARAMS, profile_path
+from .conditions import cond_1
 from .conditions.cond_1 import check_cond_1
 from .conditions.cond_2 import check_cond_2
 from .conditions.cond_3 import check_cond_3
@@ -14,25 +20,158 @@ from .conditions.cond_9 import check_cond_9
 from .conditions.cond_10 import check_cond_10
 from .conditions.cond_11 import check_cond_11
 
-def run_checks(df_by_tf: Dict[str, pd.DataFrame]) -> Tuple[bool, Dict]:
+# cond id -> check(df_by_tf, direction, start_idx, params)
+CHECKS = {
+    2: lambda f, d, s, p: check_cond_2(f, d, p),
+    3: check_cond_3,
+    4: check_cond_4,
+    5: check_cond_5,
+    6: check_cond_6,
+    7: lambda f, d, s, p: check_cond_7(f, d, p),
+    8: check_cond_8,
+    9: check_cond_9,
+    10: check_cond_10,
+    11: check_cond_11,
+}
+
+
+class CondCosts:
     """
-    Enforced logic:
-    - Conditions 1..7 are mandatory.
+    Measured seconds and pass rate of each condition inside run_checks (i.e.
+    after cond_1 fired). next() picks the condition of an AND group to run next
+    by expected cost per rejection: (avg cost + load cost of the TFs it reads
+    that are not materialized yet) / fail rate. Unmeasured conditions rank
+    first (they get measured); ties and COND_COST_ORDER=0 keep the numeric order.
+    """
+
+    def __init__(self, enabled: bool = COND_COST_ORDER):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._s: Dict[int, List] = {}   # cid -> [runs, passes, seconds]
+
+    def observe(self, cid: int, sec: float, ok: bool):
+        with self._lock:
+            s = self._s.setdefault(cid, [0, 0, 0.0])
+            s[0] += 1
+            s[1] += bool(ok)
+            s[2] += sec
+
+    def rank(self, cid: int, df_by_tf) -> float:
+        runs, passes, sec = self._s.get(cid, (0, 0, 0.0))
+        cost = (sec / runs if runs else 0.0) + pending_cost(df_by_tf, COND_TFS.get(cid, ()))
+        return cost / (1.0 - (passes + 1) / (runs + 2))
+
+    def next(self, cids: List[int], df_by_tf) -> int:
+        if not self.enabled:
+            return min(cids)
+        return min(cids, key=lambda c: (self.rank(c, df_by_tf), c))
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {cid: {"runs": r, "pass_rate": round(p / r, 3), "avg_ms": round(sec / r * 1000, 3)}
+                    for cid, (r, p, sec) in sorted(self._s.items()) if r}
+
+
+COSTS = CondCosts()
+
+def _load_sec(df_by_tf) -> float:
+    return sum(df_by_tf.loads.values()) if isinstance(df_by_tf, LazyFrames) else 0.0
+
+def _run(cid: int, df_by_tf, direction: str, start_idx: int, params: Dict):
+    """One evaluation, timed into COSTS (a lazy TF load inside it is not the condition's cost)."""
+    loads, t0 = _load_sec(df_by_tf), time.perf_counter()
+    ok, inf = CHECKS[cid](df_by_tf, direction, start_idx, params)
+    COSTS.observe(cid, time.perf_counter() - t0 - (_load_sec(df_by_tf) - loads), ok)
+    return ok, inf
+
+def _check(cid: int, df_by_tf, direction: str, start_idx: int, profile: Dict, memo: Optional[Dict]) -> Dict:
+    """{"ok", "info"} of one condition; disabled -> passed. `memo` shares results between profiles."""
+    if cid not in profile["conditions"]:
+        return {"ok": True, "info": {"cond": cid, "note": "disabled"}}
+    params = profile["params"]
+    if memo is None:
+        ok, inf = _run(cid, df_by_tf, direction, start_idx, params)
+        return {"ok": ok, "info": inf}
+    key = (cid, direction, start_idx) + tuple(params[k] for k in COND_PARAMS[cid])
+    hit = key in memo
+    if not hit:
+        memo[key] = _run(cid, df_by_tf, direction, start_idx, params)
+    memo["_reused"] = memo.get("_reused", 0) + hit
+    ok, inf = memo[key]
+    return {"ok": ok, "info": inf}
+
+def _skipped(cid: int, note: str) -> Dict:
+    return {"ok": False, "skipped": True, "info": {"cond": cid, "note": note}}
+
+def _all_of(cids: List[int], check, by_cond: Dict, df_by_tf) -> bool:
+    """AND group in COSTS order, stopping at the first failure (the rest marked skipped)."""
+    left = list(cids)
+    while left:
+        cid = COSTS.next(left, df_by_tf)
+        left.remove(cid)
+        by_cond[cid] = check(cid)
+        if not by_cond[cid]["ok"]:
+            for rest in sorted(left):
+                by_cond[rest] = _skipped(rest, f"skipped, {cid} failed")
+            return False
+    return True
+
+def evaluated(result: Dict) -> Dict:
+    """cid -> ok of the conditions that actually ran (skipped ones left out)."""
+    return {cid: v["ok"] for cid, v in result.get("by_cond", {}).items() if not v.get("skipped")}
+
+def same_outcome(a: Tuple[bool, Dict], b: Tuple[bool, Dict]) -> bool:
+    """Two (ok, result) agree: same outcome, and the conditions both evaluated agree (their cost order may differ)."""
+    (ok_a, ra), (ok_b, rb) = a, b
+    fa, fb = evaluated(ra), evaluated(rb)
+    return ((ok_a, ra["summary"], ra["direction"], ra["start_index"])
+            == (ok_b, rb["summary"], rb["direction"], rb["start_index"])
+            and all(fa[c] == fb[c] for c in fa.keys() & fb.keys()))
+
+def _starts(df_by_tf, memo: Optional[Dict]):
+    """
+    check_cond_1 long and short. cond_1 has no thresholds: profiles whose cond_1
+    state is identical get the same answer and the same new state, so it is
+    evaluated once and the resulting state written to the other profiles' files.
+    """
+    if memo is None:
+        return check_cond_1(df_by_tf, "long"), check_cond_1(df_by_tf, "short")
+    before = cond_1.load_state()
+    key = (1, json.dumps(before, sort_keys=True))
+    hit = memo.get(key)
+    if hit is None:
+        starts = check_cond_1(df_by_tf, "long"), check_cond_1(df_by_tf, "short")
+        memo[key] = (starts, cond_1.load_state())
+        return starts
+    starts, after = hit
+    if after != before:
+        cond_1.save_state(after)
+    memo["_reused"] = memo.get("_reused", 0) + 1
+    return starts
+
+def run_checks(df_by_tf: Dict[str, pd.DataFrame], profile: Optional[Dict] = None,
+               memo: Optional[Dict] = None) -> Tuple[bool, Dict]:
+    """
+    Enforced logic (profile: thresholds, enabled conditions, strict; default = PROFILES[0]):
+    - Conditions 1..7 are mandatory (2..7 and 8/9 in COSTS order, the rest skipped after a failure).
     - If 8 and 9 passed -> impulse_tf = '30m' => success.
     - Else try 10 (TF transfer) and require 11 -> impulse_tf = '1h/2h' => success.
+    - Strict profile: every enabled condition 1..11 must pass.
+    Disabled conditions count as passed.
     Returns (ok, result_dict) where result_dict contains per-condition details and overall summary.
     """
+    profile = profile or PROFILES[0]
     result = {
         "by_cond": {},
         "direction": None,
         "start_index": None,
         "impulse_tf": None,
         "summary": "",
+        "profile": profile["name"],
     }
 
     # 1) Detect start for long or short (cond_1)
-    ok1_long, info1_long = check_cond_1(df_by_tf, "long")
-    ok1_short, info1_short = check_cond_1(df_by_tf, "short")
+    (ok1_long, info1_long), (ok1_short, info1_short) = _starts(df_by_tf, memo)
     if ok1_long and not ok1_short:
         direction = "long"
         info1 = info1_long
@@ -56,53 +195,39 @@ def run_checks(df_by_tf: Dict[str, pd.DataFrame]) -> Tuple[bool, Dict]:
     result["by_cond"][1] = {"ok": True, "info": info1}
     start_idx = info1.get("start_index")
     result["start_index"] = start_idx
+    check = lambda cid: _check(cid, df_by_tf, direction, start_idx, profile, memo)
 
-    # Mandatory checks 2..7
-    mandatory_ok = True
-    for cid in [2,3,4,5,6,7]:
-        if cid == 2:
-            ok, inf = check_cond_2(df_by_tf, direction)
-        elif cid == 3:
-            ok, inf = check_cond_3(df_by_tf, direction, start_idx)
-        elif cid == 4:
-            ok, inf = check_cond_4(df_by_tf, direction, start_idx)
-        elif cid == 5:
-            ok, inf = check_cond_5(df_by_tf, direction, start_idx)
-        elif cid == 6:
-            ok, inf = check_cond_6(df_by_tf, direction, start_idx)
-        elif cid == 7:
-            ok, inf = check_cond_7(df_by_tf, direction)
-        else:
-            ok, inf = False, {"cond": cid, "reason": "unknown"}
-        result["by_cond"][cid] = {"ok": ok, "info": inf}
-        if not ok:
-            mandatory_ok = False
-
-    if not mandatory_ok:
+    # Mandatory checks 2..7 (cheapest / most selective first, stop at the first failure)
+    if not _all_of([2, 3, 4, 5, 6, 7], check, result["by_cond"], df_by_tf):
         result["summary"] = "failed_mandatory_2_7"
         return False, result
 
-    # Branch: check 8 & 9 (30m)
-    ok8, inf8 = check_cond_8(df_by_tf, direction, start_idx)
-    result["by_cond"][8] = {"ok": ok8, "info": inf8}
-    ok9, inf9 = check_cond_9(df_by_tf, direction, start_idx)
-    result["by_cond"][9] = {"ok": ok9, "info": inf9}
+    if profile["strict"]:
+        # every enabled condition, no branch choice
+        for cid in [8, 9, 10, 11]:
+            result["by_cond"][cid] = check(cid)
+        oks = {cid: result["by_cond"][cid]["ok"] for cid in [8, 9, 10, 11]}
+        if all(oks.values()):
+            result["impulse_tf"] = "30m" if 8 in profile["conditions"] or 9 in profile["conditions"] else "1h/2h"
+            result["summary"] = "ok_strict"
+            return True, result
+        result["summary"] = "failed_strict_" + "_".join(str(c) for c, ok in oks.items() if not ok)
+        return False, result
 
-    if ok8 and ok9:
+    # Branch: check 8 & 9 (30m)
+    if _all_of([8, 9], check, result["by_cond"], df_by_tf):
         result["impulse_tf"] = "30m"
         # mark 10/11 as skipped
-        result["by_cond"][10] = {"ok": False, "info": {"note": "skipped, 8&9 satisfied"}}
-        result["by_cond"][11] = {"ok": False, "info": {"note": "skipped, 8&9 satisfied"}}
+        result["by_cond"][10] = _skipped(10, "skipped, 8&9 satisfied")
+        result["by_cond"][11] = _skipped(11, "skipped, 8&9 satisfied")
         result["summary"] = "ok_30m_branch"
         return True, result
 
     # Else try transfer (10) and require 11
-    ok10, inf10 = check_cond_10(df_by_tf, direction, start_idx)
-    result["by_cond"][10] = {"ok": ok10, "info": inf10}
-    if ok10:
-        ok11, inf11 = check_cond_11(df_by_tf, direction, start_idx)
-        result["by_cond"][11] = {"ok": ok11, "info": inf11}
-        if ok11:
+    result["by_cond"][10] = check(10)
+    if result["by_cond"][10]["ok"]:
+        result["by_cond"][11] = check(11)
+        if result["by_cond"][11]["ok"]:
             result["impulse_tf"] = "1h/2h"
             result["summary"] = "ok_1h2h_branch"
             return True, result
@@ -112,3 +237,38 @@ def run_checks(df_by_tf: Dict[str, pd.DataFrame]) -> Tuple[bool, Dict]:
 
     result["summary"] = "failed_higher_tf_checks"
     return False, result
+
+def run_profiles(df_by_tf: Dict[str, pd.DataFrame], profiles: Optional[List[Dict]] = None,
+                 cond1_path: Optional[str] = None, now: Optional[float] = None) -> Dict[str, Tuple[bool, Dict]]:
+    """
+    run_checks for every profile on the same frames: profile name -> (ok, result).
+    Each profile's cond_1 state lives in profile_path(cond1_path, name) (evaluated
+    once while the states agree); conditions 2..11 are computed once per
+    (direction, start, thresholds they read).
+    result["reused"] = condition results the profile took from an earlier one.
+    A lazy TF that fails to load (FrameLoadError) after cond_1 already moved its
+    state (a confirmed start is consumed) puts every profile's cond_1 state back
+    before re-raising, so the next cycle sees the same start again.
+    `now`: the exchange's clock, which cond_1 judges the last bar closed by.
+    """
+    profiles = profiles or PROFILES
+    base = cond1_path or cond_1.STATE_FILE
+    paths = [profile_path(base, p["name"]) for p in profiles]
+    snaps = {}
+    for path in paths:
+        with cond_1.state_file(path):
+            snaps[path] = cond_1.snapshot()
+    memo, out = {}, {}
+    try:
+        for profile, path in zip(profiles, paths):
+            before = memo.get("_reused", 0)
+            with cond_1.state_file(path), cond_1.clock(now):
+                ok, result = run_checks(df_by_tf, profile, memo)
+            result["reused"] = memo.get("_reused", 0) - before
+            out[profile["name"]] = (ok, result)
+    except FrameLoadError:
+        for path, snap in snaps.items():
+            with cond_1.state_file(path):
+                cond_1.restore(snap)
+        raise
+    return out
@@ -0,0 +1,85 @@
+# bot/compact.py
+# Memory-compact indicator frames (COMPACT_MODE=1).
+# Indicators are still computed in float64; the stored frame then
+#   - keeps only the last MAX_BARS_PER_TF bars,
+#   - keeps only the columns the conditions enabled in any profile / notifier read,
+#   - stores floats as float32 (EMA5/10/21 stay float64 for cond_1's eps test),
+#   - stores time as int32 seconds relative to TIME_EPOCH_BASE (df.attrs["time_base"]).
+# Code that needs absolute timestamps uses utils.bar_time(df, i).
+
+from typing import Dict, Iterable, Set
+
+import numpy as np
+import pandas as pd
+
+from .config import MAX_BARS_PER_TF, TIME_EPOCH_BASE
+from .profiles import ALL_CONDITIONS
+
+_RSI = ("rsi6", "rsi9", "rsi21")
+_KDJ = ("kdj_j", "kdj_k", "kdj_d")
+_SRSI = ("srsi_k", "srsi_d")
+_MACD = ("macd_dif", "macd_dea")
+# macd_prev_trend_ok (cond 8 and its 1H transfer in cond 10)
+_PREV_TREND = ("macd_dif", "macd_dea", "macd_hist", "volume", "vol_ma10", "open", "close")
+
+# condition -> {tf: columns it reads}
+COND_COLUMNS = {
+    1: {"5m": ("ema5", "ema10", "ema21")},
+    2: {"5m": _MACD},
+    3: {"5m": _MACD + _RSI + _KDJ + _SRSI},
+    4: {"5m": _KDJ + ("rsi6",)},
+    5: {"5m": _RSI},
+    6: {"15m": _SRSI + _RSI + _KDJ + ("macd_dea",)},
+    7: {"15m": _RSI},
+    8: {"30m": _KDJ + _RSI + _PREV_TREND},
+    9: {"1H": _KDJ + _RSI + _SRSI},
+    10: {"1H": _KDJ + _RSI + _PREV_TREND, "2H": _KDJ + _RSI + _SRSI},
+    11: {"30m": _RSI + _KDJ + _SRSI},
+}
+# format_message: last price and ATR levels (5m), support/resistance pivots on every TF (bot/levels.py)
+NOTIFIER_COLUMNS = {"5m": ("open", "high", "low", "close", "atr14"),
+                    **{tf: ("high", "low", "close", "atr14") for tf in ("15m", "30m", "1H", "2H")}}
+
+FLOAT64_COLUMNS = {"ema5", "ema10", "ema21"}
+
+
+def required_columns(enabled: Iterable[int] = ALL_CONDITIONS) -> Dict[str, Set[str]]:
+    out: Dict[str, Set[str]] = {}
+    for cid in enabled:
+        for tf, cols in COND_COLUMNS.get(cid, {}).items():
+            out.setdefault(tf, {"time"}).update(cols)
+    for tf, cols in NOTIFIER_COLUMNS.items():
+        out.setdefault(tf, {"time"}).update(cols)
+    return out
+
+
+REQUIRED_COLUMNS = required_columns()
+
+
+def compact_frame(df: pd.DataFrame, tf: str, max_bars: int = MAX_BARS_PER_TF,
+                  columns: Dict[str, Set[str]] = None) -> pd.DataFrame:
+    columns = REQUIRED_COLUMNS if columns is None else columns
+    keep = [c for c in df.columns if c in columns.get(tf, {"time"})]
+    src = df.iloc[-max_bars:] if max_bars and len(df) > max_bars else df
+    base = int(df.attrs.get("time_base", 0))
+    data = {}
+    for c in keep:
+        col = src[c].to_numpy()
+        if c == "time":
+            data[c] = (col.astype(np.int64) + base - TIME_EPOCH_BASE).astype(np.int32)
+        elif c in FLOAT64_COLUMNS:
+            data[c] = col.astype(np.float64, copy=False)
+        else:
+            data[c] = col.astype(np.float32)
+    out = pd.DataFrame(data)
+    out.attrs["time_base"] = TIME_EPOCH_BASE
+    return out
+
+
+def compact_all(dfs: Dict[str, pd.DataFrame], max_bars: int = MAX_BARS_PER_TF) -> Dict[str, pd.DataFrame]:
+    return {tf: compact_frame(df, tf, max_bars) for tf, df in dfs.items()}
+
+
+def frames_nbytes(dfs: Dict[str, pd.DataFrame]) -> Dict[str, int]:
+    """Resident bytes per TF (column buffers + index)."""
+    return {tf: int(df.memory_usage(index=True, deep=False).sum()) for tf, df in dfs.items()}
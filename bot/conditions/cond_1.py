@@ -16,14 +16,24 @@
 """
 from typing import Tuple, Dict, Optional
 import pandas as pd
+import copy
 import json
 import os
 import logging
+import threading
 import time
+from contextlib import contextmanager
+
+from ..utils import bar_time
 
 logger = logging.getLogger(__name__)
 STATE_FILE = "cond1_state.json"
 
+# per-thread overrides: state file of the instrument being checked (state_file),
+# the clock the last bar is closed by (clock: the exchange's, bot/hedge.py OKX.now) and
+# the intrabar dry-run (bot/intrabar.py: in-memory state, last row treated as closed)
+_LOCAL = threading.local()
+
 # Гистерезис: абсолютный и относительный
 EPS_ABS = 1e-10
 EPS_REL = 1e-6  # ~0.0001% relative tolerance
@@ -45,10 +55,65 @@ def _flush_handlers():
             pass
 
 
+def _state_path() -> str:
+    return getattr(_LOCAL, "path", None) or STATE_FILE
+
+
+@contextmanager
+def state_file(path: str):
+    """Use `path` instead of STATE_FILE in this thread (one state per instrument)."""
+    prev = getattr(_LOCAL, "path", None)
+    _LOCAL.path = path
+    try:
+        yield
+    finally:
+        _LOCAL.path = prev
+
+
+@contextmanager
+def clock(now: Optional[float]):
+    """Decide whether the last 5m bar has closed at `now` instead of time.time() in this thread (None: keep)."""
+    prev = getattr(_LOCAL, "now", None)
+    _LOCAL.now = now if now is not None else prev
+    try:
+        yield
+    finally:
+        _LOCAL.now = prev
+
+
+def _now() -> float:
+    now = getattr(_LOCAL, "now", None)
+    return time.time() if now is None else now
+
+
+@contextmanager
+def dry_run():
+    """
+    Evaluate on a forming bar: the last row counts as closed and state changes
+    stay in memory (the persisted state is read once and never written).
+    """
+    _LOCAL.state = _read_state_file()
+    try:
+        yield
+    finally:
+        _LOCAL.state = None
+
+
+def _dry_active() -> bool:
+    return getattr(_LOCAL, "state", None) is not None
+
+
 def load_state() -> Dict:
-    if os.path.exists(STATE_FILE):
+    if _dry_active():
+        return copy.deepcopy(_LOCAL.state)
+    return _read_state_file()
+
+
+def _read_state_file() -> Dict:
+    path = _state_path()
+    if os.path.exists(path):
         try:
-            with open(STATE_FILE, "r", encoding="utf-8") as f:
+            with open(path, "r", encoding="utf-8") as f:
                 return json.load(f)
         except Exception:
             # corrupted -> ignore
@@ -67,8 +132,35 @@ def save_state(state: Dict):
                 safe_state[k] = v
         except Exception:
             safe_state[k] = str(v)
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
+    if _dry_active():
+        _LOCAL.state = copy.deepcopy(safe_state)
+        return
+    # write-then-rename: the intrabar dry-run may read the file concurrently
+    path = _state_path()
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(safe_state, f)
+    os.replace(tmp, path)
+
+
+def snapshot() -> Optional[Dict]:
+    """The persisted state as it is now (None: no state file yet), for restore()."""
+    if _dry_active():
+        return copy.deepcopy(_LOCAL.state)
+    return _read_state_file() if os.path.exists(_state_path()) else None
+
+
+def restore(snap: Optional[Dict]):
+    """Put back a snapshot(): an evaluation that could not finish leaves no trace."""
+    if snap is not None:
+        save_state(snap)
+    elif _dry_active():
+        _LOCAL.state = {}
+    else:
+        try:
+            os.remove(_state_path())
+        except FileNotFoundError:
+            pass
 
 
 def _is_real_cross(prev_a: float, prev_b: float, curr_a: float, curr_b: float, cross_type: str) -> bool:
@@ -164,10 +256,10 @@ def check_cond_1(df_by_tf, direction: str) -> Tuple[bool, Dict]:
 
     # Определим, закрыта ли последняя свеча (по таймстемпу)
     try:
-        last_row_ts = int(df5["time"].iat[-1])  # секундный epoch
-        now_ts = int(time.time())
+        last_row_ts = bar_time(df5, -1)  # секундный epoch
+        now_ts = int(_now())
         tf_seconds = _tf_seconds_for_5m()
-        last_bar_closed = (now_ts >= (last_row_ts + tf_seconds))
+        last_bar_closed = (now_ts >= (last_row_ts + tf_seconds)) or _dry_active()
     except Exception:
         # Если что-то странное с time -> считаем, что последняя свеча закрыта (fallback)
         last_bar_closed = True
@@ -191,20 +283,20 @@ def check_cond_1(df_by_tf, direction: str) -> Tuple[bool, Dict]:
         prev_closed_pos = last_closed_pos - 1
         debug_prev = {
             "pos": int(prev_closed_pos),
-            "time": int(df5["time"].iat[prev_closed_pos]),
+            "time": bar_time(df5, prev_closed_pos),
             "ema5": float(ema5.iat[prev_closed_pos]),
             "ema10": float(ema10.iat[prev_closed_pos]),
             "ema21": float(ema21.iat[prev_closed_pos]),
         }
         debug_last = {
             "pos": int(last_closed_pos),
-            "time": int(df5["time"].iat[last_closed_pos]),
+            "time": bar_time(df5, last_closed_pos),
             "ema5": float(ema5.iat[last_closed_pos]),
             "ema10": float(ema10.iat[last_closed_pos]),
             "ema21": float(ema21.iat[last_closed_pos]),
         }
         logger.info("[P1][DEBUG] last_bar_closed=%s last_closed_pos=%s now=%s last_ts=%s",
-                    last_bar_closed, last_closed_pos, int(time.time()), debug_last["time"])
+                    last_bar_closed, last_closed_pos, int(_now()), debug_last["time"])
         logger.info("[P1][DEBUG] prev_closed: pos=%s ema5=%.12f ema10=%.12f ema21=%.12f",
                     debug_prev["pos"], debug_prev["ema5"], debug_prev["ema10"], debug_prev["ema21"])
         logger.info("[P1][DEBUG] last_closed: pos=%s ema5=%.12f ema10=%.12f ema21=%.12f",
@@ -1,21 +1,20 @@
 
 # bot/conditions/cond_10.py
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Optional
 from .cond_8 import check_cond_8 as check30
 from .cond_9 import check_cond_9 as check1h
 
-def check_cond_10(df_by_tf, direction: str, start_idx: int) -> Tuple[bool, Dict]:
-    df = dict(df_by_tf)
+def check_cond_10(df_by_tf, direction: str, start_idx: int, params: Optional[Dict] = None) -> Tuple[bool, Dict]:
+    # пороги п.8 (на 1h) и п.9 (на 2h)
+    # п.8/п.9 читают только 5m и свой TF: подменяем TF, не копируя весь набор
+    # (ленивые фреймы, bot/lazy.py, не подгружают лишнего)
+    df_10_1 = {"5m": df_by_tf["5m"], "30m": df_by_tf["1H"]}
+    ok_a, info_a = check30(df_10_1, direction, start_idx, params)
 
-    df_10_1 = dict(df)
-    df_10_1["30m"] = df["1H"]
-    ok_a, info_a = check30(df_10_1, direction, start_idx)
-
-    df_10_2 = dict(df)
-    if "2H" not in df:
+    if "2H" not in df_by_tf:
         return False, {"cond": 10, "reason": "Нет 2H в данных"}
-    df_10_2["1H"] = df["2H"]
-    ok_b, info_b = check1h(df_10_2, direction, start_idx)
+    df_10_2 = {"5m": df_by_tf["5m"], "1H": df_by_tf["2H"]}
+    ok_b, info_b = check1h(df_10_2, direction, start_idx, params)
 
     if ok_a and ok_b:
         return True, {"cond": 10, "note": "Перенос TF (30m→1h, 1h→2h) активирован", "impulse_tf": "1h/2h"}
@@ -1,9 +1,10 @@
 
 # bot/conditions/cond_11.py
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Optional
 from ..utils import map_index_by_time
 
-def check_cond_11(df_by_tf, direction: str, start_idx: int) -> Tuple[bool, Dict]:
+def check_cond_11(df_by_tf, direction: str, start_idx: int, params: Optional[Dict] = None) -> Tuple[bool, Dict]:
+    # пороги п.11 фиксированы (ослабленные условия ТЗ), params — для единой сигнатуры
     df5 = df_by_tf["5m"]
     df30 = df_by_tf["30m"]
     i30 = map_index_by_time(df5, df30, start_idx)
@@ -1,12 +1,14 @@
 
 # bot/conditions/cond_3.py
-from typing import Tuple, Dict
-def check_cond_3(df_by_tf, direction: str, start_idx: int) -> Tuple[bool, Dict]:
+from typing import Tuple, Dict, Optional
+from ..profiles import DEFAULT_PARAMS
+def check_cond_3(df_by_tf, direction: str, start_idx: int, params: Optional[Dict] = None) -> Tuple[bool, Dict]:
     """
     3) 5m: macd, rsi, kdj, stoch rsi — растут (long) или падают (short) или стабильны
        Точка отсчёта: вторая свеча позади от стартовой; промежуточная: предпоследняя; конечная: стартовая.
-       Допуск 5 ед.
+       Допуск 5 ед. (c3.tol)
     """
+    p = params or DEFAULT_PARAMS
     import numpy as np
     df5 = df_by_tf["5m"]
     i0 = max(0, start_idx-2)   # точка отсчёта
@@ -26,7 +28,7 @@ def check_cond_3(df_by_tf, direction: str, start_idx: int) -> Tuple[bool, Dict]:
     names = []
     for col in ["macd_dif", "macd_dea", "rsi6", "rsi9", "rsi21", "kdj_j", "kdj_k", "kdj_d", "srsi_k", "srsi_d"]:
         a0, a1_, a2 = df5[col].iloc[i0], df5[col].iloc[i1], df5[col].iloc[i2]
-        good = trend_ok(a0, a1_, a2, up=up, tol=5.0)
+        good = trend_ok(a0, a1_, a2, up=up, tol=p["c3.tol"])
         names.append((col, good))
         ok = ok and good
 
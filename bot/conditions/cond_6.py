@@ -1,11 +1,14 @@
 
 # bot/conditions/cond_6.py
-from typing import Tuple, Dict
-def check_cond_6(df_by_tf, direction: str, start_idx: int) -> Tuple[bool, Dict]:
+from typing import Tuple, Dict, Optional
+from ..profiles import DEFAULT_PARAMS
+def check_cond_6(df_by_tf, direction: str, start_idx: int, params: Optional[Dict] = None) -> Tuple[bool, Dict]:
     """
     6) 15m: StochRSI, RSI (динамика + порядок на стартовой), KDJ (динамика + порядок), MACD DEA порог.
-    Погрешности как в ТЗ.
+    Погрешности как в ТЗ (c6.rsi_tol, c6.kdj_tol, c6.dea_max).
     """
+    p = params or DEFAULT_PARAMS
+    rt, kt, dea_max = p["c6.rsi_tol"], p["c6.kdj_tol"], p["c6.dea_max"]
     from ..utils import map_index_by_time
     df5 = df_by_tf["5m"]; df15 = df_by_tf["15m"]
     i15 = map_index_by_time(df5, df15, start_idx)
@@ -25,12 +28,12 @@ def check_cond_6(df_by_tf, direction: str, start_idx: int) -> Tuple[bool, Dict]:
     r6, r9, r21 = df15["rsi6"], df15["rsi9"], df15["rsi21"]
     base = i15 - 2
     if direction == "long":
-        if not (r6.iloc[i15] >= r6.iloc[base] - 6.5):  # растёт/ровно
+        if not (r6.iloc[i15] >= r6.iloc[base] - rt):  # растёт/ровно
             return False, {"cond": 6, "reason": "15m RSI long: динамика r6 не ок"}
         if not (r6.iloc[i15] > r9.iloc[i15] > r21.iloc[i15]):
             return False, {"cond": 6, "reason": "15m RSI long: порядок r6>r9>r21 не ок"}
     else:
-        if not (r6.iloc[i15] <= r6.iloc[base] + 6.5):  # падает/ровно
+        if not (r6.iloc[i15] <= r6.iloc[base] + rt):  # падает/ровно
             return False, {"cond": 6, "reason": "15m RSI short: динамика r6 не ок"}
         if not (r6.iloc[i15] < r9.iloc[i15] < r21.iloc[i15]):
             return False, {"cond": 6, "reason": "15m RSI short: порядок r6<r9<r21 не ок"}
@@ -38,12 +41,12 @@ def check_cond_6(df_by_tf, direction: str, start_idx: int) -> Tuple[bool, Dict]:
     # 6.3 KDJ динамика от i-2 -> i (допуск 5) + порядок
     j,k,d = df15["kdj_j"], df15["kdj_k"], df15["kdj_d"]
     if direction == "long":
-        if not (j.iloc[i15] >= j.iloc[i15-2] - 5 and k.iloc[i15] >= k.iloc[i15-2] - 5 and d.iloc[i15] >= d.iloc[i15-2] - 5):
+        if not (j.iloc[i15] >= j.iloc[i15-2] - kt and k.iloc[i15] >= k.iloc[i15-2] - kt and d.iloc[i15] >= d.iloc[i15-2] - kt):
             return False, {"cond": 6, "reason": "15m KDJ long: динамика не ок"}
         if not (j.iloc[i15] > k.iloc[i15] > d.iloc[i15] and (d.iloc[i15] < 60 or (j.iloc[i15]-d.iloc[i15]) >= 20) and j.iloc[i15] < 100):
             return False, {"cond": 6, "reason": "15m KDJ long: порядок/границы не ок"}
     else:
-        if not (j.iloc[i15] <= j.iloc[i15-2] + 5 and k.iloc[i15] <= k.iloc[i15-2] + 5 and d.iloc[i15] <= d.iloc[i15-2] + 5):
+        if not (j.iloc[i15] <= j.iloc[i15-2] + kt and k.iloc[i15] <= k.iloc[i15-2] + kt and d.iloc[i15] <= d.iloc[i15-2] + kt):
             return False, {"cond": 6, "reason": "15m KDJ short: динамика не ок"}
         if not (j.iloc[i15] < k.iloc[i15] < d.iloc[i15] and (d.iloc[i15] > 40 or (d.iloc[i15]-j.iloc[i15]) >= 20) and j.iloc[i15] > 0):
             return False, {"cond": 6, "reason": "15m KDJ short: порядок/границы не ок"}
@@ -51,9 +54,9 @@ def check_cond_6(df_by_tf, direction: str, start_idx: int) -> Tuple[bool, Dict]:
     # 6.4 MACD(DEA) пределы
     dea = df15["macd_dea"].iloc[i15]
     if direction == "long":
-        if not (dea < 150):
-            return False, {"cond": 6, "reason": f"15m MACD DEA long: {dea:.1f} ≥ 150"}
+        if not (dea < dea_max):
+            return False, {"cond": 6, "reason": f"15m MACD DEA long: {dea:.1f} ≥ {dea_max}"}
     else:
-        if not (dea > -150):
-            return False, {"cond": 6, "reason": f"15m MACD DEA short: {dea:.1f} ≤ -150"}
+        if not (dea > -dea_max):
+            return False, {"cond": 6, "reason": f"15m MACD DEA short: {dea:.1f} ≤ -{dea_max}"}
     return True, {"cond": 6}
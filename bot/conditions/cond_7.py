@@ -1,18 +1,22 @@
 
 # bot/conditions/cond_7.py
-from typing import Tuple, Dict
-def check_cond_7(df_by_tf, direction: str) -> Tuple[bool, Dict]:
+from typing import Tuple, Dict, Optional
+from ..profiles import DEFAULT_PARAMS
+def check_cond_7(df_by_tf, direction: str, params: Optional[Dict] = None) -> Tuple[bool, Dict]:
     """
     7) 15m: дублирует пункт 5 (RSI «свободное пространство») на 15m стартовой проекции.
+       Пороги: c7.rsi_edge (short: 100 - edge), c5.spread.
     """
+    p = params or DEFAULT_PARAMS
+    hi, lo, sp = p["c7.rsi_edge"], 100.0 - p["c7.rsi_edge"], p["c5.spread"]
     from ..utils import map_index_by_time
     df5 = df_by_tf["5m"]; df15 = df_by_tf["15m"]
     i15 = map_index_by_time(df5, df15, len(df5)-1)
     r6, r9, r21 = df15["rsi6"].iloc[i15], df15["rsi9"].iloc[i15], df15["rsi21"].iloc[i15]
     if direction == "long":
-        if not ( (r6 < 70 or (r6 >= 70 and (r6 - r9) >= 4)) and (r21 < 70) ):
+        if not ( (r6 < hi or (r6 >= hi and (r6 - r9) >= sp)) and (r21 < hi) ):
             return False, {"cond": 7, "reason": "15m RSI long: нет свободного пространства"}
     else:
-        if not ( (r6 > 30 or (r6 <= 30 and (r9 - r6) >= 4)) and (r21 > 30) ):
+        if not ( (r6 > lo or (r6 <= lo and (r9 - r6) >= sp)) and (r21 > lo) ):
             return False, {"cond": 7, "reason": "15m RSI short: нет свободного пространства"}
     return True, {"cond": 7}
@@ -1,9 +1,13 @@
 
 # bot/conditions/cond_8.py
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Optional
 from ..utils import map_index_by_time, last_cross_index, macd_prev_trend_ok
+from ..profiles import DEFAULT_PARAMS
 
-def check_cond_8(df_by_tf, direction: str, start_idx: int) -> Tuple[bool, Dict]:
+def check_cond_8(df_by_tf, direction: str, start_idx: int, params: Optional[Dict] = None) -> Tuple[bool, Dict]:
+    # пороги: c8.dj_min, c8.drsi_min, c8.sync, c8.macd_bars
+    p = params or DEFAULT_PARAMS
+    dj, drsi = p["c8.dj_min"], p["c8.drsi_min"]
     df5 = df_by_tf["5m"]
     df30 = df_by_tf["30m"]
 
@@ -14,14 +18,14 @@ def check_cond_8(df_by_tf, direction: str, start_idx: int) -> Tuple[bool, Dict]:
     j_now, k_now, d_now = df30["kdj_j"].iloc[i30], df30["kdj_k"].iloc[i30], df30["kdj_d"].iloc[i30]
     j_2 = df30["kdj_j"].iloc[i30-2]
     if direction == "long":
-        if not (j_now > k_now > d_now and (j_now - j_2) > 20):
-            return False, {"cond": 8, "reason": "30m KDJ long: порядок/ΔJ<=20"}
+        if not (j_now > k_now > d_now and (j_now - j_2) > dj):
+            return False, {"cond": 8, "reason": f"30m KDJ long: порядок/ΔJ<={dj}"}
         cross_ago = last_cross_index(df30["kdj_j"], df30["kdj_d"], "up", lookback=2)
         if cross_ago is None:
             return False, {"cond": 8, "reason": "30m KDJ: нет кросса J↑D ≤2 свечей"}
     else:
-        if not (j_now < k_now < d_now and (df30['kdj_j'].iloc[i30-2] - j_now) > 20):
-            return False, {"cond": 8, "reason": "30m KDJ short: порядок/ΔJ<=20"}
+        if not (j_now < k_now < d_now and (df30['kdj_j'].iloc[i30-2] - j_now) > dj):
+            return False, {"cond": 8, "reason": f"30m KDJ short: порядок/ΔJ<={dj}"}
         cross_ago = last_cross_index(df30["kdj_j"], df30["kdj_d"], "down", lookback=2)
         if cross_ago is None:
             return False, {"cond": 8, "reason": "30m KDJ: нет кросса J↓D ≤2 свечей"}
@@ -31,24 +35,24 @@ def check_cond_8(df_by_tf, direction: str, start_idx: int) -> Tuple[bool, Dict]:
     if direction == "long":
         if not (r6.iloc[i30] > r9.iloc[i30] and r9.iloc[i30] >= r21.iloc[i30]-1):
             return False, {"cond": 8, "reason": "30m RSI long: порядок не ок"}
-        if not ((r6_now - r6_2) > 10):
-            return False, {"cond": 8, "reason": "30m RSI long: ΔRSI6 ≤ 10"}
+        if not ((r6_now - r6_2) > drsi):
+            return False, {"cond": 8, "reason": f"30m RSI long: ΔRSI6 ≤ {drsi}"}
         cross_ago_rsi = last_cross_index(r6, r21, "up", lookback=2)
         if cross_ago_rsi is None:
             return False, {"cond": 8, "reason": "30m RSI: нет кросса RSI6↑RSI21 ≤2 свечей"}
     else:
         if not (r6.iloc[i30] < r9.iloc[i30] and r9.iloc[i30] <= r21.iloc[i30]+1):
             return False, {"cond": 8, "reason": "30m RSI short: порядок не ок"}
-        if not ((r6.iloc[i30-2] - r6_now) > 10):
-            return False, {"cond": 8, "reason": "30m RSI short: ΔRSI6 ≤ 10"}
+        if not ((r6.iloc[i30-2] - r6_now) > drsi):
+            return False, {"cond": 8, "reason": f"30m RSI short: ΔRSI6 ≤ {drsi}"}
         cross_ago_rsi = last_cross_index(r6, r21, "down", lookback=2)
         if cross_ago_rsi is None:
             return False, {"cond": 8, "reason": "30m RSI: нет кросса RSI6↓RSI21 ≤2 свечей"}
 
-    if abs(cross_ago - cross_ago_rsi) > 2:
-        return False, {"cond": 8, "reason": "30m рассинхрон кроссов KDJ vs RSI > 2 свечей"}
+    if abs(cross_ago - cross_ago_rsi) > p["c8.sync"]:
+        return False, {"cond": 8, "reason": f"30m рассинхрон кроссов KDJ vs RSI > {p['c8.sync']} свечей"}
 
-    if not macd_prev_trend_ok(df30, direction, min_bars=4):
-        return False, {"cond": 8, "reason": "30m предыдущий тренд по MACD < 4 баров"}
+    if not macd_prev_trend_ok(df30, direction, min_bars=p["c8.macd_bars"]):
+        return False, {"cond": 8, "reason": f"30m предыдущий тренд по MACD < {p['c8.macd_bars']} баров"}
 
     return True, {"cond": 8, "i30": i30}
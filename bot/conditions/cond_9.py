@@ -1,9 +1,11 @@
 
 # bot/conditions/cond_9.py
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Optional
 from ..utils import map_index_by_time, last_cross_index
+from ..profiles import DEFAULT_PARAMS
 
-def check_cond_9(df_by_tf, direction: str, start_idx: int) -> Tuple[bool, Dict]:
+def check_cond_9(df_by_tf, direction: str, start_idx: int, params: Optional[Dict] = None) -> Tuple[bool, Dict]:
+    p = params or DEFAULT_PARAMS   # c9.sync
     df5 = df_by_tf["5m"]
     df1h = df_by_tf["1H"]
 
@@ -38,7 +40,7 @@ def check_cond_9(df_by_tf, direction: str, start_idx: int) -> Tuple[bool, Dict]:
         if cross_srsi is None or not (df1h["srsi_k"].iloc[i1h] <= df1h["srsi_d"].iloc[i1h] + 2 and df1h["srsi_d"].iloc[i1h] >= 19):
             return False, {"cond": 9, "reason": "1h StochRSI short не ок"}
 
-    if max(cross_kdj, cross_rsi, cross_srsi) - min(cross_kdj, cross_rsi, cross_srsi) > 2:
-        return False, {"cond": 9, "reason": "1h рассинхрон кроссов > 2 свечей"}
+    if max(cross_kdj, cross_rsi, cross_srsi) - min(cross_kdj, cross_rsi, cross_srsi) > p["c9.sync"]:
+        return False, {"cond": 9, "reason": f"1h рассинхрон кроссов > {p['c9.sync']} свечей"}
 
     return True, {"cond": 9, "i1h": i1h}
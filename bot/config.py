@@ -7,6 +7,9 @@ import os
 # === Exchange & symbol ===
 EXCHANGE = "OKX"
 INSTRUMENT_ID = "BTC-USDT-SWAP"
+# instruments scanned each cycle (comma-separated); INSTRUMENT_ID keeps the top-level
+# state keys and file names, the others get "<name>.<inst>" files (bot/pipeline.inst_path)
+INSTRUMENTS = [i.strip() for i in os.getenv("INSTRUMENTS", INSTRUMENT_ID).split(",") if i.strip()]
 
 # === Timeframes we use (must match fetcher and conditions) ===
 # Note: capitalization must match other modules that use TIMEFRAMES
@@ -49,9 +52,67 @@ VOL_MA2 = 10
 # How many candles to download per TF (increase if you need longer history)
 CANDLES_LIMIT = 300
 
+# Compact frames (bot/compact.py): float32 storage, int32 relative time, only the
+# columns enabled conditions read, at most MAX_BARS_PER_TF bars per TF
+COMPACT_MODE = os.getenv("COMPACT_MODE", "0") == "1"
+MAX_BARS_PER_TF = int(os.getenv("MAX_BARS_PER_TF", str(CANDLES_LIMIT)))
+TIME_EPOCH_BASE = 1_500_000_000     # int32 seconds from here last until 2088
+MEMORY_BUDGET_MB_PER_INST = float(os.getenv("MEMORY_BUDGET_MB_PER_INST", "8"))
+
+# Candle store snapshot (bot/store.py): written after each clean cycle, restored at start
+# so a restart only fetches the bars missed while the process was down
+SNAPSHOT_FILE = os.getenv("SNAPSHOT_FILE", "candles_snapshot.npz")
+SNAPSHOT_MAX_AGE_SEC = int(os.getenv("SNAPSHOT_MAX_AGE_SEC", str(6 * 3600)))
+# Candle archive (bot/archive.py): closed bars appended per instrument/TF to memory-mapped column files
+# under ARCHIVE_DIR ("" = off); read back by the store at a cold start, by integrity repairs and by tools
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "candles_archive")
+ARCHIVE_FSYNC = os.getenv("ARCHIVE_FSYNC", "1") == "1"     # fsync columns + index before an append counts
+ARCHIVE_GROW_ROWS = 8192            # column files grow by this many rows at a time
+ARCHIVE_INDEX_STRIDE = 1024         # time index: every N-th bar's time kept in memory
+
 # Bot loop interval seconds
 BOT_INTERVAL_SEC = int(os.getenv("BOT_INTERVAL_SEC", "60"))
 
+# Staged cycle pipeline (bot/pipeline.py): bounded queues between fetch/compute/check/persist
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+PIPELINE_FETCH_WORKERS = int(os.getenv("PIPELINE_FETCH_WORKERS", "2"))
+PIPELINE_STOP_TIMEOUT_SEC = 60.0   # a stopping scanner lets the queued cycles finish this long
+# run_checks in N worker processes over shared-memory frames (bot/shm.py); 0 = in the check thread
+PARALLEL_WORKERS = int(os.getenv("PARALLEL_WORKERS", "0"))
+# Lazy timeframes (bot/lazy.py): each cycle fetches 5m plus the TFs the last evaluation read;
+# other TFs are fetched and computed when a condition first reads them (eager with PARALLEL_WORKERS)
+LAZY_FRAMES = os.getenv("LAZY_FRAMES", "1") == "1"
+# Mandatory groups (2..7, 8&9) run cheapest / most selective first: measured cost / fail rate
+COND_COST_ORDER = os.getenv("COND_COST_ORDER", "1") == "1"
+# Cycle deadline (bot/deadline.py): the next 5m close (at least CYCLE_MIN_BUDGET_SEC after queueing),
+# split into stage budgets; overruns degrade: cached HTFs -> no debug reports -> deferred persistence
+CYCLE_DEADLINE = os.getenv("CYCLE_DEADLINE", "1") == "1"
+CYCLE_MIN_BUDGET_SEC = float(os.getenv("CYCLE_MIN_BUDGET_SEC", "15"))
+CYCLE_STAGE_BUDGETS = os.getenv("CYCLE_STAGE_BUDGETS", "fetch:0.5,compute:0.2,check:0.2,persist:0.1")
+# Support/resistance (bot/levels.py): fractal pivots with LEVELS_PIVOT_BARS bars on each side, clustered
+# into levels within LEVELS_CLUSTER_ATR x ATR14, at most LEVELS_MAX_PER_TF levels per TF
+LEVELS_PIVOT_BARS = int(os.getenv("LEVELS_PIVOT_BARS", "2"))
+LEVELS_CLUSTER_ATR = float(os.getenv("LEVELS_CLUSTER_ATR", "0.5"))
+LEVELS_MAX_PER_TF = int(os.getenv("LEVELS_MAX_PER_TF", "20"))
+# Signal outcomes (bot/outcomes.py): target / stop at OUTCOME_TARGET_ATR / OUTCOME_STOP_ATR x ATR14 from
+# the entry, returns at OUTCOME_HORIZONS 5m bars after the signal (the longest one ends the tracking)
+OUTCOME_TARGET_ATR = float(os.getenv("OUTCOME_TARGET_ATR", "1.5"))
+OUTCOME_STOP_ATR = float(os.getenv("OUTCOME_STOP_ATR", "1.0"))
+OUTCOME_HORIZONS = [int(h) for h in os.getenv("OUTCOME_HORIZONS", "6,12,24,48").split(",") if h.strip()]
+# Candle integrity (bot/integrity.py): at most this many range fetches per TF and refresh to fill gaps / a stale tail
+INTEGRITY_MAX_REPAIRS = int(os.getenv("INTEGRITY_MAX_REPAIRS", "3"))
+# Priority scheduling of INSTRUMENTS (bot/priority.py): readiness >= READINESS_HOT (cond_1 waiting,
+# most of 2..7 passing) -> scanned every BOT_INTERVAL_SEC, hottest first; the rest every COLD_POLL_SEC
+READINESS_HOT = float(os.getenv("READINESS_HOT", "0.5"))
+COLD_POLL_SEC = int(os.getenv("COLD_POLL_SEC", "300"))
+# cold polls land this many seconds after a 5m close (OKX has the closed bar by then), not COLD_POLL_SEC after the last one
+COLD_POLL_OFFSET_SEC = float(os.getenv("COLD_POLL_OFFSET_SEC", "3"))
+
+# Intrabar early warning (bot/intrabar.py): between cycles poll the ticker, evaluate
+# conditions on the forming 5m bar and send a pre-signal; confirmed/cancelled at close
+INTRABAR_ENABLED = os.getenv("INTRABAR_ENABLED", "0") == "1"
+INTRABAR_POLL_SEC = float(os.getenv("INTRABAR_POLL_SEC", "10"))
+
 # State file & log file names
 STATE_FILE = os.getenv("STATE_FILE", "ema_state.json")
 LOG_FILE   = os.getenv("LOG_FILE", "ema_bot.log")
@@ -60,25 +121,86 @@ LOG_FILE   = os.getenv("LOG_FILE", "ema_bot.log")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID   = os.getenv("TELEGRAM_CHAT_ID", "")
 
+# Scanner leader election (bot/scanner.py): one bot_loop per host across gunicorn workers
+SCANNER_LOCK_FILE = os.getenv("SCANNER_LOCK_FILE", "ema_scanner.lock")
+SCANNER_LEASE_RETRY_SEC = float(os.getenv("SCANNER_LEASE_RETRY_SEC", "5"))
+# Sharding of INSTRUMENTS across nodes (bot/sharding.py): SQLite lease store on a volume shared by all
+# nodes ("" = off, this node scans every instrument); node id defaults to the hostname. A dead node's
+# instruments move after SHARD_LEASE_TTL_SEC + one heartbeat (keep it under a 5m bar)
+SHARD_STORE = os.getenv("SHARD_STORE", "")
+SHARD_NODE_ID = os.getenv("SHARD_NODE_ID", "")
+SHARD_HEARTBEAT_SEC = float(os.getenv("SHARD_HEARTBEAT_SEC", "15"))
+SHARD_LEASE_TTL_SEC = float(os.getenv("SHARD_LEASE_TTL_SEC", "60"))
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+
+# Latest-cycle cache (bot/cycle.py): HTTP reads use the loop's last cycle; ?fresh=1 asks for one more
+FRESH_REQUEST_FILE = os.getenv("FRESH_REQUEST_FILE", STATE_FILE + ".fresh")
+FRESH_POLL_SEC = 1.0
+FRESH_WAIT_TIMEOUT_SEC = float(os.getenv("FRESH_WAIT_TIMEOUT_SEC", "25"))   # < gunicorn worker timeout
+
+# Server-sent events (/events, bot/events.py)
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", "1000"))   # ring buffer for Last-Event-ID resume
+EVENTS_KEEPALIVE_SEC = 15.0
+EVENTS_STREAM_MAX_SEC = float(os.getenv("EVENTS_STREAM_MAX_SEC", "600"))
+# a stream holds a gunicorn thread for its whole length: at most this many per worker
+# (503 past it), so the rest of the worker's threads (--threads 8) serve plain requests
+EVENTS_MAX_STREAMS = int(os.getenv("EVENTS_MAX_STREAMS", "4"))
+EVENTS_FOLLOW_INTERVAL_SEC = 1.0    # non-leader workers poll the event journal this often
+EVENTS_LOG_FILE = os.getenv("EVENTS_LOG_FILE", STATE_FILE + ".events")   # journal the other workers replay
+
+# Telegram delivery queue (bot/delivery.py)
+DELIVERY_QUEUE_MAX = int(os.getenv("DELIVERY_QUEUE_MAX", "500"))
+DELIVERY_SPOOL_FILE = os.getenv("DELIVERY_SPOOL_FILE", "telegram_spool.json")
+DELIVERY_MAX_ATTEMPTS = 8
+DELIVERY_BACKOFF_BASE_SEC = 1.0
+DELIVERY_BACKOFF_MAX_SEC = 60.0
+# Telegram limits: ~30 msg/s per bot, ~1 msg/s per chat (groups: 20/min -> set 3.0)
+TELEGRAM_GLOBAL_RATE_PER_SEC = 30
+TELEGRAM_CHAT_INTERVAL_SEC = float(os.getenv("TELEGRAM_CHAT_INTERVAL_SEC", "1.0"))
+
 # Debug trigger (optional)
 ALLOW_DEBUG_TRIGGER = os.getenv("ALLOW_DEBUG_TRIGGER", "0") == "1"
 
+# On-demand profiling (/debug/profile, guarded by ALLOW_DEBUG_TRIGGER)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_CYCLES = int(os.getenv("PROFILE_MAX_CYCLES", "20"))
+PROFILE_TOP_N = 25                 # hot functions / allocation sites in the report
+PROFILE_TRACE_FRAMES = 10          # tracemalloc traceback depth
+
 # === Logic toggles ===
-# Enable which conditions (1..11)
-ENABLED_CONDITIONS = [1,2,3,4,5,6,7,8,9,10,11]
+# Enable which conditions (1..11); a disabled condition counts as passed (cond 1 always runs)
+ENABLED_CONDITIONS = [int(c) for c in os.getenv("ENABLED_CONDITIONS", "1,2,3,4,5,6,7,8,9,10,11").split(",") if c.strip()]
 
 # Strict mode = require ALL enabled conditions to be True simultaneously.
 # If False -> branching logic: 1..7 mandatory, then (8&9) OR (10&11).
 STRICT_MODE = os.getenv("STRICT_MODE", "False").lower() in ("1", "true", "yes")
 
+# Extra strategy profiles (bot/profiles.py), evaluated on the same frames as the default one:
+# JSON object (or path to a JSON file) name -> {"params", "conditions", "strict", "chats"}
+STRATEGY_PROFILES = os.getenv("STRATEGY_PROFILES", "")
+
 # === OKX / networking ===
-OKX_API_BASE = "https://www.okx.com"
+# overridable to point at a caching proxy or the local stand-in (tools/standin.py)
+OKX_API_BASE = os.getenv("OKX_API_BASE", "https://www.okx.com").rstrip("/")
+# equivalent hosts for hedged requests (bot/hedge.py), comma-separated; default: OKX_API_BASE only
+OKX_API_BASES = [b.strip().rstrip("/") for b in os.getenv("OKX_API_BASES", OKX_API_BASE).split(",") if b.strip()]
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
 # request timeouts
 HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10.0"))
 
 # polite pause between OKX requests (seconds)
 OKX_REQUEST_PAUSE = float(os.getenv("OKX_REQUEST_PAUSE", "0.15"))
 
+# Hedged requests: a second copy goes out when the first has not answered within
+# the endpoint's own HEDGE_PERCENTILE latency (clamped to [MIN, MAX])
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1") == "1"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_DEFAULT_DELAY_SEC = 0.5       # until an endpoint has 10 latency samples
+HEDGE_MIN_DELAY_SEC = 0.05
+HEDGE_MAX_DELAY_SEC = 2.0
+HEDGE_MAX_EXTRA = int(os.getenv("HEDGE_MAX_EXTRA", "1"))   # extra copies per request
+HEDGE_WINDOW = 200                  # latency samples kept per endpoint
+
 # === TOLERANCES / THRESHOLDS (explicitly mapped to spec) ===
 # -------------------------
 # 1) EMA timing (5m)
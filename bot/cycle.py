@@ -0,0 +1,120 @@
+# bot/cycle.py
+# The latest completed bot cycle of each instrument, shared in-process between
+# the loop and HTTP handlers. The loop publishes a new snapshot dict by swapping
+# one reference, so readers always see a consistent (bar, ok, result) and never
+# trigger OKX calls or indicator work themselves. The cycle's indicator frames
+# are published next to it in FRAMES (bot/query.py), which /indicators reads.
+#
+# `?fresh=1` readers ask the loop to run one extra cycle of an instrument instead:
+# in the scanner process via an Event, from other gunicorn workers via a request
+# file (one instrument per line) that the loop polls while it sleeps. A request is
+# answered by a cycle of that instrument queued after it, not by one in flight.
+
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Set
+
+from .config import FRESH_REQUEST_FILE, FRESH_POLL_SEC, INSTRUMENT_ID
+
+logger = logging.getLogger(__name__)
+
+
+class LatestCycle:
+    def __init__(self, fresh_file: str = FRESH_REQUEST_FILE):
+        self.fresh_file = fresh_file
+        self._snaps: Dict[str, Dict] = {}
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._fresh = threading.Event()
+        self._fresh_insts: Set[Optional[str]] = set()
+
+    # --- loop side ---
+    def publish(self, inst: str, ok: bool, result: Dict, bar_ts: Optional[int],
+                queued: Optional[float] = None) -> Dict:
+        """`queued`: when the cycle's job was queued (its candles were fetched after that)."""
+        with self._cond:
+            self._seq += 1
+            snap = {
+                "seq": self._seq,
+                "ts": time.time(),
+                "queued": time.time() if queued is None else queued,
+                "inst": inst,
+                "bar_ts": bar_ts,
+                "ok": ok,
+                "result": result,
+            }
+            self._snaps[inst] = snap
+            self._cond.notify_all()
+        return snap
+
+    def take_fresh(self) -> Optional[List[str]]:
+        """Instruments asked for since the last call (None: a request without one, run them all)."""
+        with self._cond:
+            insts, self._fresh_insts = self._fresh_insts, set()
+        return None if None in insts or not insts else sorted(insts)
+
+    def wait_interval(self, seconds: float, wake: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Sleep between cycles; returns True early when a fresh cycle was requested,
+        False early once `wake()` (checked every FRESH_POLL_SEC) is true.
+        """
+        deadline = time.time() + seconds
+        while True:
+            left = deadline - time.time()
+            if left <= 0 or (wake is not None and wake()):
+                return False
+            if self._fresh.wait(min(left, FRESH_POLL_SEC)):
+                self._fresh.clear()
+                logger.info("Fresh cycle requested in-process")
+                return True
+            if os.path.exists(self.fresh_file):
+                # moved aside first: a request appended meanwhile lands in a new file
+                taken = f"{self.fresh_file}.{os.getpid()}"
+                try:
+                    os.replace(self.fresh_file, taken)
+                    with open(taken, "r", encoding="utf-8") as f:
+                        insts = {line.split()[-1] if len(line.split()) > 1 else None for line in f if line.strip()}
+                    os.remove(taken)
+                except OSError:
+                    insts = {None}
+                with self._cond:
+                    self._fresh_insts |= insts or {None}
+                logger.info("Fresh cycle requested via %s: %s", self.fresh_file, sorted(map(str, insts)))
+                return True
+
+    # --- reader side ---
+    def get(self, inst: str = INSTRUMENT_ID) -> Optional[Dict]:
+        return self._snaps.get(inst)
+
+    def request_fresh(self, timeout: float, inst: str = INSTRUMENT_ID) -> Optional[Dict]:
+        """Wake the loop (same process) and wait for a cycle of `inst` queued after this call."""
+        asked = time.time()
+        fresh = lambda: self._snaps.get(inst) is not None and self._snaps[inst]["queued"] >= asked
+        with self._cond:
+            self._fresh_insts.add(inst)
+            self._fresh.set()
+            self._cond.wait_for(fresh, timeout)
+            return self._snaps[inst] if fresh() else None
+
+    def request_fresh_remote(self, inst: str = INSTRUMENT_ID) -> float:
+        """Ask the scanner running in another worker for a cycle of `inst` (see wait_interval); returns the request time."""
+        asked = time.time()
+        with open(self.fresh_file, "a", encoding="utf-8") as f:
+            f.write(f"{asked} {inst}\n")
+        return asked
+
+
+def describe(snap: Dict) -> Dict:
+    """JSON-safe metadata of a snapshot (no frames)."""
+    return {
+        "seq": snap["seq"],
+        "inst": snap["inst"],
+        "bar_ts": snap["bar_ts"],
+        "published_ts": snap["ts"],
+        "age_sec": round(time.time() - snap["ts"], 3),
+    }
+
+
+LATEST = LatestCycle()
@@ -2,9 +2,9 @@
 # bot/data.py
 import requests
 import pandas as pd
-from .config import INSTRUMENT_ID, CANDLES_LIMIT
+from .config import INSTRUMENT_ID, CANDLES_LIMIT, OKX_API_BASE
 
-OKX_BASE = "https://www.okx.com"
+OKX_BASE = OKX_API_BASE
 
 TF_MAP = {
     "5m": "5m",
@@ -35,15 +35,37 @@ def _okx_candles(tf: str, limit: int = CANDLES_LIMIT):
     df["time"] = (df["time_ms"] // 1000).astype(int)
     return df[["time","open","high","low","close","volume"]]
 
+def okx_rows_to_frame(rows) -> pd.DataFrame:
+    """
+    OKX candle rows (newest first: [ts, o, h, l, c, vol, ...]) -> DataFrame with
+    columns time (int seconds), open, high, low, close, volume, oldest first.
+    Malformed rows are skipped.
+    """
+    df_rows = []
+    for c in reversed(rows):  # reverse so oldest first
+        try:
+            ts = int(c[0])
+            # if ts looks like ms ( > 1e12 ), convert to seconds
+            if ts > 3_000_000_000:
+                ts = ts // 1000
+            o = float(c[1])
+            h = float(c[2])
+            l = float(c[3])
+            cl = float(c[4])
+            vol = float(c[5])
+            df_rows.append([ts, o, h, l, cl, vol])
+        except Exception:
+            # skip malformed
+            continue
+    df = pd.DataFrame(df_rows, columns=["time", "open", "high", "low", "close", "volume"])
+    # ensure sorted by time ascending
+    return df.sort_values("time").reset_index(drop=True)
+
 def get_all_timeframes(tfs):
     return {tf: _okx_candles(tf) for tf in tfs}
 
-def get_live_price():
-    url = f"{OKX_BASE}/api/v5/market/ticker"
-    params = {"instId": INSTRUMENT_ID}
-    r = requests.get(url, params=params, timeout=10)
-    r.raise_for_status()
-    data = r.json()
-    if data.get("code") != "0":
-        raise RuntimeError(f"OKX ticker error: {data.get('msg')}")
+def get_live_price(inst_id: str = INSTRUMENT_ID) -> float:
+    """Last traded price (OKX ticker), hedged across OKX_API_BASES like the candle requests."""
+    from .hedge import OKX
+    data = OKX.get("/api/v5/market/ticker", {"instId": inst_id})
     return float(data["data"][0]["last"])
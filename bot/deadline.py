@@ -0,0 +1,151 @@
+# bot/deadline.py
+# Deadline-aware cycle budget (CYCLE_DEADLINE=1).
+#
+# A cycle's data is current until the next 5m bar closes, so that close is the
+# cycle's deadline (at least CYCLE_MIN_BUDGET_SEC after the job was queued). The
+# time from queueing to the deadline is split into stage budgets
+# (CYCLE_STAGE_BUDGETS: cumulative shares for fetch / compute / check /
+# persist). Every checkpoint (a stage starting, a lazy TF load) raises the
+# degradation level by one for each of the fetch / compute / check budgets that
+# has already run out, in this order:
+#   1 cached_htf     TFs not fetched yet are served from the store's previous
+#                    frames (at most one bar of that TF old) instead of OKX
+#   2 no_debug       no Telegram debug reports and per-condition log lines (a
+#                    later cycle sends the report: its dedup key is not set)
+#   3 defer_persist  state file and candle snapshot are left to the next cycle;
+#                    events and the Telegram digest still go out
+# result["degraded"] records what the checks ran with, so signals carry it.
+# DEADLINES keeps lateness (finish - deadline) of recent cycles, budget used,
+# stage times and overruns (/status -> deadline) for sizing instances.
+
+import time
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+from .config import CYCLE_MIN_BUDGET_SEC, CYCLE_STAGE_BUDGETS
+
+LEVELS = ("cached_htf", "no_debug", "defer_persist")
+BAR_SEC = 300
+
+
+def parse_shares(spec: str = CYCLE_STAGE_BUDGETS) -> Dict[str, float]:
+    """"fetch:0.5,compute:0.2,..." -> stage -> share of the budget (normalized to 1)."""
+    shares = {}
+    for part in spec.split(","):
+        if part.strip():
+            name, share = part.split(":")
+            shares[name.strip()] = float(share)
+    total = sum(shares.values())
+    if total <= 0:
+        raise ValueError(f"CYCLE_STAGE_BUDGETS: no positive shares in {spec!r}")
+    return {name: share / total for name, share in shares.items()}
+
+
+STAGE_SHARES = parse_shares()
+
+
+class CycleBudget:
+    """Deadline, per-stage due times and degradation level of one cycle job."""
+
+    def __init__(self, queued: float, min_budget: float = CYCLE_MIN_BUDGET_SEC,
+                 shares: Optional[Dict[str, float]] = None):
+        shares = shares or STAGE_SHARES
+        self.queued = queued
+        self.deadline = max((int(queued) // BAR_SEC + 1) * BAR_SEC, queued + min_budget)
+        self.due: Dict[str, float] = {}
+        acc = 0.0
+        for stage, share in shares.items():
+            acc += share
+            self.due[stage] = queued + (self.deadline - queued) * acc
+        self.level = 0
+        self.marks: Dict[str, float] = {}    # stage -> start time
+        self.overruns: List[str] = []        # stages whose budget ran out
+        self.cached: List[str] = []          # TFs served from the previous frames
+
+    def update(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        for stage in list(self.due)[:-1]:
+            if now > self.due[stage] and stage not in self.overruns:
+                self.overruns.append(stage)
+        self.level = max(self.level, min(len(LEVELS), len(self.overruns)))
+        return self.level
+
+    def checkpoint(self, stage: str, now: Optional[float] = None) -> int:
+        """`stage` starts: record it, return the degradation level."""
+        now = time.time() if now is None else now
+        self.marks.setdefault(stage, now)
+        return self.update(now)
+
+    def applied(self) -> List[str]:
+        return list(LEVELS[:self.level])
+
+    def mark(self, result: Dict):
+        """result["degraded"] when the checks ran degraded."""
+        if self.level:
+            result["degraded"] = {"level": self.level, "applied": self.applied(), "cached_tfs": list(self.cached),
+                                  "behind": list(self.overruns)}
+
+    def stage_seconds(self, finish: float) -> Dict[str, float]:
+        out, prev = {"queue": None}, ("queue", self.queued)
+        for stage in self.due:
+            t = self.marks.get(stage)
+            if t is None:
+                continue
+            out[prev[0]] = round(t - prev[1], 4)
+            prev = (stage, t)
+        out[prev[0]] = round(finish - prev[1], 4)
+        return {k: v for k, v in out.items() if v is not None}
+
+
+def _pct(xs: List[float], q: float) -> Optional[float]:
+    if not xs:
+        return None
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(q * len(xs)))], 3)
+
+
+class DeadlineStats:
+    """Recent cycles' lateness, budget use, degradation and stage times."""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.totals = {"cycles": 0, "late": 0, "degraded": 0}
+
+    def record(self, inst: str, budget: CycleBudget, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        late = now - budget.deadline
+        entry = {"inst": inst, "late_sec": round(late, 3), "level": budget.level,
+                 "used": round((now - budget.queued) / max(1e-9, budget.deadline - budget.queued), 3),
+                 "overruns": list(budget.overruns), "stages": budget.stage_seconds(now)}
+        with self._lock:
+            self._recent.append(entry)
+            self.totals["cycles"] += 1
+            self.totals["late"] += late > 0
+            self.totals["degraded"] += budget.level > 0
+        return late
+
+    def status(self) -> Dict:
+        with self._lock:
+            recent = list(self._recent)
+            totals = dict(self.totals)
+        stages: Dict[str, List[float]] = {}
+        overruns: Dict[str, int] = {}
+        by_level = {lv: 0 for lv in range(len(LEVELS) + 1)}
+        for e in recent:
+            by_level[e["level"]] += 1
+            for s in e["overruns"]:
+                overruns[s] = overruns.get(s, 0) + 1
+            for s, sec in e["stages"].items():
+                stages.setdefault(s, []).append(sec)
+        late = [e["late_sec"] for e in recent]
+        used = [e["used"] for e in recent]
+        return dict(totals, window=len(recent), by_level=by_level, overruns=overruns,
+                    lateness_sec={"p50": _pct(late, 0.5), "p95": _pct(late, 0.95), "max": max(late, default=None)},
+                    budget_used={"p50": _pct(used, 0.5), "p95": _pct(used, 0.95), "max": max(used, default=None)},
+                    stage_sec={s: {"p50": _pct(v, 0.5), "p95": _pct(v, 0.95)} for s, v in stages.items()},
+                    last=recent[-5:])
+
+
+DEADLINES = DeadlineStats()
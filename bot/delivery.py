@@ -0,0 +1,277 @@
+# bot/delivery.py
+# Asynchronous Telegram delivery: bounded queue drained by one background worker
+# over a pooled requests.Session. Honors Telegram rate limits (global + per chat)
+# and 429 retry_after, retries with exponential backoff and spools undelivered
+# messages to disk so they survive a restart.
+#
+# The spool is a journal (one JSON line per record: {"add": item}, {"try": id,
+# "attempts": n}, {"done": id}). Producers only append records to memory; the
+# worker writes everything logged since its last pass in one append, outside the
+# lock, and rewrites the file as the pending messages once it holds twice the
+# queue size in lines. A failed write (disk full, read-only volume) is retried as
+# a rewrite with exponential backoff while messages keep going out from memory.
+# Only the process that called start() (the scanner) loads
+# and writes the spool; a message queued in another process is delivered from
+# memory by its own worker thread.
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from .config import (
+    HTTP_TIMEOUT,
+    DELIVERY_QUEUE_MAX, DELIVERY_SPOOL_FILE, DELIVERY_MAX_ATTEMPTS,
+    DELIVERY_BACKOFF_BASE_SEC, DELIVERY_BACKOFF_MAX_SEC,
+    TELEGRAM_GLOBAL_RATE_PER_SEC, TELEGRAM_CHAT_INTERVAL_SEC, TELEGRAM_API_BASE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramDelivery:
+    def __init__(self, token: str, spool_file: str = DELIVERY_SPOOL_FILE, maxsize: int = DELIVERY_QUEUE_MAX):
+        self.token = token
+        self.spool_file = spool_file
+        self.maxsize = maxsize
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._session = requests.Session()
+        self._thread: Optional[threading.Thread] = None
+        self._sent_times = deque()          # send timestamps within the last second (global limit)
+        self._chat_next: Dict[str, float] = {}  # chat_id -> earliest next send
+        self._paused_until = 0.0            # global pause from a 429 without chat scope
+        self.stats = {"queued": 0, "sent": 0, "retried": 0, "dropped": 0, "rejected": 0}
+        self._spooling = False              # this process owns the spool (start() was called)
+        self._journal: List[Dict] = []      # spool records not written yet
+        self._spool_lines = 0
+        self._rewrite = False               # next flush rewrites the spool as the pending messages
+        self._spool_fails = 0               # failed spool writes in a row
+        self._spool_retry = 0.0             # no spool write before this time (backoff after a failure)
+
+    # --- persistence ---
+    def _load_spool(self) -> List[Dict]:
+        """Undelivered messages in the spool: replays the journal (a spool from before it: one JSON list)."""
+        if not os.path.exists(self.spool_file):
+            return []
+        with open(self.spool_file, "r", encoding="utf-8") as f:
+            text = f.read()
+        if text.lstrip().startswith("["):
+            return json.loads(text)
+        items: Dict[str, Dict] = {}
+        for line in text.splitlines():
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue   # a line torn by a crash mid-write
+            if "add" in rec:
+                items[rec["add"]["id"]] = rec["add"]
+            elif "try" in rec and rec["try"] in items:
+                items[rec["try"]]["attempts"] = rec["attempts"]
+            elif "done" in rec:
+                items.pop(rec["done"], None)
+        return list(items.values())
+
+    def _log(self, rec: Dict):
+        # called with self._cond held; written by the worker (_flush_spool)
+        if self._spooling and not self._rewrite:   # a pending rewrite covers it
+            self._journal.append(rec)
+
+    def _spool_wait(self, now: float) -> Optional[float]:
+        """Called with self._cond held: seconds until the spool is due for a write (None: nothing to write)."""
+        if not self._journal and not self._rewrite:
+            return None
+        return max(0.0, self._spool_retry - now)
+
+    def _flush_spool(self):
+        """Append the records logged since the last call, or rewrite the spool as the pending messages."""
+        with self._cond:
+            if self._spool_wait(time.time()) != 0.0:
+                return
+            recs, self._journal = self._journal, []
+            compact = self._rewrite or self._spool_lines + len(recs) >= 2 * self.maxsize
+            self._rewrite = False
+            if compact:
+                recs = [{"add": dict(it)} for it in self._pending]
+        try:
+            if compact:
+                tmp = self.spool_file + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in recs)
+                os.replace(tmp, self.spool_file)
+                self._spool_lines = len(recs)
+            else:
+                with open(self.spool_file, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in recs))
+                self._spool_lines += len(recs)
+            self._spool_fails = 0
+        except Exception:
+            self._spool_fails += 1
+            delay = min(DELIVERY_BACKOFF_MAX_SEC, DELIVERY_BACKOFF_BASE_SEC * (2 ** (self._spool_fails - 1)))
+            if self._spool_fails == 1:
+                logger.exception("Delivery: failed to write spool %s, retry in %.1fs", self.spool_file, delay)
+            else:
+                logger.warning("Delivery: spool write failed %s times in a row, retry in %.1fs", self._spool_fails, delay)
+            with self._cond:
+                # the lost records: written as the pending messages next time
+                self._rewrite = True
+                self._journal = []
+                self._spool_retry = time.time() + delay
+
+    # --- producer side ---
+    def enqueue(self, text: str, chat_id: str, parse_mode: str = "HTML") -> bool:
+        """Queue a message; never blocks on the network. False if the queue is full."""
+        if not self.token or not chat_id:
+            return False
+        item = {
+            "id": uuid.uuid4().hex,
+            "chat_id": str(chat_id),
+            "text": text,
+            "parse_mode": parse_mode,
+            "attempts": 0,
+            "next_try": 0.0,
+            "created": time.time(),
+        }
+        with self._cond:
+            if len(self._pending) >= self.maxsize:
+                self.stats["rejected"] += 1
+                logger.error("Delivery queue full (%s), message rejected", self.maxsize)
+                return False
+            self._pending.append(item)
+            self.stats["queued"] += 1
+            self._log({"add": dict(item)})
+            self._cond.notify()
+        self._start_worker()
+        return True
+
+    def send_now(self, text: str, chat_id: str, parse_mode: str = "HTML") -> bool:
+        """Synchronous send bypassing the queue (manual /test)."""
+        if not self.token or not chat_id:
+            return False
+        ok, _retry, _permanent = self._post({"chat_id": str(chat_id), "text": text, "parse_mode": parse_mode})
+        return ok
+
+    # --- worker side ---
+    def start(self):
+        """Take over the spool (the scanner process): queue what a previous process left undelivered."""
+        with self._cond:
+            if not self._spooling:
+                self._spooling = True
+                try:
+                    items = self._load_spool()[-self.maxsize:]
+                except Exception:
+                    logger.exception("Delivery: failed to load spool %s", self.spool_file)
+                    items = []
+                known = {it["id"] for it in self._pending}
+                for it in reversed([it for it in items if it["id"] not in known]):
+                    it["next_try"] = 0.0
+                    self._pending.appendleft(it)
+                if items:
+                    logger.info("Delivery: restored %s undelivered message(s) from %s", len(items), self.spool_file)
+                # rewritten at the worker's first pass: replayed records dropped, messages queued before start() kept
+                self._rewrite = True
+                self._cond.notify()
+        self._start_worker()
+
+    def _start_worker(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="telegram-delivery", daemon=True)
+            self._thread.start()
+
+    def _post(self, item: Dict) -> Tuple[bool, Optional[float], bool]:
+        """Returns (ok, retry_after, permanent_failure)."""
+        url = f"{TELEGRAM_API_BASE}/bot{self.token}/sendMessage"
+        data = {"chat_id": item["chat_id"], "text": item["text"], "parse_mode": item["parse_mode"]}
+        try:
+            r = self._session.post(url, data=data, timeout=HTTP_TIMEOUT)
+        except Exception as e:
+            logger.warning("Delivery: network error: %s", e)
+            return False, None, False
+        if r.ok:
+            return True, None, False
+        retry_after = None
+        try:
+            retry_after = (r.json().get("parameters") or {}).get("retry_after")
+        except Exception:
+            pass
+        if r.status_code == 429:
+            return False, float(retry_after or 1.0), False
+        if 400 <= r.status_code < 500:
+            logger.error("Delivery: Telegram rejected message (%s): %s", r.status_code, r.text[:300])
+            return False, None, True
+        return False, None, False
+
+    def _next_ready(self, now: float) -> Tuple[Optional[Dict], float]:
+        """Pick the first due item whose chat is not throttled. Returns (item, wait_sec)."""
+        while self._sent_times and now - self._sent_times[0] >= 1.0:
+            self._sent_times.popleft()
+        wait = 1.0
+        if now < self._paused_until:
+            return None, self._paused_until - now
+        if len(self._sent_times) >= TELEGRAM_GLOBAL_RATE_PER_SEC:
+            return None, 1.0 - (now - self._sent_times[0])
+        for item in self._pending:
+            due = max(item["next_try"], self._chat_next.get(item["chat_id"], 0.0))
+            if due <= now:
+                return item, 0.0
+            wait = min(wait, due - now)
+        return None, wait
+
+    def _run(self):
+        while True:
+            self._flush_spool()   # everything logged since the last pass, in one write
+            with self._cond:
+                now = time.time()
+                spool = self._spool_wait(now)
+                if spool == 0.0:
+                    continue
+                if not self._pending:
+                    self._cond.wait(timeout=spool)
+                    continue
+                item, wait = self._next_ready(now)
+                if item is None:
+                    self._cond.wait(timeout=max(min(wait, wait if spool is None else spool), 0.01))
+                    continue
+
+            ok, retry_after, permanent = self._post(item)
+            now = time.time()
+
+            with self._cond:
+                self._sent_times.append(now)
+                self._chat_next[item["chat_id"]] = now + TELEGRAM_CHAT_INTERVAL_SEC
+                if ok or permanent:
+                    self._pending.remove(item)
+                    self._log({"done": item["id"]})
+                    self.stats["sent" if ok else "dropped"] += 1
+                else:
+                    item["attempts"] += 1
+                    if item["attempts"] >= DELIVERY_MAX_ATTEMPTS:
+                        self._pending.remove(item)
+                        self._log({"done": item["id"]})
+                        self.stats["dropped"] += 1
+                        logger.error("Delivery: giving up after %s attempts (chat=%s)", item["attempts"], item["chat_id"])
+                    else:
+                        self.stats["retried"] += 1
+                        if retry_after is not None:
+                            # Telegram flood control applies to the whole bot
+                            self._paused_until = now + retry_after
+                            delay = retry_after
+                        else:
+                            delay = min(DELIVERY_BACKOFF_MAX_SEC, DELIVERY_BACKOFF_BASE_SEC * (2 ** (item["attempts"] - 1)))
+                        item["next_try"] = now + delay
+                        self._log({"try": item["id"], "attempts": item["attempts"]})
+                        logger.warning("Delivery: attempt %s failed (chat=%s), retry in %.1fs",
+                                       item["attempts"], item["chat_id"], delay)
+
+    def status(self) -> Dict:
+        with self._cond:
+            return dict(self.stats, pending=len(self._pending), spool=self._spooling, spool_fails=self._spool_fails,
+                        worker_alive=bool(self._thread and self._thread.is_alive()))
@@ -0,0 +1,195 @@
+# bot/events.py
+# In-process event bus for the /events server-sent event stream.
+# Events live in a bounded ring buffer so clients can resume with Last-Event-ID.
+# Ids are epoch-millisecond based and strictly increasing, so an id from before a
+# restart still resumes correctly (it is simply older than everything buffered).
+# The worker running the scanner also appends every event to a journal file
+# (EVENTS_LOG_FILE, one JSON line each, compacted to the last EVENTS_BUFFER_SIZE
+# events); the other gunicorn workers replay it from the last id they have with
+# the same ids, so every worker serves every event and any of them resumes a
+# Last-Event-ID handed out by another.
+# Each open stream holds a worker thread, so a worker serves at most
+# EVENTS_MAX_STREAMS of them at a time (open_stream / close_stream).
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from .config import EVENTS_BUFFER_SIZE, EVENTS_FOLLOW_INTERVAL_SEC, EVENTS_LOG_FILE, EVENTS_MAX_STREAMS
+
+logger = logging.getLogger(__name__)
+
+
+def cycle_event(result: Dict, inst: str, bar_ts: Optional[int], ok: bool) -> Dict:
+    """Compact per-cycle payload: summary + per-condition flags (no bulky info dicts)."""
+    by_cond = result.get("by_cond", {}) or {}
+    return {
+        "inst": inst,
+        "ts": int(time.time()),
+        "bar_ts": bar_ts,
+        "ok": bool(ok),
+        "summary": result.get("summary"),
+        "direction": result.get("direction"),
+        "impulse_tf": result.get("impulse_tf"),
+        "start_index": result.get("start_index"),
+        "by_cond": {str(k): bool(v.get("ok", False)) for k, v in by_cond.items()},
+        "degraded": (result.get("degraded") or {}).get("level", 0),
+    }
+
+
+class EventBus:
+    def __init__(self, maxlen: int = EVENTS_BUFFER_SIZE, journal: Optional[str] = None,
+                 max_streams: int = EVENTS_MAX_STREAMS):
+        self._buf = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self._last_id = 0
+        self.journal = journal
+        self._journal_lines = 0
+        self.max_streams = max_streams
+        self._streams = 0
+        self._rejected = 0
+
+    def publish(self, event: str, data: Dict, inst: Optional[str] = None) -> int:
+        with self._cond:
+            self._last_id = max(self._last_id + 1, int(time.time() * 1000))
+            ev = {"id": self._last_id, "event": event, "inst": inst, "data": data}
+            self._buf.append(ev)
+            self._append_journal(ev)
+            self._cond.notify_all()
+            return self._last_id
+
+    def replay(self, ev: Dict) -> bool:
+        """An event read from the journal, with its id; False if it is not newer than what is buffered."""
+        with self._cond:
+            if ev["id"] <= self._last_id:
+                return False
+            self._last_id = ev["id"]
+            self._buf.append(ev)
+            self._cond.notify_all()
+            return True
+
+    def _append_journal(self, ev: Dict):
+        """Called with the lock held; compacts the file to the buffer once it holds twice as many lines."""
+        if not self.journal:
+            return
+        try:
+            if self._journal_lines >= 2 * self._buf.maxlen:
+                tmp = f"{self.journal}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.writelines(json.dumps(e, ensure_ascii=False) + "\n" for e in self._buf)
+                os.replace(tmp, self.journal)
+                self._journal_lines = len(self._buf)
+            else:
+                with open(self.journal, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(ev, ensure_ascii=False) + "\n")
+                self._journal_lines += 1
+        except Exception:
+            logger.exception("Events: failed to write journal %s", self.journal)
+
+    def resume_cursor(self, last_event_id: Optional[str]) -> int:
+        """
+        Cursor for a new subscriber: after `last_event_id` if given, otherwise
+        just before the newest event so the client immediately gets current state.
+        """
+        if last_event_id:
+            try:
+                return int(last_event_id)
+            except ValueError:
+                pass
+        with self._cond:
+            return self._buf[-1]["id"] - 1 if self._buf else self._last_id
+
+    def open_stream(self) -> bool:
+        """Take a stream slot; False (counted) when max_streams are already open."""
+        with self._cond:
+            if self._streams >= self.max_streams:
+                self._rejected += 1
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        with self._cond:
+            self._streams = max(0, self._streams - 1)
+
+    def wait(self, cursor: int, timeout: float) -> List[Dict]:
+        """Events with id > cursor; blocks up to `timeout` seconds if there are none."""
+        with self._cond:
+            if self._last_id <= cursor:
+                self._cond.wait(timeout)
+            return [e for e in self._buf if e["id"] > cursor]
+
+    def status(self) -> Dict:
+        with self._cond:
+            return {
+                "buffered": len(self._buf),
+                "last_id": self._last_id,
+                "oldest_id": self._buf[0]["id"] if self._buf else None,
+                "streams": self._streams,
+                "max_streams": self.max_streams,
+                "rejected": self._rejected,
+            }
+
+
+def format_sse(ev: Dict) -> str:
+    return f"id: {ev['id']}\nevent: {ev['event']}\ndata: {json.dumps(ev['data'], ensure_ascii=False)}\n\n"
+
+
+class JournalReader:
+    """Complete lines appended to the journal since the last read; starts over when it was compacted."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._ino = None
+        self._offset = 0
+        self._tail = b""
+
+    def read(self) -> List[Dict]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return []
+        if st.st_ino != self._ino or st.st_size < self._offset:
+            self._ino, self._offset, self._tail = st.st_ino, 0, b""
+        if st.st_size == self._offset:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        self._offset += len(chunk)
+        lines = (self._tail + chunk).split(b"\n")
+        self._tail = lines.pop()      # an event still being written
+        out = []
+        for line in lines:
+            try:
+                out.append(json.loads(line))
+            except ValueError:
+                logger.warning("Events: unreadable journal line skipped")
+        return out
+
+
+def follow_journal(bus: EventBus, is_leader: Callable[[], bool]):
+    """
+    For gunicorn workers that do not run the scanner: replay the events the
+    leader appends to bus.journal, in order and with their ids.
+    """
+    reader = JournalReader(bus.journal)
+
+    def run():
+        while True:
+            time.sleep(EVENTS_FOLLOW_INTERVAL_SEC)
+            if is_leader():
+                continue
+            for ev in reader.read():
+                bus.replay(ev)
+
+    t = threading.Thread(target=run, name="events-follower", daemon=True)
+    t.start()
+    return t
+
+
+EVENTS = EventBus(journal=EVENTS_LOG_FILE)
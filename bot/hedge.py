@@ -0,0 +1,182 @@
+# bot/hedge.py
+# Hedged GETs over a list of equivalent OKX base URLs (regional hosts, a local
+# caching proxy). The request goes to the currently fastest endpoint; if it has
+# not answered within that endpoint's own HEDGE_PERCENTILE latency, a second
+# copy goes to the next endpoint and the first good response wins. A fast
+# failure (network error, 429, 5xx, non-zero OKX code) fires the hedge at once.
+# Per-endpoint latency and error history decide the order, so a slow or failing
+# host drops behind without manual intervention.
+#
+# now() is the exchange's clock: local time plus the skew to the Date header of
+# the last good response, once that skew exceeds CLOCK_SKEW_MIN_SEC (the header
+# has whole seconds). Which bars are closed is decided on it, so a stand-in
+# replaying past data (tools/standin.py) is not taken for a stale feed.
+
+import time
+import logging
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional
+
+import requests
+
+from .config import (
+    OKX_API_BASES, HTTP_TIMEOUT,
+    HEDGE_ENABLED, HEDGE_PERCENTILE, HEDGE_DEFAULT_DELAY_SEC, HEDGE_MIN_DELAY_SEC,
+    HEDGE_MAX_DELAY_SEC, HEDGE_MAX_EXTRA, HEDGE_WINDOW,
+)
+
+logger = logging.getLogger(__name__)
+
+CLOCK_SKEW_MIN_SEC = 2.0
+
+
+def _pct(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    s = sorted(values)
+    return s[min(len(s) - 1, int(p * len(s)))]
+
+
+class Endpoint:
+    def __init__(self, base: str, window: int = HEDGE_WINDOW):
+        self.base = base
+        self.latencies = deque(maxlen=window)   # seconds, successful responses only
+        self.outcomes = deque(maxlen=window)    # True / False per finished request
+        self.wins = 0
+
+    def error_rate(self) -> float:
+        return (self.outcomes.count(False) / len(self.outcomes)) if self.outcomes else 0.0
+
+    def score(self) -> float:
+        """Expected cost of asking this endpoint first (lower is better); unknown hosts get tried."""
+        p50 = _pct(list(self.latencies), 0.5) or 0.0
+        return p50 + self.error_rate() * HTTP_TIMEOUT
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < 10:
+            return HEDGE_DEFAULT_DELAY_SEC
+        d = _pct(list(self.latencies), HEDGE_PERCENTILE)
+        return min(HEDGE_MAX_DELAY_SEC, max(HEDGE_MIN_DELAY_SEC, d))
+
+    def status(self) -> Dict:
+        lat = list(self.latencies)
+        r = lambda v: None if v is None else round(v * 1000, 1)
+        return {"base": self.base, "samples": len(lat), "p50_ms": r(_pct(lat, 0.5)),
+                "p90_ms": r(_pct(lat, 0.9)), "p99_ms": r(_pct(lat, 0.99)),
+                "error_rate": round(self.error_rate(), 3), "wins": self.wins,
+                "hedge_delay_ms": r(self.hedge_delay())}
+
+
+class HedgedClient:
+    def __init__(self, bases: List[str] = OKX_API_BASES, enabled: bool = HEDGE_ENABLED,
+                 max_extra: int = HEDGE_MAX_EXTRA):
+        self.endpoints = [Endpoint(b) for b in bases]
+        self.enabled = enabled
+        self.max_extra = max_extra
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=4 * (1 + max_extra), thread_name_prefix="okx-hedge")
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failed": 0}
+        self.skew = 0.0   # exchange clock - local clock (see now())
+
+    def _session(self) -> requests.Session:
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = self._local.session = requests.Session()
+        return s
+
+    def _ordered(self) -> List[Endpoint]:
+        with self._lock:
+            return sorted(self.endpoints, key=lambda e: e.score())
+
+    def _fetch(self, ep: Endpoint, path: str, params: Dict, timeout: float):
+        t0 = time.monotonic()
+        try:
+            r = self._session().get(ep.base + path, params=params, timeout=timeout)
+            r.raise_for_status()
+            data = r.json()
+            if isinstance(data, dict) and data.get("code") not in (None, "0", 0):
+                raise RuntimeError(f"OKX API error: {data}")
+        except Exception:
+            with self._lock:
+                ep.outcomes.append(False)
+            raise
+        with self._lock:
+            ep.latencies.append(time.monotonic() - t0)
+            ep.outcomes.append(True)
+        self._clock(r.headers.get("Date"))
+        return data
+
+    def _clock(self, date: Optional[str]):
+        if not date:
+            return
+        try:
+            skew = parsedate_to_datetime(date).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return
+        self.skew = skew if abs(skew) >= CLOCK_SKEW_MIN_SEC else 0.0
+
+    def now(self) -> float:
+        """The exchange's time: the clock bars are closed by."""
+        return time.time() + self.skew
+
+    def get(self, path: str, params: Dict, timeout: float = HTTP_TIMEOUT):
+        """GET `path` (e.g. /api/v5/market/candles); returns the decoded JSON of the first good response."""
+        order = self._ordered()
+        with self._lock:
+            self.stats["requests"] += 1
+        if not self.enabled:
+            try:
+                return self._fetch(order[0], path, params, timeout)
+            except Exception:
+                with self._lock:
+                    self.stats["failed"] += 1
+                raise
+
+        deadline = time.monotonic() + timeout
+        primary = self._pool.submit(self._fetch, order[0], path, params, timeout)
+        pending = {primary: order[0]}
+        extra, last_exc = 0, None
+        delay = order[0].hedge_delay()
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            can_hedge = extra < self.max_extra
+            done, _ = wait(pending, timeout=min(delay, remaining) if can_hedge else remaining,
+                           return_when=FIRST_COMPLETED)
+            for fut in done:
+                ep = pending.pop(fut)
+                try:
+                    data = fut.result()
+                except Exception as e:
+                    last_exc = e
+                    continue
+                with self._lock:
+                    ep.wins += 1
+                    if fut is not primary:
+                        self.stats["hedge_wins"] += 1
+                return data
+            # primary slow (timer expired) or a copy failed: send one more copy
+            if can_hedge and (not done or not pending):
+                extra += 1
+                ep = order[extra % len(order)]
+                with self._lock:
+                    self.stats["hedged"] += 1
+                logger.debug("OKX hedge #%s -> %s (%s)", extra, ep.base, "failed" if done else "slow")
+                pending[self._pool.submit(self._fetch, ep, path, params, max(0.1, deadline - time.monotonic()))] = ep
+                delay = ep.hedge_delay()
+        with self._lock:
+            self.stats["failed"] += 1
+        raise last_exc or TimeoutError(f"OKX {path}: no response within {timeout}s")
+
+    def status(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, enabled=self.enabled, clock_skew_sec=round(self.skew, 1),
+                        endpoints=[e.status() for e in sorted(self.endpoints, key=lambda e: e.score())])
+
+
+OKX = HedgedClient()
@@ -0,0 +1,141 @@
+# bot/integrity.py
+# Integrity of raw candle series, per TF (numpy over the time column).
+#
+#   duplicates    repeated bar times (the later row wins, as in CandleStore.merge)
+#   non_monotone  a bar time earlier than the one before it (the series is re-sorted)
+#   gaps          spacing larger than the TF's bar: [first missing, last missing, bars]
+#   stale         closed bars missing at the tail for the clock `now`
+#
+# repair() fetches only what is missing: one request per gap (OKX `after`
+# paging: the bars older than the first bar after the gap) and one for a stale
+# tail, at most INTEGRITY_MAX_REPAIRS per series and call. A gap the exchange
+# returns nothing for (maintenance, delisted hours) is remembered in `holes` and
+# not asked for again. Every anomaly is counted in INTEGRITY (/status -> integrity).
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import INTEGRITY_MAX_REPAIRS
+from .store import TF_SECONDS
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("duplicates", "non_monotone", "gap_bars", "stale_bars")
+
+
+def inspect(df: pd.DataFrame, tf: str, now: Optional[float] = None) -> Dict:
+    """Anomalies of one raw series (absolute `time` seconds); `now` enables the stale-tail test."""
+    sec = TF_SECONDS.get(tf, 300)
+    t = df["time"].to_numpy(dtype=np.int64)
+    out = {"duplicates": 0, "non_monotone": 0, "gaps": [], "gap_bars": 0, "stale_bars": 0}
+    if not len(t):
+        return out
+    out["non_monotone"] = int((np.diff(t) < 0).sum())
+    u = np.unique(t)
+    out["duplicates"] = int(len(t) - len(u))
+    step = np.diff(u)
+    idx = np.flatnonzero(step > sec)
+    out["gaps"] = [[int(u[i]) + sec, int(u[i + 1]) - sec, int(step[i] // sec) - 1] for i in idx]
+    out["gap_bars"] = sum(g[2] for g in out["gaps"])
+    if now is not None:
+        last_closed = int(now) // sec * sec - sec
+        out["stale_bars"] = max(0, (last_closed - int(u[-1])) // sec)
+    return out
+
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Unique bar times, oldest first; of duplicate rows the later one is kept."""
+    return df.drop_duplicates("time", keep="last").sort_values("time", kind="stable").reset_index(drop=True)
+
+
+def repair(df: pd.DataFrame, tf: str, fetch_before: Optional[Callable[[str, int, int], pd.DataFrame]] = None,
+           now: Optional[float] = None, holes: Optional[Set[int]] = None,
+           max_requests: int = INTEGRITY_MAX_REPAIRS) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Normalized series with gaps / stale tail filled where the exchange has the
+    bars. fetch_before(tf, ts, limit) returns up to `limit` bars older than `ts`
+    (oldest first). Report: inspect() of the input + "requests", "repaired"
+    (bars added), "new_holes" and "left" (gap + stale bars still missing).
+    """
+    sec = TF_SECONDS.get(tf, 300)
+    holes = set() if holes is None else holes
+    rep = inspect(df, tf, now)
+    rep.update(requests=0, repaired=0, new_holes=[])
+    if rep["duplicates"] or rep["non_monotone"]:
+        df = normalize(df)
+    if fetch_before is None or not len(df):
+        rep["left"] = rep["gap_bars"] + rep["stale_bars"]
+        return df, rep
+
+    todo = []
+    if rep["stale_bars"]:
+        # the tail first: it is what the checks read
+        last = int(df["time"].iat[-1])
+        todo.append([last + sec, last + rep["stale_bars"] * sec, rep["stale_bars"]])
+    todo += [g for g in rep["gaps"][::-1] if g[0] not in holes]
+    parts = [df]
+    for i, (first, last_missing, count) in enumerate(todo[:max_requests]):
+        try:
+            got = fetch_before(tf, last_missing + sec, count)
+        except Exception as e:
+            logger.warning("Integrity: repair fetch %s %s..%s failed: %s", tf, first, last_missing, e)
+            continue
+        rep["requests"] += 1
+        got = got[(got["time"] >= first) & (got["time"] <= last_missing)]
+        if len(got):
+            parts.append(got)
+            rep["repaired"] += len(got)
+        elif not (rep["stale_bars"] and i == 0):
+            # nothing at the exchange for this gap: do not ask again (a stale tail is retried)
+            holes.add(first)
+            rep["new_holes"].append(first)
+    if not rep["repaired"]:
+        rep["left"] = rep["gap_bars"] + rep["stale_bars"]
+        return df, rep
+    df = pd.concat(parts, ignore_index=True).drop_duplicates("time", keep="first")
+    df = df.sort_values("time", kind="stable").reset_index(drop=True)
+    after = inspect(df, tf, now)
+    rep["left"] = after["gap_bars"] + after["stale_bars"]
+    return df, rep
+
+
+class IntegrityStats:
+    """Anomaly counters per instrument and TF, plus the most recent anomalies."""
+
+    def __init__(self, recent: int = 50):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self.recent = deque(maxlen=recent)
+
+    def record(self, inst: str, tf: str, rep: Dict, known_holes: int = 0):
+        kinds = {k: rep.get(k, 0) for k in KINDS}
+        # bars of remembered holes are reported once, not every cycle
+        kinds["gap_bars"] = max(0, kinds["gap_bars"] - known_holes)
+        with self._lock:
+            c = self.counts.setdefault(inst, {}).setdefault(tf, dict.fromkeys(KINDS + ("requests", "repaired", "holes"), 0))
+            for k, v in kinds.items():
+                c[k] += v
+            c["requests"] += rep.get("requests", 0)
+            c["repaired"] += rep.get("repaired", 0)
+            c["holes"] += len(rep.get("new_holes", ()))
+            if any(kinds.values()):
+                self.recent.append(dict(kinds, inst=inst, tf=tf, ts=int(time.time()),
+                                        repaired=rep.get("repaired", 0), left=rep.get("left", 0)))
+        if any(kinds.values()):
+            logger.warning("Integrity %s %s: %s, repaired %s bar(s) with %s request(s), %s left",
+                           inst, tf, {k: v for k, v in kinds.items() if v}, rep.get("repaired", 0),
+                           rep.get("requests", 0), rep.get("left", 0))
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {"counts": {i: {tf: dict(c) for tf, c in tfs.items()} for i, tfs in self.counts.items()},
+                    "recent": list(self.recent)[-10:]}
+
+
+INTEGRITY = IntegrityStats()
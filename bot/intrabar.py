@@ -0,0 +1,278 @@
+# bot/intrabar.py
+# Intrabar early warning (INTRABAR_ENABLED=1).
+#
+# Between full cycles the loop polls the OKX ticker. For every TF the indicator
+# recursions (EMAs, MACD, Wilder RSI, KDJ, StochRSI, volume MAs, ATR) are carried
+# from the last closed bar ("committed" state, rebuilt only when a bar closes)
+# and stepped once for the forming bar with the live price, so a tick costs a few
+# scalar updates per TF instead of add_all_indicators over 300 bars. The forming
+# row is appended to the committed indicator rows and run_checks runs on that
+# with cond_1 in dry-run (bot/conditions/cond_1.py), so nothing is persisted.
+# A passing setup becomes a pre-signal; main.check_stage confirms or cancels it
+# once the bar has closed. Live frames are lazy (bot/lazy.py): a TF is stepped
+# when a condition reads it; one not refreshed since its last bar closed ends
+# the tick and is added to store.wanted, so the full cycle it asks for fetches it.
+
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import (
+    EMA_FAST, EMA_MED, EMA_SLOW, EMA50, EMA200,
+    MACD_FAST, MACD_SLOW, MACD_SIGNAL,
+    RSI6, RSI9, RSI21,
+    KDJ_N, KDJ_K, KDJ_D,
+    SRSI_RSI_LEN, SRSI_STOCH_LEN, SRSI_K, SRSI_D,
+    VOL_MA1, VOL_MA2,
+)
+from .indicators import ema, rsi, macd, kdj, stoch_rsi, atr
+from .lazy import FrameLoadError, LazyFrames
+from .store import TF_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_EMA_SPANS = {"ema5": EMA_FAST, "ema10": EMA_MED, "ema21": EMA_SLOW, "ema50": EMA50, "ema200": EMA200}
+_RSI_PERIODS = {"rsi6": RSI6, "rsi9": RSI9, "rsi21": RSI21}
+ATR_PERIOD = 14
+
+
+def _wilder(close: pd.Series, period: int) -> Tuple[float, float]:
+    """Last (avg_gain, avg_loss) of indicators.rsi for `period`."""
+    delta = close.diff()
+    up = delta.clip(lower=0.0).ewm(alpha=1 / period, adjust=False).mean()
+    down = (-delta.clip(upper=0.0)).ewm(alpha=1 / period, adjust=False).mean()
+    return float(up.iat[-1]), float(down.iat[-1])
+
+
+def _rsi_value(gain: float, loss: float) -> float:
+    # indicators.rsi: zero average loss -> NaN -> 50
+    if loss == 0 or np.isnan(loss) or np.isnan(gain):
+        return 50.0
+    return 100.0 - 100.0 / (1.0 + gain / loss)
+
+
+def carry_from(raw: pd.DataFrame) -> Dict:
+    """
+    Recursion state after the last row of `raw` (closed bars, float64
+    time/open/high/low/close/volume): what step() needs to produce the next row.
+    """
+    close = raw["close"]
+    dif, dea, _hist = macd(close)
+    K, D, _J = kdj(raw)
+    sK, sD = stoch_rsi(close)
+    return {
+        "time": int(raw["time"].iat[-1]),
+        "close": float(close.iat[-1]),
+        "ema": {col: float(ema(close, span).iat[-1]) for col, span in _EMA_SPANS.items()},
+        "macd_fast": float(ema(close, MACD_FAST).iat[-1]),
+        "macd_slow": float(ema(close, MACD_SLOW).iat[-1]),
+        "macd_dea": float(dea.iat[-1]),
+        "rsi": {col: _wilder(close, p) for col, p in _RSI_PERIODS.items()},
+        "srsi_rsi": _wilder(close, SRSI_RSI_LEN),
+        "srsi_base": [float(x) for x in rsi(close, SRSI_RSI_LEN).iloc[-(SRSI_STOCH_LEN - 1):]],
+        "srsi_k": float(sK.iat[-1]),
+        "srsi_d": float(sD.iat[-1]),
+        "kdj_k": float(K.iat[-1]),
+        "kdj_d": float(D.iat[-1]),
+        "lows": [float(x) for x in raw["low"].iloc[-(KDJ_N - 1):]],
+        "highs": [float(x) for x in raw["high"].iloc[-(KDJ_N - 1):]],
+        "vols": [float(x) for x in raw["volume"].iloc[-(max(VOL_MA1, VOL_MA2) - 1):]],
+        "atr14": float(atr(raw, ATR_PERIOD).iat[-1]),
+    }
+
+
+def carries(raw: pd.DataFrame):
+    """
+    carry_from(raw.iloc[:j + 1]) for any row j, from recursions computed once
+    over the whole of `raw` (bot/analytics.py rebuilds many forming bars).
+    """
+    close = raw["close"]
+    dif, dea, _hist = macd(close)
+    K, D, _J = kdj(raw)
+    sK, sD = stoch_rsi(close)
+    delta = close.diff()
+    up, down = delta.clip(lower=0.0), -delta.clip(upper=0.0)
+
+    def wilder(period):
+        return (up.ewm(alpha=1 / period, adjust=False).mean().to_numpy(),
+                down.ewm(alpha=1 / period, adjust=False).mean().to_numpy())
+
+    s = {
+        "time": raw["time"].to_numpy().astype(np.int64), "close": close.to_numpy(),
+        "ema": {col: ema(close, span).to_numpy() for col, span in _EMA_SPANS.items()},
+        "macd_fast": ema(close, MACD_FAST).to_numpy(), "macd_slow": ema(close, MACD_SLOW).to_numpy(),
+        "macd_dea": dea.to_numpy(),
+        "rsi": {col: wilder(p) for col, p in _RSI_PERIODS.items()},
+        "srsi_rsi": wilder(SRSI_RSI_LEN), "srsi_base": rsi(close, SRSI_RSI_LEN).to_numpy(),
+        "srsi_k": sK.to_numpy(), "srsi_d": sD.to_numpy(), "kdj_k": K.to_numpy(), "kdj_d": D.to_numpy(),
+        "low": raw["low"].to_numpy(), "high": raw["high"].to_numpy(), "volume": raw["volume"].to_numpy(),
+        "atr14": atr(raw, ATR_PERIOD).to_numpy(),
+    }
+    window = lambda arr, j, n: [float(x) for x in arr[max(0, j - n + 1):j + 1]]
+
+    def at(j: int) -> Dict:
+        return {
+            "time": int(s["time"][j]), "close": float(s["close"][j]),
+            "ema": {col: float(v[j]) for col, v in s["ema"].items()},
+            "macd_fast": float(s["macd_fast"][j]), "macd_slow": float(s["macd_slow"][j]),
+            "macd_dea": float(s["macd_dea"][j]),
+            "rsi": {col: (float(g[j]), float(l[j])) for col, (g, l) in s["rsi"].items()},
+            "srsi_rsi": (float(s["srsi_rsi"][0][j]), float(s["srsi_rsi"][1][j])),
+            "srsi_base": window(s["srsi_base"], j, SRSI_STOCH_LEN - 1),
+            "srsi_k": float(s["srsi_k"][j]), "srsi_d": float(s["srsi_d"][j]),
+            "kdj_k": float(s["kdj_k"][j]), "kdj_d": float(s["kdj_d"][j]),
+            "lows": window(s["low"], j, KDJ_N - 1), "highs": window(s["high"], j, KDJ_N - 1),
+            "vols": window(s["volume"], j, max(VOL_MA1, VOL_MA2) - 1),
+            "atr14": float(s["atr14"][j]),
+        }
+    return at
+
+
+def step(c: Dict, o: float, h: float, l: float, cl: float, v: float) -> Dict[str, float]:
+    """Indicator values of the bar after `c` with OHLCV (o, h, l, cl, v); same formulas as add_all_indicators."""
+    a = lambda span: 2.0 / (span + 1.0)
+    out = {"open": o, "high": h, "low": l, "close": cl, "volume": v}
+    for col, span in _EMA_SPANS.items():
+        out[col] = a(span) * cl + (1 - a(span)) * c["ema"][col]
+
+    fast = a(MACD_FAST) * cl + (1 - a(MACD_FAST)) * c["macd_fast"]
+    slow = a(MACD_SLOW) * cl + (1 - a(MACD_SLOW)) * c["macd_slow"]
+    dif = fast - slow
+    dea = a(MACD_SIGNAL) * dif + (1 - a(MACD_SIGNAL)) * c["macd_dea"]
+    out.update(macd_dif=dif, macd_dea=dea, macd_hist=(dif - dea) * 2.0)
+
+    delta = cl - c["close"]
+    gain, loss = max(delta, 0.0), max(-delta, 0.0)
+
+    def wilder(prev, period):
+        g0, l0 = prev
+        return (gain / period + (1 - 1 / period) * g0, loss / period + (1 - 1 / period) * l0)
+
+    for col, p in _RSI_PERIODS.items():
+        out[col] = _rsi_value(*wilder(c["rsi"][col], p))
+
+    lo = min(c["lows"] + [l])
+    hi = max(c["highs"] + [h])
+    rsv = (cl - lo) / (hi - lo + 1e-9) * 100
+    k = rsv / KDJ_K + (1 - 1 / KDJ_K) * c["kdj_k"]
+    d = k / KDJ_D + (1 - 1 / KDJ_D) * c["kdj_d"]
+    out.update(kdj_k=k, kdj_d=d, kdj_j=3 * k - 2 * d)
+
+    base = _rsi_value(*wilder(c["srsi_rsi"], SRSI_RSI_LEN))
+    window = c["srsi_base"] + [base]
+    stoch = (base - min(window)) / (max(window) - min(window) + 1e-9) * 100
+    sk = stoch / SRSI_K + (1 - 1 / SRSI_K) * c["srsi_k"]
+    sd = sk / SRSI_D + (1 - 1 / SRSI_D) * c["srsi_d"]
+    out.update(srsi_k=sk, srsi_d=sd)
+
+    vols = c["vols"] + [v]
+    out["vol_ma5"] = sum(vols[-VOL_MA1:]) / VOL_MA1
+    out["vol_ma10"] = sum(vols[-VOL_MA2:]) / VOL_MA2
+
+    tr = max(h - l, abs(h - c["close"]), abs(l - c["close"]))
+    out["atr14"] = tr / ATR_PERIOD + (1 - 1 / ATR_PERIOD) * c["atr14"]
+    return out
+
+
+class Intrabar:
+    def __init__(self, inst: str, limit: int):
+        self.inst = inst
+        self.limit = limit
+        self._committed: Dict[str, Tuple[int, Dict, Dict[str, np.ndarray], dict]] = {}  # tf -> (ts, carry, arrays, attrs)
+        self._bar: Dict[str, list] = {}   # tf -> [forming_ts, o, h, l, c, v]
+        self.stats = {"ticks": 0, "commits": 0}
+        self.refresh_requested_for: Optional[int] = None   # forming 5m bar that already triggered a full cycle
+
+    def _commit(self, tf: str, store, forming_ts: int):
+        """Carry + indicator rows of the closed bars before `forming_ts` (once per closed bar)."""
+        raw = store.raw[tf]
+        closed = raw[raw["time"] < forming_ts]
+        last_ts = int(closed["time"].iat[-1])
+        cached = self._committed.get(tf)
+        if cached is not None and cached[0] == last_ts:
+            return cached
+        ind = store.indicators[tf]
+        base = int(ind.attrs.get("time_base", 0))
+        ind = ind[(ind["time"].to_numpy().astype(np.int64) + base) < forming_ts].iloc[-(self.limit - 1):]
+        arrays = {col: np.concatenate([ind[col].to_numpy(), ind[col].to_numpy()[-1:]]) for col in ind.columns}
+        entry = (last_ts, carry_from(closed), arrays, dict(ind.attrs))
+        self._committed[tf] = entry
+        self.stats["commits"] += 1
+        return entry
+
+    def _forming(self, tf: str, store, forming_ts: int, price: float) -> list:
+        bar = self._bar.get(tf)
+        if bar is None or bar[0] != forming_ts:
+            raw = store.raw[tf]
+            row = raw[raw["time"] == forming_ts]
+            if len(row):
+                r = row.iloc[-1]
+                bar = [forming_ts, float(r["open"]), float(r["high"]), float(r["low"]), float(r["close"]), float(r["volume"])]
+            else:
+                bar = [forming_ts, price, price, price, price, 0.0]
+            self._bar[tf] = bar
+        bar[2] = max(bar[2], price)
+        bar[3] = min(bar[3], price)
+        bar[4] = price
+        return bar
+
+    def _live(self, tf: str, store, price: float, now: float) -> Optional[pd.DataFrame]:
+        """Committed rows + forming row at `price`; None when the store does not end at the previous closed bar."""
+        sec = TF_SECONDS.get(tf, 300)
+        forming_ts = int(now) // sec * sec
+        # the committed state must end at the bar right before the forming one and
+        # that bar must have been fetched after it closed (not as a live row)
+        if tf not in store.raw or tf not in store.indicators or store.fetched_at.get(tf, 0) < forming_ts:
+            return None
+        t = store.raw[tf]["time"].to_numpy()
+        if int(t[t < forming_ts].max(initial=0)) != forming_ts - sec:
+            return None
+        _ts, carry, arrays, attrs = self._commit(tf, store, forming_ts)
+        _fts, o, h, l, c, v = self._forming(tf, store, forming_ts, price)
+        vals = step(carry, o, h, l, c, v)
+        vals["time"] = forming_ts - int(attrs.get("time_base", 0))
+        for col, arr in arrays.items():
+            if col in vals:
+                arr[-1] = vals[col]
+        df = pd.DataFrame(arrays)
+        df.attrs.update(attrs)
+        return df
+
+    def frames(self, store, price: float, now: float) -> Optional[Tuple[Dict[str, pd.DataFrame], int]]:
+        """
+        Live frames (5m now, the other TFs when read) and the forming 5m bar
+        time; None when the 5m store does not end at the previous closed bar.
+        """
+        df5 = self._live("5m", store, price, now)
+        if df5 is None:
+            return None
+
+        def load(tf):
+            df = self._live(tf, store, price, now)
+            if df is None:
+                store.wanted.add(tf)
+                raise RuntimeError("not refreshed since its last bar closed")
+            return df
+        self.stats["ticks"] += 1
+        return LazyFrames(store.timeframes, load, {"5m": df5}), int(now) // 300 * 300
+
+    def evaluate(self, store, price: float, now: float):
+        """(ok, result, live_dfs, forming_5m_ts) for the forming bar, or None without committed data."""
+        from .checker import run_checks
+        from .conditions import cond_1
+        built = self.frames(store, price, now)
+        if built is None:
+            return None
+        dfs, forming_ts = built
+        try:
+            with cond_1.dry_run():
+                ok, result = run_checks(dfs)
+        except FrameLoadError as e:
+            logger.info("Intrabar %s: %s, waiting for a full cycle", self.inst, e)
+            return None
+        return ok, result, dfs, forming_ts
+
+    def status(self) -> Dict:
+        return dict(self.stats, forming={tf: b[0] for tf, b in self._bar.items()})
@@ -0,0 +1,113 @@
+# bot/lazy.py
+# Lazily materialized indicator frames (LAZY_FRAMES=1).
+#
+# Most cycles stop at cond_1 (no_start), which reads 5m only; 15m is read by
+# conditions 6/7, 30m by 8/11, 1H by 9/10 and 2H by 10. The fetch stage
+# therefore refreshes 5m plus the TFs the previous evaluation of the instrument
+# read (CandleStore.wanted), and LazyFrames fetches + computes any other TF the
+# first time a condition reads it. Iterating the mapping (publishing, memory
+# report, shared-memory frames) sees only the materialized TFs and never pulls
+# one. Load times are kept per TF (LOAD_COST) so the checker can add the cost
+# of a TF that is not loaded yet to the cost of the conditions that read it.
+
+import threading
+import time
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterable, Optional, Set
+
+import pandas as pd
+
+from .compact import COND_COLUMNS
+
+# condition -> TFs it reads besides 5m
+COND_TFS = {cid: tuple(tf for tf in cols if tf != "5m") for cid, cols in COND_COLUMNS.items()}
+
+# tf -> moving average of fetch + indicator seconds of a lazy load
+LOAD_COST: Dict[str, float] = {}
+_COST_ALPHA = 0.2
+_cost_lock = threading.Lock()
+
+
+class FrameLoadError(RuntimeError):
+    """A TF could not be fetched/computed on first access (not a KeyError: .get() must not hide it)."""
+
+    def __init__(self, tf: str, msg: str):
+        super().__init__(f"{tf}: {msg}")
+        self.tf = tf
+
+
+def note_load_cost(tf: str, sec: float):
+    with _cost_lock:
+        prev = LOAD_COST.get(tf)
+        LOAD_COST[tf] = sec if prev is None else prev + _COST_ALPHA * (sec - prev)
+
+
+class LazyFrames(Mapping):
+    """
+    tf -> indicator frame; `load(tf)` runs on the first read of a TF in
+    `timeframes` that is not in `frames` yet. `read` = TFs handed out by
+    __getitem__ (what the evaluation actually used), `loaded` = materialized.
+    """
+
+    def __init__(self, timeframes: Iterable[str], load: Callable[[str], pd.DataFrame],
+                 frames: Optional[Dict[str, pd.DataFrame]] = None):
+        self.timeframes = list(timeframes)
+        self._load = load
+        self._frames = dict(frames or {})
+        self._lock = threading.RLock()
+        self.read: Set[str] = set()
+        self.loads: Dict[str, float] = {}     # tf -> seconds, lazy loads of this cycle
+
+    def __getitem__(self, tf: str) -> pd.DataFrame:
+        df = self._frames.get(tf)
+        if df is None:
+            if tf not in self.timeframes:
+                raise KeyError(tf)
+            with self._lock:
+                df = self._frames.get(tf)
+                if df is None:
+                    t0 = time.perf_counter()
+                    try:
+                        df = self._load(tf)
+                    except Exception as e:
+                        raise FrameLoadError(tf, str(e)) from e
+                    sec = time.perf_counter() - t0
+                    self._frames[tf] = df
+                    self.loads[tf] = sec
+                    note_load_cost(tf, sec)
+        self.read.add(tf)
+        return df
+
+    def __contains__(self, tf) -> bool:
+        return tf in self._frames or tf in self.timeframes
+
+    def __iter__(self):
+        return iter(list(self._frames))
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    @property
+    def loaded(self) -> Set[str]:
+        return set(self._frames)
+
+    def pending_cost(self, tfs: Iterable[str]) -> float:
+        """Expected seconds to materialize those of `tfs` that are not loaded yet."""
+        return sum(LOAD_COST.get(tf, 0.0) for tf in tfs if tf not in self._frames)
+
+    def load_all(self) -> "LazyFrames":
+        for tf in self.timeframes:
+            self[tf]
+        return self
+
+    def materialized(self) -> Dict[str, pd.DataFrame]:
+        return dict(self._frames)
+
+
+def loaded(dfs) -> Set[str]:
+    """TFs a frames mapping holds without loading anything (a plain dict: all of them)."""
+    return dfs.loaded if isinstance(dfs, LazyFrames) else set(dfs)
+
+
+def pending_cost(dfs, tfs: Iterable[str]) -> float:
+    return dfs.pending_cost(tfs) if isinstance(dfs, LazyFrames) else 0.0
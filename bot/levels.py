@@ -0,0 +1,192 @@
+# bot/levels.py
+# Support/resistance levels per instrument and TF, maintained as bars close.
+#
+# Pivots are Williams fractals: a closed bar whose high is above the LEVELS_PIVOT_BARS
+# bars before it and not below the ones after it (low: mirrored), confirmed once
+# those later bars have closed. Each pivot joins the nearest level within
+# LEVELS_CLUSTER_ATR x ATR14 of its bar (the level moves to the touch-weighted
+# mean price and counts the touch; levels that grow into each other merge) or
+# starts a new one; at most LEVELS_MAX_PER_TF levels per TF, the least recently
+# touched one goes first. A closed bar costs O(LEVELS_PIVOT_BARS) for the fractal
+# test and O(log n) to place the pivot (n <= LEVELS_MAX_PER_TF), so feeding a
+# cycle's frames only walks the bars that closed since the previous feed (the
+# first feed walks the frame once). The levels stay in LEVELS between cycles, and
+# format_message reads the nearest support below / resistance above the price
+# on every TF from there instead of scanning bars at send time.
+#
+# A cycle only fetches the HTFs its evaluation reads (main.py, store.wanted), so
+# the other TFs are fed the store's last frames and their books fall behind:
+# nearest() reports how many closed bars each book is missing, and a book more
+# than one bar behind is flagged "stale" for the alert to say so.
+
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import TIMEFRAMES, LEVELS_PIVOT_BARS, LEVELS_CLUSTER_ATR, LEVELS_MAX_PER_TF
+from .store import TF_SECONDS
+
+
+class PivotBook:
+    """Fractal window + clustered levels of one TF; levels are kept sorted by price."""
+
+    def __init__(self, tf: str, k: int = LEVELS_PIVOT_BARS, tol_atr: float = LEVELS_CLUSTER_ATR,
+                 max_levels: int = LEVELS_MAX_PER_TF):
+        self.tf = tf
+        self.k = k
+        self.tol_atr = tol_atr
+        self.max_levels = max_levels
+        self.window = deque(maxlen=2 * k + 1)   # (time, high, low, atr) of the last closed bars
+        self.last_ts: Optional[int] = None
+        self.prices: List[float] = []           # level prices, ascending
+        self.levels: List[Dict] = []            # same order: price, touches, first_ts, last_ts, tol
+        self.pivots = 0
+
+    def append(self, t: int, high: float, low: float, atr: float):
+        """One closed bar, oldest first; a bar that does not follow the previous one restarts the window."""
+        if self.last_ts is not None and t - self.last_ts != TF_SECONDS.get(self.tf, 300):
+            self.window.clear()
+        self.window.append((t, high, low, atr))
+        self.last_ts = t
+        if len(self.window) < self.window.maxlen:
+            return
+        k, w = self.k, self.window
+        mt, mh, ml, ma = w[k]
+        left, right = range(k), range(k + 1, 2 * k + 1)
+        if all(mh > w[i][1] for i in left) and all(mh >= w[i][1] for i in right):
+            self._add(mh, mt, ma)
+        if all(ml < w[i][2] for i in left) and all(ml <= w[i][2] for i in right):
+            self._add(ml, mt, ma)
+
+    def _add(self, price: float, t: int, atr: float):
+        self.pivots += 1
+        tol = self.tol_atr * atr if atr == atr and atr > 0 else price * 0.001
+        i = bisect.bisect_left(self.prices, price)
+        near = [j for j in (i - 1, i) if 0 <= j < len(self.prices) and abs(self.prices[j] - price) <= tol]
+        if not near:
+            self.prices.insert(i, price)
+            self.levels.insert(i, {"price": price, "touches": 1, "first_ts": t, "last_ts": t, "tol": tol})
+            if len(self.levels) > self.max_levels:
+                self._drop(min(range(len(self.levels)), key=lambda j: self.levels[j]["last_ts"]))
+            return
+        j = min(near, key=lambda j: abs(self.prices[j] - price))
+        lv = self.levels[j]
+        n = lv["touches"]
+        lv.update(price=(lv["price"] * n + price) / (n + 1), touches=n + 1, last_ts=t, tol=max(lv["tol"], tol))
+        self.prices[j] = lv["price"]
+        # the moved level may now overlap a neighbour: merge them
+        for nb in (j + 1, j - 1):
+            if 0 <= nb < len(self.levels) and abs(self.prices[nb] - self.prices[j]) <= max(tol, self.levels[nb]["tol"]):
+                a, b = self.levels[j], self.levels[nb]
+                n = a["touches"] + b["touches"]
+                a.update(price=(a["price"] * a["touches"] + b["price"] * b["touches"]) / n, touches=n,
+                         first_ts=min(a["first_ts"], b["first_ts"]), last_ts=max(a["last_ts"], b["last_ts"]),
+                         tol=max(a["tol"], b["tol"]))
+                self.prices[j] = a["price"]
+                self._drop(nb)
+                break
+
+    def _drop(self, j: int):
+        del self.prices[j]
+        del self.levels[j]
+
+    def feed(self, df, now: Optional[float] = None) -> int:
+        """Append the closed bars of `df` newer than the last one seen; returns how many."""
+        if df is None or not len(df) or not {"high", "low"} <= set(df.columns):
+            return 0
+        now = time.time() if now is None else now
+        sec = TF_SECONDS.get(self.tf, 300)
+        t = df["time"].to_numpy()
+        base = int(df.attrs.get("time_base", 0))
+        end = int(np.searchsorted(t, now - sec - base, side="right"))   # closed bars only
+        start = 0 if self.last_ts is None else int(np.searchsorted(t, self.last_ts - base, side="right"))
+        if start >= end:
+            return 0
+        high = df["high"].to_numpy()
+        low = df["low"].to_numpy()
+        atr = df["atr14"].to_numpy() if "atr14" in df.columns else np.full(len(df), np.nan)
+        for i in range(start, end):
+            self.append(int(t[i]) + base, float(high[i]), float(low[i]), float(atr[i]))
+        return end - start
+
+    def behind(self, now: Optional[float] = None) -> Optional[int]:
+        """Closed bars of this TF not fed yet (None before the first feed)."""
+        if self.last_ts is None:
+            return None
+        now = time.time() if now is None else now
+        sec = TF_SECONDS.get(self.tf, 300)
+        last_closed = int(now // sec) * sec - sec
+        return max(0, (last_closed - self.last_ts) // sec)
+
+    def nearest(self, price: float) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """(support: highest level below `price`, resistance: lowest level above it)."""
+        i = bisect.bisect_left(self.prices, price)
+        sup = self.levels[i - 1] if i > 0 else None
+        j = bisect.bisect_right(self.prices, price)
+        res = self.levels[j] if j < len(self.levels) else None
+        return sup, res
+
+
+class LevelRegistry:
+    """inst -> tf -> PivotBook, fed by the check stage; nearest levels for the alerts."""
+
+    def __init__(self, timeframes: List[str] = TIMEFRAMES):
+        self.timeframes = list(timeframes)
+        self._lock = threading.Lock()
+        self._books: Dict[str, Dict[str, PivotBook]] = {}
+        self._updated: Dict[str, float] = {}
+
+    def update(self, inst: str, frames: Dict, now: Optional[float] = None) -> int:
+        """Feed the TFs in `frames` (bars that closed since the last feed); returns bars appended."""
+        now = time.time() if now is None else now
+        n = 0
+        with self._lock:
+            books = self._books.setdefault(inst, {})
+            for tf in self.timeframes:
+                df = frames.get(tf)
+                if df is None:
+                    continue
+                book = books.get(tf)
+                if book is None:
+                    book = books[tf] = PivotBook(tf)
+                n += book.feed(df, now)
+            self._updated[inst] = now
+        return n
+
+    def drop(self, inst: str):
+        with self._lock:
+            self._books.pop(inst, None)
+            self._updated.pop(inst, None)
+
+    def nearest(self, inst: str, price: float, now: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        tf -> {"support": level or None, "resistance": level or None, "behind": closed
+        bars not fed, "stale": behind > 1} for TFs that have levels.
+        """
+        with self._lock:
+            books = dict(self._books.get(inst, {}))
+            out = {}
+            for tf in self.timeframes:
+                book = books.get(tf)
+                if book is not None and book.levels:
+                    sup, res = book.nearest(price)
+                    behind = book.behind(now)
+                    out[tf] = {"support": dict(sup) if sup else None, "resistance": dict(res) if res else None,
+                               "behind": behind, "stale": behind is not None and behind > 1}
+        return out
+
+    def status(self, now: Optional[float] = None) -> Dict:
+        now = time.time() if now is None else now
+        with self._lock:
+            return {inst: {"updated": self._updated.get(inst),
+                           "levels": {tf: len(b.levels) for tf, b in books.items()},
+                           "pivots": {tf: b.pivots for tf, b in books.items()},
+                           "behind": {tf: b.behind(now) for tf, b in books.items()}}
+                    for inst, books in self._books.items()}
+
+
+LEVELS = LevelRegistry()
@@ -1,22 +1,232 @@
 # bot/notifier.py (updated)
 import os
-import requests
-from typing import Dict
-from .utils import swing_levels, atr_levels
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from .delivery import TelegramDelivery
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
-def send_telegram_message(text: str):
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+# Telegram hard limit for one sendMessage text
+TELEGRAM_MAX_LEN = 4096
+
+DELIVERY = TelegramDelivery(TELEGRAM_BOT_TOKEN)
+
+# -----------------------------
+# Chat routing
+# -----------------------------
+def _split_chats(value: str) -> List[str]:
+    return [c.strip() for c in (value or "").split(",") if c.strip()]
+
+def _parse_routes(spec: str) -> Dict[str, List[str]]:
+    """
+    TELEGRAM_ROUTES="BTC-USDT-SWAP=-100111;signal=-100222,-100333;ETH-USDT-SWAP:debug=-100444"
+    Keys: instrument id, severity ("signal" | "presignal" | "debug" | "info") or "<inst>:<severity>".
+    """
+    routes = {}
+    for part in (spec or "").split(";"):
+        if "=" not in part:
+            continue
+        key, chats = part.split("=", 1)
+        if key.strip() and _split_chats(chats):
+            routes[key.strip()] = _split_chats(chats)
+    return routes
+
+DEFAULT_CHATS = _split_chats(TELEGRAM_CHAT_ID)
+ROUTES = _parse_routes(os.getenv("TELEGRAM_ROUTES", ""))
+
+def route_chats(inst: Optional[str] = None, severity: str = "info") -> List[str]:
+    """Most specific rule wins: inst:severity -> inst -> severity -> TELEGRAM_CHAT_ID."""
+    for key in (f"{inst}:{severity}", inst, severity):
+        if key and key in ROUTES:
+            return ROUTES[key]
+    return DEFAULT_CHATS
+
+def send_telegram_message(text: str, inst: Optional[str] = None, severity: str = "info"):
+    """
+    Queue a message for background delivery to every routed chat. Returns True
+    if it was accepted, never blocks on Telegram (see bot/delivery.py).
+    """
+    chats = route_chats(inst, severity)
+    if not TELEGRAM_BOT_TOKEN or not chats:
         return False
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    data = {"chat_id": TELEGRAM_CHAT_ID, "text": text, "parse_mode": "HTML"}
-    try:
-        r = requests.post(url, data=data, timeout=10)
-        return r.ok
-    except Exception:
+    return all([DELIVERY.enqueue(text, chat) for chat in chats])
+
+def send_telegram_message_now(text: str):
+    """Synchronous send, bypassing the queue (used by the /test endpoint)."""
+    if not TELEGRAM_BOT_TOKEN or not DEFAULT_CHATS:
         return False
+    return all([DELIVERY.send_now(text, chat) for chat in DEFAULT_CHATS])
+
+# -----------------------------
+# Per-bar digests
+# -----------------------------
+def split_message(parts: List[str], limit: int = TELEGRAM_MAX_LEN, sep: str = "\n\n") -> List[str]:
+    """
+    Pack parts into as few messages as possible, splitting only between parts.
+    A single part longer than `limit` is split on line boundaries (HTML tags in
+    format_message never span lines).
+    """
+    pieces = []
+    for p in parts:
+        if len(p) <= limit:
+            pieces.append(p)
+            continue
+        buf = ""
+        for line in p.split("\n"):
+            while len(line) > limit:
+                pieces.append(line[:limit])
+                line = line[limit:]
+            if buf and len(buf) + 1 + len(line) > limit:
+                pieces.append(buf)
+                buf = line
+            else:
+                buf = f"{buf}\n{line}" if buf else line
+        if buf:
+            pieces.append(buf)
+
+    out, cur = [], ""
+    for p in pieces:
+        if cur and len(cur) + len(sep) + len(p) > limit:
+            out.append(cur)
+            cur = p
+        else:
+            cur = f"{cur}{sep}{p}" if cur else p
+    if cur:
+        out.append(cur)
+    return out
+
+class BarDigest:
+    """
+    Collects every report produced for one bar (all instruments, signals and
+    debug reports) and sends one digest per routed chat on flush(). The cycles
+    of one bar share it through BarDigests.
+    """
+
+    def __init__(self, bar_ts: Optional[int] = None):
+        self.bar_ts = bar_ts
+        self.entries: List[Tuple] = []  # (inst, severity, text, chats or None)
+
+    def add(self, text: str, inst: Optional[str] = None, severity: str = "info",
+            chats: Optional[List[str]] = None):
+        """`chats` overrides TELEGRAM_ROUTES (strategy profiles with their own chats)."""
+        self.entries.append((inst, severity, text, chats))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _header(self, n: int) -> str:
+        when = time.strftime("%H:%M", time.gmtime(self.bar_ts)) if self.bar_ts else "?"
+        return f"<b>🗂 Сводка бара {when} UTC</b>  •  событий: <b>{n}</b>"
+
+    def render(self) -> Dict[str, List[str]]:
+        """chat_id -> list of message texts (each <= TELEGRAM_MAX_LEN)."""
+        by_chat: "OrderedDict[str, List[str]]" = OrderedDict()
+        for inst, severity, text, chats in self.entries:
+            for chat in chats or route_chats(inst, severity):
+                by_chat.setdefault(chat, []).append(text)
+        out = {}
+        for chat, parts in by_chat.items():
+            if len(parts) > 1:
+                parts = [self._header(len(parts))] + parts
+            out[chat] = split_message(parts)
+        return out
+
+    def flush(self) -> bool:
+        if not self.entries:
+            return True
+        ok = bool(TELEGRAM_BOT_TOKEN)
+        if ok:
+            for chat, messages in self.render().items():
+                for msg in messages:
+                    ok = DELIVERY.enqueue(msg, chat) and ok
+        self.entries = []
+        return ok
+
+
+class BarDigests:
+    """
+    One BarDigest per bar shared by the instrument cycles scheduled for it: a job
+    join()s with the bar it was queued in, check_stage adds to digest(group,
+    bar_ts), and the last job of the group to leave() (persisted or dropped)
+    flushes, so a bar scanned for N instruments still sends one message per chat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open: Dict[int, Dict] = {}   # bar queued in -> {"key", "jobs", "digests"}
+
+    def join(self, key: int) -> Dict:
+        with self._lock:
+            group = self._open.get(key)
+            if group is None:
+                group = self._open[key] = {"key": key, "jobs": 0, "digests": OrderedDict()}
+            group["jobs"] += 1
+            return group
+
+    def digest(self, group: Dict, bar_ts: Optional[int]) -> BarDigest:
+        with self._lock:
+            d = group["digests"].get(bar_ts)
+            if d is None:
+                d = group["digests"][bar_ts] = BarDigest(bar_ts)
+            return d
+
+    def leave(self, group: Dict) -> Optional[Tuple[int, bool]]:
+        """(reports, queued ok) when this was the group's last job and it had reports, else None."""
+        with self._lock:
+            group["jobs"] -= 1
+            if group["jobs"] > 0:
+                return None
+            if self._open.get(group["key"]) is group:
+                del self._open[group["key"]]   # a job joining later for this bar starts a new group
+            digests, group["digests"] = list(group["digests"].values()), OrderedDict()
+        n = sum(len(d) for d in digests)
+        if not n:
+            return None
+        if len(digests) > 1:   # the jobs saw different last bars: still one digest, under the newest
+            merged = BarDigest(max((d.bar_ts for d in digests if d.bar_ts is not None), default=None))
+            for d in digests:
+                merged.entries += d.entries
+            digests = [merged]
+        return n, digests[0].flush()
+
+
+DIGESTS = BarDigests()
+
+# -----------------------------
+# Levels cache (one computation per instrument per bar)
+# -----------------------------
+_LEVELS_CACHE: "OrderedDict[Tuple, Tuple[float, float, float, float]]" = OrderedDict()
+_LEVELS_CACHE_MAX = 256
+
+def levels_for(df5, inst: Optional[str] = None) -> Tuple[float, float, float, float]:
+    """(swing_sup, swing_res, atr_sup, atr_res) for the last 5m bar, cached by (inst, bar time)."""
+    key = (inst, int(df5["time"].iloc[-1]), len(df5))
+    hit = _LEVELS_CACHE.get(key)
+    if hit is not None:
+        return hit
+    from .utils import swing_levels, atr_levels   # pandas stays out of the web worker's import path
+    sup, res = swing_levels(df5, 20)
+    a_sup, a_res = atr_levels(df5, len(df5) - 1, 1.0)
+    val = (sup, res, a_sup, a_res)
+    _LEVELS_CACHE[key] = val
+    while len(_LEVELS_CACHE) > _LEVELS_CACHE_MAX:
+        _LEVELS_CACHE.popitem(last=False)
+    return val
+
+def pivot_lines(inst: Optional[str], price: float) -> List[str]:
+    """Nearest fractal levels below / above `price` on every TF (bot/levels.py, kept up to date by the cycle)."""
+    if not inst or not price:
+        return []
+    from .levels import LEVELS
+    from .hedge import OKX   # how far behind a TF is: by the exchange's clock, like the bars it was fed
+    fmt = lambda lv: f"<b>{lv['price']:,.2f}$</b> ({lv['touches']}×)" if lv else "—"
+    # a TF this cycle did not fetch keeps the levels of its last fetch: say how old they are
+    stale = lambda n: f"  ⚠️ отстаёт на {n['behind']} св." if n["stale"] else ""
+    return [f"• {tf:<4s} фракталы:  поддержка ~ {fmt(n['support'])}  |  сопротивление ~ {fmt(n['resistance'])}{stale(n)}"
+            for tf, n in LEVELS.nearest(inst, price, OKX.now()).items()]
 
 def summarise_per_cond(by_cond: Dict) -> str:
     lines = []
@@ -34,26 +244,36 @@ def summarise_per_cond(by_cond: Dict) -> str:
         lines.append(f"P{cid}: {status} {note}")
     return "\n".join(lines)
 
-def format_message(result: Dict, price: float, dfs=None) -> str:
+def format_message(result: Dict, price: float, dfs=None, inst: Optional[str] = None) -> str:
     dir_ = result.get("direction", "?") or "?"
     impulse_tf = result.get("impulse_tf", "?") or "?"
     by_cond = result.get("by_cond", {})
+    title = f"<b>🔔 Импульс {dir_.upper()}</b>  •  TF импульса: <b>{impulse_tf}</b>"
+    if result.get("profile") not in (None, "default"):
+        title += f"  •  профиль <b>{result['profile']}</b>"
+    if inst:
+        title = f"<b>{inst}</b>  •  " + title
     lines = [
-        f"<b>🔔 Импульс {dir_.upper()}</b>  •  TF импульса: <b>{impulse_tf}</b>",
+        title,
         f"Текущая цена: <b>{price:,.2f}$</b>",
+    ]
+    deg = result.get("degraded")
+    if deg:
+        cached = f" (TF из прошлого цикла: {', '.join(deg['cached_tfs'])})" if deg.get("cached_tfs") else ""
+        lines.append(f"⚠️ Цикл с деградацией: {', '.join(deg['applied'])}{cached}")
+    lines += [
         "",
         "<b>Проверка условий (1..11)</b>:",
         summarise_per_cond(by_cond),
         "",
     ]
     if dfs and "5m" in dfs:
-        df5 = dfs["5m"]
-        sup, res = swing_levels(df5, 20)
-        i = len(df5)-1
-        a_sup, a_res = atr_levels(df5, i, 1.0)
-        lines += [
-            "<b>Поддержка/Сопротивление</b>",
-            f"• Свинги(20):  поддержка ~ <b>{sup:,.2f}$</b>  |  сопротивление ~ <b>{res:,.2f}$</b>",
-            f"• ATR14×1:     поддержка ~ <b>{a_sup:,.2f}$</b>  |  сопротивление ~ <b>{a_res:,.2f}$</b>",
-        ]
+        sup, res, a_sup, a_res = levels_for(dfs["5m"], inst)
+        lines.append("<b>Поддержка/Сопротивление</b>")
+        pivots = pivot_lines(inst, price)
+        if pivots:
+            lines += pivots
+        else:
+            lines.append(f"• Свинги(20):  поддержка ~ <b>{sup:,.2f}$</b>  |  сопротивление ~ <b>{res:,.2f}$</b>")
+        lines.append(f"• ATR14×1:     поддержка ~ <b>{a_sup:,.2f}$</b>  |  сопротивление ~ <b>{a_res:,.2f}$</b>")
     return "\n".join(lines)
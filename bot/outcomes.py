@@ -0,0 +1,229 @@
+# bot/outcomes.py
+# What happened after each final signal, measured live as 5m bars close.
+#
+# A signal recorded by profile_reports opens a tracked position: direction, entry
+# price (the price in the alert), ATR14 of the last closed 5m bar, the profile and
+# its condition branch (result["summary"]: ok_30m_branch / ok_1h2h_branch / ok_strict).
+# Every closed 5m bar from the first one opening after the signal updates each
+# open position of its instrument in O(1): max favourable / adverse excursion,
+# the first bar touching the target (entry +- OUTCOME_TARGET_ATR x ATR) and the
+# stop (entry -+ OUTCOME_STOP_ATR x ATR; both in one bar counts as stop first),
+# and the return at each of OUTCOME_HORIZONS (in bars). After the longest horizon
+# the position is closed into the aggregate of its profile + branch (sums and
+# counts, so closing is O(1) too); report() turns those into means and rates.
+# Elapsed time is counted from bar times, so bars missed while the bot was down
+# and not in the frame any more leave a horizon to the next bar that is.
+# Open positions and aggregates go to the state file (state["outcomes"]) with the
+# rest of the state and are restored by bot_loop; /outcomes serves report() from it.
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .config import OUTCOME_TARGET_ATR, OUTCOME_STOP_ATR, OUTCOME_HORIZONS
+
+BAR_SEC = 300
+RECENT_CLOSED = 50      # closed positions kept in full for /outcomes
+
+
+def _new_agg(horizons: List[int]) -> Dict:
+    return {"n": 0, "long": 0, "short": 0, "target_first": 0, "stop_first": 0, "neither": 0,
+            "target_hits": 0, "stop_hits": 0, "target_bars_sum": 0, "stop_bars_sum": 0,
+            "mfe_pct_sum": 0.0, "mae_pct_sum": 0.0, "mfe_atr_sum": 0.0, "mae_atr_sum": 0.0,
+            "ret": {str(h): {"n": 0, "sum": 0.0, "wins": 0} for h in horizons}}
+
+
+class OutcomeTracker:
+    """inst -> open positions fed by closed 5m bars; (profile, branch) -> closed-position aggregates."""
+
+    def __init__(self, target_atr: float = OUTCOME_TARGET_ATR, stop_atr: float = OUTCOME_STOP_ATR,
+                 horizons: List[int] = OUTCOME_HORIZONS):
+        self.target_atr = target_atr
+        self.stop_atr = stop_atr
+        self.horizons = sorted(set(int(h) for h in horizons if int(h) > 0))
+        self.max_bars = self.horizons[-1] if self.horizons else 1
+        self._lock = threading.Lock()
+        self._open: Dict[str, List[Dict]] = {}
+        self._last_ts: Dict[str, int] = {}          # last 5m bar fed per instrument
+        self._agg: Dict[str, Dict[str, Dict]] = {}  # profile -> branch -> sums
+        self._recent = deque(maxlen=RECENT_CLOSED)
+        self.dropped = 0
+
+    # --- positions ---
+    def open(self, inst: str, profile: str, branch: Optional[str], direction: Optional[str],
+             start_ts: Optional[int], price: Optional[float], df5, now: Optional[float] = None) -> Optional[Dict]:
+        """Track a final signal sent at `price`; df5 = the 5m frame the signal was computed on."""
+        if direction not in ("long", "short") or not price or df5 is None or not len(df5):
+            return None
+        now = time.time() if now is None else now
+        t = df5["time"].to_numpy()
+        base = int(df5.attrs.get("time_base", 0))
+        closed = int(np.searchsorted(t, now - BAR_SEC - base, side="right"))
+        atr = float(df5["atr14"].iloc[closed - 1]) if closed and "atr14" in df5.columns else float("nan")
+        if not atr == atr or atr <= 0:
+            atr = price * 0.005   # no ATR yet: 0.5% of the price
+        sign = 1.0 if direction == "long" else -1.0
+        pos = {"inst": inst, "profile": profile, "branch": branch or "unknown", "direction": direction,
+               "start_ts": start_ts, "opened": int(now), "entry": float(price), "atr": atr,
+               # the first bar opening after the signal: the forming one is already partly gone
+               "from_ts": int(t[-1]) + base + BAR_SEC,
+               "target": price + sign * self.target_atr * atr, "stop": price - sign * self.stop_atr * atr,
+               "bars": 0, "mfe": 0.0, "mae": 0.0, "target_bar": None, "stop_bar": None, "ret": {}}
+        with self._lock:
+            self._open.setdefault(inst, []).append(pos)
+        return pos
+
+    def _step(self, pos: Dict, t: int, high: float, low: float, close: float) -> bool:
+        """One closed bar for one position (O(1) for a fixed set of horizons); True when it is done."""
+        entry = pos["entry"]
+        bars = (t - pos["from_ts"]) // BAR_SEC + 1
+        pos["bars"] = bars
+        if pos["direction"] == "long":
+            fav, adv, ret = high - entry, entry - low, close - entry
+            hit_t, hit_s = high >= pos["target"], low <= pos["stop"]
+        else:
+            fav, adv, ret = entry - low, high - entry, entry - close
+            hit_t, hit_s = low <= pos["target"], high >= pos["stop"]
+        pos["mfe"] = max(pos["mfe"], fav)
+        pos["mae"] = max(pos["mae"], adv)
+        if hit_t and pos["target_bar"] is None:
+            pos["target_bar"] = bars
+        if hit_s and pos["stop_bar"] is None:
+            pos["stop_bar"] = bars
+        for h in self.horizons:
+            if bars >= h and str(h) not in pos["ret"]:
+                pos["ret"][str(h)] = ret / entry * 100.0
+        return bars >= self.max_bars
+
+    def _close(self, pos: Dict):
+        agg = self._agg.setdefault(pos["profile"], {}).setdefault(pos["branch"], _new_agg(self.horizons))
+        entry, atr = pos["entry"], pos["atr"]
+        tb, sb = pos["target_bar"], pos["stop_bar"]
+        agg["n"] += 1
+        agg[pos["direction"]] += 1
+        if tb is not None and (sb is None or tb < sb):
+            agg["target_first"] += 1
+            pos["first"] = "target"
+        elif sb is not None:
+            agg["stop_first"] += 1
+            pos["first"] = "stop"
+        else:
+            agg["neither"] += 1
+            pos["first"] = None
+        if tb is not None:
+            agg["target_hits"] += 1
+            agg["target_bars_sum"] += tb
+        if sb is not None:
+            agg["stop_hits"] += 1
+            agg["stop_bars_sum"] += sb
+        agg["mfe_pct_sum"] += pos["mfe"] / entry * 100.0
+        agg["mae_pct_sum"] += pos["mae"] / entry * 100.0
+        agg["mfe_atr_sum"] += pos["mfe"] / atr
+        agg["mae_atr_sum"] += pos["mae"] / atr
+        for h, r in pos["ret"].items():
+            slot = agg["ret"].setdefault(h, {"n": 0, "sum": 0.0, "wins": 0})
+            slot["n"] += 1
+            slot["sum"] += r
+            slot["wins"] += r > 0
+        self._recent.append(pos)
+
+    def feed(self, inst: str, df5, now: Optional[float] = None) -> int:
+        """Walk the closed 5m bars of `df5` newer than the last one fed; returns how many."""
+        if df5 is None or not len(df5):
+            return 0
+        now = time.time() if now is None else now
+        t = df5["time"].to_numpy()
+        base = int(df5.attrs.get("time_base", 0))
+        end = int(np.searchsorted(t, now - BAR_SEC - base, side="right"))
+        with self._lock:
+            last = self._last_ts.get(inst)
+            if end:
+                self._last_ts[inst] = max(last or 0, int(t[end - 1]) + base)
+            positions = self._open.get(inst)
+            if last is None or not positions:
+                return 0
+            start = int(np.searchsorted(t, last - base, side="right"))
+            if start >= end:
+                return 0
+            high = df5["high"].to_numpy()
+            low = df5["low"].to_numpy()
+            close = df5["close"].to_numpy()
+            for i in range(start, end):
+                ts = int(t[i]) + base
+                still = []
+                for pos in positions:
+                    if ts < pos["from_ts"] or not self._step(pos, ts, float(high[i]), float(low[i]), float(close[i])):
+                        still.append(pos)
+                    else:
+                        self._close(pos)
+                positions[:] = still
+            return end - start
+
+    def drop(self, inst: str):
+        """Instrument handed to another node: its open positions are not followed here any more."""
+        with self._lock:
+            self.dropped += len(self._open.pop(inst, []))
+            self._last_ts.pop(inst, None)
+
+    # --- state file ---
+    def export(self) -> Dict:
+        with self._lock:
+            return {"open": {i: [dict(p, ret=dict(p["ret"])) for p in ps] for i, ps in self._open.items() if ps},
+                    "last_ts": dict(self._last_ts), "agg": _copy(self._agg),
+                    "recent": list(self._recent), "dropped": self.dropped,
+                    "config": {"target_atr": self.target_atr, "stop_atr": self.stop_atr, "horizons": self.horizons}}
+
+    def restore(self, saved: Optional[Dict]):
+        if not saved:
+            return
+        with self._lock:
+            self._open = {i: list(ps) for i, ps in (saved.get("open") or {}).items()}
+            self._last_ts = {i: int(ts) for i, ts in (saved.get("last_ts") or {}).items()}
+            self._agg = saved.get("agg") or {}
+            self._recent = deque(saved.get("recent") or [], maxlen=RECENT_CLOSED)
+            self.dropped = int(saved.get("dropped", 0))
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {"open": sum(len(ps) for ps in self._open.values()),
+                    "closed": sum(a["n"] for branches in self._agg.values() for a in branches.values()),
+                    "dropped": self.dropped}
+
+
+def _copy(agg: Dict) -> Dict:
+    return {p: {b: dict(a, ret={h: dict(s) for h, s in a["ret"].items()}) for b, a in branches.items()}
+            for p, branches in agg.items()}
+
+
+def report(saved: Optional[Dict]) -> Dict:
+    """Means and rates per profile and branch from an export() (the state file's "outcomes")."""
+    saved = saved or {}
+    out = {}
+    for profile, branches in (saved.get("agg") or {}).items():
+        for branch, a in branches.items():
+            n = a["n"]
+            if not n:
+                continue
+            out.setdefault(profile, {})[branch] = {
+                "signals": n, "long": a["long"], "short": a["short"],
+                "target_first_rate": round(a["target_first"] / n, 3),
+                "stop_first_rate": round(a["stop_first"] / n, 3),
+                "neither_rate": round(a["neither"] / n, 3),
+                "bars_to_target": round(a["target_bars_sum"] / a["target_hits"], 1) if a["target_hits"] else None,
+                "bars_to_stop": round(a["stop_bars_sum"] / a["stop_hits"], 1) if a["stop_hits"] else None,
+                "mfe_pct": round(a["mfe_pct_sum"] / n, 3), "mae_pct": round(a["mae_pct_sum"] / n, 3),
+                "mfe_atr": round(a["mfe_atr_sum"] / n, 2), "mae_atr": round(a["mae_atr_sum"] / n, 2),
+                "returns_pct": {h: {"n": s["n"], "mean": round(s["sum"] / s["n"], 3),
+                                    "win_rate": round(s["wins"] / s["n"], 3)}
+                                for h, s in a["ret"].items() if s["n"]},
+            }
+    opened = saved.get("open") or {}
+    return {"config": saved.get("config"), "branches": out,
+            "open": [dict(p) for ps in opened.values() for p in ps],
+            "recent": saved.get("recent") or [], "dropped": saved.get("dropped", 0)}
+
+
+OUTCOMES = OutcomeTracker()
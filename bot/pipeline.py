@@ -0,0 +1,159 @@
+# bot/pipeline.py
+# Staged cycle pipeline: fetch -> compute -> check -> persist/notify.
+#
+# Every stage has its own worker thread(s) and a bounded input queue. A worker
+# that hands an item to a full downstream queue blocks, so a slow stage pushes
+# back on the ones before it (and finally on the scheduler's submit) instead of
+# piling up work. With several instruments one instrument's indicators and
+# checks overlap the next one's OKX requests, and state/snapshot writes and
+# Telegram hand-off happen off the check path. stop() drains the stages in order
+# and ends their threads (the scanner stopping, bot_loop restarted).
+
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from .config import INSTRUMENT_ID
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()   # follows the last item through the stages
+
+
+def inst_path(path: str, inst: str) -> str:
+    """Per-instrument variant of a state/snapshot file; the primary instrument keeps `path`."""
+    if inst == INSTRUMENT_ID:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{inst}{ext}"
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable, workers: int = 1, maxsize: int = 4):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self.next: Optional["Stage"] = None
+        self.stats = {"processed": 0, "dropped": 0, "errors": 0, "busy_sec": 0.0,
+                      "max_sec": 0.0, "blocked_sec": 0.0, "max_depth": 0}
+
+    def status(self) -> Dict:
+        s = dict(self.stats)
+        n = s["processed"] + s["dropped"] + s["errors"]
+        s.update(depth=self.queue.qsize(), maxsize=self.queue.maxsize, workers=self.workers,
+                 avg_ms=round(s["busy_sec"] / n * 1000, 2) if n else None,
+                 busy_sec=round(s["busy_sec"], 3), max_sec=round(s["max_sec"], 3),
+                 blocked_sec=round(s["blocked_sec"], 3))
+        return s
+
+
+class Pipeline:
+    """
+    Stages in order; an item is whatever the stage functions agree on (here: a
+    cycle job dict). A stage function returns the item for the next stage, or
+    None to drop it. `on_exit(item)` runs once when an item leaves the pipeline
+    (finished, dropped or failed).
+    """
+
+    def __init__(self, stages: List[Stage], on_exit: Optional[Callable] = None):
+        self.stages = stages
+        self.on_exit = on_exit
+        for a, b in zip(stages, stages[1:]):
+            a.next = b
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._stopped: Dict[str, int] = {}   # stage -> workers that took the stop marker
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopped = {st.name: 0 for st in self.stages}
+            for st in self.stages:
+                for i in range(st.workers):
+                    t = threading.Thread(target=self._work, args=(st,), name=f"pipe-{st.name}-{i}", daemon=True)
+                    t.start()
+                    self._threads.append(t)
+
+    def submit(self, item, timeout: Optional[float] = None) -> bool:
+        """Queue an item at the first stage; blocks while it is full (False on timeout)."""
+        first = self.stages[0]
+        try:
+            first.queue.put(item, timeout=timeout)
+        except queue.Full:
+            return False
+        first.stats["max_depth"] = max(first.stats["max_depth"], first.queue.qsize())
+        return True
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """
+        Let the queued items finish, then end the worker threads: a stop marker
+        follows them through the stages (a stage passes it on once every one of
+        its workers took it). True when all threads ended within `timeout`.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, []
+        if not threads:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        left = lambda: None if deadline is None else max(0.0, deadline - time.monotonic())
+        first = self.stages[0]
+        try:
+            for _ in range(first.workers):
+                first.queue.put(_STOP, timeout=left())
+        except queue.Full:
+            return False
+        for t in threads:
+            t.join(left())
+        return not any(t.is_alive() for t in threads)
+
+    def _exit(self, item):
+        if self.on_exit is not None:
+            try:
+                self.on_exit(item)
+            except Exception:
+                logger.exception("Pipeline exit hook failed")
+
+    def _work(self, st: Stage):
+        while True:
+            item = st.queue.get()
+            if item is _STOP:
+                with self._lock:
+                    self._stopped[st.name] += 1
+                    last = self._stopped[st.name] == st.workers
+                if last and st.next is not None:
+                    for _ in range(st.next.workers):
+                        st.next.queue.put(_STOP)
+                return
+            t0 = time.perf_counter()
+            try:
+                out = st.fn(item)
+            except Exception:
+                logger.exception("Pipeline stage %s failed", st.name)
+                out, failed = None, True
+            else:
+                failed = False
+            dt = time.perf_counter() - t0
+            st.stats["busy_sec"] += dt
+            st.stats["max_sec"] = max(st.stats["max_sec"], dt)
+            if failed:
+                st.stats["errors"] += 1
+            elif out is None:
+                st.stats["dropped"] += 1
+            else:
+                st.stats["processed"] += 1
+
+            if out is None or st.next is None:
+                self._exit(item if out is None else out)
+                continue
+            t1 = time.perf_counter()
+            st.next.queue.put(out)       # backpressure: waits while the next stage is full
+            st.stats["blocked_sec"] += time.perf_counter() - t1
+            st.next.stats["max_depth"] = max(st.next.stats["max_depth"], st.next.queue.qsize())
+
+    def status(self) -> Dict:
+        return {st.name: st.status() for st in self.stages}
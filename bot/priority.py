@@ -0,0 +1,184 @@
+# bot/priority.py
+# Readiness of an instrument and the multi-instrument scan schedule.
+#
+# readiness() scores how close an instrument is to a signal, per direction:
+#   phase      1.0 while cond_1 is armed or waiting for the EMA10/21 cross (the
+#              signal can fire within a few bars), up to 0.5 while EMA5 closes
+#              in on EMA21 (gap in ATR14 units), 0 otherwise;
+#   mandatory  share of conditions 2..7 passing at the would-be start bar
+#              (cond_1's start / waiting start, else the last bar), with the
+#              binding threshold and signed margin of each failing one
+#              (bot/analytics.py, same expressions as the funnel).
+#   score = 0.5 * phase + 0.5 * mandatory share; the instrument's score is the
+#   better direction's. With lazy frames (bot/lazy.py) an armed / waiting
+#   direction loads the TFs of 2..7; otherwise only the conditions on TFs the
+#   cycle already loaded are scored and the others ("unscored") count as failing.
+# PriorityScheduler keeps a due time per instrument: hot ones (score >=
+# READINESS_HOT, not scored yet, or EMA5 approaching EMA21 in either direction)
+# every BOT_INTERVAL_SEC, cold ones at the first 5m close + COLD_POLL_OFFSET_SEC
+# at least COLD_POLL_SEC after the last poll, so they stay on the bar grid instead
+# of drifting by the cycle time each round. Due instruments are handed out
+# hottest first, so their fetches queue ahead of the cold ones. A cold instrument
+# polled once per 5m bar still sees every EMA5/21 cross in time: cond_1 accepts a
+# cross up to 4 bars old.
+
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from .config import BOT_INTERVAL_SEC, COLD_POLL_SEC, COLD_POLL_OFFSET_SEC, READINESS_HOT
+
+BAR_SEC = 300   # cold polls follow the 5m closes
+
+
+def _num(x) -> Optional[float]:
+    x = float(x)
+    return round(x, 4) if math.isfinite(x) else None
+
+
+def readiness(dfs, result: Dict, cond1_state: Dict, profile: Optional[Dict] = None) -> Dict:
+    """
+    Score of one instrument after run_checks. `cond1_state` is cond_1's state
+    ({"up"/"down": {"waiting", "start_pos"}}). "margins" holds every enabled
+    condition's margins at the start run_checks used (empty if cond_1 failed).
+    Conditions and thresholds: `profile` (default: the default strategy profile).
+    """
+    import numpy as np
+    from . import analytics
+    from .lazy import COND_TFS, loaded
+    from .profiles import PROFILES
+
+    profile = profile or PROFILES[0]
+    params = profile["params"]
+
+    h = analytics.History(dfs)
+    t = h.n - 1
+    conds = [c for c in analytics.CONDS if c in profile["conditions"]]
+    mandatory = [c for c in analytics.MANDATORY if c in conds]
+    ema5, ema21 = h.col("5m", "ema5")[t], h.col("5m", "ema21")[t]
+    atr = h.col("5m", "atr14")[t] if "atr14" in dfs["5m"].columns else float("nan")
+
+    out = {"score": 0.0, "direction": None, "margins": {}}
+    for direction, branch in (("long", "up"), ("short", "down")):
+        br = cond1_state.get(branch) or {}
+        if result.get("direction") == direction and result.get("start_index") is not None:
+            phase, start, ph = 1.0, int(result["start_index"]), "armed"
+        elif br.get("waiting") and br.get("start_pos") is not None:
+            phase, start, ph = 1.0, min(max(int(br["start_pos"]), 0), t), "waiting"
+        else:
+            gap = (ema21 - ema5) if direction == "long" else (ema5 - ema21)   # > 0: the cross is still ahead
+            close = 1.0 - gap / atr if gap > 0 and atr > 0 else 0.0
+            phase, start, ph = 0.5 * max(0.0, close), t, "approach" if close > 0 else "idle"
+
+        T, S = np.array([t]), np.array([start])
+        have = loaded(dfs)
+        scored = [c for c in mandatory if ph in ("armed", "waiting") or set(COND_TFS[c]) <= have]
+        ok = analytics.evaluate(h, direction, T, S, params, conds=scored)
+        have = loaded(dfs)
+        marg = analytics.margins(h, direction, T, S, params,
+                                 conds=[c for c in conds if set(COND_TFS[c]) <= have] if ph == "armed" else scored)
+        failing = {}
+        for c in scored:
+            if not ok[c][0]:
+                names, vals = analytics.worst(marg[c])
+                failing[c] = [names[0] if names else None, _num(vals[0]) if len(vals) else None]
+        passed = len(scored) - len(failing)
+        score = round(0.5 * phase + 0.5 * passed / max(1, len(mandatory)), 3)
+        out[direction] = {"score": score, "phase": ph, "start": start,
+                          "mandatory": f"{passed}/{len(mandatory)}", "failing": failing,
+                          "unscored": [c for c in mandatory if c not in scored]}
+        if score > out["score"] or out["direction"] is None:
+            out["score"], out["direction"] = score, direction
+        if ph == "armed":
+            out["margins"] = {c: {k: _num(v[0]) for k, v in m.items()} for c, m in marg.items()}
+    return out
+
+
+class PriorityScheduler:
+    """
+    Due time per instrument: hot every `interval`, cold at the first 5m close +
+    `offset` at least `cold_interval` after the last start; due ones hottest first.
+    """
+
+    def __init__(self, insts: Iterable[str], interval: float = BOT_INTERVAL_SEC,
+                 cold_interval: float = COLD_POLL_SEC, hot: float = READINESS_HOT,
+                 offset: float = COLD_POLL_OFFSET_SEC):
+        self.interval = interval
+        self.cold_interval = max(interval, cold_interval)
+        self.hot = hot
+        self.offset = offset
+        self._lock = threading.Lock()
+        self._order: List[str] = []
+        self._e = {}
+        for inst in list(insts):
+            self.add(inst)
+
+    def _next(self, e, start: float) -> float:
+        if e["hot"] or self.cold_interval <= self.interval:
+            return start + self.interval
+        bars = math.floor((start + self.cold_interval - BAR_SEC - self.offset) / BAR_SEC) + 1
+        return max(start + self.interval, bars * BAR_SEC + self.offset)
+
+    def due(self, now: Optional[float] = None) -> List[str]:
+        now = time.time() if now is None else now
+        with self._lock:
+            due = [i for i in self._order if self._e[i]["next"] <= now]
+            return sorted(due, key=lambda i: -(1.0 if self._e[i]["score"] is None else self._e[i]["score"]))
+
+    def started(self, inst: str, now: Optional[float] = None, skipped: bool = False):
+        """The instrument's slot was used (job submitted, or skipped because the previous one is in flight)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            e = self._e[inst]
+            e.update(last=now, expedited=False, next=self._next(e, now))
+            e["skipped" if skipped else "runs"] += 1
+
+    def update(self, inst: str, score: Optional[float], approaching: bool = False):
+        """
+        New readiness from the check stage: re-plan the next scan from the last start.
+        `approaching`: EMA5 closes in on EMA21 (phase "approach"), the cross may come
+        within the bar, so the instrument is hot whatever its score.
+        """
+        with self._lock:
+            e = self._e.get(inst)
+            if e is None:
+                return   # handed to another node meanwhile
+            e["score"] = score
+            e["hot"] = score is None or score >= self.hot or approaching
+            if e["last"] is not None and not e["expedited"]:
+                e["next"] = self._next(e, e["last"])
+
+    def expedite(self, hot_only: bool = False, now: Optional[float] = None, insts: Optional[Iterable[str]] = None):
+        """Make instruments (all, or `insts`) due now (fresh request; a just-closed bar for the hot ones; a late cycle)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            for e in (self._e.values() if insts is None else [self._e[i] for i in insts if i in self._e]):
+                if (e["hot"] or not hot_only) and e["next"] > now:
+                    e.update(next=now, expedited=True)
+
+    def add(self, inst: str):
+        """Start scheduling `inst` (due at once): an instrument this node took over (bot/sharding.py)."""
+        with self._lock:
+            if inst not in self._e:
+                self._order.append(inst)
+                self._e[inst] = {"score": None, "hot": True, "next": 0.0, "last": None,
+                                 "expedited": False, "runs": 0, "skipped": 0}
+
+    def remove(self, inst: str):
+        with self._lock:
+            if self._e.pop(inst, None) is not None:
+                self._order.remove(inst)
+
+    def next_wake(self) -> float:
+        with self._lock:
+            return min((e["next"] for e in self._e.values()), default=time.time() + self.interval)
+
+    def status(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            return {"interval": self.interval, "cold_interval": self.cold_interval, "cold_offset": self.offset,
+                    "hot_score": self.hot,
+                    "instruments": {i: {"score": e["score"], "hot": e["hot"], "runs": e["runs"],
+                                        "skipped": e["skipped"], "next_in": round(max(0.0, e["next"] - now), 1)}
+                                    for i, e in self._e.items()}}
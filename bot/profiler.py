@@ -0,0 +1,177 @@
+# bot/profiler.py
+# On-demand profiling of live bot cycles: cProfile for CPU time, tracemalloc for
+# allocations. Idle cost is a single attribute check per cycle.
+
+import os
+import time
+import cProfile
+import pstats
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from .config import PROFILE_DIR, PROFILE_MAX_CYCLES, PROFILE_TOP_N, PROFILE_TRACE_FRAMES
+
+logger = logging.getLogger(__name__)
+
+
+def _top_functions(prof: cProfile.Profile, top: int) -> List[Dict]:
+    stats = pstats.Stats(prof)
+    rows = []
+    for (filename, line, name), (cc, nc, tt, ct, _callers) in stats.stats.items():
+        rows.append({
+            "function": f"{filename}:{line}({name})",
+            "ncalls": nc,
+            "primitive_calls": cc,
+            "tottime": round(tt, 6),
+            "cumtime": round(ct, 6),
+        })
+    rows.sort(key=lambda r: r["cumtime"], reverse=True)
+    return rows[:top]
+
+
+def _top_allocations(snapshot: tracemalloc.Snapshot, top: int) -> List[Dict]:
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    out = []
+    for st in snapshot.statistics("lineno")[:top]:
+        frame = st.traceback[0]
+        out.append({
+            "site": f"{frame.filename}:{frame.lineno}",
+            "size_kb": round(st.size / 1024, 1),
+            "count": st.count,
+        })
+    return out
+
+
+class CycleProfiler:
+    """
+    Profiles the next N bot cycles (arm + cycle()) or a single callable (run_once).
+    Only one session may be active at a time; results of the last finished
+    session are kept in `last_report` and written to PROFILE_DIR as
+    <id>.prof (pstats) and <id>.alloc (tracemalloc.Snapshot.load).
+    """
+
+    def __init__(self, out_dir: str = PROFILE_DIR):
+        self.out_dir = out_dir
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._session: Optional[Dict] = None
+        self.last_report: Optional[Dict] = None
+
+    # --- session lifecycle ---
+    def _begin(self, mode: str, cycles: int, top: int) -> Dict:
+        if self._session is not None:
+            raise RuntimeError("profiling session already in progress")
+        if tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is already tracing in this process")
+        tracemalloc.start(PROFILE_TRACE_FRAMES)
+        self._session = {
+            "id": time.strftime("%Y%m%d-%H%M%S") + f"-{mode}",
+            "mode": mode,
+            "cycles": cycles,
+            "top": top,
+            "profile": cProfile.Profile(),
+            "started": time.time(),
+            "busy_sec": 0.0,
+        }
+        return self._session
+
+    def _finish(self) -> Dict:
+        sess = self._session
+        snapshot = tracemalloc.take_snapshot()
+        _cur, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self._session = None
+        self._remaining = 0
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        prof_path = os.path.join(self.out_dir, f"{sess['id']}.prof")
+        alloc_path = os.path.join(self.out_dir, f"{sess['id']}.alloc")
+        prof = sess["profile"]
+        try:
+            prof.dump_stats(prof_path)
+            snapshot.dump(alloc_path)
+        except Exception:
+            logger.exception("Failed to write profile files to %s", self.out_dir)
+
+        report = {
+            "id": sess["id"],
+            "mode": sess["mode"],
+            "cycles": sess["cycles"],
+            "started": sess["started"],
+            "finished": time.time(),
+            "busy_sec": round(sess["busy_sec"], 4),
+            "peak_traced_kb": round(peak / 1024, 1),
+            "profile_file": prof_path,
+            "alloc_file": alloc_path,
+            "top_functions": _top_functions(prof, sess["top"]),
+            "top_allocations": _top_allocations(snapshot, sess["top"]),
+        }
+        self.last_report = report
+        logger.info("Profiling session %s finished: %s cycle(s), %.3fs busy -> %s",
+                    sess["id"], sess["cycles"], sess["busy_sec"], prof_path)
+        return report
+
+    def arm(self, cycles: int, top: int = PROFILE_TOP_N) -> Dict:
+        """Profile the next `cycles` bot cycles. Returns the session descriptor."""
+        cycles = max(1, min(int(cycles), PROFILE_MAX_CYCLES))
+        with self._lock:
+            sess = self._begin("cycles", cycles, top)
+            self._remaining = cycles
+        logger.info("Profiling armed for next %s cycle(s): %s", cycles, sess["id"])
+        return {"id": sess["id"], "cycles": cycles}
+
+    def run_once(self, fn: Callable, top: int = PROFILE_TOP_N) -> Dict:
+        """Run fn() under the profiler in the calling thread and return the report."""
+        with self._lock:
+            sess = self._begin("oneoff", 1, top)
+        t0 = time.perf_counter()
+        try:
+            sess["profile"].runcall(fn)
+        finally:
+            sess["busy_sec"] += time.perf_counter() - t0
+            with self._lock:
+                report = self._finish()
+        return report
+
+    @property
+    def armed(self) -> bool:
+        return bool(self._remaining)
+
+    @contextmanager
+    def cycle(self):
+        """Wrap one bot cycle; a no-op unless a session has been armed."""
+        if not self._remaining:
+            yield
+            return
+        sess = self._session
+        t0 = time.perf_counter()
+        sess["profile"].enable()
+        try:
+            yield
+        finally:
+            sess["profile"].disable()
+            sess["busy_sec"] += time.perf_counter() - t0
+            with self._lock:
+                self._remaining -= 1
+                if self._remaining <= 0:
+                    self._finish()
+
+    def status(self) -> Dict:
+        sess = self._session
+        return {
+            "active": sess is not None,
+            "session": None if sess is None else {
+                "id": sess["id"], "mode": sess["mode"], "cycles": sess["cycles"],
+                "remaining": self._remaining, "started": sess["started"],
+            },
+            "last_report": self.last_report,
+        }
+
+
+PROFILER = CycleProfiler()
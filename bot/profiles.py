@@ -0,0 +1,99 @@
+# bot/profiles.py
+# Strategy profiles: named threshold sets, enabled conditions, strict vs
+# branching logic and target chats. checker.run_profiles evaluates all of them
+# on the same frames in one pass; a condition result is computed once per
+# (direction, start bar, thresholds it reads) and reused by every profile with
+# the same values. Each profile keeps its own cond_1 state file (profile_path)
+# and its own dedup keys in the instrument state (main.profile_state).
+#
+#   STRATEGY_PROFILES='{"aggressive": {"params": {"c2.max_cross_age": 15, "c6.dea_max": 250},
+#                                      "conditions": [1,2,3,4,5,6,7,8,9], "chats": ["-100222"]},
+#                       "conservative": {"strict": true}}'
+#
+# "default" is built from ENABLED_CONDITIONS / STRICT_MODE / TELEGRAM_ROUTES and
+# can be overridden by an entry of the same name.
+
+import os
+import json
+from typing import Dict, List
+
+from .config import ENABLED_CONDITIONS, STRICT_MODE, STRATEGY_PROFILES
+
+DEFAULT_PROFILE = "default"
+
+# thresholds of conditions 2..10 (the values of the TZ); short-side limits
+# mirror the long ones where the conditions are symmetric
+DEFAULT_PARAMS = {
+    "c2.max_cross_age": 11,    # MACD cross on 5m not older than N bars
+    "c2.max_gap": 70.0,        # |DIF-DEA| at the cross
+    "c3.tol": 5.0,             # 5m oscillators t-2 -> t
+    "c4.kdj_gap": 6.0,         # 5m J-D at the start
+    "c4.rsi_tol": 5.0,         # 5m RSI6 t-3 -> t
+    "c5.rsi_edge": 70.0,       # 5m RSI free space (short: 100 - edge)
+    "c5.spread": 4.0,
+    "c6.rsi_tol": 6.5,         # 15m RSI6 dynamics
+    "c6.kdj_tol": 5.0,         # 15m KDJ dynamics
+    "c6.dea_max": 150.0,       # 15m |DEA| limit
+    "c7.rsi_edge": 70.0,       # 15m RSI free space (short: 100 - edge)
+    "c8.dj_min": 20.0,         # 30m ΔJ over 2 bars (also 1H in cond 10)
+    "c8.drsi_min": 10.0,       # 30m ΔRSI6 over 2 bars
+    "c8.sync": 2,              # KDJ vs RSI cross distance
+    "c8.macd_bars": 4,         # previous MACD trend length
+    "c9.sync": 2,              # 1H KDJ/RSI/StochRSI cross spread (also 2H in cond 10)
+}
+
+_C8 = ("c8.dj_min", "c8.drsi_min", "c8.sync", "c8.macd_bars")
+# condition -> thresholds it reads (the memo key of its result)
+COND_PARAMS = {
+    2: ("c2.max_cross_age", "c2.max_gap"),
+    3: ("c3.tol",),
+    4: ("c4.kdj_gap", "c4.rsi_tol"),
+    5: ("c5.rsi_edge", "c5.spread"),
+    6: ("c6.rsi_tol", "c6.kdj_tol", "c6.dea_max"),
+    7: ("c7.rsi_edge", "c5.spread"),
+    8: _C8,
+    9: ("c9.sync",),
+    10: _C8 + ("c9.sync",),
+    11: (),
+}
+
+
+def make_profile(name: str, spec: Dict, base: Dict = None) -> Dict:
+    base = base or {"params": DEFAULT_PARAMS, "conditions": ENABLED_CONDITIONS, "strict": STRICT_MODE, "chats": []}
+    unknown = set(spec.get("params", {})) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"profile {name!r}: unknown thresholds {sorted(unknown)}")
+    conditions = sorted({1} | {int(c) for c in spec.get("conditions", base["conditions"])})
+    return {
+        "name": name,
+        "params": dict(base["params"], **spec.get("params", {})),
+        "conditions": conditions,
+        "strict": bool(spec.get("strict", base["strict"])),
+        "chats": [str(c) for c in spec.get("chats", base["chats"])],
+    }
+
+
+def load_profiles(spec: str = STRATEGY_PROFILES) -> List[Dict]:
+    """Default profile first, then the STRATEGY_PROFILES entries in their order."""
+    raw = {}
+    if spec.strip():
+        if spec.strip().startswith("{"):
+            raw = json.loads(spec)
+        else:
+            with open(spec, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+    default = make_profile(DEFAULT_PROFILE, raw.pop(DEFAULT_PROFILE, {}))
+    return [default] + [make_profile(name, s) for name, s in raw.items()]
+
+
+PROFILES = load_profiles()
+# conditions any profile evaluates (compact frames keep their columns)
+ALL_CONDITIONS = sorted({c for p in PROFILES for c in p["conditions"]})
+
+
+def profile_path(path: str, name: str) -> str:
+    """Per-profile variant of a state file; the default profile keeps `path`."""
+    if name == DEFAULT_PROFILE:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{name}{ext}"
@@ -0,0 +1,219 @@
+# bot/query.py
+# Read-only indicator slices for other services (GET /indicators).
+#
+# The check stage publishes each instrument's latest indicator frames into FRAMES
+# (references only: frames are never modified after compute_dfs builds them).
+# A request picks columns as numpy arrays straight from those frames and slices
+# the last N bars: no DataFrame is copied, only the served slice is converted.
+# Gunicorn workers that do not run the scanner read the same frames from the
+# instrument's candle snapshot (SNAPSHOT_FILE, written after every clean cycle);
+# the opened snapshot and the columns read from it are cached until the file
+# changes.
+#
+# By default only closed bars are served, so a response is fully determined by
+# the last closed bar of the TF and its ETag is that bar's time: polling with
+# If-None-Match answers 304 until a new bar closes. ?forming=1 adds the forming
+# bar and ties the ETag to the frame version (cycle) as well. "Closed" is decided
+# by when the TF was fetched (store.fetched_at, published with the frames), not by
+# the request's clock: a frame fetched before its last bar closed holds that bar's
+# partial values however late it is read. Every response carries the TF's age.
+#
+# Binary format (?format=bin or Accept: application/octet-stream), little endian:
+#   uint32 header length | header JSON | column buffers
+# the header lists {"name", "dtype", "offset", "rows"} per column (offsets from
+# the start of the buffers); np.frombuffer(body, dtype, rows, 4 + hlen + offset).
+
+import os
+import json
+import time
+import struct
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .store import TF_SECONDS
+
+
+class FrameIndex:
+    """
+    inst -> (tf -> indicator frame, tf -> fetch time, version, skew): what the scanner
+    computed last. Fetch times are on the exchange's clock (CandleStore.clock);
+    `skew` = that clock - local time, so select() compares them with the same clock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames: Dict[str, Tuple[Dict, Dict, int]] = {}
+
+    def publish(self, inst: str, frames: Dict, fetched_at: Optional[Dict[str, float]] = None, skew: float = 0.0):
+        """`fetched_at`: tf -> when its bars were fetched (store.fetched_at); missing TFs count as now."""
+        now = time.time() + skew
+        fetched = {tf: float((fetched_at or {}).get(tf, now)) for tf in frames}
+        with self._lock:
+            version = self._frames.get(inst, ({}, {}, 0, 0.0))[2] + 1
+            self._frames[inst] = (dict(frames), fetched, version, skew)
+
+    def drop(self, inst: str):
+        with self._lock:
+            self._frames.pop(inst, None)
+
+    def get(self, inst: str) -> Optional["FrameSource"]:
+        entry = self._frames.get(inst)
+        return None if entry is None else FrameSource(entry[0], f"m{entry[2]}", "memory", entry[1], entry[3])
+
+
+FRAMES = FrameIndex()
+
+
+class FrameSource:
+    """Columns of one instrument's frames as arrays (absolute time), from memory or a snapshot."""
+
+    def __init__(self, frames: Dict, version: str, source: str, fetched_at: Optional[Dict[str, float]] = None,
+                 skew: float = 0.0):
+        self._frames = frames
+        self.version = version
+        self.source = source
+        self.fetched_at = dict(fetched_at or {})
+        self.skew = skew   # the clock of fetched_at - local time
+
+    def timeframes(self) -> List[str]:
+        return list(self._frames)
+
+    def columns(self, tf: str) -> List[str]:
+        return list(self._frames[tf].columns)
+
+    def time_base(self, tf: str) -> int:
+        return int(self._frames[tf].attrs.get("time_base", 0))
+
+    def column(self, tf: str, name: str) -> np.ndarray:
+        return self._frames[tf][name].to_numpy()
+
+
+class SnapshotSource(FrameSource):
+    """The indicator frames ("ind/<tf>") of a CandleStore snapshot, columns loaded on first use."""
+
+    def __init__(self, z, meta: Dict, version: str):
+        self._z = z
+        self._meta = {key.split("/", 1)[1]: spec for key, spec in meta["frames"].items() if key.startswith("ind/")}
+        self._cols: Dict[Tuple[str, str], np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.version = version
+        self.source = "snapshot"
+        self.skew = float(meta.get("skew", 0.0))
+        # older snapshots have no fetch times: the save time is the latest they can be
+        saved = float(meta.get("saved_ts", 0)) + self.skew
+        self.fetched_at = {tf: float(meta.get("fetched_at", {}).get(tf, saved)) for tf in self._meta}
+
+    def timeframes(self) -> List[str]:
+        return list(self._meta)
+
+    def columns(self, tf: str) -> List[str]:
+        return list(self._meta[tf]["columns"])
+
+    def time_base(self, tf: str) -> int:
+        return int(self._meta[tf]["attrs"].get("time_base", 0))
+
+    def column(self, tf: str, name: str) -> np.ndarray:
+        key = (tf, name)
+        arr = self._cols.get(key)
+        if arr is None:
+            with self._lock:
+                arr = self._cols.get(key)
+                if arr is None:
+                    arr = self._z[f"ind/{tf}/{self._meta[tf]['columns'].index(name)}"]
+                    self._cols[key] = arr
+        return arr
+
+
+_snap_lock = threading.Lock()
+_snapshots: Dict[str, Tuple[float, SnapshotSource]] = {}
+
+
+def snapshot_source(path: str) -> Optional[SnapshotSource]:
+    """Cached reader of a snapshot file; reopened only when the file was replaced."""
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    cached = _snapshots.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _snap_lock:
+        cached = _snapshots.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        # os.replace swaps the file: the old handle keeps reading the old inode until it is dropped
+        z = np.load(path, allow_pickle=False)
+        meta = json.loads(z["meta"].tobytes().decode("utf-8"))
+        src = SnapshotSource(z, meta, f"s{int(mtime * 1000)}")
+        # the previous reader is closed when the last request using it lets go of it
+        _snapshots[path] = (mtime, src)
+    return src
+
+
+def select(src: FrameSource, tf: str, cols: Optional[Iterable[str]] = None, last: int = 100,
+           forming: bool = False, now: Optional[float] = None) -> Dict:
+    """
+    Slice of the last `last` bars of `tf` (closed ones unless `forming`). Returns
+    the response metadata + "arrays" (name -> array view); raises KeyError for
+    an unknown TF / column (message names what is available). The last bar is
+    closed if it had closed when the TF was fetched; `age_sec` = now - fetch time,
+    both on the clock the fetch times were taken by (src.skew).
+    """
+    if tf not in src.timeframes():
+        raise KeyError(f"tf {tf!r} not available, have {src.timeframes()}")
+    available = src.columns(tf)
+    names = ["time"] + [c for c in (available if cols is None else cols) if c != "time"]
+    unknown = [c for c in names if c not in available]
+    if unknown:
+        raise KeyError(f"unknown column(s) {unknown}, have {available}")
+    now = time.time() + src.skew if now is None else now
+    fetched = src.fetched_at.get(tf, now)
+    base = src.time_base(tf)
+    t = src.column(tf, "time")
+    end = len(t)
+    # the forming bar: still open when the bars were fetched (its values are partial even if it closed since)
+    if not forming and end and int(t[-1]) + base + TF_SECONDS.get(tf, 300) > fetched:
+        end -= 1
+    start = max(0, end - max(0, last))
+    arrays = {name: src.column(tf, name)[start:end] for name in names}
+    arrays["time"] = arrays["time"].astype(np.int64) + base
+    last_ts = int(arrays["time"][-1]) if end > start else None
+    return {"tf": tf, "rows": end - start, "last_bar_ts": last_ts, "forming": forming,
+            "fetched_at": round(fetched, 3), "age_sec": round(max(0.0, now - fetched), 1),
+            "source": src.source, "version": src.version, "arrays": arrays}
+
+
+def etag(inst: str, sel: Dict, query: str) -> str:
+    """Closed bars: the last bar's time (+ the query); with the forming bar also the frame version."""
+    digest = hashlib.md5(query.encode("utf-8")).hexdigest()[:8]
+    ver = f"-{sel['version']}" if sel["forming"] else ""
+    return f'{inst}-{sel["tf"]}-{sel["last_bar_ts"]}{ver}-{digest}'
+
+
+def to_json(inst: str, sel: Dict) -> Dict:
+    """Column-oriented JSON: {"columns": {name: [...]}}; NaN -> null."""
+    cols = {}
+    for name, arr in sel["arrays"].items():
+        if arr.dtype.kind == "f":
+            cols[name] = [None if v != v else v for v in arr.tolist()]
+        else:
+            cols[name] = arr.tolist()
+    meta = {k: v for k, v in sel.items() if k != "arrays"}
+    return dict(meta, inst=inst, columns=cols)
+
+
+def to_binary(inst: str, sel: Dict) -> bytes:
+    header = {k: v for k, v in sel.items() if k != "arrays"}
+    header["inst"] = inst
+    header["columns"], bufs, offset = [], [], 0
+    for name, arr in sel["arrays"].items():
+        buf = np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder("<")).tobytes()
+        header["columns"].append({"name": name, "dtype": arr.dtype.newbyteorder("<").str, "offset": offset,
+                                  "rows": len(arr)})
+        bufs.append(buf)
+        offset += len(buf)
+    head = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return struct.pack("<I", len(head)) + head + b"".join(bufs)
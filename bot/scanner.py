@@ -0,0 +1,95 @@
+# bot/scanner.py
+# Scanner lifecycle: exactly one process per host runs bot_loop.
+# Every gunicorn worker calls start(); an election thread takes an exclusive
+# flock on SCANNER_LOCK_FILE and only the holder runs the loop. The others keep
+# retrying, so if the leader dies (the kernel drops its lock) a standby worker
+# takes over within SCANNER_LEASE_RETRY_SEC. HTTP is served by all workers from
+# the shared state file.
+
+import os
+import time
+import socket
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX dev machines: no election, always leader
+    fcntl = None
+
+from .config import SCANNER_LOCK_FILE, SCANNER_LEASE_RETRY_SEC
+
+logger = logging.getLogger(__name__)
+
+
+class ScannerLifecycle:
+    def __init__(self, target: Callable[[], None], lock_file: str = SCANNER_LOCK_FILE,
+                 retry_sec: float = SCANNER_LEASE_RETRY_SEC):
+        self.target = target
+        self.lock_file = lock_file
+        self.retry_sec = retry_sec
+        self.is_leader = False
+        self.leader_since: Optional[float] = None
+        self._fd = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _try_acquire(self) -> bool:
+        if fcntl is None:
+            return True
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        # keep fd open for the life of the process: closing it releases the lock
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{socket.gethostname()} {os.getpid()} {int(time.time())}\n".encode())
+        self._fd = fd
+        return True
+
+    def _release(self):
+        self.is_leader = False
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _run(self):
+        while True:
+            if not self._try_acquire():
+                time.sleep(self.retry_sec)
+                continue
+            self.is_leader = True
+            self.leader_since = time.time()
+            logger.info("Scanner lease acquired by pid %s (%s); starting bot loop", os.getpid(), self.lock_file)
+            try:
+                self.target()
+            except Exception:
+                logger.exception("Scanner loop crashed; releasing lease")
+            self._release()
+            time.sleep(self.retry_sec)
+
+    def start(self):
+        """Idempotent; safe to call from every worker's app factory."""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="scanner-election", daemon=True)
+            self._thread.start()
+
+    def holder(self) -> Optional[str]:
+        try:
+            with open(self.lock_file, "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except Exception:
+            return None
+
+    def status(self) -> Dict:
+        return {
+            "pid": os.getpid(),
+            "leader": self.is_leader,
+            "leader_since": self.leader_since,
+            "lease_holder": self.holder(),
+        }
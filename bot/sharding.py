@@ -0,0 +1,260 @@
+# bot/sharding.py
+# Instruments split across bot nodes (SHARD_STORE=<sqlite file on a shared volume>).
+#
+# Every node (one bot_loop per host, bot/scanner.py) heartbeats into the shared
+# store every SHARD_HEARTBEAT_SEC. The nodes seen within SHARD_LEASE_TTL_SEC form
+# a consistent-hash ring (SHARD_VNODES points per node), which names the wanted
+# owner of each instrument; adding or losing a node moves only that node's share.
+# Ownership itself is a lease row per instrument (node, expires) renewed by the
+# heartbeat: a node takes a lease only when it is free or expired, so two nodes
+# never scan the same instrument, and hands one over by releasing it once the
+# instrument's cycle is idle. A dead node stops renewing: its node row and
+# leases expire after SHARD_LEASE_TTL_SEC and the survivors take its
+# instruments within TTL + one heartbeat (< one 5m bar with the defaults).
+# The lease row also carries the instrument's alert dedup keys (last start /
+# signal per profile), so a new owner does not repeat a report the old one sent,
+# and each profile's cond_1 state, so it carries on the impulse branch in progress.
+# A node whose heartbeats fail stops scanning one heartbeat before its leases
+# expire (by its own clock). Node clocks must be NTP-synced; SQLite over NFS needs working locks
+# (no WAL: the default rollback journal is used).
+
+import os
+import json
+import time
+import bisect
+import socket
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from .config import SHARD_STORE, SHARD_NODE_ID, SHARD_HEARTBEAT_SEC, SHARD_LEASE_TTL_SEC, SHARD_VNODES
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS nodes (node TEXT PRIMARY KEY, host TEXT, pid INTEGER, started REAL, heartbeat REAL)",
+    "CREATE TABLE IF NOT EXISTS leases (inst TEXT PRIMARY KEY, node TEXT, expires REAL, epoch INTEGER, handoff TEXT)",
+)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hashing: `vnodes` points per node, a key belongs to the first point at or after its hash."""
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = SHARD_VNODES):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in set(nodes) for i in range(vnodes))
+        self._keys = [p[0] for p in points]
+        self._nodes = [p[1] for p in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        i = bisect.bisect_left(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[i]
+
+
+class ShardCoordinator:
+    """
+    Leases of this node over `insts`. heartbeat() talks to the store (from the
+    background thread started by start(), or directly with a fake clock);
+    active() = instruments to scan, releasing() = held but wanted elsewhere
+    (release() them once idle), take_acquired() = newly taken leases with the
+    previous owner's handoff dict. export(inst) -> handoff dict of an owned one.
+    """
+
+    def __init__(self, insts: Iterable[str], path: str = SHARD_STORE, node: str = SHARD_NODE_ID,
+                 heartbeat_sec: float = SHARD_HEARTBEAT_SEC, ttl: float = SHARD_LEASE_TTL_SEC,
+                 vnodes: int = SHARD_VNODES, export: Optional[Callable[[str], Dict]] = None):
+        self.insts = list(insts)
+        self.path = path
+        self.node = node or socket.gethostname()
+        self.heartbeat_sec = heartbeat_sec
+        self.ttl = ttl
+        self.vnodes = vnodes
+        self.export = export
+        self.changed = threading.Event()    # set when active() may have changed
+        self._lock = threading.Lock()
+        self._io = threading.Lock()         # one store transaction at a time (heartbeat vs release)
+        self._held: Dict[str, float] = {}   # inst -> lease expiry written by this node
+        self._desired: Set[str] = set()
+        self._acquired: Dict[str, Dict] = {}
+        self._owners: Dict[str, Optional[str]] = {}
+        self._live: List[str] = []
+        self._started = time.time()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.stats = {"heartbeats": 0, "errors": 0, "acquired": 0, "released": 0, "lost": 0,
+                      "last_heartbeat": None, "last_error": None}
+        if ttl <= heartbeat_sec:
+            raise ValueError(f"SHARD_LEASE_TTL_SEC ({ttl}) must exceed SHARD_HEARTBEAT_SEC ({heartbeat_sec})")
+        if ttl + heartbeat_sec > 300:
+            logger.warning("Shard: TTL %ss + heartbeat %ss exceed one 5m bar: a dead node's instruments "
+                           "move later than the next bar", ttl, heartbeat_sec)
+
+    # --- store ---
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        for stmt in SCHEMA:
+            db.execute(stmt)
+        return db
+
+    def _handoff(self, inst: str) -> Optional[str]:
+        if self.export is None:
+            return None
+        try:
+            return json.dumps(self.export(inst))
+        except Exception:
+            logger.exception("Shard: handoff export failed for %s", inst)
+            return None
+
+    def heartbeat(self, now: Optional[float] = None) -> Set[str]:
+        """Renew this node and its leases, take free wanted ones; returns active()."""
+        with self._io:
+            return self._heartbeat(time.time() if now is None else now)
+
+    def _heartbeat(self, now: float) -> Set[str]:
+        with self._lock:
+            held_before = set(self._held)
+        blobs = {inst: self._handoff(inst) for inst in held_before}
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("INSERT INTO nodes (node, host, pid, started, heartbeat) VALUES (?, ?, ?, ?, ?) "
+                       "ON CONFLICT(node) DO UPDATE SET host=excluded.host, pid=excluded.pid, heartbeat=excluded.heartbeat",
+                       (self.node, socket.gethostname(), os.getpid(), self._started, now))
+            db.execute("DELETE FROM nodes WHERE heartbeat <= ?", (now - 10 * self.ttl,))
+            live = sorted(r[0] for r in db.execute("SELECT node FROM nodes WHERE heartbeat > ?", (now - self.ttl,)))
+            ring = HashRing(live, self.vnodes)
+            owners = {inst: ring.owner(inst) for inst in self.insts}
+            desired = {inst for inst, node in owners.items() if node == self.node}
+            rows = {r[0]: r[1:] for r in db.execute("SELECT inst, node, expires, epoch, handoff FROM leases")}
+            held, acquired = {}, {}
+            for inst in self.insts:
+                node, expires, epoch, blob = rows.get(inst, (None, 0.0, 0, None))
+                if node == self.node and (expires > now or inst in desired):
+                    if inst not in desired and inst not in held_before:
+                        # left over from before a restart and wanted elsewhere: free it now
+                        db.execute("UPDATE leases SET node=NULL, expires=0 WHERE inst=? AND node=?", (inst, self.node))
+                        continue
+                    blob = blobs.get(inst) or blob
+                    db.execute("UPDATE leases SET expires=?, handoff=? WHERE inst=? AND node=?",
+                               (now + self.ttl, blob, inst, self.node))
+                elif inst in desired and (node is None or expires <= now):
+                    db.execute("INSERT INTO leases (inst, node, expires, epoch, handoff) VALUES (?, ?, ?, 1, NULL) "
+                               "ON CONFLICT(inst) DO UPDATE SET node=excluded.node, expires=excluded.expires, "
+                               "epoch=leases.epoch+1", (inst, self.node, now + self.ttl))
+                else:
+                    continue
+                # scanning stops a heartbeat before the lease runs out in the store
+                held[inst] = now + self.ttl - self.heartbeat_sec
+                if inst not in held_before:
+                    acquired[inst] = json.loads(blob) if blob else {}
+            db.execute("COMMIT")
+        except Exception as e:
+            try:
+                db.execute("ROLLBACK")
+            except Exception:
+                pass
+            self.stats["errors"] += 1
+            self.stats["last_error"] = f"{type(e).__name__}: {e}"
+            logger.warning("Shard: heartbeat to %s failed: %s", self.path, e)
+            self.changed.set()   # leases now only run out
+            return self.active(now)
+        finally:
+            db.close()
+
+        with self._lock:
+            lost = held_before - set(held)
+            before = self.active(now, locked=True)
+            self._held, self._desired, self._owners, self._live = held, desired, owners, live
+            self._acquired.update(acquired)
+            for inst in lost:
+                self._acquired.pop(inst, None)
+            self.stats["heartbeats"] += 1
+            self.stats["acquired"] += len(acquired)
+            self.stats["lost"] += len(lost)
+            self.stats["last_heartbeat"] = now
+            after = self.active(now, locked=True)
+        if acquired or lost:
+            logger.info("Shard %s: acquired %s, lost %s; live nodes %s", self.node, sorted(acquired), sorted(lost), live)
+        if before != after or self.releasing(now):
+            self.changed.set()
+        return after
+
+    def release(self, inst: str, now: Optional[float] = None):
+        """Give up an instrument (its cycle is idle) so its wanted owner can take it at once."""
+        blob = self._handoff(inst)
+        with self._io:
+            with self._lock:
+                self._held.pop(inst, None)
+                self._acquired.pop(inst, None)
+            db = self._connect()
+            try:
+                db.execute("UPDATE leases SET node=NULL, expires=0, handoff=COALESCE(?, handoff) WHERE inst=? AND node=?",
+                           (blob, inst, self.node))
+                self.stats["released"] += 1
+                logger.info("Shard %s: released %s", self.node, inst)
+            except Exception as e:
+                logger.warning("Shard: release of %s failed (it expires in %ss): %s", inst, self.ttl, e)
+            finally:
+                db.close()
+
+    # --- local view ---
+    def _select(self, now: Optional[float], wanted: bool, locked: bool) -> Set[str]:
+        now = time.time() if now is None else now
+        if not locked:
+            with self._lock:
+                return self._select(now, wanted, True)
+        return {i for i, exp in self._held.items() if exp > now and (i in self._desired) == wanted}
+
+    def active(self, now: Optional[float] = None, locked: bool = False) -> Set[str]:
+        """Held (unexpired by this node's clock) and wanted here: scan these."""
+        return self._select(now, True, locked)
+
+    def releasing(self, now: Optional[float] = None, locked: bool = False) -> Set[str]:
+        """Held but wanted by another node: release() once the instrument's cycle is idle."""
+        return self._select(now, False, locked)
+
+    def take_acquired(self) -> Dict[str, Dict]:
+        with self._lock:
+            out, self._acquired = self._acquired, {}
+        return out
+
+    # --- lifecycle ---
+    def _run(self):
+        while not self._stop.wait(self.heartbeat_sec):
+            self.heartbeat()
+
+    def start(self) -> Set[str]:
+        """First heartbeat now, then every heartbeat_sec in the background."""
+        active = self.heartbeat()
+        self._thread = threading.Thread(target=self._run, name="shard-heartbeat", daemon=True)
+        self._thread.start()
+        return active
+
+    def close(self):
+        """Release every lease and leave the ring (process exit)."""
+        self._stop.set()
+        for inst in list(self._held):
+            self.release(inst)
+        db = self._connect()
+        try:
+            db.execute("DELETE FROM nodes WHERE node=?", (self.node,))
+        except Exception:
+            pass
+        finally:
+            db.close()
+
+    def status(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            held = {i: round(exp - now, 1) for i, exp in self._held.items()}
+            return dict(self.stats, node=self.node, store=self.path, live_nodes=list(self._live),
+                        active=sorted(i for i in held if i in self._desired),
+                        releasing=sorted(i for i in held if i not in self._desired),
+                        lease_left_sec=held, owners=dict(self._owners))
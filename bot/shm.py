@@ -0,0 +1,255 @@
+# bot/shm.py
+# Process-parallel run_checks over shared-memory frames (PARALLEL_WORKERS > 0).
+#
+# pandas and the conditions are CPU-bound Python, so the check stage's threads
+# share one core, and pickling 5 indicator frames to a worker process costs more
+# than the checks themselves. Instead every (instrument, TF) indicator frame
+# lives in one named shared-memory block (one fixed-capacity segment per column).
+# A worker process gets only a small descriptor (block name, column layout, row
+# window), maps the block once and wraps the arrays in a DataFrame without
+# copying. The parent rewrites only what changed: a TF reused from the previous
+# cycle is skipped, a new bar moves the row window forward inside the block and
+# only rows that differ from the stored ones (aligned by bar time) are written.
+
+import os
+import logging
+import itertools
+import threading
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import PARALLEL_WORKERS, CANDLES_LIMIT
+
+logger = logging.getLogger(__name__)
+
+_ALIGN = 64
+
+
+class _Block:
+    """
+    One (inst, tf) frame. Columns are grouped by dtype; each group is a 2-D
+    segment (columns x capacity rows) so diffs, writes and the worker's frame are
+    a few numpy operations per group. Live rows: [start, start + nrows).
+    """
+
+    def __init__(self, name: str, columns, dtypes, capacity: int):
+        self.columns = list(columns)
+        self.dtypes = [np.dtype(d) for d in dtypes]
+        self.capacity = capacity
+        self.groups, size = [], 0   # (dtype, byte offset, column indexes)
+        for dt in dict.fromkeys(self.dtypes):
+            idx = [i for i, d in enumerate(self.dtypes) if d == dt]
+            self.groups.append((dt, size, idx))
+            size += -(-len(idx) * capacity * dt.itemsize // _ALIGN) * _ALIGN
+        self.shm = SharedMemory(name=name, create=True, size=max(size, 1))
+        self.start = 0
+        self.nrows = 0
+        self.source = None   # frame published last (a reused frame is skipped by identity)
+
+    def seg(self, g: int) -> np.ndarray:
+        dt, off, idx = self.groups[g]
+        return np.ndarray((len(idx), self.capacity), dtype=dt, buffer=self.shm.buf, offset=off)
+
+    def descriptor(self, key: str, attrs: Dict) -> Dict:
+        return {"key": key, "name": self.shm.name, "start": self.start, "nrows": self.nrows,
+                "capacity": self.capacity, "attrs": attrs,
+                "groups": [(dt.str, off, [self.columns[i] for i in idx], idx) for dt, off, idx in self.groups]}
+
+    def close(self):
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _first_diff(old: np.ndarray, new: np.ndarray) -> int:
+    """First row (axis 1) where two columns x rows arrays differ (NaN == NaN); len if none."""
+    neq = old != new
+    if old.dtype.kind == "f":
+        neq &= ~(np.isnan(old) & np.isnan(new))
+    rows = neq.any(axis=0)
+    return int(rows.argmax()) if rows.any() else old.shape[1]
+
+
+class SharedFrames:
+    """Parent side: indicator frames of every instrument in shared memory."""
+
+    def __init__(self, capacity: int = 2 * CANDLES_LIMIT):
+        self.capacity = capacity
+        self._blocks: Dict[Tuple[str, str], _Block] = {}
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self.stats = {"published": 0, "skipped": 0, "rows_written": 0, "rows_total": 0, "relayouts": 0}
+
+    def _new_block(self, key, df: pd.DataFrame) -> _Block:
+        old = self._blocks.pop(key, None)
+        if old is not None:
+            old.close()
+        inst, tf = key
+        name = f"ema_{os.getpid()}_{next(self._seq)}_{inst}_{tf}".replace("-", "")
+        blk = _Block(name, df.columns, df.dtypes, max(self.capacity, 2 * len(df)))
+        self._blocks[key] = blk
+        self.stats["relayouts"] += 1
+        return blk
+
+    def _write(self, key, df: pd.DataFrame) -> _Block:
+        blk = self._blocks.get(key)
+        n = len(df)
+        if blk is not None and blk.source is df:
+            self.stats["skipped"] += 1
+            return blk
+        if blk is None or blk.columns != list(df.columns) or blk.dtypes != list(df.dtypes) or n > blk.capacity:
+            blk = self._new_block(key, df)
+        # one interleaving copy of the whole frame; float64 holds every column exactly (int time < 2**53)
+        rows = df.to_numpy(dtype=np.float64)
+        new = [rows[:, idx].T.astype(dt) for dt, _off, idx in blk.groups]
+
+        # align the new frame with the stored rows by bar time
+        shift = None
+        if blk.nrows and n:
+            t0 = df["time"].iat[0]
+            g = next(g for g, (_dt, _off, idx) in enumerate(blk.groups) if blk.columns.index("time") in idx)
+            times = blk.seg(g)[blk.groups[g][2].index(blk.columns.index("time")), blk.start:blk.start + blk.nrows]
+            k = int(np.searchsorted(times, t0))
+            if k < blk.nrows and times[k] == t0:
+                shift = k
+        first = 0
+        if shift is None or blk.start + shift + n > blk.capacity:
+            # gap / different history / end of the block: rewrite from the block start
+            start = 0
+        else:
+            start = blk.start + shift
+            overlap = min(n, blk.nrows - shift)
+            first = min(_first_diff(blk.seg(g)[:, start:start + overlap], vals[:, :overlap])
+                        for g, vals in enumerate(new))
+        for g, vals in enumerate(new):
+            blk.seg(g)[:, start + first:start + n] = vals[:, first:]
+        blk.start, blk.nrows, blk.source = start, n, df
+        self.stats["rows_written"] += n - first
+        self.stats["rows_total"] += n
+        self.stats["published"] += 1
+        return blk
+
+    def publish(self, inst: str, dfs: Dict[str, pd.DataFrame]) -> Dict[str, Dict]:
+        """Bring the blocks of `inst` up to date; returns tf -> descriptor for the workers."""
+        with self._lock:
+            return {tf: self._write((inst, tf), df).descriptor(f"{inst}/{tf}", dict(df.attrs))
+                    for tf, df in dfs.items()}
+
+    def close(self):
+        with self._lock:
+            for blk in self._blocks.values():
+                blk.close()
+            self._blocks.clear()
+
+    def status(self) -> Dict:
+        with self._lock:
+            nbytes = sum(b.shm.size for b in self._blocks.values())
+            return dict(self.stats, blocks=len(self._blocks), mb=round(nbytes / 1e6, 3))
+
+
+# --- worker process side ---
+_ATTACHED: Dict[str, SharedMemory] = {}   # "inst/tf" -> mapped block
+
+
+def _init_worker(level: int):
+    logging.basicConfig(level=level, format="%(asctime)s [%(levelname)s] [pid %(process)d] %(message)s")
+
+
+def _attach(key: str, name: str) -> SharedMemory:
+    shm = _ATTACHED.get(key)
+    if shm is not None and shm.name != name:
+        # the parent replaced the block (new layout / size): drop our mapping of the old one
+        try:
+            shm.close()
+        except BufferError:
+            pass   # still referenced by an earlier frame; unmapped with the process
+        shm = None
+    if shm is None:
+        shm = _ATTACHED[key] = SharedMemory(name=name)
+    return shm
+
+
+def frames_from(descs: Dict[str, Dict]) -> Dict[str, pd.DataFrame]:
+    """Read-only DataFrames over the shared blocks; the largest dtype group is not copied."""
+    dfs = {}
+    for tf, d in descs.items():
+        shm = _attach(d["key"], d["name"])
+        start, end = d["start"], d["start"] + d["nrows"]
+        segs = []
+        for dt, off, cols, idx in d["groups"]:
+            arr = np.ndarray((len(cols), d["capacity"]), dtype=np.dtype(dt), buffer=shm.buf, offset=off)[:, start:end]
+            arr.flags.writeable = False
+            segs.append((cols, idx, arr))
+        segs.sort(key=lambda s: -len(s[0]))
+        cols, _idx, arr = segs[0]
+        df = pd.DataFrame(arr.T, columns=cols, copy=False)
+        # smaller groups (time) go back to their original positions
+        rest = sorted((i, c, arr[j]) for cols, idx, arr in segs[1:] for j, (c, i) in enumerate(zip(cols, idx)))
+        for i, c, col in rest:
+            df.insert(i, c, col)
+        df.attrs.update(d["attrs"])
+        dfs[tf] = df
+    return dfs
+
+
+def check_shared(descs: Dict[str, Dict], cond1_path: Optional[str] = None, profiles=None,
+                 now: Optional[float] = None):
+    """
+    run_checks on shared frames in a worker process; cond_1 state goes to `cond1_path`.
+    With `profiles`: checker.run_profiles (name -> (ok, result)). `now`: the
+    scanner's exchange clock (cond_1.clock), the worker has no OKX responses of its own.
+    """
+    from .checker import run_checks, run_profiles
+    from .conditions import cond_1
+    dfs = frames_from(descs)
+    if profiles is not None:
+        return run_profiles(dfs, profiles, cond1_path, now)
+    with cond_1.state_file(cond1_path or cond_1.STATE_FILE), cond_1.clock(now):
+        return run_checks(dfs)
+
+
+def _ping():
+    from . import checker  # noqa: F401  (import pandas + conditions once per worker)
+    return os.getpid()
+
+
+class ParallelChecks:
+    """SharedFrames + a spawn-context process pool running check_shared."""
+
+    def __init__(self, workers: int = PARALLEL_WORKERS, log_level: int = logging.INFO):
+        self.workers = workers
+        self.frames = SharedFrames()
+        # spawn, not fork: the parent runs pipeline/HTTP threads
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                        initializer=_init_worker, initargs=(log_level,))
+        self.stats = {"checks": 0, "errors": 0}
+
+    def warm_up(self):
+        """Start the workers and import the condition code in each before the first cycle."""
+        pids = {f.result() for f in [self.pool.submit(_ping) for _ in range(self.workers)]}
+        logger.info("Parallel checks: %s worker process(es) ready %s", len(pids), sorted(pids))
+
+    def run_checks(self, inst: str, dfs: Dict[str, pd.DataFrame], cond1_path: Optional[str] = None,
+                   profiles=None, now: Optional[float] = None):
+        descs = self.frames.publish(inst, dfs)
+        try:
+            out = self.pool.submit(check_shared, descs, cond1_path, profiles, now).result()
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        self.stats["checks"] += 1
+        return out
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.frames.close()
+
+    def status(self) -> Dict:
+        return dict(self.stats, workers=self.workers, frames=self.frames.status())
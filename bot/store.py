@@ -0,0 +1,207 @@
+# bot/store.py
+# In-memory candle store for one instrument with a binary snapshot on disk.
+#
+# Each cycle asks OKX only for the bars that can have changed since the last
+# stored one (the previously forming bar, anything closed since, the new forming
+# bar) and merges them in; a TF whose raw bars did not change keeps its
+# indicator frame from the previous cycle. After a clean cycle the raw bars and
+# indicator frames are written to SNAPSHOT_FILE (numpy .npz, no pickle) and
+# restored at start, so a restarted process fetches just the bars it missed.
+# Without a usable snapshot the bars come from the candle archive (bot/archive.py)
+# when it reaches close enough to now.
+
+import os
+import json
+import time
+import logging
+from typing import Callable, Dict, Iterable, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from .config import SNAPSHOT_FILE, SNAPSHOT_MAX_AGE_SEC, OKX_REQUEST_PAUSE
+
+logger = logging.getLogger(__name__)
+
+TF_SECONDS = {"5m": 300, "15m": 900, "30m": 1800, "1H": 3600, "2H": 7200}
+SNAPSHOT_VERSION = 1
+RAW_COLUMNS = ["time", "open", "high", "low", "close", "volume"]
+
+
+class CandleStore:
+    def __init__(self, inst: str, timeframes: Iterable[str], limit: int, clock: Callable[[], float] = time.time):
+        self.inst = inst
+        self.clock = clock                              # decides which bars are closed (bot/hedge.py OKX.now)
+        self.timeframes = list(timeframes)
+        self.limit = limit
+        self.raw: Dict[str, pd.DataFrame] = {}          # tf -> time/open/high/low/close/volume, oldest first
+        self.indicators: Dict[str, pd.DataFrame] = {}   # tf -> frame handed to run_checks last cycle
+        self.restored_from: Optional[float] = None      # snapshot save time, if restored
+        self.last_fetch: Dict[str, int] = {}            # tf -> rows requested on the last refresh
+        self.fetched_at: Dict[str, float] = {}          # tf -> time of the last successful fetch (by `clock`)
+        self.wanted: Set[str] = set()                   # HTFs the last evaluation read (bot/lazy.py)
+        self.holes: Dict[str, Set[int]] = {}            # tf -> gap starts OKX had no bars for (bot/integrity.py)
+
+    # --- incremental fetch ---
+    def rows_needed(self, tf: str, now: Optional[float] = None) -> Optional[int]:
+        """Rows to request for `tf`, or None when a full download is needed."""
+        df = self.raw.get(tf)
+        if df is None or not len(df):
+            return None
+        now = self.clock() if now is None else now
+        sec = TF_SECONDS.get(tf, 300)
+        missed = max(0, int(now - int(df["time"].iat[-1])) // sec)
+        need = missed + 2   # previously forming bar + closed since + new forming bar
+        return None if need >= self.limit else need
+
+    def merge(self, tf: str, new: pd.DataFrame) -> bool:
+        """Merge freshly fetched bars (newer rows win); True if the stored bars changed."""
+        old = self.raw.get(tf)
+        if old is None or not len(old) or not len(new):
+            merged = new
+        elif int(new["time"].iat[0]) > int(old["time"].iat[-1]):
+            # a gap between the stored and the fetched bars: keep both, repair() fills it
+            merged = pd.concat([old, new], ignore_index=True)
+        else:
+            keep = old[old["time"] < int(new["time"].iat[0])]
+            merged = pd.concat([keep, new], ignore_index=True)
+        merged = merged.drop_duplicates("time", keep="last").sort_values("time")
+        merged = merged.iloc[-self.limit:].reset_index(drop=True)
+        changed = old is None or len(old) != len(merged) or not np.array_equal(
+            old[RAW_COLUMNS].to_numpy(), merged[RAW_COLUMNS].to_numpy())
+        self.raw[tf] = merged
+        return changed
+
+    def check(self, tf: str, fetch_before: Optional[Callable[[str, int, int], pd.DataFrame]] = None,
+              now: Optional[float] = None, fetched: Optional[pd.DataFrame] = None) -> bool:
+        """
+        Integrity pass over the stored bars of `tf` (bot/integrity.py); `fetched`
+        is the response just merged (merge() already dropped its duplicates and
+        sorted it, so they are counted here). True if a repair added bars.
+        """
+        from .integrity import INTEGRITY, inspect, repair
+        holes = self.holes.setdefault(tf, set())
+        df, rep = repair(self.raw[tf], tf, fetch_before, self.clock() if now is None else now, holes)
+        if fetched is not None and len(fetched):
+            got = inspect(fetched, tf)
+            rep["duplicates"] += got["duplicates"]
+            rep["non_monotone"] += got["non_monotone"]
+        if len(df):
+            # holes that slid out of the window are forgotten
+            holes -= {h for h in holes if h < int(df["time"].iat[0])}
+        known = sum(g[2] for g in rep["gaps"] if g[0] in holes and g[0] not in rep["new_holes"])
+        INTEGRITY.record(self.inst, tf, rep, known_holes=known)
+        self.raw[tf] = df.iloc[-self.limit:].reset_index(drop=True)
+        return rep["repaired"] > 0
+
+    def refresh(self, fetch: Callable[[str, int], pd.DataFrame], now: Optional[float] = None,
+                timeframes: Optional[Iterable[str]] = None,
+                fetch_before: Optional[Callable[[str, int, int], pd.DataFrame]] = None) -> Set[str]:
+        """
+        Bring every TF (or just `timeframes`) up to date. fetch(tf, limit) returns
+        bars oldest first. Full downloads keep the polite OKX pause between them;
+        the small incremental requests do not. The merged bars go through the
+        integrity check; fetch_before(tf, ts, limit) (bars older than ts) lets it
+        fetch what is missing. Returns the TFs whose bars changed.
+        """
+        changed = set()
+        full = False
+        for tf in (self.timeframes if timeframes is None else timeframes):
+            need = self.rows_needed(tf, now)
+            if need is None and full:
+                time.sleep(OKX_REQUEST_PAUSE)
+            full = full or need is None
+            if need is None:
+                self.raw.pop(tf, None)
+                need = self.limit
+            self.last_fetch[tf] = need
+            t0 = self.clock()
+            new = fetch(tf, need)
+            if self.merge(tf, new):
+                changed.add(tf)
+            if self.check(tf, fetch_before, now, fetched=new):
+                changed.add(tf)
+            self.fetched_at[tf] = t0
+        return changed
+
+    # --- snapshot ---
+    def save_snapshot(self, path: str = SNAPSHOT_FILE) -> bool:
+        """Write raw bars + indicator frames to `path` atomically."""
+        arrays, meta = {}, {"version": SNAPSHOT_VERSION, "inst": self.inst, "limit": self.limit,
+                            "saved_ts": time.time(), "fetched_at": dict(self.fetched_at),
+                            "skew": self.clock() - time.time(), "frames": {}}
+        for kind, frames in (("raw", self.raw), ("ind", self.indicators)):
+            for tf, df in frames.items():
+                key = f"{kind}/{tf}"
+                meta["frames"][key] = {"columns": list(df.columns), "attrs": dict(df.attrs)}
+                for i, col in enumerate(df.columns):
+                    arrays[f"{key}/{i}"] = df[col].to_numpy()
+        arrays["meta"] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, path)
+            return True
+        except Exception:
+            logger.exception("Store: failed to write snapshot %s", path)
+            return False
+
+    def load_snapshot(self, path: str = SNAPSHOT_FILE, max_age: float = SNAPSHOT_MAX_AGE_SEC) -> bool:
+        """Restore from `path` if it belongs to this instrument and is recent enough."""
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                meta = json.loads(z["meta"].tobytes().decode("utf-8"))
+                if meta.get("version") != SNAPSHOT_VERSION or meta.get("inst") != self.inst:
+                    logger.info("Store: snapshot %s is for %s v%s, ignored", path, meta.get("inst"), meta.get("version"))
+                    return False
+                age = time.time() - float(meta["saved_ts"])
+                if age > max_age:
+                    logger.info("Store: snapshot %s is %.0fs old (> %ss), ignored", path, age, max_age)
+                    return False
+                raw, ind = {}, {}
+                for key, spec in meta["frames"].items():
+                    kind, tf = key.split("/", 1)
+                    df = pd.DataFrame({col: z[f"{key}/{i}"] for i, col in enumerate(spec["columns"])})
+                    df.attrs.update(spec["attrs"])
+                    (raw if kind == "raw" else ind)[tf] = df
+        except Exception:
+            logger.exception("Store: failed to read snapshot %s", path)
+            return False
+        self.raw = {tf: df.iloc[-self.limit:].reset_index(drop=True) for tf, df in raw.items()}
+        self.indicators = ind
+        self.restored_from = float(meta["saved_ts"])
+        logger.info("Store: restored %s TF(s) from %s (%.0fs old)", len(self.raw), path, age)
+        return True
+
+    def load_archive(self, archive, now: Optional[float] = None) -> Set[str]:
+        """
+        Cold start without a snapshot: the last `limit` bars of each TF from the
+        candle archive (bot/archive.py) when they are recent enough for an
+        incremental refresh. Returns the TFs seeded.
+        """
+        now = self.clock() if now is None else now
+        seeded = set()
+        for tf in self.timeframes:
+            if tf in self.raw:
+                continue
+            df = archive.frame(self.inst, tf, last=self.limit)
+            if not len(df):
+                continue
+            self.raw[tf] = df
+            if self.rows_needed(tf, now) is None:
+                del self.raw[tf]   # too old: a full download is as cheap
+                continue
+            seeded.add(tf)
+        if seeded:
+            logger.info("Store: %s seeded from the candle archive for %s", sorted(seeded), self.inst)
+        return seeded
+
+    def status(self) -> Dict:
+        return {
+            "bars": {tf: len(df) for tf, df in self.raw.items()},
+            "last_fetch": dict(self.last_fetch),
+            "restored_from": self.restored_from,
+        }
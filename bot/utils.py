@@ -28,6 +28,10 @@ def map_index_by_time(src_df: pd.DataFrame, dst_df: pd.DataFrame, src_idx: int)
     pos = dst_df["time"].searchsorted(t, side="right") - 1
     return max(0, min(pos, len(dst_df)-1))
 
+def bar_time(df: pd.DataFrame, i: int) -> int:
+    """Absolute epoch seconds of bar i (compact frames store time relative to attrs["time_base"])."""
+    return int(df["time"].iat[i]) + int(df.attrs.get("time_base", 0))
+
 def within(value: float, target: float, tol: float) -> bool:
     return abs(value - target) <= tol
 
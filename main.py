@@ -4,25 +4,35 @@
 # logs per-condition details, stores snapshot, and notifies via Telegram.
 
 import os
+import sys
+import atexit
 import time
 import json
 import logging
+import threading
 import traceback
-from threading import Thread
-from datetime import datetime
-from flask import Flask, jsonify, request
+from datetime import datetime, timezone
+from flask import Flask, Response, jsonify, request
 
-import requests
-import pandas as pd
 
-# project modules
+PROCESS_START_TS = time.time()
+
+# project modules (light ones only: pandas/numpy and everything built on them --
+# indicators, checker, store, compact, utils -- are imported inside the functions
+# that need them, so a cold start serves "/" before the scanner pulls them in)
 from bot.config import (
     TIMEFRAMES, CANDLES_LIMIT, STATE_FILE, LOG_FILE, BOT_INTERVAL_SEC,
-    TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, STRICT_MODE, ENABLED_CONDITIONS, EXCHANGE, INSTRUMENT_ID
+    TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, STRICT_MODE, ENABLED_CONDITIONS, EXCHANGE, INSTRUMENT_ID, INSTRUMENTS,
+    PIPELINE_QUEUE_SIZE, PIPELINE_FETCH_WORKERS, PIPELINE_STOP_TIMEOUT_SEC, PARALLEL_WORKERS, READINESS_HOT, COLD_POLL_SEC, LAZY_FRAMES, CYCLE_DEADLINE, SHARD_STORE, ARCHIVE_DIR,
+    COMPACT_MODE, MEMORY_BUDGET_MB_PER_INST, INTRABAR_ENABLED, INTRABAR_POLL_SEC, SNAPSHOT_FILE, OKX_REQUEST_PAUSE, PROFILE_TOP_N, EVENTS_KEEPALIVE_SEC, EVENTS_STREAM_MAX_SEC, FRESH_WAIT_TIMEOUT_SEC,
 )
-from bot.indicators import add_all_indicators
-from bot.checker import run_checks
-from bot.notifier import send_telegram_message, format_message
+from bot.hedge import OKX
+from bot.notifier import send_telegram_message, send_telegram_message_now, format_message, DIGESTS, DELIVERY
+from bot.profiler import PROFILER
+from bot.scanner import ScannerLifecycle
+from bot.events import EVENTS, cycle_event, format_sse, follow_journal
+from bot.cycle import LATEST, describe
+from bot.deadline import CycleBudget, DEADLINES
 
 app = Flask(__name__)
 
@@ -36,8 +46,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ema-bot-prod")
 
-OKX_BASE = "https://www.okx.com"
-
 # -----------------------------
 # OKX candles helper
 # -----------------------------
@@ -49,18 +57,19 @@ OKX_TF_MAP = {
     "2H": "2H",
 }
 
-def get_okx_candles(instId: str, bar: str, limit: int = 200, since: int = None):
+def get_okx_candles(instId: str, bar: str, limit: int = 200, since: int = None, after: int = None):
     """
     Request OKX candlesticks.
     Returns list of candles as returned by OKX API (most recent first).
+    `after` (ms) pages back: only candles older than that timestamp.
     """
-    url = f"{OKX_BASE}/api/v5/market/candles"
     params = {"instId": instId, "bar": bar, "limit": min(limit, 200)}
+    if after is not None:
+        params["after"] = str(after)
     # OKX supports limit up to 200 by default; if CANDLES_LIMIT > 200 we fetch in pages (below)
     try:
-        r = requests.get(url, params=params, timeout=10)
-        r.raise_for_status()
-        data = r.json()
+        # hedged across OKX_API_BASES (bot/hedge.py): a slow host no longer holds the cycle for the full timeout
+        data = OKX.get("/api/v5/market/candles", params)
     except Exception as e:
         logger.exception("OKX candles request failed: %s %s", instId, e)
         raise
@@ -76,81 +85,180 @@ def get_okx_candles(instId: str, bar: str, limit: int = 200, since: int = None):
         return data
     raise Exception(f"Unexpected OKX response format: {data}")
 
+def fetch_candles_tf(inst_id: str, tf: str, limit: int):
+    """
+    Fetch candles for one TF and return a DataFrame with columns:
+    time (int seconds), open, high, low, close, volume (oldest first)
+    """
+    bar = OKX_TF_MAP.get(tf, tf)
+    # OKX returns newest first; we'll request up to limit (<=200)
+    # We'll do two-page fetch if requested limit > 200 (simple implementation)
+    needed = limit
+    all_rows = []
+    to_fetch = min(needed, 200)
+    try:
+        rows = get_okx_candles(inst_id, bar, to_fetch)
+        all_rows.extend(rows)
+        # if needed more than 200, try second page using since parameter from last item
+        if needed > 200 and len(rows) == 200:
+            # rows are most recent first; the oldest (in this batch) is rows[-1][0] time string
+            last_ts = int(rows[-1][0])  # OKX candle format: [ts, open, high, low, close, vol]
+            more = get_okx_candles(inst_id, bar, min(needed - 200, 200), after=last_ts)
+            all_rows.extend(more)
+    except Exception as e:
+        logger.exception("Failed to fetch candles for %s %s: %s", inst_id, tf, e)
+        raise
+
+    from bot.data import okx_rows_to_frame
+    return okx_rows_to_frame(all_rows)
+
+def fetch_candles_before(inst_id: str, tf: str, before_ts: int, limit: int):
+    """Up to `limit` (<=200) candles of `tf` older than `before_ts` (seconds), oldest first: integrity repairs."""
+    from bot.data import okx_rows_to_frame
+    rows = get_okx_candles(inst_id, OKX_TF_MAP.get(tf, tf), limit, after=int(before_ts) * 1000)
+    return okx_rows_to_frame(rows)
+
 def fetch_candles_all_tf(inst_id: str, timeframes: list, limit: int):
     """
-    Fetch candles for all TFs and return dict tf->DataFrame with columns:
-    time (int seconds), open, high, low, close, volume
+    Fetch candles for all TFs and return dict tf->DataFrame (see fetch_candles_tf)
     """
     results = {}
     for tf in timeframes:
-        bar = OKX_TF_MAP.get(tf, tf)
-        # OKX returns newest first; we'll request up to limit (<=200)
-        # If limit > 200, implement paging (not implemented here because config default <=300)
-        # We'll do two-page fetch if requested limit > 200 (simple implementation)
-        needed = limit
-        all_rows = []
-        to_fetch = min(needed, 200)
-        try:
-            rows = get_okx_candles(inst_id, bar, to_fetch)
-            all_rows.extend(rows)
-            # if needed more than 200, try second page using since parameter from last item
-            if needed > 200 and len(rows) == 200:
-                # rows are most recent first; the oldest (in this batch) is rows[-1][0] time string
-                last_ts = int(rows[-1][0])  # OKX candle format: [ts, open, high, low, close, vol]
-                more = get_okx_candles(inst_id, bar, min(needed - 200, 200))
-                all_rows.extend(more)
-        except Exception as e:
-            logger.exception("Failed to fetch candles for %s %s: %s", inst_id, tf, e)
-            raise
-
-        # transform OKX candle format -> DataFrame
-        # OKX: each candle: [ts, open, high, low, close, vol] where ts is milliseconds or seconds? OKX v5 returns ISO? Usually epoch ms
-        # From experience: OKX returns string timestamp in milliseconds.
-        df_rows = []
-        for c in reversed(all_rows):  # reverse so oldest first
-            try:
-                ts = int(c[0])
-                # if ts looks like ms ( > 1e12 ), convert to seconds
-                if ts > 3_000_000_000:
-                    ts = ts // 1000
-                o = float(c[1])
-                h = float(c[2])
-                l = float(c[3])
-                cl = float(c[4])
-                vol = float(c[5])
-                df_rows.append([ts, o, h, l, cl, vol])
-            except Exception:
-                # skip malformed
-                continue
-        df = pd.DataFrame(df_rows, columns=["time", "open", "high", "low", "close", "volume"])
-        # ensure sorted by time ascending
-        df = df.sort_values("time").reset_index(drop=True)
-        results[tf] = df
+        results[tf] = fetch_candles_tf(inst_id, tf, limit)
         # small polite pause to avoid hammering API
-        time.sleep(0.15)
+        time.sleep(OKX_REQUEST_PAUSE)
     return results
 
 # -----------------------------
 # Build dfs with indicators
 # -----------------------------
-def build_dfs():
+def _with_indicators(df):
+    from bot.indicators import add_all_indicators
+    try:
+        out = add_all_indicators(df)
+    except Exception as e:
+        logger.exception("add_all_indicators failed: %s", e)
+        # still keep original DF so checks can handle missing values
+        out = df
+    return out
+
+def eager_timeframes(store=None, level=0):
     """
-    Fetch candles for all required TFs and compute indicators for each dataframe
+    TFs the fetch stage refreshes: with LAZY_FRAMES 5m plus the ones the last
+    evaluation of the instrument read (store.wanted), otherwise all of them.
+    Worker processes (PARALLEL_WORKERS) cannot load a TF on demand: all of them.
+    A cycle already behind its fetch budget (level >= 1) refreshes 5m only.
     """
-    dfs = fetch_candles_all_tf(INSTRUMENT_ID, TIMEFRAMES, CANDLES_LIMIT)
-    # compute indicators
-    for tf, df in dfs.items():
-        try:
-            dfs[tf] = add_all_indicators(df.copy())
-        except Exception as e:
-            logger.exception("add_all_indicators failed for %s: %s", tf, e)
-            # still keep original DF so checks can handle missing values
-            dfs[tf] = df
+    if level >= 1:
+        return ["5m"]
+    if not LAZY_FRAMES or PARALLEL_WORKERS > 0:
+        return list(TIMEFRAMES)
+    wanted = store.wanted if store is not None else set()
+    return [tf for tf in TIMEFRAMES if tf == "5m" or tf in wanted]
+
+def archived_before(inst, tf, before_ts, limit):
+    """The `limit` bars before `before_ts` from the candle archive if it has all of them, else from OKX."""
+    if ARCHIVE_DIR:
+        from bot.archive import ARCHIVE
+        from bot.store import TF_SECONDS
+        sec = TF_SECONDS.get(tf, 300)
+        got = ARCHIVE.before(inst, tf, before_ts, limit)
+        if len(got) == limit and int(got["time"].iat[-1]) == before_ts - sec and \
+                int(got["time"].iat[-1]) - int(got["time"].iat[0]) == (limit - 1) * sec:
+            return got
+    return fetch_candles_before(inst, tf, before_ts, limit)
+
+def archive_bars(inst, raw, timeframes):
+    """Closed bars of `timeframes` not in the candle archive yet are appended (bot/archive.py)."""
+    if not ARCHIVE_DIR:
+        return
+    from bot.archive import ARCHIVE
+    for tf in timeframes:
+        ARCHIVE.append(inst, tf, raw[tf], OKX.now())
+
+def fetch_raw(store=None, inst=INSTRUMENT_ID, timeframes=None):
+    """
+    Raw candles for all TFs (or `timeframes`) -> (raw frames, TFs that changed).
+    With a CandleStore only missed bars are fetched. Either way the bars pass
+    the integrity check (bot/integrity.py): gaps and a stale tail are fetched
+    by range (from the candle archive when it has them), duplicates and
+    out-of-order rows are dropped / sorted. Closed bars that changed go to the archive.
+    """
+    timeframes = list(TIMEFRAMES if timeframes is None else timeframes)
+    before = lambda tf, ts, limit: archived_before(inst, tf, ts, limit)
+    if store is None:
+        from bot.integrity import INTEGRITY, repair
+        raw = fetch_candles_all_tf(inst, timeframes, CANDLES_LIMIT)
+        for tf in timeframes:
+            raw[tf], rep = repair(raw[tf], tf, before, OKX.now())
+            INTEGRITY.record(inst, tf, rep)
+        archive_bars(inst, raw, timeframes)
+        return raw, set(raw)
+    changed = store.refresh(lambda tf, limit: fetch_candles_tf(inst, tf, limit), timeframes=timeframes,
+                            fetch_before=before)
+    raw = {tf: store.raw[tf] for tf in timeframes}
+    archive_bars(inst, raw, [tf for tf in timeframes if tf in changed])
+    return raw, changed
+
+def compute_dfs(raw, changed, store=None):
+    """Indicators per TF of `raw`; TFs whose bars did not change reuse the store's previous frame."""
+    from bot.compact import compact_frame
+    dfs = {}
+    for tf, df in raw.items():
+        if store is not None and tf not in changed and tf in store.indicators:
+            dfs[tf] = store.indicators[tf]
+            continue
+        # add_all_indicators copies; the raw frame stays in the store only
+        dfs[tf] = _with_indicators(df)
+        if COMPACT_MODE:
+            dfs[tf] = compact_frame(dfs[tf], tf)
+    if store is not None:
+        store.indicators.update(dfs)
     return dfs
 
+def lazy_dfs(dfs, store=None, inst=INSTRUMENT_ID, budget=None):
+    """
+    bot.lazy.LazyFrames over the computed TFs: any other TF is fetched + computed
+    on first read, or taken from the store's previous frame when the cycle is
+    behind its budget (bot/deadline.py) and that frame is at most one bar old.
+    """
+    from bot.lazy import LazyFrames
+    from bot.store import TF_SECONDS
+
+    def load(tf):
+        if (budget is not None and budget.update() >= 1 and store is not None and tf in store.indicators
+                and store.clock() - store.fetched_at.get(tf, 0) <= TF_SECONDS.get(tf, 300)):
+            budget.cached.append(tf)
+            logger.info("[%s] %s from the previous cycle (behind budget: %s)", inst, tf, budget.overruns)
+            return store.indicators[tf]
+        raw, changed = fetch_raw(store, inst, [tf])
+        logger.info("[%s] %s loaded on demand", inst, tf)
+        return compute_dfs(raw, changed, store)[tf]
+    return LazyFrames(TIMEFRAMES, load, dfs)
+
+def build_dfs(store=None, inst=INSTRUMENT_ID):
+    """
+    Fetch candles for the eager TFs and compute indicators for each dataframe;
+    the other TFs follow when a condition reads them
+    """
+    raw, changed = fetch_raw(store, inst, eager_timeframes(store))
+    return lazy_dfs(compute_dfs(raw, changed, store), store, inst)
+
+def report_memory(inst, dfs):
+    """Log resident frame memory for one instrument; warn above MEMORY_BUDGET_MB_PER_INST."""
+    from bot.compact import frames_nbytes
+    per_tf = frames_nbytes(dfs)
+    total_mb = sum(per_tf.values()) / 1e6
+    if total_mb > MEMORY_BUDGET_MB_PER_INST:
+        logger.warning("Frames for %s use %.2f MB > budget %.2f MB: %s", inst, total_mb, MEMORY_BUDGET_MB_PER_INST, per_tf)
+    return {"total_mb": round(total_mb, 3), "by_tf": per_tf, "compact": COMPACT_MODE}
+
 # -----------------------------
 # State helpers
 # -----------------------------
+# state is shared by the pipeline's check/persist workers and the intrabar ticks
+STATE_LOCK = threading.RLock()
+
 def load_state():
     try:
         if os.path.exists(STATE_FILE):
@@ -161,119 +269,663 @@ def load_state():
     return {}
 
 def save_state(state):
+    # write-then-rename so HTTP workers never read a half-written file
     try:
-        with open(STATE_FILE, "w", encoding="utf-8") as f:
-            json.dump(state, f)
+        with STATE_LOCK:
+            tmp = f"{STATE_FILE}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp, STATE_FILE)
     except Exception:
         logger.exception("Failed to save state")
 
+def inst_state(state, inst):
+    """Dedup keys / last results of one instrument: top level for INSTRUMENT_ID, state["instruments"][inst] otherwise."""
+    if inst == INSTRUMENT_ID:
+        return state
+    return state.setdefault("instruments", {}).setdefault(inst, {})
+
 # -----------------------------
-# Bot loop
+# Cycle stages (run serially by run_cycle or by the pipeline workers)
 # -----------------------------
-def bot_loop():
-    logger.info("🚀 EMA-Bot (prod) started. Interval %s sec. TFs: %s", BOT_INTERVAL_SEC, TIMEFRAMES)
-    state = load_state()
-    last_start_key = state.get("last_start_key")
-    last_signal = (state.get("last_direction"), state.get("last_signal_ts"))
+def new_job(state, inst=INSTRUMENT_ID, store=None):
+    queued = time.time()
+    return {"inst": inst, "state": state, "store": store, "queued": queued,
+            "budget": CycleBudget(queued) if CYCLE_DEADLINE else None,
+            # the Telegram digest of the bar it was queued in, shared with the other instruments' jobs
+            "digests": DIGESTS.join(int(queued) // 300 * 300),
+            "done": threading.Event(), "ok": False}
 
-    while True:
-        try:
-            dfs = build_dfs()
-        except Exception as e:
-            logger.exception("Failed to build dfs: %s", e)
-            time.sleep(BOT_INTERVAL_SEC)
-            continue
+def leave_digest(job):
+    """The job is finished or dropped: the last one of its bar sends the digest."""
+    try:
+        sent = DIGESTS.leave(job["digests"])
+        if sent is not None:
+            logger.info("Telegram digest queued (%s report(s)): %s", *sent)
+    except Exception:
+        logger.exception("Telegram digest error")
 
-        # run centralized checks (bot.checker.run_checks expects df_by_tf mapping)
-        try:
-            ok, result = run_checks(dfs)
-        except Exception as e:
-            logger.exception("run_checks error: %s\n%s", e, traceback.format_exc())
-            # save last_snapshot with error
-            s = {"error": str(e)}
-            state["last_snapshot"] = s
-            save_state(state)
-            time.sleep(BOT_INTERVAL_SEC)
-            continue
+def checkpoint(job, stage):
+    """Degradation level of the job when `stage` starts (0 without CYCLE_DEADLINE)."""
+    budget = job.get("budget")
+    return budget.checkpoint(stage) if budget is not None else 0
+
+def finish_budget(job):
+    """Lateness of a finished (or dropped) job; a cycle that ended past its deadline is re-run on the new bar now."""
+    budget = job.get("budget")
+    if budget is None:
+        return
+    late = DEADLINES.record(job["inst"], budget)
+    if late > 0:
+        logger.warning("[%s] cycle finished %.1fs after its deadline (degraded: %s, behind: %s)",
+                       job["inst"], late, budget.applied(), budget.overruns)
+        if SCHEDULE is not None:
+            SCHEDULE.expedite(insts=[job["inst"]])
 
-        # pretty log per condition (run_checks returns dict with "by_cond")
+def fetch_stage(job):
+    level = checkpoint(job, "fetch")
+    try:
+        job["raw"], job["changed"] = fetch_raw(job["store"], job["inst"], eager_timeframes(job["store"], level))
+    except Exception as e:
+        logger.exception("Failed to fetch candles for %s: %s", job["inst"], e)
+        return None
+    return job
+
+def compute_stage(job):
+    checkpoint(job, "compute")
+    try:
+        job["dfs"] = lazy_dfs(compute_dfs(job.pop("raw"), job.pop("changed"), job["store"]),
+                              job["store"], job["inst"], job.get("budget"))
+    except Exception as e:
+        logger.exception("Failed to build dfs for %s: %s", job["inst"], e)
+        return None
+    return job
+
+def profile_state(ist, name):
+    """Dedup keys / last result of one strategy profile: the instrument state itself for the default one."""
+    from bot.profiles import DEFAULT_PROFILE
+    if name == DEFAULT_PROFILE:
+        return ist
+    return ist.setdefault("profiles", {}).setdefault(name, {})
+
+# dedup keys that travel with an instrument's lease to its next owner (bot/sharding.py)
+HANDOFF_KEYS = ("last_start_key", "last_signal_ts", "last_direction")
+
+def handoff_keys(state, inst):
+    """
+    Alert dedup keys of an instrument per profile, plus the profile's cond_1 state
+    (the impulse branch in progress, under "cond_1"), for the node that takes it over.
+    """
+    from bot.profiles import PROFILES, profile_path
+    from bot.pipeline import inst_path
+    from bot.conditions import cond_1
+    with STATE_LOCK:
+        ist = inst_state(state, inst)
+        out = {p["name"]: {k: profile_state(ist, p["name"]).get(k) for k in HANDOFF_KEYS} for p in PROFILES}
+    base = inst_path(cond_1.STATE_FILE, inst)
+    for name, pkeys in out.items():
+        with cond_1.state_file(profile_path(base, name)):
+            pkeys["cond_1"] = cond_1.snapshot()
+    return out
+
+def apply_handoff(state, inst, keys):
+    """
+    Dedup keys from the instrument's previous owner: its reports are not sent again
+    here; its cond_1 state replaces this node's (left over from an earlier lease),
+    so a branch it had started carries on instead of restarting.
+    """
+    from bot.profiles import profile_path
+    from bot.pipeline import inst_path
+    from bot.conditions import cond_1
+    base = inst_path(cond_1.STATE_FILE, inst)
+    with STATE_LOCK:
+        ist = inst_state(state, inst)
+        for name, pkeys in keys.items():
+            pkeys = dict(pkeys)
+            if "cond_1" in pkeys:   # absent: a handoff written before cond_1 travelled with it
+                with cond_1.state_file(profile_path(base, name)):
+                    cond_1.restore(pkeys.pop("cond_1"))
+            profile_state(ist, name).update({k: v for k, v in pkeys.items() if v is not None})
+
+def profile_reports(ist, profile, ok, result, dfs, inst, digest, event, level=0):
+    """
+    Debug report on the first cycle of a start candle and the final signal, each
+    once per profile (dedup keys in profile_state), to the profile's chats if it
+    has its own. A cycle degraded to no_debug (level >= 2) leaves the debug report
+    to a later cycle. Returns the signal events.
+    """
+    from bot.profiles import DEFAULT_PROFILE
+    from bot.utils import bar_time
+
+    name = profile["name"]
+    chats = profile["chats"] or None
+    tag = "" if name == DEFAULT_PROFILE else f"[{name}] "
+    with STATE_LOCK:
+        pst = profile_state(ist, name)
+        last_start_key = pst.get("last_start_key")
+        last_signal = (pst.get("last_direction"), pst.get("last_signal_ts"))
+        if pst is not ist:
+            pst["last_snapshot"] = {k: result.get(k) for k in ("summary", "direction", "start_index", "impulse_tf", "reused")}
+
+    df5 = dfs.get("5m")
+    # determine start ts if present to make keys unique
+    start_idx = result.get("start_index")
+    start_ts = None
+    if start_idx is not None and df5 is not None and len(df5) > start_idx:
         try:
-            by_cond = result.get("by_cond", {})
-            for k in sorted(by_cond.keys(), key=lambda x: int(x) if str(x).isdigit() else 999):
-                ent = by_cond[k]
-                ok_flag = ent.get("ok", False)
-                info = ent.get("info", {}) or ent.get("value", {}) or {}
-                reason = ""
-                if isinstance(info, dict):
-                    reason = info.get("reason") or info.get("note") or ""
-                logger.info("[P%s] %s reason=%s values=%s", k, "✅" if ok_flag else "❌", reason, json.dumps(info, ensure_ascii=False))
-            logger.info("SUMMARY: %s | impulse_tf=%s | direction=%s", result.get("summary"), result.get("impulse_tf"), result.get("direction"))
+            start_ts = bar_time(df5, start_idx)
         except Exception:
-            logger.exception("Failed pretty log result")
-
-        # persist snapshot
-        state["last_snapshot"] = result
-        save_state(state)
+            start_ts = int(time.time())
 
-        # determine start ts if present to make keys unique
-        start_idx = result.get("start_index")
-        df5 = dfs.get("5m")
-        start_ts = None
-        if start_idx is not None and df5 is not None and len(df5) > start_idx:
+    events = []
+    # send debug Telegram report on first time we see this start candle
+    if start_ts is not None and level >= 2:
+        logger.info("%sTelegram debug report deferred (cycle behind budget)", tag)
+    elif start_ts is not None:
+        start_key = f"{result.get('direction')}|{start_ts}"
+        if start_key != last_start_key:
             try:
-                start_ts = int(df5["time"].iloc[start_idx])
+                price = None
+                try:
+                    price = float(dfs["5m"]["close"].iloc[-1])
+                except Exception:
+                    price = None
+                msg = format_message(result, price or 0.0, dfs, inst)
+                digest.add(msg, inst=inst, severity="debug", chats=chats)
+                logger.info("%sTelegram debug report added to digest", tag)
             except Exception:
-                start_ts = int(time.time())
+                logger.exception("Telegram debug error")
+            with STATE_LOCK:
+                pst["last_start_key"] = start_key
 
-        # send debug Telegram report on first time we see this start candle
-        if start_ts is not None:
-            start_key = f"{result.get('direction')}|{start_ts}"
-            if start_key != last_start_key:
+    # final signal notification uniqueness & sending
+    if ok:
+        # create signal key
+        signal_key = (result.get("direction"), start_ts)
+        if signal_key != last_signal:
+            # ensure start candle is closed (there is at least one newer closed candle)
+            if start_idx is None or df5 is None or start_idx >= len(df5) - 1:
+                logger.info("%sStart candle not yet closed (start_idx=%s len(df5)=%s). Skipping final signal.", tag, start_idx, None if df5 is None else len(df5))
+            else:
+                price = None
                 try:
-                    price = None
                     try:
                         price = float(dfs["5m"]["close"].iloc[-1])
                     except Exception:
                         price = None
-                    msg = format_message(result, price or 0.0, dfs)
-                    sent = send_telegram_message(msg)
-                    logger.info("Telegram debug report sent: %s", sent)
+                    msg = format_message(result, price or 0.0, dfs, inst)
+                    digest.add(msg, inst=inst, severity="signal", chats=chats)
+                    logger.info("✅ %sFinal signal added to Telegram digest (inst=%s direction=%s start_ts=%s)", tag, inst, result.get("direction"), start_ts)
                 except Exception:
-                    logger.exception("Telegram debug error")
-                last_start_key = start_key
-                state["last_start_key"] = last_start_key
-                save_state(state)
-
-        # final signal notification uniqueness & sending
-        if ok:
-            # create signal key
-            signal_key = (result.get("direction"), start_ts)
-            if signal_key != last_signal:
-                # ensure start candle is closed (there is at least one newer closed candle)
-                if start_idx is None or df5 is None or start_idx >= len(df5) - 1:
-                    logger.info("Start candle not yet closed (start_idx=%s len(df5)=%s). Skipping final signal.", start_idx, None if df5 is None else len(df5))
-                else:
-                    try:
-                        price = None
-                        try:
-                            price = float(dfs["5m"]["close"].iloc[-1])
-                        except Exception:
-                            price = None
-                        msg = format_message(result, price or 0.0, dfs)
-                        send_telegram_message(msg)
-                        logger.info("✅ Final signal sent via Telegram (direction=%s start_ts=%s)", result.get("direction"), start_ts)
-                    except Exception:
-                        logger.exception("Failed to send final telegram")
-                    last_signal = signal_key
-                    state["last_signal_ts"] = start_ts
-                    state["last_direction"] = result.get("direction")
-                    save_state(state)
-            else:
-                logger.info("Duplicate final signal suppressed")
+                    logger.exception("Failed to send final telegram")
+                signal_event = dict(event, start_ts=start_ts, price=price, profile=name)
+                with STATE_LOCK:
+                    pst["last_signal_ts"] = start_ts
+                    pst["last_direction"] = result.get("direction")
+                    pst["last_signal_event"] = signal_event
+                events.append(("signal", signal_event))
+                try:
+                    from bot.outcomes import OUTCOMES
+                    # followed bar by bar from here on (bot/outcomes.py), per profile and branch
+                    OUTCOMES.open(inst, name, result.get("summary"), result.get("direction"), start_ts, price, df5,
+                                  OKX.now())
+                except Exception:
+                    logger.exception("%sOutcome tracking failed to open", tag)
+        else:
+            logger.info("%sDuplicate final signal suppressed", tag)
+    else:
+        logger.info("%sNo final signal this cycle: %s", tag, result.get("summary"))
+    return events
+
+def check_stage(job):
+    """
+    run_checks for every strategy profile (one pass, shared condition results) +
+    pretty log + LATEST for the default profile, then each profile's reports: dedup
+    keys (last_start_key / last_signal) are read from and written to the profile's
+    state, Telegram reports collected into the bar's digest (shared with the other
+    instruments' jobs), events queued for persist_stage.
+    Results of a cycle behind its budget carry result["degraded"] (bot/deadline.py).
+    """
+    from bot.checker import run_profiles
+    from bot.conditions import cond_1
+    from bot.pipeline import inst_path
+    from bot.profiles import PROFILES, DEFAULT_PROFILE
+    from bot.utils import bar_time
+
+    inst, state, dfs, store, budget = job["inst"], job["state"], job["dfs"], job["store"], job.get("budget")
+    checkpoint(job, "check")
+    with STATE_LOCK:
+        ist = inst_state(state, inst)
+
+    # run centralized checks (bot.checker.run_profiles expects df_by_tf mapping)
+    cond1_path = inst_path(cond_1.STATE_FILE, inst)
+    try:
+        if PARALLEL is not None:
+            # worker process over shared-memory frames; cond_1 state files passed explicitly
+            results = PARALLEL.run_checks(inst, dfs.load_all(), cond1_path, PROFILES, OKX.now())
+        else:
+            results = run_profiles(dfs, PROFILES, cond1_path, OKX.now())
+        ok, result = results[DEFAULT_PROFILE]
+        if store is not None:
+            # prefetched by the next cycle's fetch stage
+            store.wanted = dfs.read - {"5m"}
+        if budget is not None:
+            for _ok, res in results.values():
+                budget.mark(res)
+    except Exception as e:
+        from bot.lazy import FrameLoadError
+        if isinstance(e, FrameLoadError) and store is not None:
+            # cond_1 state was put back (run_profiles): fetch the TF with the next cycle's 5m, before cond_1
+            store.wanted = (store.wanted | dfs.read | {e.tf}) - {"5m"}
+        logger.exception("run_checks error: %s\n%s", e, traceback.format_exc())
+        # save last_snapshot with error
+        s = {"error": str(e)}
+        with STATE_LOCK:
+            ist["last_snapshot"] = s
+        save_state(state)
+        return None
+
+    # readiness for the scheduler + signed threshold margins next to each condition's flag
+    ready = None
+    try:
+        from bot.priority import readiness
+        with cond_1.state_file(cond1_path):
+            c1 = cond_1.load_state()
+        ready = readiness(dfs, result, c1, PROFILES[0])
+        for cid, m in ready.pop("margins").items():
+            if cid in result.get("by_cond", {}):
+                result["by_cond"][cid]["margins"] = m
+        if SCHEDULE is not None:
+            SCHEDULE.update(inst, ready["score"], any(ready[d]["phase"] == "approach" for d in ("long", "short")))
+    except Exception:
+        logger.exception("Readiness scoring failed for %s", inst)
+
+    # pretty log per condition (run_checks returns dict with "by_cond"); not when behind budget
+    level = budget.update() if budget is not None else 0
+    try:
+        by_cond = result.get("by_cond", {}) if level < 2 else {}
+        for k in sorted(by_cond.keys(), key=lambda x: int(x) if str(x).isdigit() else 999):
+            ent = by_cond[k]
+            ok_flag = ent.get("ok", False)
+            info = ent.get("info", {}) or ent.get("value", {}) or {}
+            reason = ""
+            if isinstance(info, dict):
+                reason = info.get("reason") or info.get("note") or ""
+            margins = f" margins={json.dumps(ent['margins'])}" if ent.get("margins") else ""
+            logger.info("[%s][P%s] %s reason=%s values=%s%s", inst, k, "✅" if ok_flag else "❌", reason, json.dumps(info, ensure_ascii=False), margins)
+        logger.info("[%s] SUMMARY: %s | impulse_tf=%s | direction=%s | frames=%s", inst, result.get("summary"), result.get("impulse_tf"), result.get("direction"),
+                    ",".join(tf for tf in TIMEFRAMES if tf in dfs.loaded))
+        for name, (p_ok, p_res) in results.items():
+            if name != DEFAULT_PROFILE:
+                logger.info("[%s][%s] SUMMARY: %s | impulse_tf=%s | direction=%s | reused=%s", inst, name,
+                            p_res.get("summary"), p_res.get("impulse_tf"), p_res.get("direction"), p_res.get("reused"))
+        if ready is not None:
+            logger.info("[%s] READINESS: %s (%s) long=%s short=%s", inst, ready["score"], ready["direction"],
+                        json.dumps(ready["long"]), json.dumps(ready["short"]))
+    except Exception:
+        logger.exception("Failed pretty log result")
+
+    df5 = dfs.get("5m")
+    bar_ts = bar_time(df5, -1) if df5 is not None and len(df5) else None
+
+    # publish to HTTP readers (frames + result); state/events are written by persist_stage
+    snap = LATEST.publish(inst, ok, result, bar_ts, job["queued"])
+    from bot.query import FRAMES
+    from bot.levels import LEVELS
+    # /indicators: this cycle's frames + the store's last ones of TFs it did not load
+    frames = dict(store.indicators, **dfs.materialized()) if store is not None else dfs.materialized()
+    FRAMES.publish(inst, frames, store.fetched_at if store is not None else None, OKX.skew)
+    try:
+        # support/resistance for the alerts below: only bars closed since the last cycle are walked
+        LEVELS.update(inst, frames, OKX.now())
+    except Exception:
+        logger.exception("Levels update failed for %s", inst)
+    from bot.outcomes import OUTCOMES
+    try:
+        # outcomes of earlier signals: the 5m bars closed since the last cycle
+        OUTCOMES.feed(inst, frames.get("5m"), OKX.now())
+    except Exception:
+        logger.exception("Outcome update failed for %s", inst)
+    event = cycle_event(result, inst, bar_ts, ok)
+    events = [("cycle", event)]
+    memory = report_memory(inst, dfs)
+
+    digest = DIGESTS.digest(job["digests"], bar_ts)
+    with STATE_LOCK:
+        state.setdefault("memory", {})[inst] = memory
+        if ready is not None:
+            state.setdefault("readiness", {})[inst] = ready
+        ist["last_snapshot"] = result
+        ist["last_event"] = event
+        ist["last_cycle_queued"] = job["queued"]   # /debug/trigger?fresh=1 in other workers waits for this
+        state["last_cycle_ts"] = snap["ts"]
+        if bar_ts is not None and ist.get("presignals"):
+            closed_ts = bar_ts if bar_ts + 300 <= OKX.now() else bar_ts - 300
+            events += resolve_presignals(ist, inst, ok, result, closed_ts, digest)
+
+    for profile in PROFILES:
+        p_ok, p_res = results[profile["name"]]
+        events += profile_reports(ist, profile, p_ok, p_res, dfs, inst, digest, event, level)
+    with STATE_LOCK:
+        state["outcomes"] = OUTCOMES.export()
+
+    job.update(ok=True, events=events)
+    job.pop("dfs")
+    return job
+
+def persist_stage(job):
+    """
+    State file, candle snapshot and SSE events -- off the check path (the Telegram
+    digest goes once the bar's last job leaves: leave_digest). A cycle degraded to defer_persist (level 3) leaves the files to the next one.
+    """
+    inst, store = job["inst"], job["store"]
+    if checkpoint(job, "persist") >= 3:
+        logger.warning("[%s] state/snapshot write deferred to the next cycle (behind budget)", inst)
+    else:
+        save_state(job["state"])
+        if store is not None:
+            from bot.pipeline import inst_path
+            store.save_snapshot(inst_path(SNAPSHOT_FILE, inst))
+    for kind, ev in job["events"]:
+        EVENTS.publish(kind, ev, inst)
+    return job
+
+CYCLE_STAGES = (fetch_stage, compute_stage, check_stage, persist_stage)
+
+def run_cycle(state, store=None, inst=INSTRUMENT_ID):
+    """
+    One scan of one instrument, all stages in the calling thread (profiling,
+    debugging). bot_loop normally feeds the same stages through PIPELINE.
+    Returns True when the cycle completed (checks ran and state was saved).
+    """
+    job = new_job(state, inst, store)
+    try:
+        for stage in CYCLE_STAGES:
+            out = stage(job)
+            if out is None:
+                return False
+        return True
+    finally:
+        finish_budget(job)
+        leave_digest(job)
+
+def _bar_hhmm(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%H:%M UTC")
+
+def resolve_presignals(ist, inst, ok, result, closed_ts, digest):
+    """
+    Confirm or cancel pre-signals whose 5m bar has closed (closed_ts = last closed
+    bar). Called with STATE_LOCK held; returns the events to publish.
+    """
+    events = []
+    pending = ist.get("presignals", {})
+    for key, pre in list(pending.items()):
+        if pre["bar_ts"] > closed_ts:
+            continue
+        if pre["bar_ts"] < closed_ts:
+            status, why = "cancelled", "бар закрылся без проверки"
+        elif ok and result.get("direction") == pre["direction"]:
+            status, why = "confirmed", ""
         else:
-            logger.info("No final signal this cycle: %s", result.get("summary"))
+            status, why = "cancelled", result.get("summary") or ""
+        icon, word = ("✅", "подтверждён") if status == "confirmed" else ("❌", "отменён")
+        text = f"{icon} <b>{inst}</b>  •  Пре-сигнал {pre['direction'].upper()} {word} (свеча 5m {_bar_hhmm(pre['bar_ts'])})"
+        if why:
+            text += f"\n{why}"
+        digest.add(text, inst=inst, severity="presignal")
+        events.append(("presignal", dict(pre, status=status, reason=why)))
+        logger.info("Pre-signal %s %s %s: %s", inst, key, status, why)
+        del pending[key]
+    return events
+
+def run_intrabar(state, store, intrabar):
+    """
+    One intrabar tick: live price -> conditions on the forming 5m bar (dry-run)
+    -> pre-signal once per (direction, bar). Returns True when the store lags a
+    bar that has already closed, i.e. the loop should run a full cycle now.
+    """
+    from bot.data import get_live_price
+    from bot.conditions import cond_1
+    from bot.pipeline import inst_path
+    inst = intrabar.inst
+    try:
+        price = get_live_price(inst)
+    except Exception as e:
+        logger.warning("Intrabar: ticker request failed for %s: %s", inst, e)
+        return False
+    now = OKX.now()   # the forming bar by the exchange's clock, like store.fetched_at
+    try:
+        with cond_1.state_file(inst_path(cond_1.STATE_FILE, inst)):
+            evaluated = intrabar.evaluate(store, price, now)
+    except Exception:
+        logger.exception("Intrabar evaluation failed")
+        return False
+    if evaluated is None:
+        forming = int(now) // 300 * 300
+        if intrabar.refresh_requested_for != forming:
+            intrabar.refresh_requested_for = forming
+            return True
+        return False
 
-        time.sleep(BOT_INTERVAL_SEC)
+    ok, result, live, forming_ts = evaluated
+    if not ok:
+        return False
+    key = f"{result.get('direction')}|{forming_ts}"
+    with STATE_LOCK:
+        pending = inst_state(state, inst).setdefault("presignals", {})
+        if key in pending:
+            return False
+        pre = dict(cycle_event(result, inst, forming_ts, ok), direction=result.get("direction"),
+                   price=price, status="pending")
+        pending[key] = pre
+    header = f"⏳ <b>ПРЕ-СИГНАЛ</b> — свеча 5m {_bar_hhmm(forming_ts)} ещё формируется, подтверждение на закрытии"
+    send_telegram_message(header + "\n" + format_message(result, price, live, inst),
+                          inst=inst, severity="presignal")
+    save_state(state)
+    EVENTS.publish("presignal", pre, inst)
+    logger.info("⏳ Pre-signal sent (inst=%s direction=%s bar=%s price=%s)", inst, result.get("direction"), forming_ts, price)
+    return False
+
+# -----------------------------
+# Bot loop
+# -----------------------------
+def _job_exit(job):
+    """Pipeline exit hook: release the instrument for its next cycle, record lateness and time to first cycle."""
+    job["done"].set()
+    finish_budget(job)
+    leave_digest(job)
+    startup = job.get("startup")
+    if startup is not None and job["ok"]:
+        state = job["state"]
+        with STATE_LOCK:
+            state["startup"] = dict(startup, first_cycle_sec=round(time.time() - PROCESS_START_TS, 3),
+                                    fetched=dict(job["store"].last_fetch))
+        save_state(state)
+        logger.info("First valid cycle %.3fs after process start (snapshot restored=%s, rows fetched=%s)",
+                    state["startup"]["first_cycle_sec"], startup["restored"], state["startup"]["fetched"])
+
+def _make_pipeline():
+    from bot.pipeline import Pipeline, Stage
+    return Pipeline([
+        Stage("fetch", fetch_stage, workers=PIPELINE_FETCH_WORKERS, maxsize=PIPELINE_QUEUE_SIZE),
+        Stage("compute", compute_stage, maxsize=PIPELINE_QUEUE_SIZE),
+        # one thread per check process: a thread only waits for its worker's result
+        Stage("check", check_stage, workers=max(1, PARALLEL_WORKERS), maxsize=PIPELINE_QUEUE_SIZE),
+        Stage("persist", persist_stage, maxsize=PIPELINE_QUEUE_SIZE),
+    ], on_exit=_job_exit)
+
+PIPELINE = None
+PARALLEL = None   # bot.shm.ParallelChecks when PARALLEL_WORKERS > 0
+SCHEDULE = None   # bot.priority.PriorityScheduler
+SHARD = None      # bot.sharding.ShardCoordinator when SHARD_STORE is set
+
+def bot_loop():
+    """
+    Scanner body (bot/scanner.py): scan_loop until it fails, then stop what it
+    started before the lease is released, so a restart (or the worker that takes
+    the lease over) does not run next to this one's pipeline, processes or leases.
+    """
+    try:
+        scan_loop()
+    finally:
+        stop_scan()
+
+def stop_scan():
+    """Drain and stop PIPELINE, then close PARALLEL (processes, shared memory) and SHARD (leases)."""
+    global PIPELINE, PARALLEL, SHARD
+    if PIPELINE is not None:
+        if not PIPELINE.stop(PIPELINE_STOP_TIMEOUT_SEC):
+            logger.warning("Pipeline still busy %.0fs after stopping; its threads are left behind",
+                           PIPELINE_STOP_TIMEOUT_SEC)
+        PIPELINE = None
+    if PARALLEL is not None:
+        atexit.unregister(PARALLEL.close)
+        PARALLEL.close()
+        PARALLEL = None
+    if SHARD is not None:
+        atexit.unregister(SHARD.close)
+        SHARD.close()
+        SHARD = None
+
+def scan_loop():
+    """
+    Scheduler: submit each instrument's job to the pipeline when it is due (hot
+    ones every BOT_INTERVAL_SEC from cycle start, cold ones at the 5m close +
+    COLD_POLL_OFFSET_SEC at least COLD_POLL_SEC later), the most ready first; an instrument whose previous job is still
+    in flight is skipped. Intrabar ticks run while waiting. With SHARD_STORE only
+    the instruments this node holds leases for are loaded and scanned; the set
+    is reconciled whenever the lease heartbeat changes it (bot/sharding.py).
+    """
+    global PIPELINE, PARALLEL, SCHEDULE, SHARD
+    logger.info("🚀 EMA-Bot (prod) started. Interval %s sec. TFs: %s. Instruments: %s", BOT_INTERVAL_SEC, TIMEFRAMES, INSTRUMENTS)
+    from bot.store import CandleStore
+    from bot.pipeline import inst_path
+    if INTRABAR_ENABLED:
+        from bot.intrabar import Intrabar
+    state = load_state()
+    from bot.outcomes import OUTCOMES
+    # signals still being followed when the previous process stopped
+    OUTCOMES.restore(state.get("outcomes"))
+    # take over the spool: only this (scanner) process writes it; messages a previous one left are queued again
+    DELIVERY.start()
+    stores, restored, intrabars, jobs = {}, {}, {}, {}
+
+    def attach(inst):
+        # warm start: bars + indicator frames from the last clean cycle; only missed bars are fetched
+        stores[inst] = CandleStore(inst, TIMEFRAMES, CANDLES_LIMIT, clock=OKX.now)
+        restored[inst] = stores[inst].load_snapshot(inst_path(SNAPSHOT_FILE, inst))
+        if not restored[inst] and ARCHIVE_DIR:
+            # no usable snapshot: recent bars from the candle archive, only the rest is downloaded
+            from bot.archive import ARCHIVE
+            stores[inst].load_archive(ARCHIVE)
+        if INTRABAR_ENABLED:
+            intrabars[inst] = Intrabar(inst, CANDLES_LIMIT)
+        if SCHEDULE is not None:
+            SCHEDULE.add(inst)
+
+    def reshard():
+        """Take on newly leased instruments, hand over the ones wanted elsewhere once their cycle is idle."""
+        active = SHARD.active()
+        for inst, keys in SHARD.take_acquired().items():
+            apply_handoff(state, inst, keys)
+        for inst in [i for i in INSTRUMENTS if i in active and i not in stores]:
+            attach(inst)
+            logger.info("Shard: %s taken over (snapshot restored=%s)", inst, restored[inst])
+        for inst in [i for i in stores if i not in active]:
+            job = jobs.get(inst)
+            if job is not None and not job["done"].is_set():
+                continue   # released after its cycle
+            for d in (stores, restored, intrabars, jobs):
+                d.pop(inst, None)
+            from bot.query import FRAMES
+            from bot.levels import LEVELS
+            FRAMES.drop(inst)
+            LEVELS.drop(inst)
+            OUTCOMES.drop(inst)
+            SCHEDULE.remove(inst)
+            if inst in SHARD.releasing():
+                SHARD.release(inst)
+
+    insts = INSTRUMENTS
+    if SHARD_STORE:
+        from bot.sharding import ShardCoordinator
+        SHARD = ShardCoordinator(INSTRUMENTS, export=lambda inst: handoff_keys(state, inst))
+        atexit.register(SHARD.close)   # hand the leases over at once instead of after the TTL
+        active = SHARD.start()
+        for inst, keys in SHARD.take_acquired().items():
+            apply_handoff(state, inst, keys)
+        insts = [i for i in INSTRUMENTS if i in active]
+        logger.info("Shard node %s: %s of %s instrument(s): %s", SHARD.node, len(insts), len(INSTRUMENTS), insts)
+    for inst in insts:
+        attach(inst)
+    if PARALLEL_WORKERS > 0:
+        from bot.shm import ParallelChecks
+        PARALLEL = ParallelChecks(PARALLEL_WORKERS)
+        atexit.register(PARALLEL.close)   # unlink the shared-memory blocks
+        PARALLEL.warm_up()
+    PIPELINE = _make_pipeline()
+    PIPELINE.start()
+    from bot.priority import PriorityScheduler
+    # a single instrument keeps the plain BOT_INTERVAL_SEC cadence
+    SCHEDULE = PriorityScheduler(insts, BOT_INTERVAL_SEC,
+                                 COLD_POLL_SEC if len(INSTRUMENTS) > 1 else BOT_INTERVAL_SEC, READINESS_HOT)
+
+    while True:
+        if SHARD is not None and SHARD.changed.is_set():
+            SHARD.changed.clear()
+            reshard()
+        due = SCHEDULE.due()
+
+        def in_flight(inst):
+            """A pipeline job of `inst` still running: its store and cond_1 state are not touched (slot skipped)."""
+            prev = jobs.get(inst)
+            if prev is None or prev["done"].is_set():
+                return False
+            logger.warning("Cycle for %s still in flight (queued %.1fs ago), skipped",
+                           inst, time.time() - prev["queued"])
+            SCHEDULE.started(inst, skipped=True)
+            return True
+
+        if due and PROFILER.armed:
+            # cProfile only sees the calling thread: profiled cycles run serially here
+            with PROFILER.cycle():
+                for inst in due:
+                    if in_flight(inst):
+                        continue
+                    SCHEDULE.started(inst)
+                    run_cycle(state, stores[inst], inst)
+        else:
+            for inst in due:   # most ready first: their fetches queue ahead of the cold ones
+                prev = jobs.get(inst)
+                if in_flight(inst):
+                    continue
+                SCHEDULE.started(inst)
+                job = new_job(state, inst, stores[inst])
+                if prev is None and inst == INSTRUMENT_ID:
+                    job["startup"] = {"restored": restored[inst]}
+                jobs[inst] = job
+                PIPELINE.submit(job)   # blocks while the fetch queue is full
+
+        left = SCHEDULE.next_wake() - time.time()
+        # an instrument expedited meanwhile (a late cycle: bot/deadline.py) ends the wait
+        # so does a change of this node's shard
+        woken = lambda: SCHEDULE.next_wake() <= time.time() or (SHARD is not None and SHARD.changed.is_set())
+        if not intrabars:
+            if LATEST.wait_interval(max(0.0, left), woken):
+                SCHEDULE.expedite(insts=LATEST.take_fresh())
+            continue
+        # intrabar ticks while waiting; a fresh request or a just-closed bar ends the wait
+        if LATEST.wait_interval(max(0.0, min(INTRABAR_POLL_SEC, left)), woken):
+            SCHEDULE.expedite(insts=LATEST.take_fresh())
+            continue
+        for inst, ib in intrabars.items():
+            job = jobs.get(inst)
+            if job is not None and not job["done"].is_set():
+                continue   # the store is being updated by the pipeline
+            if run_intrabar(state, stores[inst], ib):
+                SCHEDULE.expedite(hot_only=True)   # cold instruments keep their slower cadence
+
+SCANNER = ScannerLifecycle(bot_loop)
 
 # -----------------------------
 # HTTP endpoints
@@ -284,42 +936,270 @@ def home():
 
 @app.route("/test")
 def test_telegram():
-    ok = send_telegram_message("✅ EMA-Bot (prod) test message.")
+    ok = send_telegram_message_now("✅ EMA-Bot (prod) test message.")
     return f"Telegram test sent: {ok}"
 
+def evaluation_status():
+    """Measured condition costs / pass rates and lazy TF load times of this process (None before the checker is loaded)."""
+    checker = sys.modules.get("bot.checker")
+    if checker is None:
+        return None
+    from bot.lazy import LOAD_COST
+    return {"order": "cost" if checker.COSTS.enabled else "fixed", "conditions": checker.COSTS.status(),
+            "tf_load_ms": {tf: round(sec * 1000, 1) for tf, sec in LOAD_COST.items()}}
+
+def integrity_status():
+    from bot.integrity import INTEGRITY
+    return INTEGRITY.status()
+
+def archive_status():
+    if not ARCHIVE_DIR:
+        return None
+    from bot.archive import ARCHIVE
+    return ARCHIVE.status()
+
+def levels_status():
+    from bot.levels import LEVELS
+    return LEVELS.status(OKX.now())
+
+def outcomes_status(state):
+    """Open / closed tracked signals from the state file (any worker); details at /outcomes."""
+    saved = state.get("outcomes") or {}
+    return {"open": sum(len(ps) for ps in (saved.get("open") or {}).values()),
+            "closed": sum(a["n"] for branches in (saved.get("agg") or {}).values() for a in branches.values()),
+            "dropped": saved.get("dropped", 0)}
+
 @app.route("/status")
 def status():
     state = load_state()
+    snap = LATEST.get()
     return jsonify({
         "last_signal_ts": state.get("last_signal_ts", "-"),
         "last_direction": state.get("last_direction", "-"),
         "last_start_key": state.get("last_start_key"),
-        "last_snapshot": state.get("last_snapshot", {})
+        "last_snapshot": snap["result"] if snap else state.get("last_snapshot", {}),
+        "cycle": describe(snap) if snap else None,
+        "memory": state.get("memory", {}),
+        "startup": state.get("startup"),
+        "okx": OKX.status(),
+        "pipeline": PIPELINE.status() if PIPELINE is not None else None,
+        "parallel": PARALLEL.status() if PARALLEL is not None else None,
+        "readiness": state.get("readiness", {}),
+        "schedule": SCHEDULE.status() if SCHEDULE is not None else None,
+        "shard": SHARD.status() if SHARD is not None else None,
+        "evaluation": evaluation_status(),
+        "deadline": DEADLINES.status(),
+        "integrity": integrity_status(),
+        "archive": archive_status(),
+        "levels": levels_status(),
+        "outcomes": outcomes_status(state),
+        "delivery": DELIVERY.status(),
+        "events": EVENTS.status(),
+        "scanner": SCANNER.status(),
     })
 
+@app.route("/events")
+def events():
+    """
+    Server-sent events: "cycle" (run_checks summary + per-condition flags),
+    "signal" (final signal) and "presignal" (intrabar: pending/confirmed/cancelled). ?inst=A,B filters by instrument; resume with the
+    Last-Event-ID header (or ?last_id=). Streams end after EVENTS_STREAM_MAX_SEC
+    and EventSource clients reconnect transparently. A stream holds a worker
+    thread: past EVENTS_MAX_STREAMS open ones this worker answers 503.
+    """
+    if not EVENTS.open_stream():
+        return (jsonify({"error": "too many event streams", "max_streams": EVENTS.max_streams}), 503,
+                {"Retry-After": str(int(EVENTS_KEEPALIVE_SEC))})
+    insts = {i for i in request.args.get("inst", "").split(",") if i}
+    cursor = EVENTS.resume_cursor(request.headers.get("Last-Event-ID") or request.args.get("last_id"))
+
+    def stream(cursor):
+        yield "retry: 3000\n\n"
+        deadline = time.time() + EVENTS_STREAM_MAX_SEC
+        while time.time() < deadline:
+            evs = EVENTS.wait(cursor, EVENTS_KEEPALIVE_SEC)
+            if not evs:
+                yield ": keepalive\n\n"
+                continue
+            for ev in evs:
+                cursor = ev["id"]
+                if insts and ev["inst"] not in insts:
+                    continue
+                yield format_sse(ev)
+
+    resp = Response(stream(cursor), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # the server closes the response when the stream ends or the client goes away
+    resp.call_on_close(EVENTS.close_stream)
+    return resp
+
+@app.route("/indicators")
+def indicators():
+    """
+    Indicator values the bot computed, read-only: ?inst=&tf=5m&cols=ema5,rsi6&last=100
+    (closed bars; &forming=1 adds the forming one), JSON or &format=bin
+    (bot/query.py). ETag = last bar time: If-None-Match -> 304 until a new bar.
+    """
+    from bot.query import FRAMES, snapshot_source, select, etag, to_json, to_binary
+    from bot.pipeline import inst_path
+    inst = request.args.get("inst", INSTRUMENT_ID)
+    tf = request.args.get("tf", "5m")
+    if tf not in TIMEFRAMES:
+        return jsonify({"error": f"unknown tf {tf!r}", "timeframes": TIMEFRAMES}), 400
+    if inst not in INSTRUMENTS:
+        return jsonify({"error": f"unknown inst {inst!r}", "instruments": INSTRUMENTS}), 404
+    try:
+        last = min(int(request.args.get("last", 100)), CANDLES_LIMIT)
+    except ValueError:
+        return jsonify({"error": "last must be an integer"}), 400
+    cols = [c for c in request.args.get("cols", "").split(",") if c] or None
+    forming = request.args.get("forming") == "1"
+    binary = request.args.get("format") == "bin" or (
+        request.args.get("format") is None and request.accept_mimetypes.best == "application/octet-stream")
+    src = FRAMES.get(inst) if SCANNER.is_leader else snapshot_source(inst_path(SNAPSHOT_FILE, inst))
+    if src is None:
+        err = {"error": f"no frames for {inst} yet"}
+        if SHARD is not None and inst not in SHARD.active():
+            err["owner"] = SHARD.status()["owners"].get(inst)
+        return jsonify(err), 503
+    if tf not in src.timeframes():
+        # lazy frames (bot/lazy.py): a TF no recent condition read has not been computed
+        return jsonify({"error": f"{inst} {tf} not computed by the bot yet", "timeframes": src.timeframes()}), 404
+    try:
+        sel = select(src, tf, cols, last, forming)
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 400
+    tag = etag(inst, sel, f"{','.join(sel['arrays'])}|{last}|{int(binary)}")
+    if request.if_none_match.contains(tag):
+        resp = Response(status=304)
+    elif binary:
+        resp = Response(to_binary(inst, sel), mimetype="application/octet-stream")
+    else:
+        resp = jsonify(to_json(inst, sel))
+    resp.set_etag(tag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+@app.route("/outcomes")
+def outcomes():
+    """
+    What happened after the final signals (bot/outcomes.py): per profile and branch
+    (ok_30m_branch / ok_1h2h_branch) target/stop rates, MFE/MAE and returns at the
+    OUTCOME_HORIZONS, plus the signals still followed and the last closed ones.
+    ?profile= keeps one profile.
+    """
+    from bot.outcomes import report
+    rep = report(load_state().get("outcomes"))
+    profile = request.args.get("profile")
+    if profile:
+        rep["branches"] = {p: b for p, b in rep["branches"].items() if p == profile}
+        rep["open"] = [p for p in rep["open"] if p["profile"] == profile]
+        rep["recent"] = [p for p in rep["recent"] if p["profile"] == profile]
+    return jsonify(rep)
+
+def _wait_remote_cycle(inst, asked, timeout):
+    """Poll the shared state file until the scanner (another worker) stores a cycle of `inst` queued after `asked`."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        time.sleep(0.5)
+        state = load_state()
+        if inst_state(state, inst).get("last_cycle_queued", 0) >= asked:
+            return state
+    return None
+
 @app.route("/debug/trigger", methods=["POST"])
 def debug_trigger():
+    """
+    Returns the latest cycle's run_checks result of ?inst= (default INSTRUMENT_ID)
+    without doing any work in the request thread. ?fresh=1 asks the loop for one
+    extra cycle of that instrument and waits for it.
+    """
     allow = os.getenv("ALLOW_DEBUG_TRIGGER", "0") == "1"
     if not allow:
         return "disabled", 403
+    fresh = request.args.get("fresh") == "1"
+    inst = request.args.get("inst", INSTRUMENT_ID)
+    if inst not in INSTRUMENTS:
+        return jsonify({"error": f"unknown inst {inst!r}", "instruments": INSTRUMENTS}), 404
     try:
-        dfs = build_dfs()
-        ok, result = run_checks(dfs)
-        # store snapshot
+        if SCANNER.is_leader:
+            snap = LATEST.request_fresh(FRESH_WAIT_TIMEOUT_SEC, inst) if fresh else LATEST.get(inst)
+            if snap is None:
+                err = "timed out waiting for a fresh cycle" if fresh else "no cycle completed yet"
+                return jsonify({"error": err}), 504 if fresh else 503
+            return jsonify({"ok": snap["ok"], "result": snap["result"], "cycle": describe(snap)})
+
+        # the scanner runs in another worker: read what it stored
         state = load_state()
-        state["last_snapshot"] = result
-        save_state(state)
-        return jsonify({"ok": ok, "result": result})
+        if fresh:
+            asked = LATEST.request_fresh_remote(inst)
+            state = _wait_remote_cycle(inst, asked, FRESH_WAIT_TIMEOUT_SEC)
+            if state is None:
+                return jsonify({"error": "timed out waiting for a fresh cycle"}), 504
+        ist = inst_state(state, inst)
+        if "last_snapshot" not in ist:
+            return jsonify({"error": "no cycle completed yet"}), 503
+        ev = ist.get("last_event") or {}
+        return jsonify({"ok": ev.get("ok"), "result": ist["last_snapshot"],
+                        "cycle": {"source": "state_file", "inst": inst, "bar_ts": ev.get("bar_ts"),
+                                  "queued_ts": ist.get("last_cycle_queued")}})
     except Exception as e:
         logger.exception("debug trigger failure: %s", e)
         return jsonify({"error": str(e)}), 500
 
+@app.route("/debug/profile", methods=["GET", "POST"])
+def debug_profile():
+    """
+    GET  -> current/last profiling session.
+    POST ?cycles=N       -> profile the next N bot_loop cycles (202, poll with GET).
+                            Only the worker running the scanner has cycles to
+                            profile: any other answers 409 (retry until it lands there).
+    POST ?mode=oneoff    -> profile one build_dfs + run_checks in this request
+                            (any worker; cond_1 in dry-run, its state file untouched).
+    Optional ?top=K limits hot functions / allocation sites in the report.
+    """
+    allow = os.getenv("ALLOW_DEBUG_TRIGGER", "0") == "1"
+    if not allow:
+        return "disabled", 403
+    if request.method == "GET":
+        return jsonify(dict(PROFILER.status(), scanner_worker=SCANNER.is_leader))
+    try:
+        top = int(request.args.get("top", PROFILE_TOP_N))
+        if request.args.get("mode") == "oneoff":
+            from bot.checker import run_checks
+            from bot.conditions import cond_1
+
+            def once():
+                with cond_1.dry_run():
+                    return run_checks(build_dfs())
+            report = PROFILER.run_once(once, top=top)
+            return jsonify(report)
+        if not SCANNER.is_leader:
+            # arming here would leave tracemalloc running in a worker that never cycles
+            return jsonify({"error": "the scanner runs in another worker; retry until the request reaches it",
+                            "scanner": SCANNER.holder()}), 409
+        armed = PROFILER.arm(int(request.args.get("cycles", 1)), top=top)
+        return jsonify({"armed": armed}), 202
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        logger.exception("debug profile failure: %s", e)
+        return jsonify({"error": str(e)}), 500
+
 # -----------------------------
 # Start service
 # -----------------------------
+def create_app():
+    """
+    App factory (gunicorn 'main:create_app()'). Every worker joins the scanner
+    election; only the lease holder runs bot_loop. Do not use --preload: the
+    election thread must start after the worker fork.
+    """
+    SCANNER.start()
+    follow_journal(EVENTS, lambda: SCANNER.is_leader)
+    return app
+
 if __name__ == "__main__":
     logger.info("Starting EMA-Bot (production) main")
-    t = Thread(target=bot_loop, daemon=True)
-    t.start()
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port)
\ No newline at end of file
+    create_app().run(host="0.0.0.0", port=port)
\ No newline at end of file
@@ -0,0 +1,120 @@
+# tests/test_compact.py
+# COMPACT_MODE frames (float32 indicators, int32 relative time) give the same
+# condition results as the float64 frames they are made from.
+#
+# History: a seeded synthetic market. Start indices are every bar where cond_1
+# fires (bot/analytics.candidates, the tools/funnel candidate finder), so each
+# check_cond_N runs at starts that actually reach it, not only on bars that stop
+# at cond_1. The coverage asserts keep the parity asserts meaningful: every
+# condition both passes and fails, full signals occur, and so do both branches.
+# cond_5 never fails at a fresh EMA cross with the default thresholds, so it is
+# also compared with a tighter RSI edge.
+
+import logging
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_market
+from bot import analytics
+from bot.compact import compact_all
+from bot.conditions import cond_1
+from bot.conditions.cond_2 import check_cond_2
+from bot.conditions.cond_3 import check_cond_3
+from bot.conditions.cond_4 import check_cond_4
+from bot.conditions.cond_5 import check_cond_5
+from bot.conditions.cond_6 import check_cond_6
+from bot.conditions.cond_7 import check_cond_7
+from bot.conditions.cond_8 import check_cond_8
+from bot.conditions.cond_9 import check_cond_9
+from bot.conditions.cond_10 import check_cond_10
+from bot.conditions.cond_11 import check_cond_11
+from bot.indicators import add_all_indicators
+from bot.profiles import DEFAULT_PARAMS
+
+BARS = 20000
+SEED = 7
+WARMUP = 300
+
+SCALAR = {
+    2: lambda f, d, s: check_cond_2(f, d), 3: check_cond_3, 4: check_cond_4, 5: check_cond_5,
+    6: check_cond_6, 7: lambda f, d, s: check_cond_7(f, d), 8: check_cond_8, 9: check_cond_9,
+    10: check_cond_10, 11: check_cond_11,
+    "5@edge55": lambda f, d, s: check_cond_5(f, d, s, dict(DEFAULT_PARAMS, **{"c5.rsi_edge": 55})),
+}
+
+
+@pytest.fixture(scope="module")
+def histories():
+    logging.disable(logging.INFO)
+    full = {tf: add_all_indicators(df) for tf, df in make_market(BARS, seed=SEED).items()}
+    # max_bars=0: the whole history, so start indices are the same in both
+    return analytics.History(full), analytics.History(compact_all(full, 0))
+
+
+@pytest.fixture(scope="module")
+def results(histories):
+    """direction -> (candidates, {cond: [ok float64]}, {cond: [ok compact]})."""
+    h64, h32 = histories
+    out = {}
+    for direction, (t, s) in analytics.all_candidates(h64, WARMUP).items():
+        ok64 = {c: [] for c in SCALAR}
+        ok32 = {c: [] for c in SCALAR}
+        for ti, si in zip(t.tolist(), s.tolist()):
+            f64, f32 = analytics.cut_frames(h64, ti), analytics.cut_frames(h32, ti)
+            for c, check in SCALAR.items():
+                ok64[c].append(bool(check(f64, direction, si)[0]))
+                ok32[c].append(bool(check(f32, direction, si)[0]))
+        out[direction] = ((t, s), ok64, ok32)
+    return out
+
+
+def test_compact_frames_are_float32(histories):
+    _h64, h32 = histories
+    df = h32.frames["5m"]
+    assert df["rsi6"].dtype == np.float32
+    assert df["ema21"].dtype == np.float64      # cond_1's eps test stays float64
+    assert df["time"].dtype == np.int32
+
+
+def test_candidates_reach_every_condition(results):
+    for direction, ((t, _s), ok64, _ok32) in results.items():
+        assert len(t) >= 50, direction
+        for cid in range(2, 12):
+            oks = [ok for key, v in ok64.items() if str(key).split("@")[0] == str(cid) for ok in v]
+            assert any(oks) and not all(oks), (direction, cid)
+
+
+def test_signals_and_both_branches_occur(results):
+    signals = b30 = b1h = 0
+    for _direction, (_cands, ok64, _ok32) in results.items():
+        ok = {c: np.array(v) for c, v in ok64.items() if isinstance(c, int)}
+        out = analytics.outcome(ok)
+        signals += int(out["signal"].sum())
+        b30 += int((out["mandatory"] & out["branch_30m"]).sum())
+        b1h += int((out["mandatory"] & out["branch_1h2h"]).sum())
+    assert signals > 0
+    assert b30 > 0 and b1h > 0
+
+
+@pytest.mark.parametrize("cid", list(SCALAR))
+def test_condition_parity(results, cid):
+    for direction, ((t, s), ok64, ok32) in results.items():
+        diff = [(int(t[n]), int(s[n]), a) for n, (a, b) in enumerate(zip(ok64[cid], ok32[cid])) if a != b]
+        assert not diff, f"cond {cid} {direction}: float64 vs compact differ at (bar, start, f64) {diff[:5]}"
+
+
+def test_cond_1_parity(histories, tmp_path):
+    h64, h32 = histories
+    for direction in ("long", "short"):
+        found = {}
+        for name, h in (("f64", h64), ("compact", h32)):
+            hits = []
+            with cond_1.state_file(str(tmp_path / f"{name}_{direction}.json")), cond_1.dry_run():
+                for i in range(WARMUP, 6000):
+                    ok, info = cond_1.check_cond_1({"5m": h.frames["5m"].iloc[:i + 1]}, direction)
+                    if ok:
+                        hits.append((i, info["start_index"]))
+            found[name] = hits
+        assert found["f64"], direction
+        assert found["f64"] == found["compact"], direction
@@ -0,0 +1,115 @@
+# tests/test_integrity.py
+# CandleStore + bot/integrity.py keep every TF equal to the market under faulty
+# candle responses, and ask for a bar the exchange never has only once.
+#
+# History: a seeded synthetic market walked bar by bar; one CandleStore refresh
+# per step from a fake exchange whose latest-bars responses (seeded RNG) drop a
+# bar (gap), repeat one (duplicate), swap two (out of order) or lag behind
+# (stale tail). Range fetches (fetch_before) are served clean; HOLES 5m bars are
+# missing at the "exchange" for good.
+
+import logging
+import math
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_market, TF_SECONDS
+from bot.store import CandleStore
+
+LIMIT = 300
+STEPS = 600
+FAULT_RATE = 0.1
+HOLES = 3
+SEED = 7
+FAULTS = ("gap", "duplicate", "out_of_order", "stale")
+
+
+@pytest.fixture(scope="module")
+def walked():
+    """(every hole asked for, faults injected, exchange calls, steps whose store differed from the market)."""
+    logging.disable(logging.WARNING)
+    warm = LIMIT * 24 + 10
+    market = make_market(warm + STEPS, seed=SEED)
+    rng = np.random.default_rng(SEED)
+    t5 = market["5m"]["time"].to_numpy()
+    hole_times = set(int(t) for t in rng.choice(t5[warm - 200:warm + STEPS - 10], HOLES, replace=False))
+    market["5m"] = market["5m"][~market["5m"]["time"].isin(hole_times)].reset_index(drop=True)
+    times = {tf: df["time"].to_numpy() for tf, df in market.items()}
+
+    calls = {"latest": 0, "range": 0, "hole_retries": 0}    # retries: asked again for a known hole
+    asked = set()                                           # holes asked for at all
+    faults = dict.fromkeys(FAULTS, 0)
+    clock = {"now": 0}
+
+    def closed(tf):
+        # closed bars only, as the stand-in serves them
+        return int(np.searchsorted(times[tf], clock["now"] // TF_SECONDS[tf] * TF_SECONDS[tf], side="left"))
+
+    def fetch(tf, limit):
+        calls["latest"] += 1
+        end = closed(tf)
+        df = market[tf].iloc[max(0, end - limit):end].reset_index(drop=True)
+        if len(df) >= 3 and rng.random() < FAULT_RATE:
+            kind = FAULTS[rng.integers(len(FAULTS))]
+            faults[kind] += 1
+            i = int(rng.integers(1, len(df) - 1))
+            if kind == "gap":
+                df = df.drop(index=i)
+            elif kind == "duplicate":
+                df = df.iloc[np.r_[np.arange(len(df)), i]]
+            elif kind == "out_of_order":
+                order = np.arange(len(df))
+                order[i - 1], order[i] = i, i - 1
+                df = df.iloc[order]
+            else:
+                df = df.iloc[:-int(rng.integers(1, 3))]
+            df = df.reset_index(drop=True)
+        return df
+
+    def fetch_before(tf, ts, limit):
+        calls["range"] += 1
+        end = min(closed(tf), int(np.searchsorted(times[tf], ts, side="left")))
+        if tf == "5m" and (ts - 300) in store.holes.get("5m", ()):
+            calls["hole_retries"] += 1
+        if tf == "5m" and (ts - 300) in hole_times:
+            asked.add(ts - 300)
+        return market[tf].iloc[max(0, end - limit):end].reset_index(drop=True)
+
+    def differs():
+        for tf, df in store.raw.items():
+            start = int(np.searchsorted(times[tf], int(df["time"].iat[0]), side="left"))
+            if not np.array_equal(df.to_numpy(), market[tf].iloc[start:closed(tf)].to_numpy()):
+                return True
+        return False
+
+    store = CandleStore("TEST", list(market), LIMIT)
+    dirty = []
+    for step in range(STEPS):
+        clock["now"] = int(t5[0]) + (warm + step) * 300
+        store.refresh(fetch, now=clock["now"], fetch_before=fetch_before)
+        if differs():
+            dirty.append(step)
+    return asked == hole_times, faults, calls, dirty
+
+
+def test_every_fault_kind_is_injected(walked):
+    _asked, faults, _calls, _dirty = walked
+    assert all(faults.values()), faults
+
+
+def test_store_matches_the_market_after_every_refresh(walked):
+    _asked, _faults, _calls, dirty = walked
+    assert not dirty, f"store differs from the market after steps {dirty[:5]}"
+
+
+def test_known_holes_are_not_asked_again(walked):
+    all_asked, _faults, calls, _dirty = walked
+    assert all_asked
+    assert calls["hole_retries"] == 0
+
+
+def test_repairs_fetch_less_than_whole_windows(walked):
+    _asked, faults, calls, _dirty = walked
+    # under half of re-downloading the window (LIMIT bars, 200-bar pages) on every anomaly
+    assert calls["range"] < sum(faults.values()) * math.ceil(LIMIT / 200) / 2
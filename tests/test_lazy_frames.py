@@ -0,0 +1,80 @@
+# tests/test_lazy_frames.py
+# Lazy timeframes (bot/lazy.py) and cost-ordered conditions (checker.COSTS) give
+# the same outcome as eager frames checked in numeric order, with fewer loads.
+#
+# History: a seeded synthetic market walked bar by bar (benchmarks.synthetic.walk).
+# Indicators are computed once over the whole history; a TF "load" hands out its
+# frame at the step and is counted. Every step each mode builds its frames as
+# main.compute_dfs does:
+#   eager        - all five TFs, conditions in numeric order,
+#   lazy fixed   - 5m + the TFs the previous step read, the rest on first read,
+#   lazy ordered - the same with COSTS ordering 2..7 and 8/9.
+
+import logging
+
+import pytest
+
+from benchmarks.synthetic import make_market, walk
+from bot import checker
+from bot.checker import run_checks, same_outcome
+from bot.conditions import cond_1
+from bot.config import TIMEFRAMES
+from bot.indicators import add_all_indicators
+from bot.lazy import LazyFrames
+
+BARS = 300
+STEPS = 1500
+SEED = 7
+MODES = ("eager", "lazy fixed", "lazy ordered")
+
+
+@pytest.fixture(scope="module")
+def walked(tmp_path_factory):
+    """([mode -> (ok, result)] per step, mode -> TF loads)."""
+    logging.disable(logging.INFO)
+    tmp = tmp_path_factory.mktemp("lazy")
+    warm = BARS * 24
+    full = {tf: add_all_indicators(df) for tf, df in make_market(warm + STEPS, seed=SEED).items()}
+    loads = dict.fromkeys(MODES, 0)
+    wanted = {m: set() for m in MODES}
+    out = []
+    enabled = checker.COSTS.enabled
+    try:
+        for _t, view in walk(full, warm, STEPS, BARS):
+            step = {}
+            for mode in MODES:
+
+                def load(tf, mode=mode):
+                    loads[mode] += 1
+                    return view[tf]
+
+                checker.COSTS.enabled = mode == "lazy ordered"
+                eager = TIMEFRAMES if mode == "eager" else ["5m"] + sorted(wanted[mode])
+                dfs = LazyFrames(TIMEFRAMES, load, {tf: load(tf) for tf in eager})
+                with cond_1.state_file(str(tmp / f"{mode}.json")):
+                    step[mode] = run_checks(dfs)
+                wanted[mode] = dfs.read - {"5m"}
+            out.append(step)
+    finally:
+        checker.COSTS.enabled = enabled
+    return out, loads
+
+
+def test_walk_reaches_the_lazy_timeframes(walked):
+    steps, _loads = walked
+    summaries = {res["summary"] for step in steps for _ok, res in step.values()}
+    assert "no_start" in summaries
+    assert summaries & {"ok_30m_branch", "ok_1h2h_branch"}
+
+
+def test_lazy_modes_match_eager(walked):
+    steps, _loads = walked
+    diff = [(n, mode) for n, step in enumerate(steps) for mode in MODES[1:]
+            if not same_outcome(step["eager"], step[mode])]
+    assert not diff, f"lazy frames differ from eager at (step, mode) {diff[:5]}"
+
+
+def test_lazy_modes_load_fewer_frames(walked):
+    _steps, loads = walked
+    assert loads["lazy fixed"] < loads["eager"]
+    assert loads["lazy ordered"] < loads["eager"]
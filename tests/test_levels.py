@@ -0,0 +1,57 @@
+# tests/test_levels.py
+# Incremental support/resistance (bot/levels.py: LevelRegistry fed only the bars
+# closed since the previous cycle) equals a PivotBook rebuilt from the frames.
+#
+# History: a seeded synthetic market walked bar by bar (benchmarks.synthetic.walk)
+# with all five TFs' indicator frames, the forming bar included as in the live
+# loop; every CHECK steps a fresh book per TF is fed the whole frame.
+
+import logging
+
+import pytest
+
+from benchmarks.synthetic import make_market, walk
+from bot.indicators import add_all_indicators
+from bot.levels import LevelRegistry, PivotBook
+
+BARS = 300
+STEPS = 2000
+CHECK = 50
+SEED = 7
+
+
+@pytest.fixture(scope="module")
+def walked():
+    """(registry after the walk, [(step, tf) where a rebuild differed], rebuilds)."""
+    logging.disable(logging.INFO)
+    warm = BARS * 24
+    full = {tf: add_all_indicators(df) for tf, df in make_market(warm + STEPS + 1, seed=SEED).items()}
+    registry = LevelRegistry()
+    diff, rebuilds = [], 0
+    # the clock just after each 5m bar closed; frames hold the forming bar too
+    for step, (t, view) in enumerate(walk(full, warm, STEPS, BARS, ahead=300)):
+        now = t + 300
+        registry.update("TEST", view, now)
+        if step % CHECK and step != STEPS - 1:
+            continue
+        rebuilds += 1
+        books = registry._books["TEST"]
+        for tf, df in view.items():
+            fresh = PivotBook(tf)
+            fresh.feed(df, now)
+            if fresh.levels != books[tf].levels:
+                diff.append((step, tf))
+    return registry, diff, rebuilds
+
+
+def test_every_timeframe_has_levels_and_is_current(walked):
+    registry, _diff, _rebuilds = walked
+    status = registry.status(registry._updated["TEST"])["TEST"]
+    assert all(status["levels"].get(tf) for tf in ("5m", "15m", "30m", "1H", "2H")), status["levels"]
+    assert not any(status["behind"].values()), status["behind"]
+
+
+def test_incremental_levels_match_a_rebuild(walked):
+    _registry, diff, rebuilds = walked
+    assert rebuilds > STEPS // CHECK
+    assert not diff, f"incremental levels differ from a rebuild at (step, tf) {diff[:5]}"
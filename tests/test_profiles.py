@@ -0,0 +1,57 @@
+# tests/test_profiles.py
+# checker.run_profiles (several strategy profiles in one pass, condition results
+# shared) gives every profile the same outcome as an independent run_checks of
+# that profile with its own cond_1 state.
+#
+# History: a seeded synthetic market walked bar by bar (benchmarks.synthetic.walk)
+# with the default profile plus a looser and a strict one, so the profiles both
+# share condition results and disagree on some of them.
+
+import logging
+
+import pytest
+
+from benchmarks.run import PROFILE_SPECS
+from benchmarks.synthetic import make_market, walk
+from bot.checker import run_checks, run_profiles, same_outcome
+from bot.conditions import cond_1
+from bot.indicators import add_all_indicators
+from bot.profiles import PROFILES, make_profile, profile_path
+
+BARS = 300
+STEPS = 1500
+SEED = 7
+
+
+@pytest.fixture(scope="module")
+def walked(tmp_path_factory):
+    """[(shared results, independent results)] per step."""
+    logging.disable(logging.INFO)
+    tmp = tmp_path_factory.mktemp("profiles")
+    profiles = [PROFILES[0]] + [make_profile(n, s) for n, s in PROFILE_SPECS.items()]
+    warm = BARS * 24
+    full = {tf: add_all_indicators(df) for tf, df in make_market(warm + STEPS, seed=SEED).items()}
+    out = []
+    for _t, view in walk(full, warm, STEPS, BARS):
+        shared = run_profiles(view, profiles, str(tmp / "shared.json"))
+        alone = {}
+        for p in profiles:
+            with cond_1.state_file(profile_path(str(tmp / "alone.json"), p["name"])):
+                alone[p["name"]] = run_checks(view, p)
+        out.append((shared, alone))
+    return out
+
+
+def test_profiles_reach_the_shared_conditions(walked):
+    reused = sum(res["reused"] for shared, _alone in walked for _ok, res in shared.values())
+    started = sum(res["summary"] != "no_start" for shared, _alone in walked for _ok, res in shared.values())
+    split = sum(len({(ok, res["summary"]) for ok, res in shared.values()}) > 1 for shared, _alone in walked)
+    assert started > 0
+    assert reused > 0
+    assert split > 0        # thresholds that differ between profiles are actually evaluated
+
+
+def test_run_profiles_matches_independent_runs(walked):
+    diff = [(step, name) for step, (shared, alone) in enumerate(walked)
+            for name, got in shared.items() if not same_outcome(got, alone[name])]
+    assert not diff, f"run_profiles differs from run_checks at (step, profile) {diff[:5]}"
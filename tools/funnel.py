@@ -0,0 +1,146 @@
+# tools/funnel.py
+# Condition funnel over history (bot/analytics.py).
+#
+#   python -m tools.funnel --recordings recordings --inst BTC-USDT-SWAP --verify 200 --json funnel.json
+#   python -m tools.funnel --synthetic 20000 --seed 7
+#
+# Loads candles from tools/okx_recorder.py recordings (or a seeded synthetic
+# market), computes indicators once over the whole history, finds every bar
+# where cond_1 fires and evaluates conditions 2..11 independently at each of
+# them. Prints pass rates, the run_checks funnel, which mandatory condition
+# blocks most candidates (first in order / the only one failing), the
+# co-failure matrix, near misses (binding threshold and signed margin of the
+# only failing mandatory condition), the 8&9 vs 10&11 branch split and
+# threshold sweeps. --verify N cross-checks N candidates per direction against
+# the scalar check_cond_N and the margins against the flags (exit code 1 on any
+# mismatch) and measures their cost. The higher-TF bar containing a candidate is
+# rebuilt as it stood at that moment (bot/analytics.py); --final-htf reads its
+# final values instead, which sees the rest of the bar (the report says so).
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+
+from bot.config import INSTRUMENT_ID, TIMEFRAMES
+
+
+def load_recordings(path: str, inst: str):
+    from bot.data import okx_rows_to_frame
+    raw = {}
+    for tf in TIMEFRAMES:
+        with open(os.path.join(path, f"{inst}__{tf}.json"), "r", encoding="utf-8") as f:
+            rows = json.load(f)["rows"]
+        raw[tf] = okx_rows_to_frame(rows[::-1])   # recordings are oldest first
+    return raw
+
+
+def _pct(x) -> str:
+    return "   -  " if x is None else f"{x * 100:5.1f}%"
+
+
+def print_report(rep, sweeps, ver, cost_vec):
+    c = rep["candidates"]
+    print(f"candidates: long={c['long']} short={c['short']}  signals={rep['signals']}  "
+          f"(vectorized eval {rep['elapsed_sec'] * 1000:.1f} ms)")
+    print("\npass rate (each condition on its own)")
+    print("  cond    all   long  short")
+    for cid, r in rep["pass_rate"].items():
+        print(f"  {cid:>4} {_pct(r['all'])} {_pct(r['long'])} {_pct(r['short'])}")
+
+    total = c["long"] + c["short"]
+    print(f"\nfunnel (run_checks order), start {total}")
+    for st in rep["funnel"]:
+        print(f"  after {str(st['after']):>11}: {st['left']}")
+    print("\nmandatory blockers        first   sole" + ("   scalar ms" if ver else ""))
+    for cid in rep["first_fail"]:
+        extra = f"   {ver['scalar_ms'][cid]:9.3f}" if ver else ""
+        print(f"  cond {cid:>2}                {rep['first_fail'][cid]:6d} {rep['sole_fail'][cid]:6d}{extra}")
+    if ver:
+        print("  higher TF (8..11)       " + "  ".join(f"{cid}: {ver['scalar_ms'][cid]:.3f} ms" for cid in (8, 9, 10, 11)))
+
+    print("\nnear misses (only this mandatory condition fails): binding threshold, count, median margin")
+    for cid, rows in rep["near_miss"].items():
+        if rows:
+            print(f"  cond {cid:>2}  " + "  ".join(f"{name} x{r['count']} ({r['p50']})" for name, r in rows.items()))
+
+    b = rep["branch"]
+    print(f"\nbranches (of {b['mandatory_ok']} passing 2..7): only 8&9={b['only_30m']}  "
+          f"only 10&11={b['only_1h2h']}  both={b['both']}  neither={b['neither']}")
+
+    conds, m = rep["co_fail"]["conds"], rep["co_fail"]["matrix"]
+    print("\nco-failures (candidates failing both; diagonal = failing alone or not)")
+    print("       " + "".join(f"{x:>6}" for x in conds))
+    for cid, row in zip(conds, m):
+        print(f"  {cid:>4} " + "".join(f"{v:6d}" for v in row))
+
+    if sweeps:
+        print("\nthreshold sweeps: value -> pass rate of the condition / signals")
+        for name, rows in sweeps.items():
+            print(f"  {name:18s} " + "  ".join(f"{r['value']}: {_pct(r['pass_rate']).strip()}/{r['signals']}" for r in rows))
+    if cost_vec is not None:
+        print(f"\nvectorized: {cost_vec:.3f}s for funnel + sweeps")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="condition funnel over history")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--recordings", help="directory written by tools.okx_recorder")
+    src.add_argument("--synthetic", type=int, help="N synthetic 5m bars (benchmarks.synthetic)")
+    ap.add_argument("--inst", default=INSTRUMENT_ID)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--warmup", type=int, default=300, help="5m bars skipped before the first candidate")
+    ap.add_argument("--verify", type=int, default=0, help="cross-check N candidates per direction with check_cond_N")
+    ap.add_argument("--verify-cond1", action="store_true", help="also replay check_cond_1 bar by bar (slow)")
+    ap.add_argument("--no-sweep", action="store_true")
+    ap.add_argument("--final-htf", action="store_true",
+                    help="read higher-TF bars at their final values instead of rebuilding the forming one")
+    ap.add_argument("--json", help="write the full report here")
+    args = ap.parse_args(argv)
+    logging.disable(logging.INFO)
+
+    from bot.indicators import add_all_indicators
+    from bot import analytics
+
+    if args.recordings:
+        raw = load_recordings(args.recordings, args.inst)
+    else:
+        from benchmarks.synthetic import make_market
+        raw = make_market(args.synthetic, seed=args.seed)
+    t0 = time.perf_counter()
+    h = analytics.History({tf: add_all_indicators(df) for tf, df in raw.items()}, rebuild_forming=not args.final_htf)
+    t_ind = time.perf_counter() - t0
+    print(f"history: {h.n} 5m bars, indicators {t_ind:.2f}s; higher TFs at each candidate: "
+          + ("FINAL bar values (look ahead into the forming bar)" if args.final_htf else "forming bar rebuilt from 5m"))
+
+    t0 = time.perf_counter()
+    cands = analytics.all_candidates(h, args.warmup)
+    rep = analytics.funnel(h, cands)
+    sweeps = None if args.no_sweep else analytics.sweep(h, cands)
+    cost_vec = time.perf_counter() - t0
+
+    ver = analytics.verify(h, cands, args.verify) if args.verify else None
+    if ver:
+        ver["margins"] = analytics.check_margins(h, cands)
+    print_report(rep, sweeps, ver, cost_vec)
+    bad = 0
+    if ver:
+        bad = sum(ver["mismatches"].values()) + sum(ver["margins"].values())
+        print(f"\nverify: {ver['checked']} candidates, mismatches {ver['mismatches']}")
+        print(f"margins contradicting the flags: {ver['margins']}")
+        for cid, ex in ver["examples"].items():
+            print(f"  cond {cid}: {ex}")
+    if args.verify_cond1:
+        c1 = analytics.verify_candidates(h, args.warmup, cands)
+        print(f"verify cond_1: {c1}")
+        bad += sum(not v["equal"] for v in c1.values())
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"report": rep, "sweeps": sweeps, "verify": ver}, f, ensure_ascii=False, indent=1)
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
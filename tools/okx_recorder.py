@@ -0,0 +1,108 @@
+# tools/okx_recorder.py
+# Record real OKX /api/v5/market/candles data to disk for tools/standin.py.
+#
+#   python -m tools.okx_recorder --inst BTC-USDT-SWAP --bars 5m,15m,30m,1H,2H --count 1500 --out recordings
+#
+# Pages backwards with /market/history-candles (`after` = oldest ts seen) and
+# writes <out>/<inst>__<bar>.json: {"inst", "bar", "rows": [...]} with rows in
+# OKX format, oldest first, closed bars only.
+#
+#   python -m tools.okx_recorder --inst BTC-USDT-SWAP --bars 5m --count 105120 --archive candles_archive
+#
+# With --archive the bars go to the candle archive (bot/archive.py) instead: the
+# bars since its last one are fetched, then --count bars older than its first
+# one (run again to reach further back); nothing already archived is requested.
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import requests
+
+PAGE = 100  # history-candles max page size
+
+
+def fetch_rows(base: str, inst: str, bar: str, count: int, pause: float, after=None, stop_ts=None):
+    """Up to `count` closed bars older than `after` (ms; None = now), stopping at `stop_ts` (seconds)."""
+    rows = []
+    session = requests.Session()
+    while len(rows) < count:
+        params = {"instId": inst, "bar": bar, "limit": PAGE}
+        if after is not None:
+            params["after"] = after
+        r = session.get(f"{base}/api/v5/market/history-candles", params=params, timeout=15)
+        r.raise_for_status()
+        data = r.json()
+        if data.get("code") not in ("0", 0):
+            raise RuntimeError(f"OKX error: {data}")
+        page = data.get("data") or []
+        if not page:
+            break
+        rows.extend(page)
+        after = page[-1][0]
+        time.sleep(pause)
+        if stop_ts is not None and int(after) // 1000 <= stop_ts:
+            break
+    # newest first -> oldest first, closed bars only (confirm == "1"), dedup by ts
+    seen, out = set(), []
+    for row in reversed(rows):
+        if len(row) > 8 and row[8] != "1":
+            continue
+        if row[0] in seen:
+            continue
+        seen.add(row[0])
+        out.append(row)
+    return out[-count:]
+
+
+def record_archive(args) -> int:
+    from bot.archive import CandleArchive
+    from bot.data import okx_rows_to_frame
+    from bot.store import TF_SECONDS
+
+    archive = CandleArchive(args.archive)
+    for inst in args.inst.split(","):
+        for bar in args.bars.split(","):
+            meta = archive.series(inst, bar).meta()
+            rows = []
+            if meta["rows"]:
+                missed = int(time.time() - meta["last"]) // TF_SECONDS.get(bar, 60) + 1
+                rows += fetch_rows(args.base, inst, bar, missed, args.pause, stop_ts=meta["last"])
+                rows += fetch_rows(args.base, inst, bar, args.count, args.pause, after=meta["first"] * 1000)
+            else:
+                rows += fetch_rows(args.base, inst, bar, args.count, args.pause)
+            added = archive.append(inst, bar, okx_rows_to_frame(rows[::-1]))
+            meta = archive.series(inst, bar).meta()
+            print(f"{inst} {bar}: {len(rows)} bars fetched, {added} new -> {meta['rows']} archived "
+                  f"({meta['first']}..{meta['last']})", file=sys.stderr)
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Record OKX candles for replay")
+    ap.add_argument("--base", default="https://www.okx.com")
+    ap.add_argument("--inst", default="BTC-USDT-SWAP", help="comma-separated instrument ids")
+    ap.add_argument("--bars", default="5m,15m,30m,1H,2H")
+    ap.add_argument("--count", type=int, default=1500, help="bars per series")
+    ap.add_argument("--pause", type=float, default=0.25)
+    ap.add_argument("--out", default="recordings")
+    ap.add_argument("--archive", help="append to this candle archive directory instead of --out")
+    args = ap.parse_args(argv)
+
+    if args.archive:
+        return record_archive(args)
+    os.makedirs(args.out, exist_ok=True)
+    for inst in args.inst.split(","):
+        for bar in args.bars.split(","):
+            rows = fetch_rows(args.base, inst, bar, args.count, args.pause)
+            path = os.path.join(args.out, f"{inst}__{bar}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"inst": inst, "bar": bar, "rows": rows}, f)
+            print(f"{inst} {bar}: {len(rows)} bars -> {path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
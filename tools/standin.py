@@ -0,0 +1,265 @@
+# tools/standin.py
+# Local stand-in for OKX market data and the Telegram Bot API.
+#
+#   python -m tools.standin --recordings recordings --port 8099 --speed 30 \
+#       --latency-ms 80 --jitter-ms 40 --error-rate 0.02 --throttle-rate 0.05 --tg-throttle-rate 0.1
+#   OKX_API_BASE=http://127.0.0.1:8099 TELEGRAM_API_BASE=http://127.0.0.1:8099 \
+#       TELEGRAM_BOT_TOKEN=x TELEGRAM_CHAT_ID=1 BOT_INTERVAL_SEC=1 python main.py
+#   curl http://127.0.0.1:8099/_standin/stats
+#
+# Replays recordings from tools/okx_recorder.py (or, with --archive DIR, the
+# candle archive of bot/archive.py, read in place) against a virtual clock that
+# starts once every series has CANDLES_LIMIT closed bars and runs `--speed`
+# times faster than real time; only bars closed at the virtual "now" are served.
+# Responses carry the virtual "now" in their Date header, the exchange clock
+# the bot decides closed bars and a stale tail by (bot/hedge.py).
+# Telegram sendMessage calls are logged (memory + --tg-log JSONL). For each
+# alert the stats report the delay between the real moment the last 5m bar
+# closed on the virtual clock and the alert's arrival (bar-close-to-alert).
+# Faults (latency, 5xx, 429) are drawn from a seeded RNG, so runs repeat.
+
+import os
+import sys
+import json
+import time
+import glob
+import bisect
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+BAR_SECONDS = {"1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800,
+               "1H": 3600, "2H": 7200, "4H": 14400, "1D": 86400}
+
+
+class ArchiveRows:
+    """OKX-format rows over the memory-mapped columns of an archived series; built per requested slice."""
+
+    def __init__(self, cols):
+        self.cols = cols
+
+    def __len__(self):
+        return len(self.cols["time"])
+
+    def __getitem__(self, i):
+        if not isinstance(i, slice):
+            return self[i:i + 1 or None][0]
+        c = {k: v[i].tolist() for k, v in self.cols.items()}
+        return [[str(t * 1000), repr(o), repr(h), repr(lo), repr(cl), repr(v), repr(v), "0", "1"]
+                for t, o, h, lo, cl, v in zip(c["time"], c["open"], c["high"], c["low"], c["close"], c["volume"])]
+
+
+class Replay:
+    def __init__(self, recordings_dir: str, speed: float, warmup: int, start=None, archive_dir=None):
+        self.series = {}   # (inst, bar) -> (ts_sec sequence, rows)
+        if archive_dir:
+            from bot.archive import CandleArchive
+            archive = CandleArchive(archive_dir)
+            for inst in archive.instruments():
+                for bar in archive.timeframes(inst):
+                    cols = archive.series(inst, bar).read()
+                    self.series[(inst, bar)] = (cols["time"], ArchiveRows(cols))
+        for path in [] if archive_dir else glob.glob(os.path.join(recordings_dir, "*.json")):
+            with open(path, "r", encoding="utf-8") as f:
+                rec = json.load(f)
+            rows = rec["rows"]
+            self.series[(rec["inst"], rec["bar"])] = ([int(r[0]) // 1000 for r in rows], rows)
+        if not self.series:
+            raise SystemExit(f"no recordings in {archive_dir or recordings_dir}")
+        if start is None:
+            # earliest moment every series has `warmup` closed bars
+            start = max(int(ts[min(warmup, len(ts)) - 1]) + BAR_SECONDS[bar]
+                        for (inst, bar), (ts, _rows) in self.series.items())
+        self.vstart = int(start)
+        self.speed = speed
+        self.real_start = time.time()
+
+    def vnow(self, real=None) -> float:
+        return self.vstart + ((real or time.time()) - self.real_start) * self.speed
+
+    def real_at(self, vts: float) -> float:
+        return self.real_start + (vts - self.vstart) / self.speed
+
+    def candles(self, inst: str, bar: str, limit: int, after_ms=None):
+        """Closed bars at the virtual now, newest first, OKX paging semantics for `after`."""
+        ts, rows = self.series.get((inst, bar), ([], []))
+        sec = BAR_SECONDS.get(bar, 60)
+        hi = bisect.bisect_right(ts, self.vnow() - sec)   # bars with ts + sec <= vnow
+        if after_ms is not None:
+            hi = min(hi, bisect.bisect_left(ts, int(after_ms) // 1000))
+        lo = max(0, hi - limit)
+        return list(reversed(rows[lo:hi]))
+
+
+class StandIn:
+    def __init__(self, replay: Replay, args):
+        self.replay = replay
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.stats = {"okx_requests": 0, "okx_5xx": 0, "okx_429": 0,
+                      "tg_requests": 0, "tg_5xx": 0, "tg_429": 0, "tg_delivered": 0}
+        self.alerts = []
+        self.tg_log = open(args.tg_log, "a", encoding="utf-8") if args.tg_log else None
+
+    def draw(self, error_rate: float, throttle_rate: float):
+        """Returns (delay_sec, fault) with fault in (None, "5xx", "429")."""
+        with self.lock:
+            delay = max(0.0, self.rng.gauss(self.args.latency_ms, self.args.jitter_ms)) / 1000
+            x = self.rng.random()
+        if x < throttle_rate:
+            return delay, "429"
+        if x < throttle_rate + error_rate:
+            return delay, "5xx"
+        return delay, None
+
+    def record_alert(self, chat_id, text):
+        now = time.time()
+        last_close = self.replay.vnow(now) // 300 * 300
+        latency = now - self.replay.real_at(last_close)
+        entry = {"real_ts": now, "virtual_ts": self.replay.vnow(now), "bar_close": int(last_close),
+                 "latency_sec": round(latency, 4), "chat_id": chat_id, "len": len(text or ""),
+                 "head": (text or "")[:120]}
+        with self.lock:
+            self.alerts.append(entry)
+            self.stats["tg_delivered"] += 1
+            if self.tg_log:
+                self.tg_log.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self.tg_log.flush()
+
+    def report(self):
+        with self.lock:
+            lat = sorted(a["latency_sec"] for a in self.alerts)
+            elapsed = time.time() - self.replay.real_start
+
+            def pct(p):
+                return lat[min(len(lat) - 1, int(p * len(lat)))] if lat else None
+            return dict(self.stats,
+                        elapsed_sec=round(elapsed, 2),
+                        okx_rps=round(self.stats["okx_requests"] / elapsed, 2) if elapsed else None,
+                        virtual_now=int(self.replay.vnow()),
+                        alerts=len(lat),
+                        alert_latency_p50=pct(0.5), alert_latency_p95=pct(0.95),
+                        alert_latency_max=lat[-1] if lat else None)
+
+
+def make_handler(standin: StandIn):
+    a = standin.args
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def date_time_string(self, timestamp=None):
+            # the Date header carries the virtual clock: the bot takes which bars are closed from it
+            return super().date_time_string(standin.replay.vnow() if timestamp is None else timestamp)
+
+        def log_message(self, fmt, *args):
+            if a.verbose:
+                sys.stderr.write("standin: " + fmt % args + "\n")
+
+        def _json(self, code, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == "/_standin/stats":
+                return self._json(200, standin.report())
+            if url.path not in ("/api/v5/market/candles", "/api/v5/market/history-candles",
+                                "/api/v5/market/ticker"):
+                return self._json(404, {"code": "404", "msg": "not found"})
+            with standin.lock:
+                standin.stats["okx_requests"] += 1
+            delay, fault = standin.draw(a.error_rate, a.throttle_rate)
+            time.sleep(delay)
+            if fault == "429":
+                with standin.lock:
+                    standin.stats["okx_429"] += 1
+                return self._json(429, {"code": "50011", "msg": "Too Many Requests", "data": []})
+            if fault == "5xx":
+                with standin.lock:
+                    standin.stats["okx_5xx"] += 1
+                return self._json(503, {"code": "50001", "msg": "Service temporarily unavailable", "data": []})
+            inst = q.get("instId", "")
+            if url.path.endswith("/ticker"):
+                rows = standin.replay.candles(inst, "5m", 1)
+                last = rows[0][4] if rows else "0"
+                return self._json(200, {"code": "0", "msg": "", "data": [{"instId": inst, "last": last}]})
+            limit = min(int(q.get("limit", 100)), 300 if url.path.endswith("/candles") else 100)
+            rows = standin.replay.candles(inst, q.get("bar", "1m"), limit, q.get("after"))
+            return self._json(200, {"code": "0", "msg": "", "data": rows})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length).decode() if length else ""
+            if not (url.path.startswith("/bot") and url.path.endswith("/sendMessage")):
+                return self._json(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+            if "json" in (self.headers.get("Content-Type") or ""):
+                data = json.loads(raw or "{}")
+            else:
+                data = {k: v[0] for k, v in parse_qs(raw).items()}
+            with standin.lock:
+                standin.stats["tg_requests"] += 1
+            delay, fault = standin.draw(a.tg_error_rate, a.tg_throttle_rate)
+            time.sleep(delay)
+            if fault == "429":
+                with standin.lock:
+                    standin.stats["tg_429"] += 1
+                return self._json(429, {"ok": False, "error_code": 429,
+                                        "description": f"Too Many Requests: retry after {a.tg_retry_after}",
+                                        "parameters": {"retry_after": a.tg_retry_after}})
+            if fault == "5xx":
+                with standin.lock:
+                    standin.stats["tg_5xx"] += 1
+                return self._json(502, {"ok": False, "error_code": 502, "description": "Bad Gateway"})
+            standin.record_alert(data.get("chat_id"), data.get("text"))
+            return self._json(200, {"ok": True, "result": {"message_id": standin.stats["tg_delivered"],
+                                                           "date": int(time.time())}})
+
+    return Handler
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="OKX + Telegram stand-in server")
+    ap.add_argument("--recordings", default="recordings")
+    ap.add_argument("--archive", help="replay a candle archive directory (bot/archive.py) instead")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--speed", type=float, default=1.0, help="virtual seconds per real second")
+    ap.add_argument("--warmup", type=int, default=300, help="closed bars per series at virtual start")
+    ap.add_argument("--start", type=int, help="virtual start, epoch seconds (overrides --warmup)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="OKX 5xx probability")
+    ap.add_argument("--throttle-rate", type=float, default=0.0, help="OKX 429 probability")
+    ap.add_argument("--tg-error-rate", type=float, default=0.0)
+    ap.add_argument("--tg-throttle-rate", type=float, default=0.0)
+    ap.add_argument("--tg-retry-after", type=int, default=1)
+    ap.add_argument("--tg-log", help="append delivered messages as JSONL")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args(argv)
+
+    replay = Replay(args.recordings, args.speed, args.warmup, args.start, args.archive)
+    standin = StandIn(replay, args)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(standin))
+    print(f"stand-in on http://{args.host}:{args.port}  virtual start {replay.vstart}  speed x{args.speed}",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(standin.report(), indent=1), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())